@@ -0,0 +1,34 @@
+"""economy_leaderboard_index
+
+Revision ID: cc6ed9cc5dc4
+Revises: bb5dc8bb4cb3
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cc6ed9cc5dc4'
+down_revision: Union[str, Sequence[str], None] = 'bb5dc8bb4cb3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # EconomyRepository.get_leaderboard: ORDER BY balance DESC LIMIT n
+    op.create_index(
+        'ix_economy_balance_user',
+        'economy',
+        [sa.text('balance DESC'), 'user_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_economy_balance_user', table_name='economy')
@@ -12,6 +12,7 @@ from sqlalchemy import (
     DateTime,
     Enum as SQLEnum,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -142,6 +143,11 @@ class Economy(Base):
     # Relationships
     user: Mapped[User] = relationship("User", back_populates="economy")
     
+    # Leaderboard: ORDER BY balance DESC LIMIT n walks this index instead of sorting
+    __table_args__ = (
+        Index("ix_economy_balance_user", balance.desc(), "user_id"),
+    )
+    
     def __repr__(self) -> str:
         return f"<Economy user_id={self.user_id} balance={self.balance}>"
 
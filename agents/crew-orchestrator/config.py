@@ -12,6 +12,11 @@ class Settings(BaseSettings):
     cors_allow_origins: str = "http://localhost:8088,http://localhost:3000"
     enabled_agents: Optional[str] = None
 
+    # Async (ARQ) execution: max concurrent calls per agent across all workers.
+    # ORCHESTRATOR_AGENT_CONCURRENCY='{"coder_agent": 2}' overrides per agent.
+    agent_concurrency_default: int = 4
+    agent_concurrency: Dict[str, int] = {}
+
     # Agent Service URLs (defaults based on docker-compose service names)
     agents: Dict[str, str] = {
         "project_strategist": "http://project-strategist:8001",
@@ -28,6 +33,13 @@ class Settings(BaseSettings):
     def parsed_cors_allow_origins(self) -> List[str]:
         return [o.strip() for o in self.cors_allow_origins.split(",") if o.strip()]
 
+    def agent_url(self, agent_name: str) -> str:
+        return self.agents.get(agent_name.replace("-", "_")) or f"http://{agent_name}:8000"
+
+    def agent_concurrency_limit(self, agent_name: str) -> int:
+        key = agent_name.replace("-", "_")
+        return self.agent_concurrency.get(key, self.agent_concurrency_default)
+
     def enabled_agent_keys(self) -> List[str]:
         if not self.enabled_agents:
             return list(self.agents.keys())
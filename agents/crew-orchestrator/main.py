@@ -16,9 +16,10 @@ from fastapi import (
     status,
 )
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Any, Union
+from typing import List, Dict, Literal, Optional, Any, Union
 import httpx
 import json
 import logging
@@ -27,7 +28,9 @@ import os
 import hashlib
 from time import perf_counter
 from contextlib import asynccontextmanager
-from task_queue import get_redis_pool
+from task_queue import MAX_AGENTS_PER_TASK, enqueue_task, get_arq_pool, get_redis_pool
+from task_state import TASK_PROGRESS_CHANNEL, TaskProgressHub, TaskState, load_tasks
+from workflow_journal import run_recovery_sweeps
 import redis.asyncio as redis
 from datetime import datetime, timezone
 from prometheus_client import Counter
@@ -41,6 +44,10 @@ logging.basicConfig(level=settings.log_level)
 logger = logging.getLogger("crew-orchestrator")
 
 redis_client: Optional[redis.Redis] = None
+approval_waiter = None  # shared.approval_system.ApprovalWaiter, created on the first approval
+progress_hub: Optional[TaskProgressHub] = None
+arq_pool = None  # created on the first async submission
+APPROVAL_TIMEOUT_SECONDS = 60
 
 # Forward declaration of app
 app: FastAPI = None  # type: ignore
@@ -111,6 +118,30 @@ async def monitor_agent_health():
         await asyncio.sleep(30)  # Run every 30 seconds
 
 
+def _crew_memory():
+    """The orchestrator's AgentMemory (shared/rag_memory; ChromaDB may be missing)."""
+    import sys
+    _shared_path = os.path.join(os.path.dirname(__file__), "..", "shared")
+    if _shared_path not in sys.path:
+        sys.path.insert(0, _shared_path)
+    from rag_memory import AgentMemory  # type: ignore[import]
+    return AgentMemory(agent_name="crew-orchestrator")
+
+
+def _approval_system():
+    """shared/approval_system (mounted at /app/shared by docker-compose); 503 when the image lacks it."""
+    import importlib
+    import sys
+    _parent = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    if _parent not in sys.path:
+        sys.path.append(_parent)
+    try:
+        return importlib.import_module("shared.approval_system")
+    except ImportError as e:
+        logger.error(f"Approval system unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Approval system not available")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global redis_client
@@ -118,20 +149,37 @@ async def lifespan(app: FastAPI):
     redis_client = await get_redis_pool()
     logger.info("Redis connected")
 
+    # Open the RAG store now so the first /execute doesn't pay for loading it
+    try:
+        await asyncio.to_thread(lambda: _crew_memory().warm_up())
+    except Exception as e:
+        logger.warning(f"RAG memory warm-up skipped: {e}")
+
     # Start background tasks
     monitor_task = asyncio.create_task(monitor_agent_health())
     fan_out_task = asyncio.create_task(_redis_event_fan_out())
+    # Resume workflows interrupted by a shutdown or crash, once their lease lapses
+    recovery_task = asyncio.create_task(run_recovery_sweeps(redis_client, settings))
 
     yield
 
     # Shutdown
-    for task in (monitor_task, fan_out_task):
+    for task in (monitor_task, fan_out_task, recovery_task):
         task.cancel()
         try:
             await task
         except asyncio.CancelledError:
             pass
 
+    if approval_waiter:
+        await approval_waiter.close()
+
+    if progress_hub:
+        await progress_hub.close()
+
+    if arq_pool:
+        await arq_pool.close()
+
     if redis_client:
         await redis_client.close()
         logger.info("Redis connection closed")
@@ -273,6 +321,9 @@ class ExecuteRequest(BaseModel):
     agent_type: Optional[str] = None
     task_id: Optional[str] = None
     requires_approval: Optional[bool] = None
+    # "async": queue on the ARQ worker and return a job id instead of waiting
+    mode: Literal["sync", "async"] = "sync"
+    priority: Literal["high", "normal", "low"] = "normal"
 
 
 class SmokeRequest(BaseModel):
@@ -324,6 +375,7 @@ async def request_approval(
         logger.error("Redis not connected, cannot request approval")
         return "error"
 
+    approvals = _approval_system()
     approval_id = f"approval-{task_id}"
     if agent:
         approval_id += f"-{agent}"
@@ -349,26 +401,62 @@ async def request_approval(
         log_msg += f" ({agent})"
     await log_event("orchestrator", "warn", log_msg)
 
-    status = "pending"
-    timeout = 60
-    start_time = datetime.now()
-
-    while status == "pending":
-        if (datetime.now() - start_time).seconds > timeout:
-            await log_event("orchestrator", "error", f"Approval timeout for {task_id}")
-            return "timeout"
-
-        response = await redis_client.get(f"approval:{approval_id}:response")
-        if response:
-            data = json.loads(response)
-            status = data.get("status")
-        else:
-            await asyncio.sleep(1)
+    # Woken by /approvals/respond via pub/sub; no polling while we wait
+    global approval_waiter
+    if approval_waiter is None or approval_waiter.redis is not redis_client:
+        approval_waiter = approvals.ApprovalWaiter(redis_client)
+    response = await approval_waiter.wait(approval_id, APPROVAL_TIMEOUT_SECONDS)
+    if response is None:
+        await log_event("orchestrator", "error", f"Approval timeout for {task_id}")
+        return "timeout"
+    status = response.get("status")
 
     await log_event("orchestrator", "success", f"Approval received: {status}")
     return status
 
 
+async def submit_task(task: TaskDefinition, priority: str) -> JSONResponse:
+    """Queue a task on the ARQ worker; progress is followed via /tasks/{id}/stream"""
+    global arq_pool
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not connected")
+    if not (task.agents or task.agent):
+        raise HTTPException(status_code=422, detail="Task needs an agent or agents")
+    if len(task.agents or []) > MAX_AGENTS_PER_TASK:
+        raise HTTPException(status_code=422, detail=f"Queued tasks take at most {MAX_AGENTS_PER_TASK} agents")
+
+    state = TaskState(redis_client, task.id)
+    created = await state.create({
+        **task.dict(),
+        "status": "queued",
+        "priority": priority,
+        "queued_at": datetime.now().isoformat(),
+        "progress": 0,
+        "agents_completed": 0,
+        "steps": task.agents or [task.agent],
+    }, exclusive=True)
+    if not created:
+        raise HTTPException(status_code=409, detail=f"Task {task.id} already exists")
+    if arq_pool is None:
+        arq_pool = await get_arq_pool()
+    job_id = await enqueue_task(arq_pool, task.dict(), priority)
+    if job_id is None:
+        await state.discard()
+        raise HTTPException(status_code=409, detail=f"Task {task.id} already has a job")
+    await log_event("orchestrator", "info", f"Queued task: {task.id} ({priority})")
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "queued",
+            "task_id": task.id,
+            "job_id": job_id,
+            "priority": priority,
+            "stream": f"/tasks/{task.id}/stream",
+        },
+    )
+
+
 @app.post("/execute")
 async def execute_task(
     request: ExecuteRequest,
@@ -421,29 +509,30 @@ async def execute_task(
         )
     )
 
+    if request.mode == "async":
+        return await submit_task(task, request.priority)
+
+    if task.requires_approval and redis_client:
+        _approval_system()  # 503 before the task is recorded, not halfway through it
+
     # Store Task in Redis
-    if redis_client:
+    task_state = TaskState(redis_client, task.id) if redis_client else None
+    if task_state:
         task_data = task.dict()
         task_data["status"] = "in_progress"
         task_data["started_at"] = datetime.now().isoformat()
         task_data["progress"] = 0
+        task_data["agents_completed"] = 0
         task_data["steps"] = task.agents or [task.agent]
-        await redis_client.set(f"task:{task.id}:details", json.dumps(task_data))
-        await redis_client.lpush("tasks:history", task.id)
-        await redis_client.ltrim("tasks:history", 0, 99)
+        await task_state.create(task_data)
 
         await log_event("orchestrator", "info", f"Received task: {task.id}")
 
     # 2. RAG Query — retrieve relevant context from shared agent memory
     rag_context: str = ""
     try:
-        import sys
-        import os
-        _shared_path = os.path.join(os.path.dirname(__file__), "..", "shared")
-        if _shared_path not in sys.path:
-            sys.path.insert(0, _shared_path)
-        from rag_memory import AgentMemory  # type: ignore[import]
-        _agent_memory = AgentMemory(agent_name="crew-orchestrator")
+        # Cheap: the client/collection are shared process-wide by rag_memory
+        _agent_memory = _crew_memory()
         rag_context = _agent_memory.query_relevant_context(task.description, top_k=3)
         logger.info(
             json.dumps(
@@ -478,7 +567,10 @@ async def execute_task(
     if task.requires_approval:
         status = await request_approval(task.id, task.description, task.agent)
         if status != "approved":
-            return {"status": "rejected" if status != "timeout" else "timeout"}
+            outcome = "rejected" if status != "timeout" else "timeout"
+            if task_state:
+                await task_state.update(status=outcome)
+            return {"status": outcome}
 
     # 5. Execute Agent(s)
     agents_to_run = []
@@ -490,10 +582,8 @@ async def execute_task(
     results = {}
 
     # Update progress
-    if redis_client:
-        task_data = json.loads(await redis_client.get(f"task:{task.id}:details"))
-        task_data["progress"] = 10
-        await redis_client.set(f"task:{task.id}:details", json.dumps(task_data))
+    if task_state:
+        await task_state.update(progress=10)
 
     for i, agent_name in enumerate(agents_to_run):
         await log_event(
@@ -505,9 +595,9 @@ async def execute_task(
             await redis_client.set(f"agent:{agent_name}:current_task", task.id)
 
             # Update progress
-            task_data = json.loads(await redis_client.get(f"task:{task.id}:details"))
-            task_data["progress"] = 10 + int((i / len(agents_to_run)) * 80)
-            await redis_client.set(f"task:{task.id}:details", json.dumps(task_data))
+            await task_state.update(
+                progress=10 + int((i / len(agents_to_run)) * 80), current_agent=agent_name
+            )
 
         # Approval for multi-agent (Test 2/3)
         if len(agents_to_run) > 1 and task.requires_approval:
@@ -515,10 +605,10 @@ async def execute_task(
             status = await request_approval(task.id, desc, agent_name)
 
             if status != "approved":
-                return {
-                    "status": "rejected" if status != "timeout" else "timeout",
-                    "agent": agent_name,
-                }
+                outcome = "rejected" if status != "timeout" else "timeout"
+                if task_state:
+                    await task_state.update(status=outcome)
+                return {"status": outcome, "agent": agent_name}
 
         # Determine agent URL
         agent_key = agent_name.replace("-", "_")
@@ -546,6 +636,8 @@ async def execute_task(
                         agent_name, "success", "Task completed successfully"
                     )
                     results[agent_name] = result
+                    if task_state:
+                        await task_state.update(incr={"agents_completed": 1})
                 else:
                     await log_event(
                         agent_name, "error", f"Failed: status={response.status_code}"
@@ -554,11 +646,15 @@ async def execute_task(
                         "status": "error",
                         "message": "Agent execution failed",
                     }
+                    if task_state:
+                        await task_state.update(status="failed", failed_agent=agent_name)
                     return {"status": "error", "message": "Agent execution failed"}
 
         except Exception:
             await log_event(agent_name, "error", "Exception during agent execution")
             logger.exception("Agent execution exception")
+            if task_state:
+                await task_state.update(status="failed", failed_agent=agent_name)
             return {"status": "error", "message": "Agent execution failed"}
         finally:
             # Mark agent as idle
@@ -567,10 +663,9 @@ async def execute_task(
 
     # Final update
     if redis_client:
-        task_data = json.loads(await redis_client.get(f"task:{task.id}:details"))
-        task_data["progress"] = 100
-        task_data["status"] = "completed"
-        await redis_client.set(f"task:{task.id}:details", json.dumps(task_data))
+        await task_state.update(
+            progress=100, status="completed", completed_at=datetime.now().isoformat()
+        )
         await log_event("orchestrator", "success", "Workflow completed")
 
         # Publish BROski$ reward event — backend Celery / Discord bot listens
@@ -838,12 +933,8 @@ async def respond_to_approval(
     if not approval_id:
         raise HTTPException(status_code=400, detail="Missing approval_id")
 
-    # Store the response where the waiting agent can find it
-    await redis_client.set(
-        f"approval:{approval_id}:response",
-        json.dumps(response),
-        ex=3600,  # Expire in 1 hour
-    )
+    # Store the response where the waiting agent can find it, and wake it
+    await _approval_system().publish_response(redis_client, approval_id, response)
 
     return {"status": "response_recorded"}
 
@@ -933,16 +1024,30 @@ async def get_tasks(api_key: str = Depends(require_api_key)):
     if not redis_client:
         return []
 
-    # Get last 10 tasks from a list
+    # Last 10 tasks, fetched in one pipelined round trip. For live updates
+    # subscribe to the task_progress channel (or /ws/events) instead of polling.
     task_ids = await redis_client.lrange("tasks:history", 0, 9)
-    tasks = []
+    return await load_tasks(redis_client, task_ids)
+
+
+@app.get("/tasks/{task_id}/stream")
+async def stream_task(task_id: str, api_key: str = Depends(require_api_key)):
+    """Server-sent events: the task's current state, then every progress delta until it finishes"""
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Redis not connected")
+    if not await load_tasks(redis_client, [task_id]):
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    global progress_hub
+    if progress_hub is None or progress_hub.redis is not redis_client:
+        progress_hub = TaskProgressHub(redis_client)
+    hub = progress_hub
 
-    for tid in task_ids:
-        task_data = await redis_client.get(f"task:{tid}:details")
-        if task_data:
-            tasks.append(json.loads(task_data))
+    async def events():
+        async for update in hub.follow(task_id):
+            yield f"data: {json.dumps(update)}\n\n"
 
-    return tasks
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 @app.get("/logs")
@@ -979,7 +1084,7 @@ async def _redis_event_fan_out() -> None:
     if not redis_client:
         return
     pubsub = redis_client.pubsub()
-    await pubsub.subscribe("ws_tasks", "broski_events", "approval_requests")
+    await pubsub.subscribe("ws_tasks", TASK_PROGRESS_CHANNEL, "broski_events", "approval_requests")
     try:
         async for raw in pubsub.listen():
             if raw["type"] != "message":
@@ -1006,7 +1111,7 @@ async def ws_events(websocket: WebSocket):
     Real-time event stream for Mission Control Dashboard.
     Pushes agent tasks, BROski rewards, and approval requests as they happen.
 
-    Message format: { "channel": "ws_tasks"|"broski_events"|..., "data": {...} }
+    Message format: { "channel": "ws_tasks"|"task_progress"|"broski_events"|..., "data": {...} }
     """
     await websocket.accept()
     _ws_clients.add(websocket)
@@ -1,52 +1,284 @@
-from arq.connections import RedisSettings
-import httpx
+"""
+ARQ task queue for the crew orchestrator.
+
+POST /execute with "mode": "async" enqueues an execute_crew_task job and
+returns straight away; the worker calls the agents one after another and
+reports through task_state (hash + task_progress channel), which
+GET /tasks/{id}/stream relays to the client.
+
+  - Priorities: one ARQ queue per priority. WorkerSettings serves "normal"
+    (ARQ's default queue); run HighPriorityWorkerSettings and
+    LowPriorityWorkerSettings next to it so urgent work has its own capacity:
+        arq task_queue.WorkerSettings
+        arq task_queue.HighPriorityWorkerSettings
+        arq task_queue.LowPriorityWorkerSettings
+  - Per-agent limits: a Redis ZSET of leased slots per agent, shared by all
+    workers. When an agent is full the job is re-queued with arq.Retry
+    instead of holding a worker; on retry it resumes after the last agent
+    that finished (agents_completed in the task hash). On the last of
+    SLOT_MAX_TRIES the task is marked failed instead.
+  - Deadlines: each run of a task gets job_timeout_for(its agents), enough
+    for every agent call and approval wait. ARQ only has per-function
+    timeouts, so the function's is sized for MAX_AGENTS_PER_TASK and the
+    tighter per-task deadline is enforced inside the job. Any failure other
+    than a slot retry marks the task failed before it propagates.
+  - One pooled httpx.AsyncClient per worker process (startup/shutdown).
+"""
+import asyncio
 import json
 import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import httpx
+from arq import Retry
+from arq.connections import RedisSettings
+from arq.worker import func
 
 logger = logging.getLogger(__name__)
 
+PRIORITY_QUEUES = {
+    "high": "arq:queue:orchestrator:high",
+    "normal": "arq:queue",  # ARQ's default queue
+    "low": "arq:queue:orchestrator:low",
+}
+APPROVAL_TIMEOUT_SECONDS = 60
+AGENT_TIMEOUT_SECONDS = 120.0
+SLOT_RETRY_SECONDS = 2
+SLOT_MAX_TRIES = 150  # ~5 minutes of waiting for a busy agent
+MAX_AGENTS_PER_TASK = 10
+JOB_TIMEOUT_MARGIN_SECONDS = 30
+
+
+def job_timeout_for(agent_count: int) -> float:
+    """Longest a crew task with ``agent_count`` agents may run (per try)."""
+    return agent_count * (AGENT_TIMEOUT_SECONDS + APPROVAL_TIMEOUT_SECONDS) + JOB_TIMEOUT_MARGIN_SECONDS
+
+
+def _redis_settings() -> RedisSettings:
+    # Use environment variable or fallback to localhost for local dev, 'redis' for docker
+    return RedisSettings(
+        host=os.getenv('ORCHESTRATOR_REDIS_HOST', 'localhost'),
+        port=int(os.getenv('ORCHESTRATOR_REDIS_PORT', 6379)),
+    )
+
+
+def job_id_for(task_id: str) -> str:
+    return f"crew-task:{task_id}"
+
+
+# ── Per-agent concurrency ─────────────────────────────────────────────
+def _slots_key(agent_name: str) -> str:
+    return f"agent:{agent_name}:slots"
+
+
+async def acquire_agent_slot(redis, agent_name: str, holder: str, limit: int, lease_seconds: float) -> bool:
+    """Take one of ``limit`` slots for ``agent_name``; leases expire so a dead worker can't leak them."""
+    key = _slots_key(agent_name)
+    now = time.time()
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.zadd(key, {holder: now + lease_seconds})
+        pipe.zcard(key)
+        _, _, holders = await pipe.execute()
+    if holders <= limit:
+        return True
+    await redis.zrem(key, holder)
+    return False
+
+
+async def release_agent_slot(redis, agent_name: str, holder: str) -> None:
+    await redis.zrem(_slots_key(agent_name), holder)
+
+
+# ── Submission ────────────────────────────────────────────────────────
+async def enqueue_task(pool, task: Dict[str, Any], priority: str = "normal") -> Optional[str]:
+    """
+    Queue a crew task. Returns the job id, or None when ARQ already has a job
+    (queued, running or a kept result) for this task id.
+    """
+    job_id = job_id_for(task["id"])
+    job = await pool.enqueue_job(
+        "execute_crew_task",
+        task,
+        _job_id=job_id,
+        _queue_name=PRIORITY_QUEUES[priority],
+    )
+    return None if job is None else job_id
+
+
 # Task definitions
 async def execute_agent_task(ctx, agent_name: str, task: dict):
     """Worker function that executes agent tasks"""
     logger.info(f"Executing task {task.get('id')} on {agent_name}")
-    
+
     agent_url = f"http://{agent_name}:8000" if ":" not in agent_name else agent_name
-    
+
     try:
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(f"{agent_url}/execute", json=task)
-            response.raise_for_status()
-            result = response.json()
-        
+        response = await ctx['http'].post(f"{agent_url}/execute", json=task, timeout=300.0)
+        response.raise_for_status()
+        result = response.json()
+
         # Store result in Redis
         task_id = task.get('id', 'unknown')
         await ctx['redis'].set(
-            f"task_result:{task_id}", 
+            f"task_result:{task_id}",
             json.dumps(result),
             ex=3600 * 24  # Expire after 24 hours
         )
-        
+
         return result
     except Exception as e:
         logger.error(f"Task {task.get('id')} failed: {e}")
         # Could implement retry logic here or let ARQ handle it via retry_jobs
         raise
 
+
+async def _await_approval(ctx, task: Dict[str, Any], agent_name: str) -> str:
+    from shared.approval_system import response_key
+
+    approval_id = f"approval-{task['id']}-{agent_name}"
+    stored = await ctx['state_redis'].get(response_key(approval_id))
+    if stored:  # answered before a slot retry re-queued this job
+        return json.loads(stored).get("status", "rejected")
+    await ctx['state_redis'].publish("approval_requests", json.dumps({
+        "id": approval_id,
+        "task_id": task["id"],
+        "description": task["description"],
+        "agent": agent_name,
+        "plan": f"Execute specific tasks for {agent_name}",
+        "risk_level": "Low",
+        "estimated_time": "2 minutes",
+    }))
+    response = await ctx['approvals'].wait(approval_id, APPROVAL_TIMEOUT_SECONDS)
+    return "timeout" if response is None else response.get("status", "rejected")
+
+
+async def execute_crew_task(ctx, task: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a task's agents in order, resuming after the last one that finished."""
+    from task_state import TaskState
+
+    state = TaskState(ctx['state_redis'], task["id"])
+    agents = task.get("agents") or [task["agent"]]
+    try:
+        return await asyncio.wait_for(_run_agents(ctx, task, state, agents), job_timeout_for(len(agents)))
+    except Retry:
+        raise
+    except Exception as e:
+        logger.exception(f"Crew task {task['id']} failed")
+        await state.update(status="failed", error=str(e) or e.__class__.__name__)
+        raise
+
+
+async def _run_agents(ctx, task: Dict[str, Any], state, agents) -> Dict[str, Any]:
+    from config import settings
+    from task_state import load_tasks
+
+    redis = ctx['state_redis']
+    [current] = await load_tasks(redis, [task["id"]]) or [{}]
+    done = current.get("agents_completed", 0)
+    results = current.get("results") or {}
+    holder = task["id"]
+
+    if done == 0:
+        await state.update(status="in_progress", started_at=datetime.now().isoformat(), progress=10)
+
+    for i in range(done, len(agents)):
+        agent_name = agents[i]
+        if task.get("requires_approval"):
+            status = await _await_approval(ctx, task, agent_name)
+            if status != "approved":
+                outcome = "rejected" if status != "timeout" else "timeout"
+                await state.update(status=outcome, failed_agent=agent_name)
+                return {"status": outcome, "agent": agent_name}
+
+        limit = settings.agent_concurrency_limit(agent_name)
+        if not await acquire_agent_slot(redis, agent_name, holder, limit, AGENT_TIMEOUT_SECONDS + 30):
+            if ctx.get('job_try', 1) >= SLOT_MAX_TRIES:
+                await state.update(status="failed", failed_agent=agent_name, error="Agent busy, gave up waiting")
+                return {"status": "error", "agent": agent_name}
+            await state.update(status="waiting", waiting_for=agent_name)
+            raise Retry(defer=SLOT_RETRY_SECONDS)
+
+        try:
+            await state.update(
+                status="in_progress",
+                current_agent=agent_name,
+                progress=10 + int((i / len(agents)) * 80),
+            )
+            response = await ctx['http'].post(
+                f"{settings.agent_url(agent_name)}/execute",
+                json={"id": task["id"], "task": task["description"], "type": task.get("type"), "requires_approval": False},
+                timeout=AGENT_TIMEOUT_SECONDS,
+            )
+            ok = response.status_code == 200
+            result = response.json() if ok else {"status": "error", "message": "Agent execution failed"}
+        except httpx.HTTPError as e:
+            ok, result = False, {"status": "error", "message": str(e)}
+        finally:
+            await release_agent_slot(redis, agent_name, holder)
+
+        results[agent_name] = result
+        if not ok:
+            await state.update(status="failed", failed_agent=agent_name, results=results)
+            return {"status": "error", "agent": agent_name}
+        await state.update(incr={"agents_completed": 1}, results=results)
+
+    await state.update(progress=100, status="completed", completed_at=datetime.now().isoformat())
+    await redis.publish("broski_events", json.dumps({
+        "event": "task_completed",
+        "task_id": task["id"],
+        "task_type": task.get("type"),
+        "agents": list(results),
+        "timestamp": datetime.now().isoformat(),
+    }))
+    return {"status": "completed", "results": results}
+
+
+# ── Worker lifecycle ──────────────────────────────────────────────────
+async def startup(ctx) -> None:
+    from shared.approval_system import ApprovalWaiter
+
+    ctx['http'] = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=AGENT_TIMEOUT_SECONDS,
+    )
+    ctx['state_redis'] = await get_redis_pool()
+    ctx['approvals'] = ApprovalWaiter(ctx['state_redis'])
+
+
+async def shutdown(ctx) -> None:
+    await ctx['approvals'].close()
+    await ctx['http'].aclose()
+    await ctx['state_redis'].close()
+
+
 # Worker settings
 class WorkerSettings:
-    # Use environment variable or fallback to localhost for local dev, 'redis' for docker
-    import os
-    redis_host = os.getenv('ORCHESTRATOR_REDIS_HOST', 'localhost')
-    redis_port = int(os.getenv('ORCHESTRATOR_REDIS_PORT', 6379))
-    
-    redis_settings = RedisSettings(host=redis_host, port=redis_port)
-    functions = [execute_agent_task]
+    redis_settings = _redis_settings()
+    functions = [
+        execute_agent_task,
+        func(execute_crew_task, max_tries=SLOT_MAX_TRIES, timeout=job_timeout_for(MAX_AGENTS_PER_TASK)),
+    ]
+    on_startup = startup
+    on_shutdown = shutdown
     max_jobs = 10
     job_timeout = 600  # 10 minutes
     allow_abort_jobs = True
 
+
+class HighPriorityWorkerSettings(WorkerSettings):
+    queue_name = PRIORITY_QUEUES["high"]
+
+
+class LowPriorityWorkerSettings(WorkerSettings):
+    queue_name = PRIORITY_QUEUES["low"]
+    max_jobs = 5
+
+
 async def get_redis_pool():
-    import os
     import redis.asyncio as aioredis
 
     redis_host = os.getenv('ORCHESTRATOR_REDIS_HOST', 'localhost')
@@ -57,3 +289,9 @@ async def get_redis_pool():
         encoding="utf-8",
         decode_responses=True,
     )
+
+
+async def get_arq_pool():
+    from arq import create_pool
+
+    return await create_pool(_redis_settings())
@@ -0,0 +1,231 @@
+"""
+Task State - Orchestrator task progress as a Redis hash
+
+  task:{id}:state   Hash, one field per attribute. Strings and numbers are
+                    stored as-is; lists, dicts and booleans as JSON (decoded
+                    again for the fields in _JSON_FIELDS).
+  tasks:history     List of the last HISTORY_LIMIT task ids, newest first
+  task_progress     Pub/sub channel carrying every change as a delta:
+                    {"task_id", "timestamp", <changed fields>, "incr": {...}}
+
+Updates touch only the fields they change (HSET / HINCRBY) and go out with
+their delta in one MULTI/EXEC, so concurrent reporters can't overwrite each
+other and each progress step is a single round trip. Dashboards can
+subscribe to task_progress instead of polling /tasks; inside the
+orchestrator, TaskProgressHub shares one subscription between all the
+/tasks/{id}/stream followers.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from redis.exceptions import WatchError
+
+logger = logging.getLogger(__name__)
+
+HISTORY_KEY = "tasks:history"
+HISTORY_LIMIT = 100
+TASK_PROGRESS_CHANNEL = "task_progress"
+
+TERMINAL_STATUSES = {"completed", "failed", "rejected", "timeout"}
+# A follower gives up after this long without a delta for its task (a
+# worker that died mid-task never publishes a terminal status).
+FOLLOW_IDLE_TIMEOUT_SECONDS = 300.0
+
+_INT_FIELDS = {"progress", "agents_completed"}
+_JSON_FIELDS = {"agents", "steps", "requires_approval", "results"}
+
+
+def state_key(task_id: str) -> str:
+    return f"task:{task_id}:state"
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return value
+    return json.dumps(value)
+
+
+def decode_task(raw: Dict[str, str]) -> Dict[str, Any]:
+    """Inverse of the hash encoding, for HGETALL replies."""
+    task: Dict[str, Any] = {}
+    for field, value in raw.items():
+        if field in _INT_FIELDS:
+            task[field] = int(value)
+        elif field in _JSON_FIELDS:
+            task[field] = json.loads(value)
+        else:
+            task[field] = value
+    return task
+
+
+class TaskState:
+    """Field-level writer for one task's state hash."""
+
+    def __init__(self, redis_client, task_id: str):
+        self.redis = redis_client
+        self.task_id = task_id
+        self.key = state_key(task_id)
+
+    def _delta(self, fields: Dict[str, Any], incr: Optional[Dict[str, int]] = None) -> str:
+        delta = {"task_id": self.task_id, "timestamp": datetime.now().isoformat(), **fields}
+        if incr:
+            delta["incr"] = incr
+        return json.dumps(delta)
+
+    async def create(self, fields: Dict[str, Any], exclusive: bool = False) -> bool:
+        """
+        Write the task's initial state. With ``exclusive`` the hash is only
+        created if it doesn't exist yet (WATCH + MULTI) and False is returned
+        otherwise; without it any previous state is replaced.
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if exclusive:
+                await pipe.watch(self.key)
+                if await pipe.exists(self.key):
+                    return False
+                pipe.multi()
+            pipe.delete(self.key)
+            pipe.hset(self.key, mapping={k: _encode(v) for k, v in fields.items() if v is not None})
+            pipe.lpush(HISTORY_KEY, self.task_id)
+            pipe.ltrim(HISTORY_KEY, 0, HISTORY_LIMIT - 1)
+            pipe.publish(TASK_PROGRESS_CHANNEL, self._delta(fields))
+            try:
+                await pipe.execute()
+            except WatchError:  # created by a concurrent submission
+                return False
+        return True
+
+    async def discard(self) -> None:
+        """Drop a state hash that turned out to have no work behind it."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.key)
+            pipe.lrem(HISTORY_KEY, 1, self.task_id)
+            await pipe.execute()
+
+    async def update(self, incr: Optional[Dict[str, int]] = None, **fields: Any) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if fields:
+                pipe.hset(self.key, mapping={k: _encode(v) for k, v in fields.items()})
+            for field, amount in (incr or {}).items():
+                pipe.hincrby(self.key, field, amount)
+            pipe.publish(TASK_PROGRESS_CHANNEL, self._delta(fields, incr))
+            await pipe.execute()
+
+
+async def load_tasks(redis_client, task_ids: List[str]) -> List[Dict[str, Any]]:
+    """Fetch several tasks in one pipelined round trip; unknown ids are skipped."""
+    if not task_ids:
+        return []
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for task_id in task_ids:
+            pipe.hgetall(state_key(task_id))
+        replies = await pipe.execute()
+    return [decode_task(raw) for raw in replies if raw]
+
+
+class TaskProgressHub:
+    """
+    Follows any number of tasks over a single task_progress subscription
+    (the ApprovalWaiter pattern): one listener routes each delta to the
+    queues of that task's followers.
+    """
+
+    # After the subscription breaks, followers wait this long before resubscribing
+    RESUBSCRIBE_SECONDS = 1.0
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self._followers: Dict[str, List[asyncio.Queue]] = {}
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_listening(self) -> None:
+        if self._listener is not None and not self._listener.done():
+            return
+        async with self._lock:
+            if self._listener is not None and not self._listener.done():
+                return
+            pubsub = self.redis.pubsub()
+            await pubsub.subscribe(TASK_PROGRESS_CHANNEL)
+            self._pubsub = pubsub
+            self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub) -> None:
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    delta = json.loads(message["data"])
+                except ValueError:
+                    continue
+                for queue in self._followers.get(delta.get("task_id"), ()):
+                    queue.put_nowait(delta)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Task progress listener stopped: %s", exc)
+        try:
+            await pubsub.aclose()
+        except Exception:
+            pass
+        # Deltas may have been lost: every follower re-reads the hash
+        for queues in list(self._followers.values()):
+            for queue in queues:
+                queue.put_nowait(None)
+
+    async def follow(
+        self, task_id: str, idle_timeout: float = FOLLOW_IDLE_TIMEOUT_SECONDS
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the task's current state, then each delta published for it,
+        until it reaches a terminal status or nothing is published for it
+        for ``idle_timeout`` seconds. Yields nothing for an unknown task.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        queues = self._followers.setdefault(task_id, [])
+        queues.append(queue)
+        try:
+            await self._ensure_listening()  # before the snapshot, so no delta is missed
+            snapshot = await load_tasks(self.redis, [task_id])
+            if not snapshot:
+                return
+            yield snapshot[0]
+            if snapshot[0].get("status") in TERMINAL_STATUSES:
+                return
+            deadline = loop.time() + idle_timeout
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    delta = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    return
+                if delta is None:  # listener died: resubscribe, then resync from the hash
+                    await asyncio.sleep(min(self.RESUBSCRIBE_SECONDS, max(0.0, deadline - loop.time())))
+                    await self._ensure_listening()
+                    snapshot = await load_tasks(self.redis, [task_id])
+                    if not snapshot:
+                        return
+                    delta = snapshot[0]
+                yield delta
+                if delta.get("status") in TERMINAL_STATUSES:
+                    return
+                deadline = loop.time() + idle_timeout
+        finally:
+            queues.remove(queue)
+            if not queues and self._followers.get(task_id) is queues:
+                del self._followers[task_id]
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
@@ -1,3 +1,4 @@
+import fakeredis
 import pytest
 import pytest_asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -7,6 +8,8 @@ import os
 
 # Add parent directory to path to import main
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# ...and agents/ for shared/ (mounted at /app/shared by docker-compose)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 # Mock arq before importing main/task_queue
 mock_arq = MagicMock()
@@ -26,6 +29,11 @@ def mock_redis():
     mock.ltrim.return_value = True
     mock.publish.return_value = True
     mock.delete.return_value = True
+    # Task state goes through MULTI pipelines (task_state.TaskState)
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock(return_value=[])
+    mock.pipeline = MagicMock(return_value=pipe)
     # Mock pubsub for websocket tests if needed
     mock_pubsub = AsyncMock()
     mock_pubsub.subscribe.return_value = None
@@ -33,6 +41,12 @@ def mock_redis():
     mock.pubsub.return_value = mock_pubsub
     return mock
 
+@pytest_asyncio.fixture
+async def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
 @pytest.fixture
 def mock_httpx_response():
     response = MagicMock()
@@ -4,6 +4,7 @@ import os
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, patch, MagicMock
 import json
+import fakeredis
 
 # Add parent directory to path to import main
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -22,6 +23,10 @@ def mock_redis():
     mock.set.return_value = True
     mock.lpush.return_value = True
     mock.publish.return_value = 1
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock(return_value=[])
+    mock.pipeline = MagicMock(return_value=pipe)
     
     with patch("main.redis_client", mock):
         yield mock
@@ -60,9 +65,6 @@ async def test_execute_task_simple(mock_redis):
         }
     }
     
-    # Setup Redis to return task details
-    mock_redis.get.return_value = json.dumps({"status": "running", "progress": 0})
-    
     # Mock httpx
     with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
         # Configure the response object
@@ -90,16 +92,12 @@ async def test_execute_task_requires_approval(mock_redis):
         }
     }
     
-    # Complex side effect for Redis get
-    async def get_side_effect(key):
-        if "details" in key:
-             return json.dumps({"status": "running", "progress": 0})
-        if "approval" in key:
-            # Simulate approval granted
-            return json.dumps({"status": "approved"})
-        return None
-        
-    mock_redis.get.side_effect = get_side_effect
+    # Approval already granted: the waiter finds it on its first check
+    server = fakeredis.FakeServer()
+    fakeredis.FakeRedis(server=server).set(
+        "approval:approval-test-task-2-backend-specialist:response", json.dumps({"status": "approved"})
+    )
+    fake = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
 
     with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
         mock_response = MagicMock()
@@ -107,8 +105,7 @@ async def test_execute_task_requires_approval(mock_redis):
         mock_response.json.return_value = {"status": "success"}
         mock_post.return_value = mock_response
         
-        # Patch sleep to speed up test
-        with patch("asyncio.sleep", new_callable=AsyncMock): 
+        with patch("main.redis_client", fake):
             response = client.post("/execute", json=payload)
             
             assert response.status_code == 200
@@ -2,7 +2,6 @@ import pytest
 import json
 import asyncio
 from unittest.mock import AsyncMock, patch, MagicMock
-from datetime import datetime, timedelta
 import sys
 import os
 
@@ -10,6 +9,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from main import request_approval, monitor_agent_health
+from shared.approval_system import publish_response
+from task_state import state_key
 
 @pytest.mark.asyncio
 async def test_execute_endpoint_success(client, mock_redis, mock_httpx_response):
@@ -17,16 +18,8 @@ async def test_execute_endpoint_success(client, mock_redis, mock_httpx_response)
     # Mock Redis responses
     # Redis is used for:
     # 1. Logging (lpush)
-    # 2. Task details (set)
+    # 2. Task state and progress (pipelined HSET + publish)
     # 3. Agent busy status (set/delete)
-    # 4. Progress updates (get/set)
-    
-    # We mock get to return a valid JSON for task details update
-    mock_redis.get.return_value = json.dumps({
-        "id": "test-task",
-        "status": "in_progress",
-        "progress": 0
-    })
     
     # Mock HTTPX for agent call
     mock_client = AsyncMock()
@@ -55,23 +48,13 @@ async def test_execute_endpoint_success(client, mock_redis, mock_httpx_response)
     # Verify Redis interactions
     assert mock_redis.set.called
     assert mock_redis.lpush.called
+    assert mock_redis.pipeline.called
+    assert not mock_redis.get.called  # progress no longer re-reads the task
 
 @pytest.mark.asyncio
-async def test_approval_flow_success(client, mock_redis):
+async def test_approval_flow_success(client, fake_redis):
     """Test approval flow where request is approved immediately"""
-    # Define side effect to handle different keys
-    def get_side_effect(key, *args, **kwargs):
-        if "approval" in key:
-            return json.dumps({"status": "approved"})
-        # Default mock for task details
-        return json.dumps({
-            "id": "task-approval-ok",
-            "status": "in_progress",
-            "progress": 0,
-            "agents": ["qa_engineer"]
-        })
-    
-    mock_redis.get.side_effect = get_side_effect
+    await publish_response(fake_redis, "approval-task-approval-ok-qa_engineer", {"status": "approved"})
     
     payload = {
         "task": {
@@ -89,7 +72,7 @@ async def test_approval_flow_success(client, mock_redis):
     mock_client.__aenter__.return_value = mock_client
     mock_client.__aexit__.return_value = None
 
-    with patch("httpx.AsyncClient", return_value=mock_client):
+    with patch("httpx.AsyncClient", return_value=mock_client), patch("main.redis_client", fake_redis):
         # We also need to mock log_event to avoid errors if redis mock isn't perfect
         with patch("main.log_event", new=AsyncMock()):
              response = await client.post("/execute", json=payload)
@@ -98,9 +81,9 @@ async def test_approval_flow_success(client, mock_redis):
     assert response.json()["status"] == "completed"
 
 @pytest.mark.asyncio
-async def test_approval_flow_rejection(client, mock_redis):
+async def test_approval_flow_rejection(client, fake_redis):
     """Test approval flow where request is rejected"""
-    mock_redis.get.return_value = json.dumps({"status": "rejected"})
+    await publish_response(fake_redis, "approval-task-approval-no-qa_engineer", {"status": "rejected"})
     
     payload = {
         "task": {
@@ -112,38 +95,48 @@ async def test_approval_flow_rejection(client, mock_redis):
         }
     }
     
-    with patch("main.log_event", new=AsyncMock()):
+    with patch("main.log_event", new=AsyncMock()), patch("main.redis_client", fake_redis):
         response = await client.post("/execute", json=payload)
         
     assert response.status_code == 200
     assert response.json()["status"] == "rejected"
 
 @pytest.mark.asyncio
-async def test_request_approval_timeout(mock_redis):
+async def test_request_approval_timeout(fake_redis):
     """Test the request_approval helper timeout logic"""
-    # We need to simulate time passing
-    start_time = datetime.now()
-    
-    with patch("main.datetime") as mock_dt:
-        # Define return values for datetime.now() calls
-        # 1. Assignment of start_time
-        # 2. Loop check (let's say it's > timeout)
-        mock_dt.now.side_effect = [
-            start_time,
-            start_time + timedelta(seconds=61)
-        ]
-        
-        # Redis returns None (no response yet)
-        mock_redis.get.return_value = None
-        
-        # Patch redis_client in main
-        with patch("main.redis_client", mock_redis):
-            # Patch log_event
-            with patch("main.log_event", new=AsyncMock()):
-                status = await request_approval("task-timeout", "desc")
+    with patch("main.redis_client", fake_redis), patch("main.APPROVAL_TIMEOUT_SECONDS", 0.05):
+        with patch("main.log_event", new=AsyncMock()):
+            status = await request_approval("task-timeout", "desc")
                 
     assert status == "timeout"
 
+@pytest.mark.asyncio
+async def test_request_approval_woken_by_response(client, fake_redis):
+    """A response posted while waiting wakes request_approval without polling"""
+    with patch("main.redis_client", fake_redis), patch("main.log_event", new=AsyncMock()):
+        waiting = asyncio.create_task(request_approval("task-live", "desc"))
+        await asyncio.sleep(0.05)
+        response = await client.post(
+            "/approvals/respond", json={"approval_id": "approval-task-live", "status": "approved"}
+        )
+        assert response.status_code == 200
+        status = await asyncio.wait_for(waiting, 1)
+    assert status == "approved"
+
+@pytest.mark.asyncio
+async def test_approvals_answer_503_without_shared_module(client, fake_redis):
+    """An image built without agents/shared still starts; only approvals are unavailable"""
+    payload = {"task": {"id": "task-no-shared", "type": "test", "description": "desc",
+                        "agent": "qa_engineer", "requires_approval": True}}
+    with patch.dict(sys.modules, {"shared.approval_system": None}), \
+            patch("main.redis_client", fake_redis), patch("main.log_event", new=AsyncMock()):
+        respond = await client.post("/approvals/respond", json={"approval_id": "a", "status": "approved"})
+        execute = await client.post("/execute", json=payload)
+
+    assert respond.status_code == 503
+    assert execute.status_code == 503
+    assert not await fake_redis.exists(state_key("task-no-shared"))
+
 @pytest.mark.asyncio
 async def test_health_check_monitor(mock_redis):
     """Test the background health monitor"""
@@ -214,3 +207,31 @@ async def test_health_check_alert(mock_redis):
     assert mock_redis.publish.call_args[0][0] == "approval_requests"
     alert_msg = json.loads(mock_redis.publish.call_args[0][1])
     assert alert_msg["type"] == "CRITICAL_ALERT"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("memory", [MagicMock(), ImportError("No module named 'chromadb'")])
+async def test_startup_warms_up_rag_memory(fake_redis, memory):
+    """The RAG store is opened at startup, and a missing ChromaDB doesn't stop it"""
+    import main
+
+    async def idle():
+        await asyncio.Event().wait()
+
+    crew_memory = MagicMock(side_effect=memory) if isinstance(memory, Exception) else MagicMock(return_value=memory)
+    with patch.multiple(
+        "main",
+        get_redis_pool=AsyncMock(return_value=fake_redis),
+        run_recovery_sweeps=lambda *args: idle(),
+        monitor_agent_health=idle,
+        _redis_event_fan_out=idle,
+        _crew_memory=crew_memory,
+        redis_client=None,
+        approval_waiter=None,
+        progress_hub=None,
+        arq_pool=None,
+    ):
+        async with main.lifespan(main.app):
+            crew_memory.assert_called_once()
+    if not isinstance(memory, Exception):
+        memory.warm_up.assert_called_once()
@@ -0,0 +1,214 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import task_queue
+from task_queue import PRIORITY_QUEUES, acquire_agent_slot, enqueue_task, execute_crew_task, release_agent_slot
+from task_state import TaskState, load_tasks
+
+
+class Retry(Exception):
+    def __init__(self, defer=None):
+        self.defer = defer
+
+
+@pytest.fixture(autouse=True)
+def real_retry(monkeypatch):
+    # arq is stubbed out in conftest; give the worker a raisable Retry
+    monkeypatch.setattr(task_queue, "Retry", Retry)
+
+
+def agent_http(calls):
+    async def post(url, json=None, timeout=None):
+        calls.append(url)
+        return MagicMock(status_code=200, json=lambda: {"status": "ok", "url": url})
+    http = MagicMock()
+    http.post = post
+    return http
+
+
+def make_task(task_id="t1", agents=("qa_engineer", "coder_agent")):
+    return {"id": task_id, "type": "test", "description": "do it", "agent": None,
+            "agents": list(agents), "requires_approval": False}
+
+
+@pytest.mark.asyncio
+async def test_agent_slots_are_limited_and_leased(fake_redis):
+    assert await acquire_agent_slot(fake_redis, "coder", "a", limit=2, lease_seconds=60)
+    assert await acquire_agent_slot(fake_redis, "coder", "b", limit=2, lease_seconds=60)
+    assert not await acquire_agent_slot(fake_redis, "coder", "c", limit=2, lease_seconds=60)
+    assert await acquire_agent_slot(fake_redis, "coder", "a", limit=2, lease_seconds=60)  # re-entrant
+
+    await release_agent_slot(fake_redis, "coder", "b")
+    assert await acquire_agent_slot(fake_redis, "coder", "c", limit=2, lease_seconds=60)
+
+    # A holder that died without releasing stops counting once its lease lapses
+    assert await acquire_agent_slot(fake_redis, "other", "dead", limit=1, lease_seconds=-1)
+    assert await acquire_agent_slot(fake_redis, "other", "live", limit=1, lease_seconds=60)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_uses_priority_queue_and_stable_job_id():
+    pool = MagicMock(enqueue_job=AsyncMock())
+    job_id = await enqueue_task(pool, make_task(), "high")
+    assert job_id == "crew-task:t1"
+    pool.enqueue_job.assert_awaited_once_with(
+        "execute_crew_task", make_task(), _job_id="crew-task:t1", _queue_name=PRIORITY_QUEUES["high"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_agents_and_reports_progress(fake_redis):
+    calls = []
+    await TaskState(fake_redis, "t1").create({"id": "t1", "status": "queued", "agents_completed": 0})
+    ctx = {"state_redis": fake_redis, "http": agent_http(calls)}
+
+    result = await execute_crew_task(ctx, make_task())
+
+    assert result["status"] == "completed"
+    assert calls == ["http://qa-engineer:8005/execute", "http://coder-agent:8002/execute"]
+    [state] = await load_tasks(fake_redis, ["t1"])
+    assert state["status"] == "completed"
+    assert state["agents_completed"] == 2
+    assert set(state["results"]) == {"qa_engineer", "coder_agent"}
+    assert await fake_redis.zcard("agent:coder_agent:slots") == 0
+
+
+@pytest.mark.asyncio
+async def test_busy_agent_requeues_and_resumes_after_finished_agents(fake_redis):
+    calls = []
+    await TaskState(fake_redis, "t1").create({"id": "t1", "status": "queued", "agents_completed": 0})
+    ctx = {"state_redis": fake_redis, "http": agent_http(calls)}
+    limit = task_queue.AGENT_TIMEOUT_SECONDS + 30
+    for holder in ("x", "y", "z", "w"):  # default limit is 4
+        await acquire_agent_slot(fake_redis, "coder_agent", holder, 4, limit)
+
+    with pytest.raises(Retry):
+        await execute_crew_task(ctx, make_task())
+    [state] = await load_tasks(fake_redis, ["t1"])
+    assert (state["status"], state["waiting_for"], state["agents_completed"]) == ("waiting", "coder_agent", 1)
+
+    await release_agent_slot(fake_redis, "coder_agent", "x")
+    assert (await execute_crew_task(ctx, make_task()))["status"] == "completed"
+    assert calls.count("http://qa-engineer:8005/execute") == 1  # not repeated on retry
+
+
+@pytest.mark.asyncio
+async def test_busy_agent_on_final_try_marks_task_failed(fake_redis):
+    await TaskState(fake_redis, "t1").create({"id": "t1", "status": "queued", "agents_completed": 0})
+    ctx = {"state_redis": fake_redis, "http": agent_http([]), "job_try": task_queue.SLOT_MAX_TRIES}
+    for holder in ("x", "y", "z", "w"):  # default limit is 4
+        await acquire_agent_slot(fake_redis, "qa_engineer", holder, 4, 60)
+
+    result = await execute_crew_task(ctx, make_task())
+
+    assert result == {"status": "error", "agent": "qa_engineer"}
+    [state] = await load_tasks(fake_redis, ["t1"])
+    assert (state["status"], state["failed_agent"]) == ("failed", "qa_engineer")
+
+
+@pytest.mark.asyncio
+async def test_unexpected_agent_failure_marks_task_failed(fake_redis):
+    await TaskState(fake_redis, "t1").create({"id": "t1", "status": "queued", "agents_completed": 0})
+
+    def not_json():
+        raise ValueError("Expecting value: line 1 column 1 (char 0)")
+
+    http = MagicMock()
+    http.post = AsyncMock(return_value=MagicMock(status_code=200, json=not_json))
+
+    with pytest.raises(ValueError):
+        await execute_crew_task({"state_redis": fake_redis, "http": http}, make_task())
+
+    [state] = await load_tasks(fake_redis, ["t1"])
+    assert state["status"] == "failed"
+    assert "Expecting value" in state["error"]
+    assert await fake_redis.zcard("agent:qa_engineer:slots") == 0
+
+
+@pytest.mark.asyncio
+async def test_task_past_its_deadline_is_marked_failed(fake_redis, monkeypatch):
+    await TaskState(fake_redis, "t1").create({"id": "t1", "status": "queued", "agents_completed": 0})
+    monkeypatch.setattr(task_queue, "job_timeout_for", lambda agents: 0.05)
+
+    async def hang(url, json=None, timeout=None):
+        await asyncio.sleep(5)
+
+    http = MagicMock()
+    http.post = hang
+
+    with pytest.raises(asyncio.TimeoutError):
+        await execute_crew_task({"state_redis": fake_redis, "http": http}, make_task())
+    [state] = await load_tasks(fake_redis, ["t1"])
+    assert (state["status"], state["error"]) == ("failed", "TimeoutError")
+
+
+def test_job_timeout_covers_every_agent_and_approval():
+    per_agent = task_queue.AGENT_TIMEOUT_SECONDS + task_queue.APPROVAL_TIMEOUT_SECONDS
+    assert task_queue.job_timeout_for(3) > 3 * per_agent
+    # arq.worker.func is a mock here; check what the worker registered with it
+    _, kwargs = task_queue.func.call_args
+    assert kwargs["timeout"] == task_queue.job_timeout_for(task_queue.MAX_AGENTS_PER_TASK)
+
+
+@pytest.mark.asyncio
+async def test_execute_async_mode_returns_job_id(client, fake_redis):
+    pool = MagicMock(enqueue_job=AsyncMock())
+    payload = {"task": make_task("t-async"), "mode": "async", "priority": "low"}
+    with patch("main.redis_client", fake_redis), patch("main.arq_pool", pool), \
+            patch("main.log_event", new=AsyncMock()):
+        response = await client.post("/execute", json=payload)
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body["job_id"] == "crew-task:t-async"
+    assert body["stream"] == "/tasks/t-async/stream"
+    assert pool.enqueue_job.await_args.kwargs["_queue_name"] == PRIORITY_QUEUES["low"]
+    [state] = await load_tasks(fake_redis, ["t-async"])
+    assert state["status"] == "queued"
+
+
+class ArqPool:
+    """ArqRedis.enqueue_job semantics over fakeredis: None if the job id is taken."""
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def enqueue_job(self, function, *args, _job_id, _queue_name):
+        job_key, result_key = f"arq:job:{_job_id}", f"arq:result:{_job_id}"
+        if await self.redis.exists(job_key, result_key):
+            return None
+        await self.redis.set(job_key, json.dumps({"function": function, "args": args}))
+        await self.redis.zadd(_queue_name, {_job_id: 0})
+        return MagicMock(job_id=_job_id)
+
+
+@pytest.mark.asyncio
+async def test_resubmitting_a_task_id_is_refused_without_touching_its_state(client, fake_redis):
+    pool = ArqPool(fake_redis)
+    payload = {"task": make_task("t-dup"), "mode": "async"}
+    with patch("main.redis_client", fake_redis), patch("main.arq_pool", pool), \
+            patch("main.log_event", new=AsyncMock()):
+        assert (await client.post("/execute", json=payload)).status_code == 202
+        await TaskState(fake_redis, "t-dup").update(status="in_progress", progress=50)
+        response = await client.post("/execute", json=payload)
+
+    assert response.status_code == 409
+    [state] = await load_tasks(fake_redis, ["t-dup"])
+    assert (state["status"], state["progress"]) == ("in_progress", 50)
+    assert await fake_redis.zcard(PRIORITY_QUEUES["normal"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_task_id_with_a_kept_arq_result_is_refused(client, fake_redis):
+    await fake_redis.set("arq:result:crew-task:t-old", "done")
+    payload = {"task": make_task("t-old"), "mode": "async"}
+    with patch("main.redis_client", fake_redis), patch("main.arq_pool", ArqPool(fake_redis)), \
+            patch("main.log_event", new=AsyncMock()):
+        response = await client.post("/execute", json=payload)
+
+    assert response.status_code == 409
+    assert await load_tasks(fake_redis, ["t-old"]) == []
+    assert "t-old" not in await fake_redis.lrange("tasks:history", 0, -1)
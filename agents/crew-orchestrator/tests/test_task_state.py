@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import fakeredis
+import pytest
+import pytest_asyncio
+
+from task_state import HISTORY_KEY, TASK_PROGRESS_CHANNEL, TaskProgressHub, TaskState, load_tasks, state_key
+
+
+@pytest_asyncio.fixture
+async def r():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+async def next_message(pubsub):
+    while True:
+        msg = await pubsub.get_message(timeout=1)
+        assert msg is not None, "no message published"
+        if msg["type"] == "message":
+            return json.loads(msg["data"])
+
+
+@pytest.mark.asyncio
+async def test_updates_touch_only_their_fields(r):
+    state = TaskState(r, "t1")
+    await state.create({"id": "t1", "status": "in_progress", "progress": 0, "agents": ["a", "b"],
+                        "requires_approval": False, "agent": None})
+    await state.update(progress=40)
+    await TaskState(r, "t1").update(current_agent="b")  # a second reporter
+    await state.update(incr={"agents_completed": 1})
+    await state.update(incr={"agents_completed": 1})
+
+    [task] = await load_tasks(r, ["t1"])
+    assert task == {
+        "id": "t1", "status": "in_progress", "progress": 40, "agents": ["a", "b"],
+        "requires_approval": False, "current_agent": "b", "agents_completed": 2,
+    }
+    assert await r.lrange(HISTORY_KEY, 0, -1) == ["t1"]
+
+
+@pytest.mark.asyncio
+async def test_every_change_is_published_as_a_delta(r):
+    pubsub = r.pubsub()
+    await pubsub.subscribe(TASK_PROGRESS_CHANNEL)
+    state = TaskState(r, "t1")
+    await state.create({"id": "t1", "progress": 0})
+    await state.update(progress=50, incr={"agents_completed": 1})
+
+    created = await next_message(pubsub)
+    assert created["task_id"] == "t1" and created["progress"] == 0
+    delta = await next_message(pubsub)
+    assert delta["progress"] == 50
+    assert delta["incr"] == {"agents_completed": 1}
+    assert "timestamp" in delta
+    await pubsub.aclose()
+
+
+@pytest.mark.asyncio
+async def test_load_tasks_skips_missing_and_keeps_order(r):
+    await TaskState(r, "t1").create({"id": "t1"})
+    await TaskState(r, "t2").create({"id": "t2"})
+    tasks = await load_tasks(r, ["t2", "gone", "t1"])
+    assert [t["id"] for t in tasks] == ["t2", "t1"]
+    assert await load_tasks(r, []) == []
+
+
+@pytest.mark.asyncio
+async def test_create_replaces_a_previous_run(r):
+    await TaskState(r, "t1").create({"id": "t1", "failed_agent": "x"})
+    await TaskState(r, "t1").create({"id": "t1"})
+    assert await r.hgetall(state_key("t1")) == {"id": "t1"}
+
+
+@pytest.mark.asyncio
+async def test_followers_share_one_subscription_until_terminal(r):
+    hub = TaskProgressHub(r)
+    state = TaskState(r, "t1")
+    await state.create({"id": "t1", "status": "queued", "progress": 0})
+    await TaskState(r, "t2").create({"id": "t2", "status": "queued", "progress": 0})
+
+    async def follow(task_id):
+        return [update async for update in hub.follow(task_id)]
+
+    followers = [asyncio.create_task(follow(t)) for t in ("t1", "t1", "t2")]
+    await asyncio.sleep(0.05)
+    [(_, subscribers)] = await r.pubsub_numsub(TASK_PROGRESS_CHANNEL)
+    assert subscribers == 1
+
+    await TaskState(r, "other").update(progress=5)
+    await state.update(progress=50)
+    await state.update(status="completed", progress=100)
+    await TaskState(r, "t2").update(status="failed")
+    first, second, other = await asyncio.wait_for(asyncio.gather(*followers), 1)
+    await hub.close()
+
+    assert first == second
+    assert first[0]["status"] == "queued"
+    assert [u.get("progress") for u in first[1:]] == [50, 100]
+    assert [u["status"] for u in other] == ["queued", "failed"]
+    assert hub._followers == {}
+
+
+@pytest.mark.asyncio
+async def test_follower_resyncs_when_the_subscription_breaks(r, monkeypatch):
+    monkeypatch.setattr(TaskProgressHub, "RESUBSCRIBE_SECONDS", 0.01)
+    await TaskState(r, "t1").create({"id": "t1", "status": "in_progress", "progress": 10})
+    drop = asyncio.Event()
+
+    class BrokenPubSub:
+        async def subscribe(self, channel):
+            pass
+
+        async def listen(self):
+            await drop.wait()
+            raise ConnectionError("connection lost")
+            yield  # pragma: no cover
+
+        async def aclose(self):
+            pass
+
+    real_pubsub = r.pubsub
+    pubsubs = iter([BrokenPubSub()])
+    hub = TaskProgressHub(r)
+    monkeypatch.setattr(r, "pubsub", lambda: next(pubsubs, None) or real_pubsub())
+    seen = []
+
+    async def follow():
+        async for update in hub.follow("t1"):
+            seen.append(update)
+
+    follower = asyncio.create_task(follow())
+    await asyncio.sleep(0.02)
+    # Finishes while the subscription is down, so its delta is never seen
+    await TaskState(r, "t1").update(status="completed", progress=100)
+    drop.set()
+    await asyncio.wait_for(follower, 1)
+    await hub.close()
+
+    assert [u["status"] for u in seen] == ["in_progress", "completed"]
+
+
+@pytest.mark.asyncio
+async def test_follow_task_gives_up_when_the_task_goes_quiet(r):
+    await TaskState(r, "t1").create({"id": "t1", "status": "in_progress", "progress": 10})
+
+    hub = TaskProgressHub(r)
+
+    async def follow():
+        return [update async for update in hub.follow("t1", idle_timeout=0.1)]
+
+    seen = await asyncio.wait_for(follow(), 2)
+    await hub.close()
+    assert [u["status"] for u in seen] == ["in_progress"]
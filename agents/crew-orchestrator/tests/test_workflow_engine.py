@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+import pytest
+
+from workflow_engine import (
+    FailurePolicy,
+    StepResult,
+    WorkflowStep,
+    WorkflowValidationError,
+    plan_layers,
+    run_dag,
+)
+
+
+def step(step_id, *deps):
+    return WorkflowStep(id=step_id, agent_type="test-agent", task_description=step_id, depends_on=list(deps) or None)
+
+
+def diamond(width):
+    return [step("root")] + [step(f"mid-{i}", "root") for i in range(width)] + [
+        step("sink", *(f"mid-{i}" for i in range(width)))
+    ]
+
+
+def runner(delay=0.0, fail=(), log=None):
+    async def run(s, outputs):
+        if log is not None:
+            log.append(("start", s.id, sorted(outputs)))
+        await asyncio.sleep(delay)
+        if s.id in fail:
+            return StepResult(step_id=s.id, agent_type=s.agent_type, status="failed", error="boom")
+        return StepResult(step_id=s.id, agent_type=s.agent_type, status="success", output={"id": s.id})
+    return run
+
+
+def test_plan_layers_diamond():
+    assert plan_layers(diamond(2)) == [["root"], ["mid-0", "mid-1"], ["sink"]]
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([step("a", "b"), step("b", "a"), step("c")], "cycle"),
+    ([step("a", "missing")], "unknown"),
+    ([step("a"), step("a")], "Duplicate"),
+])
+def test_plan_layers_rejects_invalid_graphs(steps, message):
+    with pytest.raises(WorkflowValidationError, match=message):
+        plan_layers(steps)
+
+
+@pytest.mark.asyncio
+async def test_cycle_detected_before_any_step_runs():
+    log = []
+    with pytest.raises(WorkflowValidationError):
+        await run_dag([step("a"), step("b", "c"), step("c", "b")], runner(log=log))
+    assert log == []
+
+
+@pytest.mark.asyncio
+async def test_fifty_step_diamond_runs_in_critical_path_time():
+    steps = diamond(48)
+    delay = 0.05
+    t0 = time.perf_counter()
+    results = await run_dag(steps, runner(delay), max_concurrency=64)
+    elapsed = time.perf_counter() - t0
+    assert all(r.status == "success" for r in results)
+    assert [r.step_id for r in results] == [s.id for s in steps]
+    assert elapsed < 3 * delay * 2  # critical path is 3 steps; serial would be 50
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    in_flight = peak = 0
+
+    async def run(s, outputs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return StepResult(step_id=s.id, agent_type=s.agent_type, status="success")
+
+    await run_dag(diamond(20), run, max_concurrency=4)
+    assert peak == 4
+
+
+@pytest.mark.asyncio
+async def test_step_starts_when_its_own_dependencies_finish():
+    # "fast-child" must not wait for "slow" even though both are in layer 1
+    log = []
+    steps = [step("slow"), step("fast"), step("fast-child", "fast")]
+
+    async def run(s, outputs):
+        log.append(("start", s.id))
+        await asyncio.sleep(0.1 if s.id == "slow" else 0.0)
+        log.append(("end", s.id))
+        return StepResult(step_id=s.id, agent_type=s.agent_type, status="success")
+
+    await run_dag(steps, run)
+    assert log.index(("start", "fast-child")) < log.index(("end", "slow"))
+
+
+@pytest.mark.asyncio
+async def test_dependents_receive_upstream_outputs():
+    log = []
+    await run_dag([step("a"), step("b", "a")], runner(log=log))
+    assert ("start", "b", ["a"]) in log
+
+
+@pytest.mark.asyncio
+async def test_skip_dependents_policy():
+    steps = [step("a"), step("b", "a"), step("c", "b"), step("d")]
+    results = {r.step_id: r for r in await run_dag(steps, runner(fail={"a"}))}
+    assert [results[i].status for i in "abcd"] == ["failed", "skipped", "skipped", "success"]
+    assert "'a'" in results["c"].error
+
+
+@pytest.mark.asyncio
+async def test_continue_policy_runs_dependents():
+    steps = [step("a"), step("b", "a")]
+    results = await run_dag(steps, runner(fail={"a"}), failure_policy=FailurePolicy.CONTINUE)
+    assert [r.status for r in results] == ["failed", "success"]
+
+
+@pytest.mark.asyncio
+async def test_fail_fast_cancels_running_steps():
+    cancelled = []
+
+    async def run(s, outputs):
+        if s.id == "bad":
+            return StepResult(step_id=s.id, agent_type=s.agent_type, status="failed")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(s.id)
+            raise
+        return StepResult(step_id=s.id, agent_type=s.agent_type, status="success")
+
+    steps = [step("slow"), step("bad"), step("after", "slow")]
+    t0 = time.perf_counter()
+    results = await run_dag(steps, run, failure_policy=FailurePolicy.FAIL_FAST)
+    assert time.perf_counter() - t0 < 0.5
+    assert cancelled == ["slow"]
+    assert [r.status for r in results] == ["skipped", "failed", "skipped"]
+
+
+@pytest.mark.asyncio
+async def test_step_exception_becomes_failed_result():
+    async def run(s, outputs):
+        raise RuntimeError("agent exploded")
+
+    results = await run_dag([step("a")], run)
+    assert results[0].status == "failed"
+    assert results[0].error == "agent exploded"
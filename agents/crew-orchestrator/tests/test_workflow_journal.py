@@ -0,0 +1,215 @@
+import asyncio
+
+import fakeredis
+import pytest
+import pytest_asyncio
+
+import workflow_engine
+import workflow_journal
+from workflow_engine import StepResult, WorkflowExecution, WorkflowStep, execute_workflow_background
+from workflow_journal import ACTIVE_KEY, WorkflowJournal, recover_workflows, run_recovery_sweeps
+
+
+@pytest_asyncio.fixture
+async def r():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+def make_workflow(workflow_id="wf-1"):
+    return WorkflowExecution(id=workflow_id, name="test", steps=[
+        WorkflowStep(id="a", agent_type="agent", task_description="a"),
+        WorkflowStep(id="b", agent_type="agent", task_description="b", depends_on=["a"]),
+    ])
+
+
+class CallLog(list):
+    block: dict
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replace the agent call; blocks on step ids listed in ``calls.block``."""
+    log = CallLog()
+    log.block = {}
+
+    async def fake_execute_step(step, redis_client, settings, step_outputs, idempotency_key=None):
+        log.append((step.id, sorted(step_outputs), idempotency_key))
+        if step.id in log.block:
+            await log.block[step.id].wait()
+        return StepResult(step_id=step.id, agent_type=step.agent_type, status="success", output={"from": step.id})
+
+    monkeypatch.setattr(workflow_engine, "execute_step", fake_execute_step)
+    return log
+
+
+async def submit(r, workflow):
+    await WorkflowJournal(r, workflow.id).submitted(workflow, {"id": workflow.id, "name": workflow.name})
+
+
+@pytest.mark.asyncio
+async def test_run_journals_every_transition(r, calls):
+    workflow = make_workflow()
+    await submit(r, workflow)
+    await execute_workflow_background(workflow, r, settings=None)
+
+    journal = WorkflowJournal(r, workflow.id)
+    events = [e["event"] for e in await journal.events()]
+    assert events == ["submitted", "started", "step_started", "step_finished", "step_started", "step_finished", "finished"]
+    assert set(await journal.checkpoints()) == {"a", "b"}
+    assert (await journal.state())["status"] == "success"
+    assert await r.smembers(ACTIVE_KEY) == set()
+    assert not await r.exists(journal.lease_key)
+    assert calls[1] == ("b", ["a"], "wf-1:b")
+
+
+@pytest.mark.asyncio
+async def test_first_checkpoint_wins(r):
+    journal = WorkflowJournal(r, "wf-1")
+    first = StepResult(step_id="a", agent_type="agent", status="success", output={"n": 1})
+    second = StepResult(step_id="a", agent_type="agent", status="success", output={"n": 2})
+    assert await journal.step_finished(first) is True
+    assert await journal.step_finished(second) is False
+    assert (await journal.checkpoints())["a"].output == {"n": 1}
+
+
+@pytest.mark.asyncio
+async def test_lease_blocks_second_runner(r, calls):
+    workflow = make_workflow()
+    await submit(r, workflow)
+    assert await WorkflowJournal(r, workflow.id, owner="other").claim()
+    await execute_workflow_background(workflow, r, settings=None)
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_crashed_workflow_resumes_from_last_checkpoint(r, calls):
+    workflow = make_workflow()
+    await submit(r, workflow)
+    calls.block["b"] = asyncio.Event()
+
+    # Run until step b is in flight, then "crash" the orchestrator
+    run = asyncio.create_task(execute_workflow_background(workflow, r, settings=None))
+    while len(calls) < 2:
+        await asyncio.sleep(0.01)
+    run.cancel()
+    await asyncio.gather(run, return_exceptions=True)
+
+    journal = WorkflowJournal(r, workflow.id)
+    assert set(await journal.checkpoints()) == {"a"}
+    assert await recover_workflows(r, settings=None) == []  # lease still held
+
+    await r.delete(journal.lease_key)  # lease expires
+    del calls.block["b"]
+    assert await recover_workflows(r, settings=None) == ["wf-1"]
+    await asyncio.gather(*workflow_journal._resumed_tasks)
+
+    assert [c[0] for c in calls] == ["a", "b", "b"]  # a never re-ran
+    assert calls[-1] == ("b", ["a"], "wf-1:b")  # a's output came from the checkpoint
+    assert (await journal.state())["status"] == "success"
+    assert "resumed" in [e["event"] for e in await journal.events()]
+    assert await r.smembers(ACTIVE_KEY) == set()
+
+
+@pytest.mark.asyncio
+async def test_recovery_sweep_resumes_after_lease_lapses(r, calls, monkeypatch):
+    """A restart usually beats the dead owner's lease; a later sweep picks the workflow up."""
+    monkeypatch.setattr(workflow_journal, "LEASE_SECONDS", 1)
+    workflow = make_workflow()
+    await submit(r, workflow)
+    calls.block["b"] = asyncio.Event()
+
+    run = asyncio.create_task(execute_workflow_background(workflow, r, settings=None))
+    while len(calls) < 2:
+        await asyncio.sleep(0.01)
+    run.cancel()
+    await asyncio.gather(run, return_exceptions=True)
+    del calls.block["b"]
+
+    journal = WorkflowJournal(r, workflow.id)
+    sweeps = asyncio.create_task(run_recovery_sweeps(r, settings=None, interval=0.05))
+    try:
+        await asyncio.sleep(0.2)
+        assert [c[0] for c in calls] == ["a", "b"]  # first sweeps skip the live lease
+        for _ in range(100):
+            if (await journal.state())["status"] == "success":
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        sweeps.cancel()
+        await asyncio.gather(sweeps, return_exceptions=True)
+        await asyncio.gather(*workflow_journal._resumed_tasks)
+
+    assert [c[0] for c in calls] == ["a", "b", "b"]
+    assert (await journal.state())["status"] == "success"
+    assert await r.smembers(ACTIVE_KEY) == set()
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_cancels_the_run(r, calls, monkeypatch):
+    workflow = make_workflow()
+    await submit(r, workflow)
+    calls.block["a"] = asyncio.Event()
+    monkeypatch.setattr(workflow_engine, "LEASE_SECONDS", 0.03)  # heartbeat every 10ms
+
+    async def taken_over(self):
+        return False
+
+    monkeypatch.setattr(WorkflowJournal, "renew", taken_over)
+    await asyncio.wait_for(execute_workflow_background(workflow, r, settings=None), timeout=1)
+
+    journal = WorkflowJournal(r, workflow.id)
+    assert [c[0] for c in calls] == ["a"]  # a was cancelled in flight, b never started
+    assert await journal.checkpoints() == {}
+    assert await r.smembers(ACTIVE_KEY) == {"wf-1"}  # left for the new owner
+
+
+@pytest.mark.asyncio
+async def test_resubmitted_workflow_id_is_refused(r, calls):
+    workflow = make_workflow()
+    journal = WorkflowJournal(r, workflow.id)
+    assert await journal.submitted(workflow, {"id": workflow.id})
+    await execute_workflow_background(workflow, r, settings=None)
+
+    changed = make_workflow()
+    changed.steps = changed.steps[:1]
+    assert await journal.submitted(changed, {"id": workflow.id}) is False  # finished, still retained
+
+    assert len((await journal.definition()).steps) == 2
+    assert set(await journal.checkpoints()) == {"a", "b"}
+    assert [e["event"] for e in await journal.events()].count("submitted") == 1
+    assert await r.smembers(ACTIVE_KEY) == set()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submission_of_another_id_does_not_refuse(monkeypatch):
+    """Other workflows joining or leaving workflows:active mid-submit don't make a fresh id look reused."""
+    server = fakeredis.FakeServer()
+    r = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    other = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    await other.sadd(ACTIVE_KEY, "wf-done")
+    real_pipeline = r.pipeline
+
+    def pipeline_with_interleaving(*args, **kwargs):
+        pipe = real_pipeline(*args, **kwargs)
+        real_sismember = pipe.sismember
+
+        async def sismember(*a):
+            # Between WATCH and EXEC: another id is submitted, a third one finishes
+            await submit(other, make_workflow("wf-other"))
+            await other.srem(ACTIVE_KEY, "wf-done")
+            return await real_sismember(*a)
+
+        pipe.sismember = sismember
+        return pipe
+
+    monkeypatch.setattr(r, "pipeline", pipeline_with_interleaving)
+    journal = WorkflowJournal(r, "wf-1")
+    assert await journal.submitted(make_workflow(), {"id": "wf-1"}) is True
+    monkeypatch.undo()
+
+    assert await r.smembers(ACTIVE_KEY) == {"wf-1", "wf-other"}
+    assert await journal.submitted(make_workflow(), {"id": "wf-1"}) is False
+    await r.aclose()
+    await other.aclose()
@@ -4,17 +4,32 @@ Multi-Agent Workflow Engine - Workflow execution endpoints
 Add these endpoints to crew-orchestrator/main.py
 """
 
+import asyncio
+import logging
+import time
+from collections import deque
 from enum import Enum
-from typing import List, Dict, Any, Optional
+from typing import Awaitable, Callable, List, Dict, Any, Optional
 from pydantic import BaseModel
 from datetime import datetime
 import uuid
 import json
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
 
+from workflow_journal import LEASE_SECONDS, WorkflowJournal
+
+logger = logging.getLogger("crew-orchestrator.workflow-engine")
+
 # Data models
 
 
+class FailurePolicy(str, Enum):
+    """What happens to the rest of the DAG when a step fails"""
+    FAIL_FAST = "fail_fast"              # cancel running steps, skip everything not started
+    SKIP_DEPENDENTS = "skip_dependents"  # skip steps downstream of the failure, run the rest
+    CONTINUE = "continue"                # run dependents anyway (without the failed output)
+
+
 class WorkflowStep(BaseModel):
     """Single step in a workflow"""
     id: str
@@ -30,7 +45,10 @@ class WorkflowExecution(BaseModel):
     id: str
     name: str
     steps: List[WorkflowStep]
-    parallel: bool = False  # Execute steps in parallel or sequentially
+    # Deprecated: steps always run as a DAG; use max_concurrency=1 for one at a time
+    parallel: bool = False
+    max_concurrency: int = 8  # Steps running at once
+    failure_policy: FailurePolicy = FailurePolicy.SKIP_DEPENDENTS
     metadata: Optional[Dict[str, Any]] = None
 
 
@@ -55,6 +73,157 @@ class WorkflowResult(BaseModel):
     timestamp: str
 
 
+class WorkflowValidationError(ValueError):
+    """Workflow steps don't form a valid DAG"""
+
+
+def plan_layers(steps: List[WorkflowStep]) -> List[List[str]]:
+    """
+    Topologically layer the steps (Kahn's algorithm, O(steps + edges)).
+
+    Layer N holds the steps whose longest dependency chain has length N, so
+    the layer count is the critical path length. Raises WorkflowValidationError
+    on duplicate IDs, unknown dependencies, or cycles.
+    """
+    ids = [step.id for step in steps]
+    if len(set(ids)) != len(ids):
+        dupes = sorted({i for i in ids if ids.count(i) > 1})
+        raise WorkflowValidationError(f"Duplicate step ids: {dupes}")
+
+    dependents: Dict[str, List[str]] = {i: [] for i in ids}
+    pending: Dict[str, int] = {}
+    for step in steps:
+        deps = set(step.depends_on or ())
+        unknown = deps - dependents.keys()
+        if unknown:
+            raise WorkflowValidationError(f"Step '{step.id}' depends on unknown steps: {sorted(unknown)}")
+        pending[step.id] = len(deps)
+        for dep in deps:
+            dependents[dep].append(step.id)
+
+    layers: List[List[str]] = []
+    layer = [i for i in ids if pending[i] == 0]
+    placed = 0
+    while layer:
+        layers.append(layer)
+        placed += len(layer)
+        nxt = []
+        for step_id in layer:
+            for child in dependents[step_id]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    nxt.append(child)
+        layer = nxt
+
+    if placed != len(ids):
+        cyclic = sorted(i for i in ids if pending[i] > 0)
+        raise WorkflowValidationError(f"Dependency cycle among steps: {cyclic}")
+    return layers
+
+
+def _skipped(step: WorkflowStep, reason: str) -> StepResult:
+    return StepResult(step_id=step.id, agent_type=step.agent_type, status="skipped", error=reason)
+
+
+async def run_dag(
+    steps: List[WorkflowStep],
+    run_step: Callable[[WorkflowStep, Dict[str, Any]], Awaitable[StepResult]],
+    max_concurrency: int = 8,
+    failure_policy: FailurePolicy = FailurePolicy.SKIP_DEPENDENTS,
+    on_result: Optional[Callable[[StepResult], Awaitable[None]]] = None,
+) -> List[StepResult]:
+    """
+    Run ``steps`` as a DAG with at most ``max_concurrency`` in flight.
+
+    A step starts as soon as its last dependency settles (no waiting for the
+    rest of its layer), so wall time tracks the critical path. ``run_step``
+    gets the step and the outputs of every step finished so far. Results are
+    returned in step order; ``on_result`` is awaited as each one settles.
+    """
+    plan_layers(steps)  # validate up front: no step runs if the graph is bad
+    by_id = {step.id: step for step in steps}
+    dependents: Dict[str, List[str]] = {step.id: [] for step in steps}
+    pending: Dict[str, int] = {}
+    for step in steps:
+        deps = set(step.depends_on or ())
+        pending[step.id] = len(deps)
+        for dep in deps:
+            dependents[dep].append(step.id)
+
+    ready = deque(step.id for step in steps if pending[step.id] == 0)
+    results: Dict[str, StepResult] = {}
+    outputs: Dict[str, Any] = {}
+    running: Dict[asyncio.Task, str] = {}
+    limit = max(1, max_concurrency)
+
+    async def settle(result: StepResult) -> None:
+        results[result.step_id] = result
+        if on_result is not None:
+            await on_result(result)
+
+    async def skip_downstream(root: str, reason: str) -> None:
+        stack = list(dependents[root])
+        while stack:
+            child = stack.pop()
+            if child in results:
+                continue
+            await settle(_skipped(by_id[child], reason))
+            stack.extend(dependents[child])
+
+    async def guarded(step: WorkflowStep) -> StepResult:
+        try:
+            return await run_step(step, dict(outputs))
+        except Exception as e:
+            return StepResult(step_id=step.id, agent_type=step.agent_type, status="failed", error=str(e))
+
+    aborted: Optional[str] = None
+    try:
+        while ready or running:
+            while ready and len(running) < limit and aborted is None:
+                step = by_id[ready.popleft()]
+                if step.id not in results:
+                    running[asyncio.create_task(guarded(step))] = step.id
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                step_id = running.pop(task)
+                result = task.result()
+                await settle(result)
+                ok = result.status == "success"
+                if ok:
+                    outputs[step_id] = result.output or {}
+                elif failure_policy == FailurePolicy.FAIL_FAST:
+                    aborted = aborted or step_id
+                elif failure_policy == FailurePolicy.SKIP_DEPENDENTS:
+                    await skip_downstream(step_id, f"dependency '{step_id}' {result.status}")
+                    continue
+                for child in dependents[step_id]:
+                    pending[child] -= 1
+                    if pending[child] == 0:
+                        ready.append(child)
+
+            if aborted is not None and running:
+                for task in running:
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+                for step_id in running.values():
+                    await settle(_skipped(by_id[step_id], f"cancelled: step '{aborted}' failed"))
+                running.clear()
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    for step in steps:
+        if step.id not in results:
+            reason = f"cancelled: step '{aborted}' failed" if aborted else "not reached"
+            await settle(_skipped(step, reason))
+    return [results[step.id] for step in steps]
+
+
 # Add these endpoints to crew-orchestrator/main.py
 
 def add_workflow_endpoints(app: FastAPI, redis_client, settings):
@@ -100,24 +269,25 @@ def add_workflow_endpoints(app: FastAPI, redis_client, settings):
         # Generate IDs if not provided
         if not workflow.id:
             workflow.id = f"workflow-{uuid.uuid4().hex[:8]}"
+
+        try:
+            layers = plan_layers(workflow.steps)
+        except WorkflowValidationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Store workflow in Redis
+        # Journal the definition before anything runs so a restart can resume it
         if redis_client:
             workflow_data = {
                 "id": workflow.id,
                 "name": workflow.name,
-                "status": "pending",
-                "steps_total": len(workflow.steps),
-                "steps_completed": 0,
                 "created_at": datetime.now().isoformat(),
                 "parallel": workflow.parallel,
+                "max_concurrency": workflow.max_concurrency,
+                "failure_policy": workflow.failure_policy.value,
+                "critical_path_steps": len(layers),
             }
-            await redis_client.set(
-                f"workflow:{workflow.id}",
-                json.dumps(workflow_data),
-                ex=86400  # 24 hour expiry
-            )
-            await redis_client.lpush("workflows:history", workflow.id)
+            if not await WorkflowJournal(redis_client, workflow.id).submitted(workflow, workflow_data):
+                raise HTTPException(status_code=409, detail=f"Workflow {workflow.id} already exists")
         
         # Execute workflow in background
         background_tasks.add_task(
@@ -131,7 +301,8 @@ def add_workflow_endpoints(app: FastAPI, redis_client, settings):
             "workflow_id": workflow.id,
             "status": "submitted",
             "message": f"Workflow '{workflow.name}' queued for execution",
-            "steps": len(workflow.steps)
+            "steps": len(workflow.steps),
+            "layers": layers,
         }
     
     
@@ -144,23 +315,18 @@ def add_workflow_endpoints(app: FastAPI, redis_client, settings):
         if not redis_client:
             raise HTTPException(status_code=503, detail="Redis not connected")
         
-        workflow_data = await redis_client.get(f"workflow:{workflow_id}")
+        journal = WorkflowJournal(redis_client, workflow_id)
+        workflow_data = await redis_client.get(journal.meta_key)
         if not workflow_data:
             raise HTTPException(status_code=404, detail="Workflow not found")
         
         workflow = json.loads(workflow_data)
+        workflow.update(await journal.state())
         
-        # Get step results
-        step_results = []
-        steps_key = f"workflow:{workflow_id}:steps"
-        step_ids = await redis_client.lrange(steps_key, 0, -1)
-        
-        for step_id in step_ids:
-            step_data = await redis_client.get(f"workflow:{workflow_id}:step:{step_id}")
-            if step_data:
-                step_results.append(json.loads(step_data))
-        
-        workflow["results"] = step_results
+        # Step results come from the checkpoints, so in-flight progress shows too
+        checkpoints = await journal.checkpoints()
+        workflow.setdefault("steps_completed", len(checkpoints))
+        workflow["results"] = [r.model_dump() for r in checkpoints.values()]
         return workflow
     
     
@@ -174,12 +340,17 @@ def add_workflow_endpoints(app: FastAPI, redis_client, settings):
             return []
         
         workflow_ids = await redis_client.lrange("workflows:history", 0, limit-1)
-        workflows = []
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for wid in workflow_ids:
+                journal = WorkflowJournal(redis_client, wid)
+                pipe.get(journal.meta_key)
+                pipe.hgetall(journal.state_key)
+            replies = await pipe.execute()
         
-        for wid in workflow_ids:
-            workflow_data = await redis_client.get(f"workflow:{wid}")
+        workflows = []
+        for workflow_data, state in zip(replies[::2], replies[1::2]):
             if workflow_data:
-                workflows.append(json.loads(workflow_data))
+                workflows.append({**json.loads(workflow_data), **state})
         
         return workflows
     
@@ -200,107 +371,106 @@ async def execute_workflow_background(
     Execute workflow steps in background.
     
     Handles:
-    - Sequential vs parallel execution
-    - Dependency resolution
+    - DAG scheduling with bounded concurrency (run_dag)
+    - Failure propagation per workflow.failure_policy
+    - Journaling and resume from checkpoints (workflow_journal)
     - Retry logic
     - Timeout handling
+    
+    Safe to call again for a workflow that was interrupted: steps with a
+    checkpoint return their recorded result instead of running again. If
+    the lease is lost (another process took the workflow over) the run is
+    cancelled, in-flight steps included.
     """
-    import asyncio
-    import httpx
     from time import perf_counter
     
     start_time = perf_counter()
     results: List[StepResult] = []
-    step_outputs: Dict[str, Any] = {}
+    journal = WorkflowJournal(redis_client, workflow.id) if redis_client else None
+    done: Dict[str, StepResult] = {}
+    heartbeat = None
+    lease_lost = False
+    run_task = asyncio.current_task()
+    
+    async def keep_lease() -> None:
+        nonlocal lease_lost
+        renewed_at = time.monotonic()
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            try:
+                if await journal.renew():
+                    renewed_at = time.monotonic()
+                    continue
+                logger.warning("Workflow %s: lease taken over, cancelling this run", workflow.id)
+            except Exception as e:
+                if time.monotonic() - renewed_at < LEASE_SECONDS:
+                    logger.warning("Workflow %s: lease renewal failed, retrying: %s", workflow.id, e)
+                    continue
+                logger.warning("Workflow %s: lease expired while Redis was unreachable, cancelling this run", workflow.id)
+            lease_lost = True
+            run_task.cancel()
+            return
     
     try:
-        # Update status
-        if redis_client:
-            workflow_data = json.loads(
-                await redis_client.get(f"workflow:{workflow.id}") or "{}"
+        if journal:
+            if not await journal.claim():
+                return  # another process is running it
+            heartbeat = asyncio.create_task(keep_lease())
+            done = await journal.checkpoints()
+            await journal.started(resumed=bool(done))
+        
+        async def run_step(step: WorkflowStep, step_outputs: Dict[str, Any]) -> StepResult:
+            if step.id in done:
+                return done[step.id]
+            if journal:
+                await journal.step_started(step.id)
+            return await execute_step(
+                step, redis_client, settings, step_outputs,
+                idempotency_key=f"{workflow.id}:{step.id}",
             )
-            workflow_data["status"] = "running"
-            await redis_client.set(f"workflow:{workflow.id}", json.dumps(workflow_data))
         
-        if workflow.parallel:
-            # Execute all steps in parallel
-            tasks = [
-                execute_step(step, redis_client, settings, step_outputs)
-                for step in workflow.steps
-            ]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            results = [r for r in results if isinstance(r, StepResult)]
-        else:
-            # Execute steps sequentially, respecting dependencies
-            executed_steps = set()
-            
-            while len(executed_steps) < len(workflow.steps):
-                # Find next executable step
-                next_step = None
-                for step in workflow.steps:
-                    if step.id in executed_steps:
-                        continue
-                    
-                    # Check dependencies
-                    if step.depends_on:
-                        if not all(dep_id in executed_steps for dep_id in step.depends_on):
-                            continue
-                    
-                    next_step = step
-                    break
-                
-                if not next_step:
-                    break  # Circular dependency or all done
-                
-                # Execute step
-                result = await execute_step(
-                    next_step, redis_client, settings, step_outputs
-                )
-                if isinstance(result, StepResult):
-                    results.append(result)
-                    executed_steps.add(next_step.id)
-                    step_outputs[next_step.id] = result.output or {}
+        async def on_result(result: StepResult) -> None:
+            if journal and result.step_id not in done:
+                await journal.step_finished(result)
+        
+        results = await run_dag(
+            workflow.steps,
+            run_step,
+            max_concurrency=workflow.max_concurrency,
+            failure_policy=workflow.failure_policy,
+            on_result=on_result,
+        )
         
         # Determine final status
-        failed_steps = [r for r in results if r.status in ("failed", "timeout")]
+        failed_steps = [r for r in results if r.status != "success"]
         final_status = "success"
         if len(failed_steps) == len(results):
             final_status = "failed"
         elif len(failed_steps) > 0:
             final_status = "partial_failure"
+        steps_completed = sum(1 for r in results if r.status != "skipped")
         
-        # Store final result
-        if redis_client:
-            final_result = WorkflowResult(
-                workflow_id=workflow.id,
-                status=final_status,
-                steps_completed=len(results),
-                steps_total=len(workflow.steps),
-                results=results,
-                total_duration_seconds=perf_counter() - start_time,
-                timestamp=datetime.now().isoformat()
-            )
-            
-            workflow_data = json.loads(
-                await redis_client.get(f"workflow:{workflow.id}") or "{}"
-            )
-            workflow_data.update({
-                "status": final_status,
-                "steps_completed": len(results),
-                "total_duration_seconds": final_result.total_duration_seconds,
-                "completed_at": datetime.now().isoformat()
-            })
-            await redis_client.set(f"workflow:{workflow.id}", json.dumps(workflow_data))
+        if journal:
+            await journal.finished(final_status, steps_completed, perf_counter() - start_time)
     
+    except asyncio.CancelledError:
+        if not lease_lost:
+            raise
+        # The new lease holder owns the journal from here on
     except Exception as e:
-        print(f"Workflow execution error: {e}")
+        # The journal keeps the workflow active; the next recovery sweep resumes it
+        logger.exception("Workflow %s execution error: %s", workflow.id, e)
+    finally:
+        if heartbeat:
+            heartbeat.cancel()
 
 
 async def execute_step(
     step: WorkflowStep,
     redis_client,
     settings,
-    step_outputs: Dict[str, Any]
+    step_outputs: Dict[str, Any],
+    idempotency_key: Optional[str] = None,
 ) -> StepResult:
     """
     Execute a single workflow step.
@@ -333,7 +503,8 @@ async def execute_step(
                         "workflow_metadata": {
                             "previous_outputs": step_outputs
                         }
-                    }
+                    },
+                    headers={"Idempotency-Key": idempotency_key} if idempotency_key else None,
                 )
                 
                 if response.status_code == 200:
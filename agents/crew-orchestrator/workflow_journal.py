@@ -0,0 +1,216 @@
+"""
+Workflow Journal - Durable, resumable workflow state in Redis
+
+Every workflow gets:
+
+  workflow:{id}:journal      Redis Stream, one entry per transition
+                             (submitted, step_started, step_finished, finished);
+                             the "submitted" entry carries the full definition
+  workflow:{id}:checkpoints  Hash step_id -> StepResult JSON; written with
+                             HSETNX so the first result for a step wins
+  workflow:{id}:state        Hash status / started_at / completed_at / ...
+  workflow:{id}:lease        Owner token (SET NX EX) of the process running it
+  workflows:active           Set of submitted but unfinished workflow ids
+
+A workflow id can't be reused while any of these keys exist: submitted()
+refuses it (the endpoint answers 409). Each transition is one MULTI/EXEC, so
+the stream entry and the checkpoint or state change land together or not at
+all. A finished step's checkpoint is its idempotency key: a resumed run
+returns the recorded result instead of calling the agent again, and the
+agent call itself carries ``Idempotency-Key: {workflow_id}:{step_id}`` for
+the step that was in flight when the process died.
+
+recover_workflows() runs at orchestrator startup and then every
+LEASE_SECONDS (run_recovery_sweeps): every id in workflows:active whose
+lease has lapsed is rebuilt from its journal and resumed from the last
+checkpoint. Sweeping periodically matters because a crashed process is
+usually restarted before its lease runs out.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from redis.exceptions import WatchError
+
+if TYPE_CHECKING:
+    from workflow_engine import StepResult, WorkflowExecution
+
+logger = logging.getLogger("crew-orchestrator.workflow-journal")
+
+ACTIVE_KEY = "workflows:active"
+HISTORY_KEY = "workflows:history"
+LEASE_SECONDS = 60
+FINISHED_TTL_SECONDS = 86400  # finished workflows are kept for 24 hours
+
+# Compare-and-expire: a GET followed by EXPIRE could extend a lease that
+# another process claimed in between
+_RENEW_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class WorkflowJournal:
+    """Append-only transition log plus checkpoints for one workflow."""
+
+    def __init__(self, redis_client, workflow_id: str, owner: Optional[str] = None):
+        self.redis = redis_client
+        self.workflow_id = workflow_id
+        self.owner = owner or uuid.uuid4().hex
+        prefix = f"workflow:{workflow_id}"
+        self.meta_key = prefix
+        self.stream_key = f"{prefix}:journal"
+        self.checkpoint_key = f"{prefix}:checkpoints"
+        self.state_key = f"{prefix}:state"
+        self.lease_key = f"{prefix}:lease"
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat()
+
+    # ── Transitions ───────────────────────────────────────────────────
+    async def submitted(self, workflow, meta: Dict) -> bool:
+        """
+        Journal a new workflow; False if the id is already in use (running,
+        or finished within FINISHED_TTL_SECONDS). A resubmitted id would
+        otherwise inherit the old checkpoints, and recovery would resume
+        the first definition in the stream.
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            # Only this id's keys: watching workflows:active would fail a fresh
+            # id whenever any other workflow is submitted or finishes
+            await pipe.watch(self.meta_key, self.state_key, self.stream_key)
+            if await pipe.exists(self.meta_key, self.state_key, self.stream_key) or await pipe.sismember(
+                ACTIVE_KEY, self.workflow_id
+            ):
+                return False
+            pipe.multi()
+            pipe.xadd(self.stream_key, {
+                "event": "submitted",
+                "definition": workflow.model_dump_json(),
+                "at": self._now(),
+            })
+            pipe.set(self.meta_key, json.dumps(meta), ex=FINISHED_TTL_SECONDS)
+            pipe.hset(self.state_key, mapping={"status": "pending", "steps_total": len(workflow.steps)})
+            pipe.sadd(ACTIVE_KEY, self.workflow_id)
+            pipe.lpush(HISTORY_KEY, self.workflow_id)
+            try:
+                await pipe.execute()
+            except WatchError:  # submitted concurrently
+                return False
+        return True
+
+    async def claim(self) -> bool:
+        """Take the lease; False if another process is running this workflow."""
+        return bool(await self.redis.set(self.lease_key, self.owner, nx=True, ex=LEASE_SECONDS))
+
+    async def renew(self) -> bool:
+        """Extend the lease if this process still owns it; False once it has been taken over."""
+        return bool(await self.redis.eval(_RENEW_LEASE, 1, self.lease_key, self.owner, LEASE_SECONDS))
+
+    async def started(self, resumed: bool) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(self.stream_key, {"event": "resumed" if resumed else "started", "at": self._now()})
+            pipe.hset(self.state_key, mapping={"status": "running", "started_at": self._now()})
+            await pipe.execute()
+
+    async def step_started(self, step_id: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(self.stream_key, {"event": "step_started", "step_id": step_id, "at": self._now()})
+            await pipe.execute()
+
+    async def step_finished(self, result) -> bool:
+        """Record a step's result; False if one was already checkpointed."""
+        payload = result.model_dump_json()
+        checkpoint = result.status != "skipped"  # skips are re-derived on resume
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if checkpoint:
+                pipe.hsetnx(self.checkpoint_key, result.step_id, payload)
+            pipe.xadd(self.stream_key, {
+                "event": "step_finished",
+                "step_id": result.step_id,
+                "status": result.status,
+                "result": payload,
+                "at": self._now(),
+            })
+            replies = await pipe.execute()
+        return bool(replies[0]) if checkpoint else True
+
+    async def finished(self, status: str, steps_completed: int, duration_seconds: float) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(self.stream_key, {"event": "finished", "status": status, "at": self._now()})
+            pipe.hset(self.state_key, mapping={
+                "status": status,
+                "steps_completed": steps_completed,
+                "total_duration_seconds": duration_seconds,
+                "completed_at": self._now(),
+            })
+            pipe.srem(ACTIVE_KEY, self.workflow_id)
+            pipe.delete(self.lease_key)
+            for key in (self.meta_key, self.stream_key, self.checkpoint_key, self.state_key):
+                pipe.expire(key, FINISHED_TTL_SECONDS)
+            await pipe.execute()
+
+    # ── Reads ─────────────────────────────────────────────────────────
+    async def checkpoints(self) -> Dict[str, "StepResult"]:
+        from workflow_engine import StepResult
+
+        raw = await self.redis.hgetall(self.checkpoint_key)
+        return {step_id: StepResult.model_validate_json(data) for step_id, data in raw.items()}
+
+    async def definition(self) -> Optional["WorkflowExecution"]:
+        from workflow_engine import WorkflowExecution
+
+        entries = await self.redis.xrange(self.stream_key, count=1)
+        if not entries or entries[0][1].get("event") != "submitted":
+            return None
+        return WorkflowExecution.model_validate_json(entries[0][1]["definition"])
+
+    async def state(self) -> Dict:
+        return await self.redis.hgetall(self.state_key)
+
+    async def events(self) -> List[Dict]:
+        return [fields for _, fields in await self.redis.xrange(self.stream_key)]
+
+
+# Resumed runs are held here so they aren't garbage collected mid-flight
+_resumed_tasks: set = set()
+
+
+async def recover_workflows(redis_client, settings) -> List[str]:
+    """Resume every unfinished workflow whose owner has gone away."""
+    from workflow_engine import execute_workflow_background
+
+    resumed = []
+    for workflow_id in await redis_client.smembers(ACTIVE_KEY):
+        journal = WorkflowJournal(redis_client, workflow_id)
+        if await redis_client.exists(journal.lease_key):
+            continue  # still owned by a live process
+        workflow = await journal.definition()
+        if workflow is None:
+            logger.warning("Dropping workflow %s: journal has no definition", workflow_id)
+            await redis_client.srem(ACTIVE_KEY, workflow_id)
+            continue
+        task = asyncio.create_task(execute_workflow_background(workflow, redis_client, settings))
+        _resumed_tasks.add(task)
+        task.add_done_callback(_resumed_tasks.discard)
+        resumed.append(workflow_id)
+    if resumed:
+        logger.info("Resuming %d workflow(s): %s", len(resumed), resumed)
+    return resumed
+
+
+async def run_recovery_sweeps(redis_client, settings, interval: Optional[float] = None) -> None:
+    """Call recover_workflows() now and then every ``interval`` (LEASE_SECONDS) seconds."""
+    while True:
+        try:
+            await recover_workflows(redis_client, settings)
+        except Exception as e:
+            logger.error("Workflow recovery failed: %s", e)
+        await asyncio.sleep(interval or LEASE_SECONDS)
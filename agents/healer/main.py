@@ -85,6 +85,12 @@ class ThrottleStateUpdate(BaseModel):
 
 
 # ── Throttle helpers ──────────────────────────────────────────────────────────────────────────────
+# ZSET of paused containers scored by pause expiry — lets get_throttle_state()
+# avoid KEYS throttle:paused:* on the shared Redis.
+THROTTLE_PAUSED_INDEX = "throttle:paused_index"
+HEARTBEAT_INDEX = "agents:heartbeat_index"
+
+
 def _throttle_pause_key(container: str) -> str:
     return f"throttle:paused:{container}"
 
@@ -96,16 +102,23 @@ async def set_throttle_state(update: ThrottleStateUpdate) -> Dict[str, Any]:
     if redis_client:
         if update.paused:
             payload = json.dumps({"paused": True, "reason": update.reason, "until_ts": now + ttl})
-            for c in update.containers:
-                if not isinstance(c, str) or not c:
-                    continue
-                await redis_client.set(_throttle_pause_key(c), payload, ex=ttl)
-                applied.append(c)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for c in update.containers:
+                    if not isinstance(c, str) or not c:
+                        continue
+                    pipe.set(_throttle_pause_key(c), payload, ex=ttl)
+                    pipe.zadd(THROTTLE_PAUSED_INDEX, {c: now + ttl})
+                    applied.append(c)
+                pipe.zremrangebyscore(THROTTLE_PAUSED_INDEX, "-inf", now)
+                await pipe.execute()
         else:
-            keys = [_throttle_pause_key(c) for c in update.containers if isinstance(c, str) and c]
-            if keys:
-                await redis_client.delete(*keys)
-                applied = [c for c in update.containers if isinstance(c, str) and c]
+            containers = [c for c in update.containers if isinstance(c, str) and c]
+            if containers:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.delete(*[_throttle_pause_key(c) for c in containers])
+                    pipe.zrem(THROTTLE_PAUSED_INDEX, *containers)
+                    await pipe.execute()
+                applied = containers
     else:
         if update.paused:
             until = now + ttl
@@ -138,12 +151,18 @@ async def is_throttle_paused(container: str) -> bool:
 
 async def get_throttle_state() -> Dict[str, Any]:
     if redis_client:
-        keys = await redis_client.keys("throttle:paused:*")
-        containers = [
-            k.split("throttle:paused:", 1)[1]
-            for k in keys
-            if isinstance(k, str) and k.startswith("throttle:paused:")
-        ]
+        now = time.time()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.exists(THROTTLE_PAUSED_INDEX)
+            pipe.zrangebyscore(THROTTLE_PAUSED_INDEX, now, "+inf")
+            indexed, containers = await pipe.execute()
+        if not indexed:
+            # Pauses written before the index existed — non-blocking SCAN fallback
+            containers = [
+                k.split("throttle:paused:", 1)[1]
+                async for k in redis_client.scan_iter(match="throttle:paused:*", count=1000)
+                if isinstance(k, str) and k.startswith("throttle:paused:")
+            ]
         return {"containers": sorted(set(containers)), "backend": "redis"}
     now = time.time()
     containers = [c for c, until in _throttle_paused_local.items() if until > now]
@@ -298,22 +317,28 @@ def _seconds_until_midnight_utc() -> int:
 async def heartbeat_loop() -> None:
     """
     Publishes agent heartbeat to Redis every 10s.
-    Key: agents:heartbeat:healer-agent  (TTL 30s — disappears if healer dies)
+    Key: agents:heartbeat:healer-agent  (TTL 30s — disappears if healer dies),
+    indexed in agents:heartbeat_index so readers can ZCOUNT instead of KEYS.
     Also ensures healer:heals_today has a midnight-reset expiry.
     """
     key = f"agents:heartbeat:{HEALER_AGENT_ID}"
     while True:
         if redis_client:
             try:
-                await redis_client.hset(
-                    key,
-                    mapping={
-                        "name": "healer-agent",
-                        "status": "online",
-                        "last_seen": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
-                    },
-                )
-                await redis_client.expire(key, 30)
+                now = time.time()
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.hset(
+                        key,
+                        mapping={
+                            "name": "healer-agent",
+                            "status": "online",
+                            "last_seen": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+                        },
+                    )
+                    pipe.expire(key, 30)
+                    pipe.zadd(HEARTBEAT_INDEX, {HEALER_AGENT_ID: now + 30})
+                    pipe.zremrangebyscore(HEARTBEAT_INDEX, "-inf", now)
+                    await pipe.execute()
 
                 # Ensure healer:heals_today resets at midnight UTC
                 ttl = await redis_client.ttl("healer:heals_today")
@@ -1,11 +1,137 @@
+"""
+Human-in-the-loop approvals over Redis.
+
+A response is stored at ``approval:{id}:response`` and announced on the
+``approval_responses`` channel in the same MULTI (publish_response). Waiters
+don't poll: an ApprovalWaiter keeps ONE pub/sub connection per process and
+resolves a future per pending approval when its announcement arrives, so an
+idle wait costs no Redis traffic and wakes as soon as the human answers.
+Each wait checks the stored response once after subscribing, which covers
+answers that landed before the waiter was listening.
+"""
 import asyncio
+import logging
 import uuid
 import json
 from enum import Enum
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import redis.asyncio as redis
 
+logger = logging.getLogger(__name__)
+
+APPROVAL_RESPONSES_CHANNEL = "approval_responses"
+RESPONSE_TTL_SECONDS = 3600
+
+
+def response_key(approval_id: str) -> str:
+    return f"approval:{approval_id}:response"
+
+
+async def publish_response(redis_client, approval_id: str, response: Dict[str, Any]) -> None:
+    """Store an approval response and wake everyone waiting on it."""
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(response_key(approval_id), json.dumps(response), ex=RESPONSE_TTL_SECONDS)
+        pipe.publish(
+            APPROVAL_RESPONSES_CHANNEL,
+            json.dumps({"approval_id": approval_id, "response": response}),
+        )
+        await pipe.execute()
+
+
+class ApprovalWaiter:
+    """Waits on any number of approvals over a single pub/sub subscription."""
+
+    # While pub/sub is broken, waiters re-check the stored response this often
+    RECHECK_SECONDS = 1.0
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_listening(self) -> None:
+        if self._listener is not None and not self._listener.done():
+            return
+        async with self._lock:
+            if self._listener is not None and not self._listener.done():
+                return
+            pubsub = self.redis.pubsub()
+            await pubsub.subscribe(APPROVAL_RESPONSES_CHANNEL)
+            self._pubsub = pubsub
+            self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub) -> None:
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    data = json.loads(message["data"])
+                except ValueError:
+                    continue
+                self._resolve(data.get("approval_id"), data.get("response"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Approval listener stopped: %s", exc)
+        try:
+            await pubsub.aclose()
+        except Exception:
+            pass
+        # Wake every waiter so it re-checks the stored response itself
+        for approval_id in list(self._pending):
+            self._resolve(approval_id, None)
+
+    def _resolve(self, approval_id: Optional[str], response: Optional[Dict[str, Any]]) -> None:
+        for future in self._pending.pop(approval_id, ()):
+            if not future.done():
+                future.set_result(response)
+
+    async def wait(self, approval_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The response for ``approval_id``, or None if none arrives within ``timeout`` seconds."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            future = loop.create_future()
+            waiters = self._pending.setdefault(approval_id, [])
+            waiters.append(future)
+            try:
+                await self._ensure_listening()
+                stored = await self.redis.get(response_key(approval_id))
+                if stored:
+                    return json.loads(stored)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                response = await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters and self._pending.get(approval_id) is waiters:
+                    del self._pending[approval_id]
+            if response is not None:
+                return response
+            # Listener died: back off, then resubscribe and re-check
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(self.RECHECK_SECONDS, remaining))
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+
 class ApprovalStatus(Enum):
     PENDING = "pending"
     APPROVED = "approved"
@@ -16,10 +142,12 @@ class ApprovalSystem:
     def __init__(self, redis_url: str = "redis://redis:6379"):
         self.redis_url = redis_url
         self.redis = None
+        self.waiter: Optional[ApprovalWaiter] = None
     
     async def connect(self):
         if not self.redis:
             self.redis = await redis.from_url(self.redis_url, decode_responses=True)
+            self.waiter = ApprovalWaiter(self.redis)
 
     async def request_approval(
         self,
@@ -62,16 +190,9 @@ class ApprovalSystem:
     
     async def _wait_for_response(self, approval_id: str, timeout: int) -> Dict[str, Any]:
         """Wait for human to approve/reject via Dashboard"""
-        
-        # Poll for response (could also use pub/sub)
-        start_time = datetime.now().timestamp()
-        while (datetime.now().timestamp() - start_time) < timeout:
-            response = await self.redis.get(f"approval:{approval_id}:response")
-            
-            if response:
-                return json.loads(response)
-            
-            await asyncio.sleep(1)
+        response = await self.waiter.wait(approval_id, timeout)
+        if response is not None:
+            return response
         
         # Timeout - default to rejection for safety
         return {
@@ -103,8 +224,4 @@ class ApprovalSystem:
             request["status"] = status
             await self.redis.set(f"approval:{approval_id}", json.dumps(request))
 
-        await self.redis.set(
-            f"approval:{approval_id}:response",
-            json.dumps(response),
-            ex=3600
-        )
+        await publish_response(self.redis, approval_id, response)
@@ -1,39 +1,107 @@
 import hashlib
 import os
+import threading
 from chromadb import PersistentClient
-from typing import List
+from typing import Any, Dict, List, Tuple
+
+# Chroma rejects add() batches above the client's max batch size; stay well under it
+INGEST_BATCH_SIZE = 1000
+
+# Process-wide registry: one PersistentClient per path, one collection (and
+# its embedding function) per (path, agent). Opening either is expensive, so
+# AgentMemory instances share them and only open them on first use.
+_clients: Dict[str, Any] = {}
+_collections: Dict[Tuple[str, str], Any] = {}
+_registry_lock = threading.Lock()
+
+
+def get_collection(agent_name: str, base_path: str = "./memory"):
+    """Shared collection for ``agent_name``, created on first request."""
+    path = os.path.abspath(os.path.join(base_path, agent_name))
+    key = (path, agent_name)
+    collection = _collections.get(key)
+    if collection is not None:
+        return collection
+    with _registry_lock:
+        collection = _collections.get(key)
+        if collection is None:
+            client = _clients.get(path)
+            if client is None:
+                client = _clients[path] = PersistentClient(path=path)
+            collection = _collections[key] = client.get_or_create_collection(
+                name=f"{agent_name}_knowledge",
+                metadata={"description": "Agent's contextual memory"}
+            )
+        return collection
+
+
+def clear_registry() -> None:
+    """Forget cached clients/collections (tests, or after deleting a store)."""
+    with _registry_lock:
+        _collections.clear()
+        _clients.clear()
+
 
 class AgentMemory:
     def __init__(self, agent_name: str, base_path: str = "./memory"):
-        self.client = PersistentClient(path=os.path.join(base_path, agent_name))
-        self.collection = self.client.get_or_create_collection(
-            name=f"{agent_name}_knowledge",
-            metadata={"description": "Agent's contextual memory"}
-        )
-    
-    def ingest_document(self, doc_path: str, chunk_size: int = 1000):
-        """Break Bible/Docs into chunks and store with embeddings"""
+        self.agent_name = agent_name
+        self.base_path = base_path
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = get_collection(self.agent_name, self.base_path)
+        return self._collection
+
+    def warm_up(self) -> None:
+        """Open the store and load its embedding model now instead of on the first query."""
+        collection = self.collection
+        try:
+            # Chroma loads the embedding model lazily, on the first text it embeds
+            collection.query(query_texts=["warm-up"], n_results=1)
+        except Exception:
+            # An empty store may refuse the query; the text was embedded before that
+            if collection.count():
+                raise
+
+    def ingest_document(self, doc_path: str, chunk_size: int = 1000) -> int:
+        """Break Bible/Docs into chunks and store with embeddings.
+
+        Chunk IDs are content hashes: one batched lookup finds the chunks
+        already stored, and only new ones are embedded (in batches).
+        Returns the number of chunks added.
+        """
         if not os.path.exists(doc_path):
-            return
+            return 0
             
         with open(doc_path, 'r', encoding='utf-8') as f:
             content = f.read()
         
         # Split into semantic chunks (by headers, paragraphs, etc.)
         chunks = self._smart_chunk(content, chunk_size)
-        
-        # Store each chunk with metadata
+
+        # Use SHA-256 for secure ID generation (replaced MD5); first occurrence wins
+        pending: Dict[str, Tuple[int, str]] = {}
         for idx, chunk in enumerate(chunks):
-            # Use SHA-256 for secure ID generation (replaced MD5)
-            chunk_id = hashlib.sha256(chunk.encode()).hexdigest()
-            # Check if exists first to avoid re-embedding
-            existing = self.collection.get(ids=[chunk_id])
-            if not existing['ids']:
-                self.collection.add(
-                    documents=[chunk],
-                    ids=[chunk_id],
-                    metadatas=[{"source": doc_path, "chunk_index": idx}]
-                )
+            pending.setdefault(hashlib.sha256(chunk.encode()).hexdigest(), (idx, chunk))
+
+        # Check which exist in one round trip per batch to avoid re-embedding
+        ids = list(pending)
+        for start in range(0, len(ids), INGEST_BATCH_SIZE):
+            existing = self.collection.get(ids=ids[start:start + INGEST_BATCH_SIZE], include=[])
+            for chunk_id in existing['ids']:
+                pending.pop(chunk_id, None)
+
+        new_ids = list(pending)
+        for start in range(0, len(new_ids), INGEST_BATCH_SIZE):
+            batch = new_ids[start:start + INGEST_BATCH_SIZE]
+            self.collection.add(
+                documents=[pending[i][1] for i in batch],
+                ids=batch,
+                metadatas=[{"source": doc_path, "chunk_index": pending[i][0]} for i in batch]
+            )
+        return len(new_ids)
     
     def query_relevant_context(self, task_description: str, top_k: int = 3) -> str:
         """Retrieve only relevant Bible sections for this task"""
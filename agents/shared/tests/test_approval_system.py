@@ -0,0 +1,116 @@
+import asyncio
+
+import fakeredis
+import pytest
+import redis.asyncio.connection as redis_connection
+
+from agents.shared import approval_system
+from agents.shared.approval_system import ApprovalSystem, ApprovalWaiter, publish_response
+
+
+@pytest.fixture
+def r():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Every command written to any Redis connection, pub/sub included."""
+    commands = []
+    original = redis_connection.AbstractConnection.send_packed_command
+
+    async def spy(self, command, check_health=True):
+        commands.append(command)
+        return await original(self, command, check_health)
+
+    monkeypatch.setattr(redis_connection.AbstractConnection, "send_packed_command", spy)
+    return commands
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_many_waiters_share_one_subscription_and_wake_on_the_push(r, sent, monkeypatch):
+    async def scenario():
+        pubsubs = []
+        original = r.pubsub
+
+        def counting_pubsub(**kwargs):
+            pubsubs.append(1)
+            return original(**kwargs)
+
+        monkeypatch.setattr(r, "pubsub", counting_pubsub)
+        waiter = ApprovalWaiter(r)
+        waits = [asyncio.create_task(waiter.wait(f"a{i}", timeout=5)) for i in range(50)]
+        await asyncio.sleep(0.05)
+
+        await publish_response(r, "a7", {"status": "approved"})
+        published = len(sent)
+        assert published  # the spy sees this client's commands
+        result = await asyncio.wait_for(waits[7], 1)
+
+        assert result == {"status": "approved"}
+        assert len(sent) == published  # woken by the pushed message, no extra round trip
+        assert len(pubsubs) == 1
+        assert not any(w.done() for i, w in enumerate(waits) if i != 7)
+        for w in waits:
+            w.cancel()
+        await asyncio.gather(*waits, return_exceptions=True)
+        await waiter.close()
+
+    run(scenario())
+
+
+def test_idle_wait_sends_no_commands(r, sent):
+    async def scenario():
+        waiter = ApprovalWaiter(r)
+        task = asyncio.create_task(waiter.wait("idle", timeout=5))
+        await asyncio.sleep(0.05)  # subscribed and checked the stored response
+        before = len(sent)
+        await asyncio.sleep(1.5)  # the old loop would have sent a GET per second
+        assert len(sent) == before
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await waiter.close()
+
+    run(scenario())
+
+
+def test_response_stored_before_waiting_is_found(r):
+    async def scenario():
+        await publish_response(r, "early", {"status": "rejected"})
+        waiter = ApprovalWaiter(r)
+        assert await waiter.wait("early", timeout=1) == {"status": "rejected"}
+        await waiter.close()
+
+    run(scenario())
+
+
+def test_timeout_returns_none_and_forgets_the_waiter(r):
+    async def scenario():
+        waiter = ApprovalWaiter(r)
+        assert await waiter.wait("never", timeout=0.05) is None
+        assert waiter._pending == {}
+        await waiter.close()
+
+    run(scenario())
+
+
+def test_approval_system_round_trip(r, monkeypatch):
+    async def scenario():
+        async def fake_from_url(url, decode_responses=True):
+            return r
+
+        monkeypatch.setattr(approval_system.redis, "from_url", fake_from_url)
+        agent, human = ApprovalSystem(), ApprovalSystem()
+        pending = asyncio.create_task(agent.request_approval("coder", "deploy", {"env": "prod"}, timeout=5))
+        await asyncio.sleep(0.05)
+        [approval_id] = [k.split(":")[1] for k in await r.keys("approval:*")]
+        await human.respond_to_approval(approval_id, "approved", reason="lgtm")
+        result = await asyncio.wait_for(pending, 1)
+        assert result["status"] == "approved"
+        assert result["reason"] == "lgtm"
+        await agent.waiter.close()
+
+    run(scenario())
@@ -0,0 +1,83 @@
+import pytest
+
+from agents.shared import rag_memory
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+        self.get_calls = 0
+        self.add_calls = 0
+        self.queries = []
+
+    def get(self, ids, include=None):
+        self.get_calls += 1
+        return {"ids": [i for i in ids if i in self.docs]}
+
+    def add(self, documents, ids, metadatas):
+        self.add_calls += 1
+        assert len(set(ids)) == len(ids)
+        self.docs.update(zip(ids, documents))
+
+    def count(self):
+        return len(self.docs)
+
+    def query(self, query_texts, n_results):
+        self.queries.append(query_texts)
+        if not self.docs:
+            raise ValueError("collection is empty")
+        return {"documents": [list(self.docs.values())[:n_results]]}
+
+
+class FakeClient:
+    instances = 0
+
+    def __init__(self, path):
+        FakeClient.instances += 1
+        self.collections = {}
+
+    def get_or_create_collection(self, name, metadata=None):
+        return self.collections.setdefault(name, FakeCollection())
+
+
+@pytest.fixture(autouse=True)
+def fake_chroma(monkeypatch):
+    FakeClient.instances = 0
+    monkeypatch.setattr(rag_memory, "PersistentClient", FakeClient)
+    rag_memory.clear_registry()
+    yield
+    rag_memory.clear_registry()
+
+
+def test_agent_memory_shares_client_and_opens_lazily(tmp_path):
+    first = rag_memory.AgentMemory("crew", base_path=str(tmp_path))
+    assert FakeClient.instances == 0
+
+    second = rag_memory.AgentMemory("crew", base_path=str(tmp_path))
+    assert first.collection is second.collection
+    assert FakeClient.instances == 1
+
+
+def test_warm_up_embeds_a_query(tmp_path):
+    memory = rag_memory.AgentMemory("crew", base_path=str(tmp_path))
+    memory.warm_up()  # empty store: the refused query is not an error
+    assert memory.collection.queries == [["warm-up"]]
+
+    memory.collection.docs["x"] = "doc"
+    memory.warm_up()
+    assert len(memory.collection.queries) == 2
+
+
+def test_ingest_document_batches_lookups_and_skips_known_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_memory, "INGEST_BATCH_SIZE", 100)
+    doc = tmp_path / "bible.md"
+    doc.write_text("".join(f"\n## Section {i}\nbody {i}\n" for i in range(250)) + "\n## Section 0\nbody 0\n")
+    memory = rag_memory.AgentMemory("crew", base_path=str(tmp_path))
+
+    assert memory.ingest_document(str(doc), chunk_size=1000) == 251  # preamble + 250 unique sections
+    collection = memory.collection
+    assert (collection.get_calls, collection.add_calls) == (3, 3)
+
+    assert memory.ingest_document(str(doc), chunk_size=1000) == 0
+    assert collection.add_calls == 3
+    assert memory.ingest_document(str(tmp_path / "missing.md")) == 0
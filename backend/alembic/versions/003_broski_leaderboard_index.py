@@ -0,0 +1,31 @@
+"""broski_leaderboard_index — covering index for the leaderboard fallback
+
+Revision ID: 003_broski_leaderboard_index
+Revises: 002_dashboard_tasks
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '003_broski_leaderboard_index'
+down_revision = '002_dashboard_tasks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # (coins DESC, xp DESC, user_id) INCLUDE (level, level_name): top-N and
+    # "how many wallets rank above me" become index-only scans
+    op.create_index(
+        'ix_broski_wallets_leaderboard',
+        'broski_wallets',
+        [sa.text('coins DESC'), sa.text('xp DESC'), 'user_id'],
+        unique=False,
+        postgresql_include=['level', 'level_name'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_broski_wallets_leaderboard', table_name='broski_wallets')
@@ -0,0 +1,36 @@
+"""broski_unique_user_achievement — one unlock per (wallet, achievement)
+
+Revision ID: 004_broski_unique_user_achievement
+Revises: 003_broski_leaderboard_index
+Create Date: 2026-10-17
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = '004_broski_unique_user_achievement'
+down_revision = '003_broski_leaderboard_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Drop duplicate unlocks left by the old read-then-insert check, keeping the earliest
+    op.execute(
+        """
+        DELETE FROM broski_user_achievements a
+        USING broski_user_achievements b
+        WHERE a.wallet_id = b.wallet_id
+          AND a.achievement_slug = b.achievement_slug
+          AND a.id > b.id
+        """
+    )
+    op.create_unique_constraint(
+        'uq_broski_user_achievement',
+        'broski_user_achievements',
+        ['wallet_id', 'achievement_slug'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_broski_user_achievement', 'broski_user_achievements', type_='unique')
@@ -1,11 +1,17 @@
 import logging
-import httpx
+from typing import AsyncIterator
 from app.core.config import settings
+from app.llm.hedging import Attempt, ProviderError, StreamAttempt, StreamInterrupted, hedged_call, hedged_stream
+from app.llm.http_clients import http_clients
 from app.llm.ollama import OllamaModelResolver
-from app.core.model_routes import ModelRouteContext, openrouter_chat, select_model_route
+from app.llm.streaming import abandon_stream, current_token_sink, iter_ollama_tokens, iter_sse_chat_tokens
+from app.core.model_routes import ModelRouteContext, openrouter_chat, openrouter_chat_stream, select_model_route
 
 logger = logging.getLogger(__name__)
 
+SESSION_AUTH_RESPONSE = "Perplexity Session Auth is active. (Simulated Response)"
+NO_PROVIDER_RESPONSE = "Error: No valid LLM provider available (Local, Session, OpenRouter, or API Key)."
+
 
 class Brain:
     """
@@ -43,10 +49,10 @@ class Brain:
 
         # 1. Try Vector Search (Semantic)
         try:
-            from app.core.rag import rag
+            from app.core.rag import async_rag
             if query:
                 logger.info(f"[BRAIN] Semantic searching for: '{query}'")
-                rag_results = rag.query(query, n_results=limit)
+                rag_results = await async_rag.query(query, n_results=limit)
                 if rag_results:
                     context.append("--- Semantic Memory (RAG) ---")
                     context.extend(rag_results)
@@ -69,7 +75,7 @@ class Brain:
             logger.error(f"[BRAIN] Error recalling context: {e}")
             return ""
 
-    def _build_memory_context(
+    async def _build_memory_context(
         self,
         conversation_id: str | None,
         agent_id: str,
@@ -82,6 +88,7 @@ class Brain:
           2. RAG snippets   (if available)
           3. Conversation history (if self or shared mode)
 
+        Handoffs and history are fetched in one pipelined Redis round trip.
         Hard-capped to avoid prompt token overflow.
         Fails closed: if anything errors, returns empty string.
         """
@@ -93,15 +100,21 @@ class Brain:
             return rag_context  # preserve existing RAG behaviour
 
         try:
-            from app.core.agent_memory import read_handoffs, get_history
+            from app.core.agent_memory import memory_store
+            memory = await memory_store.load_context(
+                conversation_id,
+                agent_id,
+                history_n=10,
+                handoff_limit=5,
+                include_handoffs=memory_mode == "shared",
+            )
             blocks: list[str] = []
 
             # 1. Handoff inbox
             if memory_mode == "shared":
-                handoffs = read_handoffs(agent_id, limit=5, consume=False)
-                if handoffs:
+                if memory.handoffs:
                     handoff_text = "\n".join(
-                        f"- [{h['from_agent_id']}] {h['summary']}" for h in handoffs
+                        f"- [{h['from_agent_id']}] {h['summary']}" for h in memory.handoffs
                     )
                     handoff_text = handoff_text[:MAX_HANDOFF_CHARS]
                     blocks.append(f"--- Handoff Notes for {agent_id} ---\n{handoff_text}")
@@ -111,10 +124,9 @@ class Brain:
                 blocks.append(rag_context[:MAX_RAG_CHARS])
 
             # 3. Conversation history
-            history = get_history(conversation_id, last_n=10)
-            if history:
+            if memory.history:
                 history_lines = []
-                for turn in history:
+                for turn in memory.history:
                     line = f"[{turn['agent_id']}|{turn['role']}] {turn['content']}"
                     history_lines.append(line)
                 history_text = "\n".join(history_lines)[:MAX_HISTORY_CHARS]
@@ -153,7 +165,78 @@ class Brain:
           none   — stateless, original behaviour (default)
           self   — reads + writes conversation history
           shared — reads handoffs + history; writes both
+
+        If a token sink is installed (app.llm.streaming.stream_tokens_to),
+        the answer is streamed from the provider and every token is forwarded
+        to the sink; the returned text is the same either way. If the stream
+        breaks mid-answer the sink is told to abandon it and the answer is
+        fetched again through the buffered chain.
         """
+        full_prompt = await self._prepare_turn(
+            role, task_description, use_memory, conversation_id, agent_id, memory_mode
+        )
+
+        # ------------------------------------------------------------------
+        # 5. LLM routing (streamed when someone is listening)
+        # ------------------------------------------------------------------
+        sink = current_token_sink()
+        if sink is None:
+            result = await self._route_llm(role=role, prompt=full_prompt, route_context=route_context)
+        else:
+            parts: list[str] = []
+            try:
+                async for token in self._stream_llm(role=role, prompt=full_prompt, route_context=route_context):
+                    parts.append(token)
+                    await sink(token)
+                result = "".join(parts)
+            except StreamInterrupted as exc:
+                # Never return (or persist) a truncated answer: redo it buffered
+                logger.warning(f"[BRAIN] Stream failed mid-answer ({exc}); retrying without streaming")
+                await abandon_stream(sink)
+                result = await self._route_llm(role=role, prompt=full_prompt, route_context=route_context)
+                await sink(result)
+
+        # ------------------------------------------------------------------
+        # 6. Persist assistant response turn
+        # ------------------------------------------------------------------
+        await self._persist_turn(conversation_id, agent_id, memory_mode, "assistant", result)
+        return result
+
+    async def think_stream(
+        self,
+        role: str,
+        task_description: str,
+        use_memory: bool = False,
+        route_context: dict | None = None,
+        conversation_id: str | None = None,
+        agent_id: str = "brain",
+        memory_mode: str = "none",
+    ) -> AsyncIterator[str]:
+        """
+        Streaming think(): yields tokens as the provider produces them.
+
+        Same routing, memory and persistence as think(); the assistant turn
+        is persisted once the stream completes.
+        """
+        full_prompt = await self._prepare_turn(
+            role, task_description, use_memory, conversation_id, agent_id, memory_mode
+        )
+        parts: list[str] = []
+        async for token in self._stream_llm(role=role, prompt=full_prompt, route_context=route_context):
+            parts.append(token)
+            yield token
+        await self._persist_turn(conversation_id, agent_id, memory_mode, "assistant", "".join(parts))
+
+    async def _prepare_turn(
+        self,
+        role: str,
+        task_description: str,
+        use_memory: bool,
+        conversation_id: str | None,
+        agent_id: str,
+        memory_mode: str,
+    ) -> str:
+        """Steps 1-4 of think(): recall, build memory, compose prompt, persist user turn."""
         logger.info(f"[BRAIN] {role} is thinking about: {task_description} "
                     f"(memory_mode={memory_mode}, conversation_id={conversation_id})")
 
@@ -168,7 +251,7 @@ class Brain:
         # ------------------------------------------------------------------
         # 2. Build injected memory block (new Phase 1 — fails closed)
         # ------------------------------------------------------------------
-        memory_block = self._build_memory_context(
+        memory_block = await self._build_memory_context(
             conversation_id=conversation_id,
             agent_id=agent_id,
             memory_mode=memory_mode,
@@ -187,39 +270,29 @@ class Brain:
         # 4. Persist the user turn BEFORE we call the LLM
         #    (so history is consistent even if LLM errors)
         # ------------------------------------------------------------------
-        if memory_mode != "none" and conversation_id:
-            try:
-                from app.core.agent_memory import append_turn
-                append_turn(
-                    conversation_id=conversation_id,
-                    agent_id=agent_id,
-                    role="user",
-                    content=task_description,
-                )
-            except Exception as exc:
-                logger.warning(f"[BRAIN] Failed to persist user turn: {exc}")
-
-        # ------------------------------------------------------------------
-        # 5. LLM routing (unchanged from original)
-        # ------------------------------------------------------------------
-        result = await self._route_llm(role=role, prompt=full_prompt, route_context=route_context)
+        await self._persist_turn(conversation_id, agent_id, memory_mode, "user", task_description)
+        return full_prompt
 
-        # ------------------------------------------------------------------
-        # 6. Persist assistant response turn
-        # ------------------------------------------------------------------
-        if memory_mode != "none" and conversation_id:
-            try:
-                from app.core.agent_memory import append_turn
-                append_turn(
-                    conversation_id=conversation_id,
-                    agent_id=agent_id,
-                    role="assistant",
-                    content=result,
-                )
-            except Exception as exc:
-                logger.warning(f"[BRAIN] Failed to persist assistant turn: {exc}")
-
-        return result
+    async def _persist_turn(
+        self,
+        conversation_id: str | None,
+        agent_id: str,
+        memory_mode: str,
+        role: str,
+        content: str,
+    ) -> None:
+        if memory_mode == "none" or not conversation_id:
+            return
+        try:
+            from app.core.agent_memory import memory_store
+            await memory_store.append_turn(
+                conversation_id=conversation_id,
+                agent_id=agent_id,
+                role=role,
+                content=content,
+            )
+        except Exception as exc:
+            logger.warning(f"[BRAIN] Failed to persist {role} turn: {exc}")
 
     # ------------------------------------------------------------------
     # LLM routing — extracted so think() stays readable
@@ -231,73 +304,231 @@ class Brain:
         prompt: str,
         route_context: dict | None = None,
     ) -> str:
-        """Try Ollama → Perplexity Session → OpenRouter → Perplexity API."""
+        """
+        Try Ollama → Perplexity Session → OpenRouter → Perplexity API.
 
-        # 1. Local LLM (Ollama)
+        The chain is hedged (app.llm.hedging): a provider slower than its
+        hedge deadline gets the next one started alongside it, the first
+        answer wins, and providers with an open circuit are skipped.
+        """
+        attempts: list[Attempt] = []
         if settings.OLLAMA_HOST:
-            try:
-                system_prompt = (
-                    f"You are a {role}.\n"
-                    "Always respond in two phases:\n"
-                    "1) TL;DR (1-3 lines)\n"
-                    "2) Details (headings + bullets)\n"
-                    "Break work into micro-tasks and propose the next single step.\n\n"
-                    f"Task:\n{prompt}"
-                )
-                async with httpx.AsyncClient(timeout=120.0) as client:
-                    model = settings.DEFAULT_LLM_MODEL
-                    if model.strip().lower() == "auto":
-                        resolved = await self._ollama_model_resolver.resolve(client)
-                        if resolved:
-                            model = resolved
-                    logger.info(f"[BRAIN] Routing to Local LLM (Ollama: {model})...")
-                    response = await client.post(
-                        f"{settings.OLLAMA_HOST}/api/generate",
-                        json={
-                            "model": model,
-                            "prompt": system_prompt,
-                            "stream": False,
-                            "options": settings.ollama_generate_options(),
-                        }
-                    )
-                    if response.status_code == 200:
-                        return response.json()["response"]
-                    logger.warning(f"[BRAIN] Local LLM failed ({response.status_code}), falling back...")
-            except Exception as e:
-                logger.warning(f"[BRAIN] Local LLM error: {e}. Falling back...")
+            attempts.append(Attempt("ollama", lambda: self._call_ollama(role, prompt)))
+        if settings.PERPLEXITY_SESSION_AUTH:
+            attempts.append(Attempt("session", self._call_session))
+        route = self._openrouter_route(route_context)
+        if route is not None:
+            attempts.append(Attempt("openrouter", lambda: self._call_openrouter(route, role, prompt)))
+        if self.api_key:
+            attempts.append(Attempt("perplexity", lambda: self._call_perplexity(role, prompt)))
+        if not attempts:
+            return NO_PROVIDER_RESPONSE
 
-        # 2. Perplexity Session Auth (Comet/Spaces)
+        try:
+            _, answer = await hedged_call(attempts, hedge=settings.LLM_HEDGE_ENABLED)
+            return answer
+        except ProviderError as exc:
+            return exc.response or NO_PROVIDER_RESPONSE
+
+    async def _call_ollama(self, role: str, prompt: str) -> str:
+        try:
+            client = http_clients.get("ollama")
+            model = await self._ollama_model(client)
+            logger.info(f"[BRAIN] Routing to Local LLM (Ollama: {model})...")
+            response = await client.post(
+                f"{settings.OLLAMA_HOST}/api/generate",
+                json=self._ollama_payload(role, prompt, model, stream=False),
+            )
+        except Exception as e:
+            logger.warning(f"[BRAIN] Local LLM error: {e}. Falling back...")
+            raise ProviderError(str(e)) from e
+        if response.status_code != 200:
+            logger.warning(f"[BRAIN] Local LLM failed ({response.status_code}), falling back...")
+            raise ProviderError(f"Ollama returned {response.status_code}")
+        return response.json()["response"]
+
+    async def _call_session(self) -> str:
+        logger.info("[BRAIN] Using Perplexity Session Auth (Simulated)...")
+        return SESSION_AUTH_RESPONSE
+
+    async def _call_openrouter(self, route, role: str, prompt: str) -> str:
+        try:
+            return await openrouter_chat(
+                client=http_clients.get("openrouter"),
+                base_url=route.base_url,
+                api_key=settings.OPENROUTER_API_KEY,
+                model=route.model,
+                max_tokens=route.max_tokens,
+                privacy_mode=route.privacy_mode,
+                messages=self._openrouter_messages(role, prompt),
+            )
+        except Exception as e:
+            logger.warning(f"[BRAIN] OpenRouter route {route.name} failed: {e}. Falling back...")
+            raise ProviderError(str(e)) from e
+
+    async def _call_perplexity(self, role: str, prompt: str) -> str:
+        headers, payload = self._perplexity_request(role, prompt)
+        try:
+            response = await http_clients.get("perplexity").post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=headers,
+            )
+        except Exception as e:
+            logger.error(f"[BRAIN] Error thinking: {e}")
+            raise ProviderError(str(e), response=f"Error: {str(e)}") from e
+        if response.status_code != 200:
+            logger.error(f"[BRAIN] Perplexity API Error: {response.text}")
+            raise ProviderError(
+                f"Perplexity returned {response.status_code}",
+                response=f"Error: API returned {response.status_code} - {response.text}",
+            )
+        data = response.json()
+        return data["choices"][0]["message"]["content"]
+
+    async def _stream_llm(
+        self,
+        role: str,
+        prompt: str,
+        route_context: dict | None = None,
+    ) -> AsyncIterator[str]:
+        """Streaming _route_llm: same provider order, fallback and breakers.
+
+        Hedged on time to first token (app.llm.hedging.hedged_stream): a
+        provider that hasn't started streaming within its hedge deadline gets
+        the next one started alongside it, and the first to produce a token
+        is streamed to the end. A failure before the first token falls
+        through to the next provider; a failure mid-stream raises
+        StreamInterrupted after the partial tokens.
+        """
+        attempts: list[StreamAttempt] = []
+        if settings.OLLAMA_HOST:
+            attempts.append(StreamAttempt("ollama", lambda: self._stream_ollama(role, prompt)))
         if settings.PERPLEXITY_SESSION_AUTH:
-            logger.info("[BRAIN] Using Perplexity Session Auth (Simulated)...")
-            return "Perplexity Session Auth is active. (Simulated Response)"
+            attempts.append(StreamAttempt("session", self._stream_session))
+        route = self._openrouter_route(route_context)
+        if route is not None:
+            attempts.append(StreamAttempt("openrouter", lambda: self._stream_openrouter(route, role, prompt)))
+        if self.api_key:
+            attempts.append(StreamAttempt("perplexity", lambda: self._stream_perplexity(role, prompt)))
+        if not attempts:
+            yield NO_PROVIDER_RESPONSE
+            return
 
-        # 3. OpenRouter fallback
-        if route_context is not None and settings.OPENROUTER_API_KEY:
-            try:
-                ctx = ModelRouteContext(**route_context)
-            except TypeError:
-                ctx = ModelRouteContext(kind=str(route_context.get("kind", "general")))
-            route = select_model_route(ctx, settings)
-            if route is not None:
-                try:
-                    return await openrouter_chat(
-                        base_url=route.base_url,
-                        api_key=settings.OPENROUTER_API_KEY,
-                        model=route.model,
-                        max_tokens=route.max_tokens,
-                        privacy_mode=route.privacy_mode,
-                        messages=[
-                            {"role": "system", "content": f"You are a {role}."},
-                            {"role": "user", "content": prompt},
-                        ],
+        try:
+            async for token in hedged_stream(attempts, hedge=settings.LLM_HEDGE_ENABLED):
+                yield token
+        except StreamInterrupted:
+            raise
+        except ProviderError as exc:
+            yield exc.response or NO_PROVIDER_RESPONSE
+
+    async def _stream_ollama(self, role: str, prompt: str) -> AsyncIterator[str]:
+        client = http_clients.get("ollama")
+        model = await self._ollama_model(client)
+        logger.info(f"[BRAIN] Streaming from Local LLM (Ollama: {model})...")
+        async with client.stream(
+            "POST",
+            f"{settings.OLLAMA_HOST}/api/generate",
+            json=self._ollama_payload(role, prompt, model, stream=True),
+        ) as response:
+            if response.status_code != 200:
+                logger.warning(f"[BRAIN] Local LLM failed ({response.status_code}), falling back...")
+                raise ProviderError(f"Ollama returned {response.status_code}")
+            async for token in iter_ollama_tokens(response):
+                yield token
+
+    async def _stream_session(self) -> AsyncIterator[str]:
+        yield await self._call_session()
+
+    async def _stream_openrouter(self, route, role: str, prompt: str) -> AsyncIterator[str]:
+        async for token in openrouter_chat_stream(
+            client=http_clients.get("openrouter"),
+            base_url=route.base_url,
+            api_key=settings.OPENROUTER_API_KEY,
+            model=route.model,
+            max_tokens=route.max_tokens,
+            privacy_mode=route.privacy_mode,
+            messages=self._openrouter_messages(role, prompt),
+        ):
+            yield token
+
+    async def _stream_perplexity(self, role: str, prompt: str) -> AsyncIterator[str]:
+        headers, payload = self._perplexity_request(role, prompt)
+        payload["stream"] = True
+        emitted = False
+        try:
+            async with http_clients.get("perplexity").stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=headers,
+            ) as response:
+                if response.status_code != 200:
+                    text = (await response.aread()).decode("utf-8", "replace")
+                    logger.error(f"[BRAIN] Perplexity API Error: {text}")
+                    raise ProviderError(
+                        f"Perplexity returned {response.status_code}",
+                        response=f"Error: API returned {response.status_code} - {text}",
                     )
-                except Exception as e:
-                    logger.warning(f"[BRAIN] OpenRouter route {route.name} failed: {e}. Falling back...")
+                async for token in iter_sse_chat_tokens(response):
+                    emitted = True
+                    yield token
+        except ProviderError:
+            raise
+        except Exception as e:
+            logger.error(f"[BRAIN] Error thinking: {e}")
+            if emitted:
+                raise
+            raise ProviderError(str(e), response=f"Error: {str(e)}") from e
 
-        # 4. Perplexity API (paid fallback)
-        if not self.api_key:
-            return "Error: No valid LLM provider available (Local, Session, OpenRouter, or API Key)."
+    # ------------------------------------------------------------------
+    # Provider request builders (shared by the buffered and streamed paths)
+    # ------------------------------------------------------------------
+
+    async def _ollama_model(self, client) -> str:
+        model = settings.DEFAULT_LLM_MODEL
+        if model.strip().lower() == "auto":
+            resolved = await self._ollama_model_resolver.resolve(client)
+            if resolved:
+                model = resolved
+        return model
+
+    @staticmethod
+    def _ollama_payload(role: str, prompt: str, model: str, stream: bool) -> dict:
+        system_prompt = (
+            f"You are a {role}.\n"
+            "Always respond in two phases:\n"
+            "1) TL;DR (1-3 lines)\n"
+            "2) Details (headings + bullets)\n"
+            "Break work into micro-tasks and propose the next single step.\n\n"
+            f"Task:\n{prompt}"
+        )
+        return {
+            "model": model,
+            "prompt": system_prompt,
+            "stream": stream,
+            "options": settings.ollama_generate_options(),
+        }
 
+    @staticmethod
+    def _openrouter_route(route_context: dict | None):
+        if route_context is None or not settings.OPENROUTER_API_KEY:
+            return None
+        try:
+            ctx = ModelRouteContext(**route_context)
+        except TypeError:
+            ctx = ModelRouteContext(kind=str(route_context.get("kind", "general")))
+        return select_model_route(ctx, settings)
+
+    @staticmethod
+    def _openrouter_messages(role: str, prompt: str) -> list[dict[str, str]]:
+        return [
+            {"role": "system", "content": f"You are a {role}."},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _perplexity_request(self, role: str, prompt: str) -> tuple[dict, dict]:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -313,22 +544,7 @@ class Brain:
             ],
             "temperature": 0.2,
         }
-
-        try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    json=payload,
-                    headers=headers,
-                )
-                if response.status_code != 200:
-                    logger.error(f"[BRAIN] Perplexity API Error: {response.text}")
-                    return f"Error: API returned {response.status_code} - {response.text}"
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
-        except Exception as e:
-            logger.error(f"[BRAIN] Error thinking: {e}")
-            return f"Error: {str(e)}"
+        return headers, payload
 
 
 # Global instance
@@ -1,14 +1,16 @@
 """BROski$ Token System — API Endpoints"""
 from __future__ import annotations
 
+import asyncio
 from typing import Any
 
 import redis
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models import models
 from app.models.broski import BROskiAchievement
 from app.schemas.broski import (
@@ -19,68 +21,90 @@ from app.schemas.broski import (
     LeaderboardEntry,
     AwardRequest,
 )
-from app.services import broski_service
+from app.services import broski_service, leaderboard
 from app.api import deps
 
 router = APIRouter()
 
+# Routes run on the AsyncSession; broski_service stays sync and is called
+# through AsyncSession.run_sync, which drives the same connection without
+# a threadpool hop. Leaderboard reads go through leaderboard.top_async /
+# rank_of_async, which keep the blocking Redis lookup off the event loop.
+
 
 @router.get("/wallet", response_model=WalletResponse)
-def get_my_wallet(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+async def get_my_wallet(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """Get your BROski$ wallet — coins, XP, and level."""
-    wallet = broski_service.get_wallet(current_user.id, db)
-    return wallet
+    return await db.run_sync(lambda s: broski_service.get_wallet(current_user.id, s))
 
 
 @router.get("/transactions", response_model=TransactionPage)
-def get_my_transactions(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+async def get_my_transactions(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
 ) -> Any:
     """Get your full BROski$ transaction history."""
-    items, total = broski_service.get_transactions(current_user.id, db, skip=skip, limit=limit)
+    items, total = await db.run_sync(
+        lambda s: broski_service.get_transactions(current_user.id, s, skip=skip, limit=limit)
+    )
     return TransactionPage(items=items, total=total, skip=skip, limit=limit)
 
 
 @router.get("/achievements", response_model=list[AchievementResponse])
-def list_achievements(
-    db: Session = Depends(get_db),
-    _: models.User = Depends(deps.get_current_active_user),
+async def list_achievements(
+    db: AsyncSession = Depends(get_async_db),
+    _: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """List ALL available achievements you can unlock."""
-    return db.query(BROskiAchievement).all()
+    return (await db.scalars(select(BROskiAchievement))).all()
 
 
 @router.get("/achievements/me", response_model=list[UserAchievementResponse])
-def get_my_achievements(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+async def get_my_achievements(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """See which achievements YOU'VE earned. 🏆"""
-    wallet = broski_service.get_wallet(current_user.id, db)
-    return wallet.earned_achievements
+    def _earned(s: Session) -> list[UserAchievementResponse]:
+        # serialise inside run_sync: the nested achievement is lazy-loaded
+        wallet = broski_service.get_wallet(current_user.id, s)
+        return [UserAchievementResponse.model_validate(ua) for ua in wallet.earned_achievements]
+
+    return await db.run_sync(_earned)
 
 
 @router.get("/leaderboard", response_model=list[LeaderboardEntry])
-def get_leaderboard(
-    db: Session = Depends(get_db),
-    _: models.User = Depends(deps.get_current_active_user),
+async def get_leaderboard(
+    db: AsyncSession = Depends(get_async_db),
+    _: models.User = Depends(deps.get_current_active_user_async),
     limit: int = Query(10, ge=1, le=50),
 ) -> Any:
     """Top BROski$ earners — where do you rank? 🏅"""
-    return broski_service.get_leaderboard(db, limit=limit)
+    return await leaderboard.top_async(db, limit)
+
+
+@router.get("/leaderboard/me", response_model=LeaderboardEntry)
+async def get_my_rank(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
+) -> Any:
+    """Your own leaderboard position."""
+    standing = await leaderboard.rank_of_async(db, current_user.id)
+    if standing is None:
+        raise HTTPException(status_code=404, detail="No BROski$ wallet yet — earn some coins first!")
+    return standing
 
 
 @router.post("/award")
-def award_coins_and_xp(
+async def award_coins_and_xp(
     award: AwardRequest,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """Admin/agent endpoint — award coins and/or XP to a user."""
     if not current_user.is_superuser:
@@ -89,6 +113,19 @@ def award_coins_and_xp(
             detail="Only admins and agents can award BROski$ coins directly.",
         )
 
+    wallet, level_up_msg = await db.run_sync(_apply_award, award)
+
+    response: dict[str, Any] = {
+        "message": f"BROski$ awarded! +{award.coins} coins, +{award.xp} XP ⚡",
+        "wallet": WalletResponse.model_validate(wallet),
+    }
+    if level_up_msg:
+        response["level_up"] = level_up_msg
+
+    return response
+
+
+def _apply_award(db: Session, award: AwardRequest):
     level_up_msg = None
     wallet = None
 
@@ -100,36 +137,22 @@ def award_coins_and_xp(
 
     if wallet is None:
         wallet = broski_service.get_wallet(award.user_id, db)
-
-    response: dict[str, Any] = {
-        "message": f"BROski$ awarded! +{award.coins} coins, +{award.xp} XP ⚡",
-        "wallet": WalletResponse.model_validate(wallet),
-    }
-    if level_up_msg:
-        response["level_up"] = level_up_msg
-
-    return response
+    return wallet, level_up_msg
 
 
 @router.get("/pulse")
-def get_broski_pulse(db: Session = Depends(get_db)) -> Any:
+async def get_broski_pulse(db: AsyncSession = Depends(get_async_db)) -> Any:
     """Public system-wide BROski$ pulse — no auth needed. Used by dashboard."""
     from app.models.broski import BROskiWallet
-    from app.core.config import settings as cfg
 
-    total_coins = db.query(func.sum(BROskiWallet.coins)).scalar() or 0
-    total_xp = db.query(func.sum(BROskiWallet.xp)).scalar() or 0
-    user_count = db.query(func.count(BROskiWallet.id)).scalar() or 0
+    # One round trip for all three aggregates
+    totals = await db.execute(
+        select(func.sum(BROskiWallet.coins), func.sum(BROskiWallet.xp), func.count(BROskiWallet.id))
+    )
+    total_coins, total_xp, user_count = totals.one()
+    total_coins, total_xp, user_count = total_coins or 0, total_xp or 0, user_count or 0
 
-    # Count agents online via Redis heartbeats
-    agents_online = 0
-    try:
-        r = redis.Redis.from_url(cfg.HYPERCODE_REDIS_URL, decode_responses=True, socket_connect_timeout=1)
-        keys = r.keys("agents:heartbeat:*")
-        agents_online = len(keys)
-        r.close()
-    except Exception:
-        pass
+    agents_online = await asyncio.get_running_loop().run_in_executor(None, _count_agents_online)
 
     from app.models.broski import xp_to_level
     total_xp_int = int(total_xp)
@@ -145,13 +168,33 @@ def get_broski_pulse(db: Session = Depends(get_db)) -> Any:
     }
 
 
+def _count_agents_online() -> int:
+    """Count agents online via the Redis heartbeat index (blocking; run off the loop)."""
+    from app.core.config import settings as cfg
+
+    agents_online = 0
+    try:
+        from app.core import key_registry
+        r = redis.Redis.from_url(cfg.HYPERCODE_REDIS_URL, decode_responses=True, socket_connect_timeout=1)
+        if r.exists(key_registry.HEARTBEAT_INDEX):
+            agents_online = key_registry.count_live(r, key_registry.HEARTBEAT_INDEX)
+        else:
+            agents_online = sum(
+                1 for _ in r.scan_iter(match=key_registry.HEARTBEAT_PATTERN, count=key_registry.SCAN_COUNT)
+            )
+        r.close()
+    except Exception:
+        pass
+    return agents_online
+
+
 @router.post("/daily-login")
-def daily_login(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+async def daily_login(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """Claim your daily login bonus — +5 coins, once every 24 hours!"""
-    wallet, awarded = broski_service.handle_daily_login(current_user.id, db)
+    wallet, awarded = await db.run_sync(lambda s: broski_service.handle_daily_login(current_user.id, s))
     if awarded:
         return {
             "message": "Daily login bonus claimed! +5 BROski$ coins 📅",
@@ -1,10 +1,12 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
 from app.models import models
 from app.api import deps
 from pydantic import BaseModel
+import asyncio
 import logging
 
 router = APIRouter()
@@ -30,10 +32,10 @@ class LogEntry(BaseModel):
 # --- Endpoints ---
 
 @router.post("/execute")
-def execute_command(
+async def execute_command(
     request: ExecuteRequest,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Executes a command from the Dashboard.
@@ -59,8 +61,8 @@ def execute_command(
         # status="pending" # Default
     )
     db.add(task)
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
 
     # Push to Celery
     queue_payload = {
@@ -74,7 +76,8 @@ def execute_command(
     }
     
     from app.core.celery_app import celery_app
-    celery_app.send_task("hypercode.tasks.process_agent_job", args=[queue_payload])
+    # send_task blocks on the broker (and its connection retries); keep it off the event loop
+    await asyncio.to_thread(celery_app.send_task, "hypercode.tasks.process_agent_job", args=[queue_payload])
     
     logger.info(f"Dashboard command executed: {description} -> Task {task.id}")
 
@@ -85,21 +88,21 @@ def execute_command(
     }
 
 @router.get("/logs", response_model=List[LogEntry])
-def get_dashboard_logs(
-    db: Session = Depends(get_db),
+async def get_dashboard_logs(
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0, 
     limit: int = 50,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Returns recent system events formatted for the Dashboard "Live Ops" feed.
     Currently pulls from the Tasks table as a proxy for logs.
     """
     capped_limit = min(limit, 200)
-    query = db.query(models.Task).join(models.Project, models.Task.project_id == models.Project.id).order_by(models.Task.id.desc())
+    query = select(models.Task).join(models.Project, models.Task.project_id == models.Project.id).order_by(models.Task.id.desc())
     if not current_user.is_superuser:
-        query = query.filter(models.Project.owner_id == current_user.id)
-    tasks = query.offset(skip).limit(capped_limit).all()
+        query = query.where(models.Project.owner_id == current_user.id)
+    tasks = await db.scalars(query.offset(skip).limit(capped_limit))
     
     logs = []
     for t in tasks:
@@ -2,7 +2,7 @@ import logging
 from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
-from app.core.rag import rag
+from app.core.rag import async_rag, rag
 from app.api import deps
 from app.models import models
 
@@ -20,7 +20,7 @@ class QueryRequest(BaseModel):
     limit: int = Field(default=5, ge=1, le=20)
 
 @router.post("/ingest", response_model=dict)
-def ingest_memory(
+async def ingest_memory(
     request: IngestRequest,
     current_user: models.User = Depends(deps.get_current_active_superuser),
 ) -> Any:
@@ -28,7 +28,7 @@ def ingest_memory(
     Ingest text into the vector memory.
     """
     try:
-        chunks_count = rag.ingest_document(request.content, request.source, request.metadata)
+        chunks_count = await async_rag.ingest_document(request.content, request.source, request.metadata)
     except Exception as e:
         logger.error(f"ChromaDB ingest failed: {e}")
         raise HTTPException(status_code=503, detail="Memory service unavailable")
@@ -37,7 +37,7 @@ def ingest_memory(
     return {"status": "success", "chunks_ingested": chunks_count}
 
 @router.post("/query", response_model=dict)
-def query_memory(
+async def query_memory(
     request: QueryRequest,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
@@ -45,7 +45,7 @@ def query_memory(
     Semantic search in vector memory.
     """
     try:
-        results = rag.query(request.query, request.limit)
+        results = await async_rag.query(request.query, request.limit)
     except Exception as e:
         logger.error(f"ChromaDB query failed: {e}")
         raise HTTPException(status_code=503, detail="Memory service unavailable")
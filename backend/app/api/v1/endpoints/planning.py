@@ -12,10 +12,11 @@ import logging
 from typing import Any, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models import models
 from app.schemas.planning import CodingPlan, DocumentInput, DocumentType
 from app.services.document_parser import document_parser
@@ -33,7 +34,7 @@ router = APIRouter()
 @router.post("/generate", response_model=CodingPlan)
 async def generate_plan(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     doc_input: DocumentInput,
     persist: bool = Query(
         default=False,
@@ -43,7 +44,7 @@ async def generate_plan(
         default=None,
         description="Task ID to attach the plan to (required when persist=True).",
     ),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Parse a document and generate a structured coding plan.
@@ -70,7 +71,7 @@ async def generate_plan(
         raise HTTPException(status_code=500, detail=f"Plan generation failed: {exc}")
 
     if persist and task_id is not None:
-        _persist_plan_to_task(db, task_id, plan, current_user)
+        await _persist_plan_to_task(db, task_id, plan, current_user)
 
     return plan
 
@@ -82,13 +83,13 @@ async def generate_plan(
 @router.post("/generate-from-task/{task_id}", response_model=CodingPlan)
 async def generate_plan_from_task(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     task_id: int,
     persist: bool = Query(
         default=False,
         description="When true, save the generated plan to Task.output.",
     ),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Fetch an existing Task by ID, use its description as input,
@@ -97,14 +98,7 @@ async def generate_plan_from_task(
     - Enforces ownership: regular users can only plan their own tasks.
     - If persist=True, saves the plan back to Task.output.
     """
-    query = (
-        db.query(models.Task)
-        .join(models.Project, models.Task.project_id == models.Project.id)
-        .filter(models.Task.id == task_id)
-    )
-    if not current_user.is_superuser:
-        query = query.filter(models.Project.owner_id == current_user.id)
-    task = query.first()
+    task = await _find_task(db, task_id, current_user)
 
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -139,7 +133,7 @@ async def generate_plan_from_task(
         raise HTTPException(status_code=500, detail=f"Plan generation failed: {exc}")
 
     if persist:
-        _persist_plan_to_task(db, task_id, plan, current_user)
+        await _persist_plan_to_task(db, task_id, plan, current_user)
 
     return plan
 
@@ -148,26 +142,33 @@ async def generate_plan_from_task(
 # Internal helper
 # ---------------------------------------------------------------------------
 
-def _persist_plan_to_task(
-    db: Session,
+async def _find_task(
+    db: AsyncSession, task_id: int, current_user: models.User
+) -> Optional[models.Task]:
+    """Task by ID, restricted to current_user's projects unless superuser."""
+    query = (
+        select(models.Task)
+        .join(models.Project, models.Task.project_id == models.Project.id)
+        .where(models.Task.id == task_id)
+    )
+    if not current_user.is_superuser:
+        query = query.where(models.Project.owner_id == current_user.id)
+    return await db.scalar(query)
+
+
+async def _persist_plan_to_task(
+    db: AsyncSession,
     task_id: int,
     plan: CodingPlan,
     current_user: models.User,
 ) -> None:
     """Save the plan JSON to Task.output; silently logs errors (never raises)."""
     try:
-        query = (
-            db.query(models.Task)
-            .join(models.Project, models.Task.project_id == models.Project.id)
-            .filter(models.Task.id == task_id)
-        )
-        if not current_user.is_superuser:
-            query = query.filter(models.Project.owner_id == current_user.id)
-        task = query.first()
+        task = await _find_task(db, task_id, current_user)
         if task:
             task.output = json.dumps(format_plan_json(plan))
             db.add(task)
-            db.commit()
+            await db.commit()
             logger.info(f"[PLANNING] Plan persisted to Task {task_id}.")
         else:
             logger.warning(
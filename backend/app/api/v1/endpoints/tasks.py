@@ -1,10 +1,11 @@
+import asyncio
 from typing import Any, List, Optional
 
-from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models import models
 from app.schemas import schemas
 from app.api import deps
@@ -12,29 +13,34 @@ from app.api import deps
 router = APIRouter()
 
 
+def _task_query(current_user: models.User):
+    """SELECT of the tasks current_user may see (all of them for superusers)."""
+    query = select(models.Task).join(models.Project, models.Task.project_id == models.Project.id)
+    if not current_user.is_superuser:
+        query = query.where(models.Project.owner_id == current_user.id)
+    return query
+
+
 @router.get("/", response_model=List[schemas.Task])
-def read_tasks(
-    db: Session = Depends(get_db),
+async def read_tasks(
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Retrieve tasks.
     """
-    query = db.query(models.Task).join(models.Project, models.Task.project_id == models.Project.id)
-    if not current_user.is_superuser:
-        query = query.filter(models.Project.owner_id == current_user.id)
-    tasks = query.offset(skip).limit(limit).all()
-    return tasks
+    tasks = await db.scalars(_task_query(current_user).offset(skip).limit(limit))
+    return tasks.all()
 
 
 @router.post("/", response_model=schemas.Task)
 async def create_task(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     task_in: schemas.TaskCreate,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Create new task.
@@ -48,7 +54,7 @@ async def create_task(
     task_type = task_data.pop("type", "general")
     generate_plan_flag: bool = task_data.pop("generate_plan", False)
 
-    project = db.query(models.Project).filter(models.Project.id == task_in.project_id).first()
+    project = await db.get(models.Project, task_in.project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     if not current_user.is_superuser and project.owner_id != current_user.id:
@@ -56,11 +62,11 @@ async def create_task(
 
     task = models.Task(**task_data)
     db.add(task)
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
 
     from app.services import broski_service
-    broski_service.award_coins(current_user.id, 2, "Task created", db)
+    await db.run_sync(lambda s: broski_service.award_coins(current_user.id, 2, "Task created", s))
 
     plan_reference: Optional[str] = None
 
@@ -87,8 +93,8 @@ async def create_task(
             plan_json_str = json.dumps(format_plan_json(plan))
             task.output = plan_json_str
             db.add(task)
-            db.commit()
-            db.refresh(task)
+            await db.commit()
+            await db.refresh(task)
             plan_reference = plan_json_str
         except Exception as exc:
             import logging
@@ -114,7 +120,8 @@ async def create_task(
     from app.core.celery_app import celery_app
     from celery.exceptions import OperationalError as CeleryOperationalError
     try:
-        celery_app.send_task("hypercode.tasks.process_agent_job", args=[queue_payload])
+        # send_task blocks on the broker (and its connection retries); keep it off the event loop
+        await asyncio.to_thread(celery_app.send_task, "hypercode.tasks.process_agent_job", args=[queue_payload])
     except CeleryOperationalError as e:
         import logging as _logging
         _logging.getLogger(__name__).error(f"Celery broker unreachable: {e}")
@@ -124,44 +131,38 @@ async def create_task(
 
 
 @router.get("/{id}", response_model=schemas.Task)
-def read_task(
+async def read_task(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     id: int,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Get task by ID.
     """
-    query = db.query(models.Task).join(models.Project, models.Task.project_id == models.Project.id).filter(models.Task.id == id)
-    if not current_user.is_superuser:
-        query = query.filter(models.Project.owner_id == current_user.id)
-    task = query.first()
+    task = await db.scalar(_task_query(current_user).where(models.Task.id == id))
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
 
 @router.put("/{id}", response_model=schemas.Task)
-def update_task(
+async def update_task(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     id: int,
     task_in: schemas.TaskUpdate,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> Any:
     task_data = task_in.dict(exclude_unset=True)
-    query = db.query(models.Task).join(models.Project, models.Task.project_id == models.Project.id).filter(models.Task.id == id)
-    if not current_user.is_superuser:
-        query = query.filter(models.Project.owner_id == current_user.id)
-    task = query.first()
+    task = await db.scalar(_task_query(current_user).where(models.Task.id == id))
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
     old_status = task.status
 
     if "project_id" in task_data and task_data["project_id"] != task.project_id:
-        project = db.query(models.Project).filter(models.Project.id == task_data["project_id"]).first()
+        project = await db.get(models.Project, task_data["project_id"])
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         if not current_user.is_superuser and project.owner_id != current_user.id:
@@ -171,19 +172,11 @@ def update_task(
         setattr(task, key, value)
 
     db.add(task)
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
 
     if "status" in task_data and old_status != models.TaskStatus.DONE and task.status == models.TaskStatus.DONE:
         from app.services import broski_service
-        broski_service.award_coins(current_user.id, 10, "Task completed", db)
-        broski_service.award_xp(current_user.id, 25, "Task completed", db)
-        wallet = broski_service.get_wallet(current_user.id, db)
-        today = datetime.now(timezone.utc).date()
-        last = wallet.last_first_task_date.astimezone(timezone.utc).date() if wallet.last_first_task_date else None
-        if last is None or last < today:
-            broski_service.award_xp(current_user.id, 15, "First task of the day bonus!", db)
-            wallet.last_first_task_date = datetime.now(timezone.utc)
-            db.commit()
+        await db.run_sync(lambda s: broski_service.award_task_completion(current_user.id, s))
 
     return task
@@ -1,15 +1,27 @@
 """Advanced multi-tier caching strategy for HyperCode."""
 
+import asyncio
 import hashlib
 import json
 import logging
-from typing import Any, Optional, Callable
+import time
+import uuid
+from typing import Any, Awaitable, Optional, Callable
 from functools import wraps
 from cachetools import TTLCache
 import redis.asyncio as redis
 
+from app.core import key_registry
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
+# Cross-process invalidation bus: every MultiTierCache subscribes at connect()
+# and evicts its local tier when another process deletes or clears.
+INVALIDATION_CHANNEL = "cache:invalidate"
+NAMESPACE_VERSION_KEY = "cache:ns_version:{namespace}"
+PURGE_BATCH_SIZE = 500
+
 
 class CacheLayer:
     """Enum for cache layers."""
@@ -25,6 +37,15 @@ class MultiTierCache:
     1. Local Cache (in-process TTL cache) - Fastest, limited size
     2. Redis Cache (distributed) - Medium speed, large capacity
     3. Disk Cache (persistent) - Slowest, unlimited capacity
+
+    Loads through get_or_load() are single-flight per key: concurrent misses
+    share one in-flight loader. Within the stale window an expired entry is
+    served immediately while a single background refresh runs.
+
+    delete() and clear_namespace() are broadcast on INVALIDATION_CHANNEL so
+    every worker drops its local copy. clear_namespace() bumps a per-namespace
+    version that is part of every key, so old entries become unreachable in
+    one step.
     """
     
     def __init__(
@@ -32,6 +53,7 @@ class MultiTierCache:
         local_size: int = 1000,
         local_ttl: int = 300,
         redis_url: str = "redis://redis:6379/1",
+        stale_ttl: int = 0,
     ):
         """Initialize multi-tier cache.
         
@@ -39,20 +61,38 @@ class MultiTierCache:
             local_size: Max items in local cache
             local_ttl: TTL for local cache items (seconds)
             redis_url: Redis connection URL
+            stale_ttl: Extra seconds an expired entry may be served while
+                it is refreshed in the background (0 disables)
         """
-        self.local_cache = TTLCache(maxsize=local_size, ttl=local_ttl)
+        # Local entries are (value, fresh_until, stale_until). An entry is
+        # never fresh for longer than its own ttl (or what is left of the
+        # Redis copy's), capped at local_ttl, and outlives its freshness by
+        # stale_ttl so it can be served during revalidation.
+        self.local_cache = TTLCache(maxsize=local_size, ttl=local_ttl + stale_ttl)
+        self.local_ttl = local_ttl
+        self.stale_ttl = stale_ttl
         self.redis_url = redis_url
         self.redis_client = None
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._ns_versions: dict[str, int] = {}
+        self._instance_id = uuid.uuid4().hex
+        self._listener_task: Optional[asyncio.Task] = None
         self.stats = {
             "hits": 0,
             "misses": 0,
             "local_hits": 0,
             "redis_hits": 0,
             "evictions": 0,
+            "coalesced": 0,
+            "stale_hits": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "invalidations_sent": 0,
+            "invalidations_received": 0,
         }
     
     async def connect(self):
-        """Connect to Redis."""
+        """Connect to Redis and subscribe to the invalidation bus."""
         try:
             self.redis_client = await redis.from_url(
                 self.redis_url,
@@ -64,15 +104,48 @@ class MultiTierCache:
         except Exception as e:
             logger.warning(f"Redis connection failed: {e}. Using local cache only.")
             self.redis_client = None
+            return
+
+        self._listener_task = asyncio.create_task(self._listen_invalidations())
     
     async def disconnect(self):
         """Disconnect from Redis."""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
         if self.redis_client:
-            await self.redis_client.close()
+            await self.redis_client.aclose()
     
     def _make_key(self, namespace: str, key: str) -> str:
-        """Generate cache key."""
+        """Generate cache key.
+
+        Version 0 keeps the plain ``namespace:key`` form; after a
+        clear_namespace() the version is embedded as ``namespace:v<n>:key``.
+        """
+        version = self._ns_versions.get(namespace, 0)
+        if version:
+            return f"{namespace}:v{version}:{key}"
         return f"{namespace}:{key}"
+
+    async def _key(self, namespace: str, key: str) -> str:
+        """Generate cache key, loading the namespace version on first use."""
+        if namespace not in self._ns_versions and self.redis_client:
+            try:
+                version = await self.redis_client.get(
+                    NAMESPACE_VERSION_KEY.format(namespace=namespace)
+                )
+                self._ns_versions[namespace] = int(version or 0)
+            except Exception as e:
+                logger.warning(f"Redis namespace version lookup failed: {e}")
+        return self._make_key(namespace, key)
+
+    def _index_key(self, namespace: str) -> str:
+        """Registry index for keys written under the current namespace version."""
+        return key_registry.cache_index_key(namespace, self._ns_versions.get(namespace, 0))
     
     def _serialize(self, value: Any) -> str:
         """Serialize value for storage."""
@@ -82,6 +155,56 @@ class MultiTierCache:
         """Deserialize value from storage."""
         return json.loads(data)
     
+    async def _lookup(self, cache_key: str) -> tuple[bool, Any, bool]:
+        """Look a key up across tiers.
+
+        Returns (found, value, is_stale). A stale local entry is only
+        reported when Redis has no fresher copy.
+        """
+        stale_value: Any = None
+        has_stale = False
+
+        # Try local cache
+        entry = self.local_cache.get(cache_key)
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            now = time.monotonic()
+            if now < fresh_until:
+                self.stats["local_hits"] += 1
+                logger.debug(f"Local cache hit: {cache_key}")
+                return True, value, False
+            if now < stale_until:
+                stale_value, has_stale = value, True
+
+        # Try Redis cache
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline()
+                pipe.get(cache_key)
+                pipe.pttl(cache_key)
+                value, pttl = await pipe.execute()
+                if value:
+                    deserialized = self._deserialize(value)
+                    if self.stale_ttl and 0 <= pttl <= self.stale_ttl * 1000:
+                        # Past its fresh TTL, inside the stale window
+                        return True, deserialized, True
+                    self.stats["redis_hits"] += 1
+                    logger.debug(f"Redis cache hit: {cache_key}")
+
+                    # Populate local cache, fresh no longer than the Redis copy
+                    remaining = pttl / 1000 - self.stale_ttl if pttl >= 0 else self.local_ttl
+                    self._set_local(cache_key, deserialized, remaining)
+                    return True, deserialized, False
+            except Exception as e:
+                logger.warning(f"Redis get failed: {e}")
+
+        return has_stale, stale_value, has_stale
+
+    def _set_local(self, cache_key: str, value: Any, ttl: float) -> None:
+        """Store a value in the local tier, fresh for min(ttl, local_ttl) and stale until ttl + stale_ttl."""
+        now = time.monotonic()
+        self.local_cache[cache_key] = (value, now + min(ttl, self.local_ttl), now + ttl + self.stale_ttl)
+
     async def get(
         self,
         namespace: str,
@@ -94,36 +217,100 @@ class MultiTierCache:
         1. Local cache (fastest)
         2. Redis cache (medium speed)
         3. Returns default
+
+        Stale entries are treated as misses; use get_or_load() to serve
+        them while revalidating.
         """
-        cache_key = self._make_key(namespace, key)
-        
-        # Try local cache
-        if cache_key in self.local_cache:
+        cache_key = await self._key(namespace, key)
+        found, value, is_stale = await self._lookup(cache_key)
+        if found and not is_stale:
             self.stats["hits"] += 1
-            self.stats["local_hits"] += 1
-            logger.debug(f"Local cache hit: {cache_key}")
-            return self.local_cache[cache_key]
-        
-        # Try Redis cache
-        if self.redis_client:
-            try:
-                value = await self.redis_client.get(cache_key)
-                if value:
-                    self.stats["hits"] += 1
-                    self.stats["redis_hits"] += 1
-                    logger.debug(f"Redis cache hit: {cache_key}")
-                    
-                    # Populate local cache
-                    deserialized = self._deserialize(value)
-                    self.local_cache[cache_key] = deserialized
-                    return deserialized
-            except Exception as e:
-                logger.warning(f"Redis get failed: {e}")
+            return value
         
         # Cache miss
         self.stats["misses"] += 1
         logger.debug(f"Cache miss: {cache_key}")
         return default
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = 300,
+    ) -> Any:
+        """Get a value, calling loader at most once per key on a miss.
+
+        - Fresh hit: returned directly.
+        - Stale hit: returned directly; one background refresh is started.
+        - Miss: the first caller runs loader, concurrent callers await the
+          same result (counted as coalesced). Loader errors reach every
+          waiter. None results are returned but not cached.
+        """
+        cache_key = await self._key(namespace, key)
+        index = self._index_key(namespace)
+        found, value, is_stale = await self._lookup(cache_key)
+
+        if found and not is_stale:
+            self.stats["hits"] += 1
+            return value
+
+        if found:
+            self.stats["stale_hits"] += 1
+            logger.debug(f"Stale cache hit: {cache_key}")
+            if cache_key not in self._inflight:
+                self.stats["refreshes"] += 1
+                task = self._start_load(cache_key, index, loader, ttl)
+                task.add_done_callback(self._log_refresh_error)
+            return value
+
+        task = self._inflight.get(cache_key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            logger.debug(f"Coalesced load: {cache_key}")
+        else:
+            self.stats["misses"] += 1
+            logger.debug(f"Cache miss: {cache_key}")
+            task = self._start_load(cache_key, index, loader, ttl)
+
+        # shield() so one cancelled waiter does not abort the shared load
+        return await asyncio.shield(task)
+
+    def _start_load(
+        self,
+        cache_key: str,
+        index: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+    ) -> asyncio.Task:
+        """Register and start the single in-flight loader for a key.
+
+        An invalidation while the loader runs unregisters the task; its
+        result still reaches the waiters but is not written to the cache.
+        """
+
+        async def _run() -> Any:
+            try:
+                result = await loader()
+                if result is not None and self._inflight.get(cache_key) is task:
+                    await self._store(cache_key, index, result, ttl)
+                return result
+            finally:
+                if self._inflight.get(cache_key) is task:
+                    del self._inflight[cache_key]
+
+        task = asyncio.ensure_future(_run())
+        self._inflight[cache_key] = task
+        return task
+
+    def _log_refresh_error(self, task: asyncio.Task) -> None:
+        """Record failures of background refreshes nobody awaits."""
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self.stats["refresh_errors"] += 1
+            logger.warning(f"Background cache refresh failed: {exc}")
     
     async def set(
         self,
@@ -136,11 +323,14 @@ class MultiTierCache:
         
         Writes to both local and Redis caches for consistency.
         """
-        cache_key = self._make_key(namespace, key)
-        
+        cache_key = await self._key(namespace, key)
+        await self._store(cache_key, self._index_key(namespace), value, ttl)
+
+    async def _store(self, cache_key: str, index: str, value: Any, ttl: int) -> None:
+        """Write an already-resolved key to both tiers and its namespace index."""
         # Store in local cache
         try:
-            self.local_cache[cache_key] = value
+            self._set_local(cache_key, value, ttl)
         except Exception as e:
             logger.warning(f"Local cache set failed: {e}")
             self.stats["evictions"] += 1
@@ -149,48 +339,142 @@ class MultiTierCache:
         if self.redis_client:
             try:
                 serialized = self._serialize(value)
-                await self.redis_client.setex(
-                    cache_key,
-                    ttl,
-                    serialized,
-                )
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.setex(cache_key, ttl + self.stale_ttl, serialized)
+                    key_registry.register(pipe, index, cache_key, ttl + self.stale_ttl)
+                    await pipe.execute()
                 logger.debug(f"Cache set: {cache_key} (ttl={ttl}s)")
             except Exception as e:
                 logger.warning(f"Redis set failed: {e}")
     
     async def delete(self, namespace: str, key: str) -> None:
-        """Delete value from cache."""
-        cache_key = self._make_key(namespace, key)
-        
-        # Delete from local cache
-        if cache_key in self.local_cache:
-            del self.local_cache[cache_key]
+        """Delete value from cache in every process."""
+        cache_key = await self._key(namespace, key)
+        self._evict_local_key(cache_key)
         
-        # Delete from Redis cache
+        # Delete from Redis cache and tell the other workers
         if self.redis_client:
             try:
-                await self.redis_client.delete(cache_key)
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.delete(cache_key)
+                    pipe.publish(
+                        INVALIDATION_CHANNEL,
+                        self._invalidation_message("delete", key=cache_key),
+                    )
+                    await pipe.execute()
+                self.stats["invalidations_sent"] += 1
                 logger.debug(f"Cache deleted: {cache_key}")
             except Exception as e:
                 logger.warning(f"Redis delete failed: {e}")
     
     async def clear_namespace(self, namespace: str) -> None:
-        """Clear all keys in a namespace."""
-        # Clear local cache
-        keys_to_delete = [k for k in self.local_cache if k.startswith(f"{namespace}:")]
-        for key in keys_to_delete:
-            del self.local_cache[key]
+        """Clear all keys in a namespace in every process."""
+        self._evict_local_namespace(namespace)
         
         # Clear Redis cache
         if self.redis_client:
             try:
-                pattern = f"{namespace}:*"
-                keys = await self.redis_client.keys(pattern)
-                if keys:
-                    await self.redis_client.delete(*keys)
+                version = await self.redis_client.incr(
+                    NAMESPACE_VERSION_KEY.format(namespace=namespace)
+                )
+                self._ns_versions[namespace] = version
+                await self.redis_client.publish(
+                    INVALIDATION_CHANNEL,
+                    self._invalidation_message(
+                        "clear", namespace=namespace, version=version
+                    ),
+                )
+                self.stats["invalidations_sent"] += 1
+
+                # Old-version keys are already unreachable; drop the indexed
+                # ones now rather than waiting for their TTL.
+                await self._purge_index(key_registry.cache_index_key(namespace, version - 1))
                 logger.debug(f"Cleared namespace: {namespace}")
             except Exception as e:
                 logger.warning(f"Redis namespace clear failed: {e}")
+
+    async def _purge_index(self, index: str) -> None:
+        """Delete every key listed in a registry index, in bounded batches."""
+        while True:
+            members = await self.redis_client.zrange(index, 0, PURGE_BATCH_SIZE - 1)
+            if not members:
+                return
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.delete(*members)
+                key_registry.unregister(pipe, index, *members)
+                await pipe.execute()
+
+    # ── Invalidation bus ──────────────────────────────────────────────────
+
+    def _invalidation_message(self, op: str, **fields: Any) -> str:
+        """Encode an invalidation bus message tagged with this instance."""
+        return json.dumps({"origin": self._instance_id, "op": op, **fields})
+
+    def _evict_local_key(self, cache_key: str) -> None:
+        """Drop a key from the local tier and detach any in-flight load."""
+        self.local_cache.pop(cache_key, None)
+        self._inflight.pop(cache_key, None)
+
+    def _evict_local_namespace(self, namespace: str) -> None:
+        """Drop every local entry and in-flight load of a namespace."""
+        prefix = f"{namespace}:"
+        for key in [k for k in self.local_cache if k.startswith(prefix)]:
+            self.local_cache.pop(key, None)
+        for key in [k for k in self._inflight if k.startswith(prefix)]:
+            self._inflight.pop(key, None)
+
+    def _reset_local(self) -> None:
+        """Forget local entries and namespace versions.
+
+        Used when the subscription (re)starts, since invalidations published
+        while we were not subscribed are lost.
+        """
+        self.local_cache.clear()
+        self._inflight.clear()
+        self._ns_versions.clear()
+
+    def _apply_invalidation(self, data: str) -> None:
+        """Apply one invalidation bus message to the local tier."""
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"Malformed cache invalidation message: {data!r}")
+            return
+        if message.get("origin") == self._instance_id:
+            return
+
+        self.stats["invalidations_received"] += 1
+        op = message.get("op")
+        if op == "delete":
+            self._evict_local_key(message.get("key", ""))
+        elif op == "clear":
+            namespace = message.get("namespace", "")
+            self._evict_local_namespace(namespace)
+            version = message.get("version")
+            if isinstance(version, int):
+                current = self._ns_versions.get(namespace, 0)
+                self._ns_versions[namespace] = max(current, version)
+            else:
+                self._ns_versions.pop(namespace, None)
+
+    async def _listen_invalidations(self) -> None:
+        """Apply invalidations from other processes until cancelled."""
+        while self.redis_client is not None:
+            pubsub = self.redis_client.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self._reset_local()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(1)
     
     def get_stats(self) -> dict:
         """Get cache statistics."""
@@ -205,6 +489,13 @@ class MultiTierCache:
             "local_hits": self.stats["local_hits"],
             "redis_hits": self.stats["redis_hits"],
             "evictions": self.stats["evictions"],
+            "coalesced": self.stats["coalesced"],
+            "stale_hits": self.stats["stale_hits"],
+            "refreshes": self.stats["refreshes"],
+            "refresh_errors": self.stats["refresh_errors"],
+            "invalidations_sent": self.stats["invalidations_sent"],
+            "invalidations_received": self.stats["invalidations_received"],
+            "inflight": len(self._inflight),
             "local_cache_size": len(self.local_cache),
         }
 
@@ -218,7 +509,10 @@ async def get_cache() -> MultiTierCache:
     global _cache_instance
     
     if _cache_instance is None:
-        _cache_instance = MultiTierCache()
+        _cache_instance = MultiTierCache(
+            local_ttl=settings.CACHE_LOCAL_TTL_SECONDS,
+            stale_ttl=settings.CACHE_STALE_TTL_SECONDS,
+        )
         await _cache_instance.connect()
     
     return _cache_instance
@@ -229,6 +523,9 @@ def cache(
     ttl: int = 300,
 ):
     """Decorator for caching async functions.
+
+    Concurrent misses for the same arguments share one call of the wrapped
+    coroutine (see MultiTierCache.get_or_load).
     
     Usage:
         @cache(namespace="agents", ttl=600)
@@ -242,21 +539,13 @@ def cache(
             key_parts = [str(arg) for arg in args] + [f"{k}={v}" for k, v in kwargs.items()]
             cache_key = hashlib.md5(":".join(key_parts).encode()).hexdigest()
             
-            # Try cache
             cache = await get_cache()
-            cached = await cache.get(namespace, cache_key)
-            
-            if cached is not None:
-                return cached
-            
-            # Call function
-            result = await func(*args, **kwargs)
-            
-            # Store in cache
-            if result is not None:
-                await cache.set(namespace, cache_key, result, ttl)
-            
-            return result
+            return await cache.get_or_load(
+                namespace,
+                cache_key,
+                lambda: func(*args, **kwargs),
+                ttl,
+            )
         
         return wrapper
     
@@ -7,16 +7,29 @@ Provides:
   - Secret redaction before any persistence or injection
   - Bounded lists + TTL so memory never silently bloats
 
+Two access paths share the same keys and encoding:
+  - memory_store (AsyncAgentMemory) — for coroutines such as Brain.think();
+    one pooled redis.asyncio client per event loop, and load_context()
+    fetches handoffs + history in a single pipelined round trip.
+  - the module-level functions — sync shim for Celery tasks and other sync
+    callers, backed by one process-wide connection pool.
+Neither pings before each operation: a failed command is logged and the
+call degrades to its empty result.
+
 Design spec: docs/architecture/INTER_AGENT_MEMORY_SHARING.md
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-import re
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Any
 
+from app.core.redaction import MEMORY_REDACTOR
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -26,14 +39,7 @@ HISTORY_MAX_ENTRIES = 50          # max turns kept per conversation
 HANDOFF_MAX_ENTRIES = 100         # max handoff notes per agent inbox
 HISTORY_TTL_SECONDS = 60 * 60 * 24 * 7     # 7 days
 HANDOFF_TTL_SECONDS = 60 * 60 * 24 * 30    # 30 days
-
-# Patterns that should NEVER be stored — fail closed
-_SECRET_PATTERNS: list[re.Pattern] = [
-    re.compile(r"(?i)(api[_-]?key|bearer|token|secret|password|passwd|pwd)\s*[:=]\s*\S+"),
-    re.compile(r"sk-[A-Za-z0-9]{20,}"),          # OpenAI-style keys
-    re.compile(r"pplx-[A-Za-z0-9]{20,}"),         # Perplexity keys
-    re.compile(r"[A-Za-z0-9+/]{40,}={0,2}"),      # raw base64 blobs
-]
+REDIS_TIMEOUT_SECONDS = 2
 
 
 # ---------------------------------------------------------------------------
@@ -41,33 +47,79 @@ _SECRET_PATTERNS: list[re.Pattern] = [
 # ---------------------------------------------------------------------------
 
 def _redact(text: str) -> str:
-    """Strip secrets before any content enters memory."""
-    for pattern in _SECRET_PATTERNS:
-        text = pattern.sub("[REDACTED]", text)
-    return text
+    """Strip secrets before any content enters memory (rules: redaction.MEMORY_RULES)."""
+    return MEMORY_REDACTOR.redact(text)
 
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def _conversation_key(conversation_id: str) -> str:
+    return f"memory:conversation:{conversation_id}"
+
+
+def _handoff_key(agent_id: str) -> str:
+    return f"memory:handoff:{agent_id}"
+
+
+def _turn_entry(agent_id: str, role: str, content: str, task_id: int | None, tags: list[str] | None) -> str:
+    return json.dumps({
+        "ts": _now_iso(),
+        "agent_id": agent_id,
+        "role": role,
+        "content": _redact(content),
+        "task_id": task_id,
+        "tags": tags or [],
+    })
+
+
+def _handoff_note(to_agent_id: str, from_agent_id: str, summary: str, links: list[Any] | None) -> str:
+    return json.dumps({
+        "ts": _now_iso(),
+        "from_agent_id": from_agent_id,
+        "to_agent_id": to_agent_id,
+        "summary": _redact(summary),
+        "links": links or [],
+    })
+
+
+def _redis_url() -> str:
+    from app.core.config import settings
+    return settings.HYPERCODE_REDIS_URL
+
+
+_sync_pool = None
+_sync_pool_lock = threading.Lock()
+
+
 def _get_redis():
-    """Lazy import — returns a redis.Redis client or None if unavailable."""
+    """Lazy import — returns a pooled redis.Redis client or None if unavailable."""
+    global _sync_pool
     try:
-        from app.core.config import settings
         import redis
-        client = redis.Redis.from_url(
-            settings.REDIS_URL,
-            decode_responses=True,
-            socket_connect_timeout=2,
-        )
-        client.ping()
-        return client
+        if _sync_pool is None:
+            with _sync_pool_lock:
+                if _sync_pool is None:
+                    _sync_pool = redis.ConnectionPool.from_url(
+                        _redis_url(),
+                        decode_responses=True,
+                        socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+                        socket_timeout=REDIS_TIMEOUT_SECONDS,
+                    )
+        return redis.Redis(connection_pool=_sync_pool)
     except Exception as exc:
         logger.warning(f"[AGENT_MEMORY] Redis unavailable — memory disabled: {exc}")
         return None
 
 
+@dataclass
+class MemoryContext:
+    """What an agent turn reads from memory before calling the LLM."""
+    handoffs: list[dict[str, Any]] = field(default_factory=list)
+    history: list[dict[str, Any]] = field(default_factory=list)
+
+
 # ---------------------------------------------------------------------------
 # Conversation history
 # ---------------------------------------------------------------------------
@@ -89,15 +141,8 @@ def append_turn(
     if r is None:
         return False
     try:
-        entry = json.dumps({
-            "ts": _now_iso(),
-            "agent_id": agent_id,
-            "role": role,
-            "content": _redact(content),
-            "task_id": task_id,
-            "tags": tags or [],
-        })
-        key = f"memory:conversation:{conversation_id}"
+        entry = _turn_entry(agent_id, role, content, task_id, tags)
+        key = _conversation_key(conversation_id)
         pipe = r.pipeline()
         pipe.rpush(key, entry)
         pipe.ltrim(key, -HISTORY_MAX_ENTRIES, -1)   # keep last N entries
@@ -122,8 +167,7 @@ def get_history(
     if r is None:
         return []
     try:
-        key = f"memory:conversation:{conversation_id}"
-        raw_entries = r.lrange(key, -last_n, -1)
+        raw_entries = r.lrange(_conversation_key(conversation_id), -last_n, -1)
         return [json.loads(e) for e in raw_entries]
     except Exception as exc:
         logger.warning(f"[AGENT_MEMORY] get_history failed: {exc}")
@@ -136,7 +180,7 @@ def clear_conversation(conversation_id: str) -> bool:
     if r is None:
         return False
     try:
-        r.delete(f"memory:conversation:{conversation_id}")
+        r.delete(_conversation_key(conversation_id))
         logger.info(f"[AGENT_MEMORY] Purged conversation: {conversation_id}")
         return True
     except Exception as exc:
@@ -163,14 +207,8 @@ def write_handoff(
     if r is None:
         return False
     try:
-        note = json.dumps({
-            "ts": _now_iso(),
-            "from_agent_id": from_agent_id,
-            "to_agent_id": to_agent_id,
-            "summary": _redact(summary),
-            "links": links or [],
-        })
-        key = f"memory:handoff:{to_agent_id}"
+        note = _handoff_note(to_agent_id, from_agent_id, summary, links)
+        key = _handoff_key(to_agent_id)
         pipe = r.pipeline()
         pipe.rpush(key, note)
         pipe.ltrim(key, -HANDOFF_MAX_ENTRIES, -1)
@@ -200,7 +238,7 @@ def read_handoffs(
     if r is None:
         return []
     try:
-        key = f"memory:handoff:{agent_id}"
+        key = _handoff_key(agent_id)
         raw_notes = r.lrange(key, 0, limit - 1)
         notes = [json.loads(n) for n in raw_notes]
         if consume and notes:
@@ -221,9 +259,144 @@ def clear_handoffs(agent_id: str) -> bool:
     if r is None:
         return False
     try:
-        r.delete(f"memory:handoff:{agent_id}")
+        r.delete(_handoff_key(agent_id))
         logger.info(f"[AGENT_MEMORY] Cleared handoff inbox for {agent_id}")
         return True
     except Exception as exc:
         logger.warning(f"[AGENT_MEMORY] clear_handoffs failed: {exc}")
         return False
+
+
+# ---------------------------------------------------------------------------
+# Async store
+# ---------------------------------------------------------------------------
+
+class AsyncAgentMemory:
+    """
+    Async counterpart of the functions above (same keys, same never-raise
+    contract). The pooled client is bound to the event loop that created it;
+    a call from another loop gets a fresh one.
+    """
+
+    def __init__(self, redis_url: str | None = None, *, client: Any = None) -> None:
+        self._redis_url = redis_url
+        self._entry: tuple[asyncio.AbstractEventLoop | None, Any] | None = (None, client) if client else None
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        if self._entry is not None and self._entry[0] in (loop, None):
+            return self._entry[1]
+        import redis.asyncio as aioredis
+        client = aioredis.from_url(
+            self._redis_url or _redis_url(),
+            decode_responses=True,
+            socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+            socket_timeout=REDIS_TIMEOUT_SECONDS,
+        )
+        self._entry = (loop, client)
+        return client
+
+    async def aclose(self) -> None:
+        """Release the pool owned by the running loop (API or Celery worker process shutdown)."""
+        entry, self._entry = self._entry, None
+        if entry is None or entry[0] is None:
+            self._entry = entry
+            return
+        if entry[0] is asyncio.get_running_loop():
+            try:
+                await entry[1].aclose()
+            except Exception:
+                logger.debug("[AGENT_MEMORY] closing Redis client failed", exc_info=True)
+
+    async def load_context(
+        self,
+        conversation_id: str,
+        agent_id: str,
+        *,
+        history_n: int = 10,
+        handoff_limit: int = 5,
+        include_handoffs: bool = True,
+    ) -> MemoryContext:
+        """Handoff inbox + recent history in one pipelined round trip."""
+        try:
+            pipe = self._client().pipeline(transaction=False)
+            if include_handoffs:
+                pipe.lrange(_handoff_key(agent_id), 0, handoff_limit - 1)
+            pipe.lrange(_conversation_key(conversation_id), -history_n, -1)
+            results = await pipe.execute()
+        except Exception as exc:
+            logger.warning(f"[AGENT_MEMORY] load_context failed: {exc}")
+            return MemoryContext()
+        raw_handoffs = results[0] if include_handoffs else []
+        return MemoryContext(
+            handoffs=[json.loads(n) for n in raw_handoffs],
+            history=[json.loads(e) for e in results[-1]],
+        )
+
+    async def append_turn(
+        self,
+        conversation_id: str,
+        agent_id: str,
+        role: str,
+        content: str,
+        task_id: int | None = None,
+        tags: list[str] | None = None,
+    ) -> bool:
+        key = _conversation_key(conversation_id)
+        try:
+            pipe = self._client().pipeline(transaction=False)
+            pipe.rpush(key, _turn_entry(agent_id, role, content, task_id, tags))
+            pipe.ltrim(key, -HISTORY_MAX_ENTRIES, -1)
+            pipe.expire(key, HISTORY_TTL_SECONDS)
+            await pipe.execute()
+            return True
+        except Exception as exc:
+            logger.warning(f"[AGENT_MEMORY] append_turn failed: {exc}")
+            return False
+
+    async def get_history(self, conversation_id: str, last_n: int = 10) -> list[dict[str, Any]]:
+        try:
+            raw_entries = await self._client().lrange(_conversation_key(conversation_id), -last_n, -1)
+            return [json.loads(e) for e in raw_entries]
+        except Exception as exc:
+            logger.warning(f"[AGENT_MEMORY] get_history failed: {exc}")
+            return []
+
+    async def write_handoff(
+        self,
+        to_agent_id: str,
+        from_agent_id: str,
+        summary: str,
+        links: list[Any] | None = None,
+    ) -> bool:
+        key = _handoff_key(to_agent_id)
+        try:
+            pipe = self._client().pipeline(transaction=False)
+            pipe.rpush(key, _handoff_note(to_agent_id, from_agent_id, summary, links))
+            pipe.ltrim(key, -HANDOFF_MAX_ENTRIES, -1)
+            pipe.expire(key, HANDOFF_TTL_SECONDS)
+            await pipe.execute()
+            logger.info(f"[AGENT_MEMORY] Handoff written: {from_agent_id} -> {to_agent_id}")
+            return True
+        except Exception as exc:
+            logger.warning(f"[AGENT_MEMORY] write_handoff failed: {exc}")
+            return False
+
+    async def read_handoffs(self, agent_id: str, limit: int = 5, consume: bool = False) -> list[dict[str, Any]]:
+        """Like read_handoffs(); with consume=True the read and trim are one MULTI."""
+        key = _handoff_key(agent_id)
+        try:
+            if consume:
+                pipe = self._client().pipeline(transaction=True)
+                pipe.lrange(key, 0, limit - 1)
+                pipe.ltrim(key, limit, -1)
+                raw_notes = (await pipe.execute())[0]
+            else:
+                raw_notes = await self._client().lrange(key, 0, limit - 1)
+            return [json.loads(n) for n in raw_notes]
+        except Exception as exc:
+            logger.warning(f"[AGENT_MEMORY] read_handoffs failed: {exc}")
+            return []
+
+
+memory_store = AsyncAgentMemory()
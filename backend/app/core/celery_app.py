@@ -9,7 +9,16 @@ celery_app = Celery(
 
 celery_app.conf.task_routes = {
     "hypercode.tasks.process_agent_job": "main-queue",
-    "app.worker.test_celery": "main-queue"
+    "app.worker.test_celery": "main-queue",
+    "hypercode.tasks.reconcile_leaderboard": "main-queue",
+}
+
+celery_app.conf.beat_schedule = {
+    # Repair the Redis leaderboard mirror after missed writes (see app/services/leaderboard.py)
+    "reconcile-broski-leaderboard": {
+        "task": "hypercode.tasks.reconcile_leaderboard",
+        "schedule": 300.0,
+    },
 }
 
 # Explicitly import the worker module so tasks are registered
@@ -1,23 +1,33 @@
 from __future__ import annotations
 
-import asyncio
+import logging
+import math
 import time
-from collections import deque
+import zlib
 from dataclasses import dataclass
-from typing import Deque, Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import Request
 from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+logger = logging.getLogger(__name__)
 
-def _get_client_ip(request: Request) -> str:
-    forwarded_for = request.headers.get("x-forwarded-for")
+REDIS_TIMEOUT_SECONDS = 0.25
+REDIS_BACKOFF_SECONDS = 5.0
+
+
+def _scope_client_ip(scope: Scope) -> str:
+    """First X-Forwarded-For hop, else the peer address, read straight from the ASGI scope."""
+    forwarded_for = Headers(scope=scope).get("x-forwarded-for")
     if forwarded_for:
         return forwarded_for.split(",")[0].strip()
-    if request.client and request.client.host:
-        return request.client.host
+    client = scope.get("client")
+    if client and client[0]:
+        return client[0]
     return "unknown"
 
 
@@ -65,61 +75,183 @@ class RateLimitConfig:
     enabled: bool
     window_seconds: int
     max_requests: int
+    backend: str = "memory"          # "memory" (per process) or "redis" (shared by replicas)
+    redis_url: Optional[str] = None
+
+
+class _GcraShard:
+    """One slice of the in-memory limiter state: key -> theoretical arrival time."""
+
+    __slots__ = ("tat",)
+
+    def __init__(self) -> None:
+        self.tat: Dict[Tuple[str, str], float] = {}
+
+
+class LocalRateLimiter:
+    """Sharded GCRA limiter: O(1) per request, one float per key.
+
+    GCRA allows max_requests back-to-back, then one request every
+    window/max_requests seconds. All work is synchronous on the event loop,
+    so no lock is needed. Keys whose arrival time has passed carry no state
+    and are evicted incrementally: at most one shard per sweep_interval.
+    """
+
+    def __init__(self, window_seconds: float, max_requests: int, shards: int = 64, sweep_interval: float = 1.0):
+        self._interval = window_seconds / max_requests
+        self._window = window_seconds
+        self._shards: List[_GcraShard] = [_GcraShard() for _ in range(shards)]
+        self._sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        self._sweep_cursor = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard.tat) for shard in self._shards)
+
+    def _shard(self, key: Tuple[str, str]) -> _GcraShard:
+        return self._shards[zlib.crc32(f"{key[0]}|{key[1]}".encode()) % len(self._shards)]
+
+    def hit(self, key: Tuple[str, str], now: Optional[float] = None) -> float:
+        """Record a request; returns 0 if allowed, else seconds until allowed."""
+        now = time.monotonic() if now is None else now
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        shard = self._shard(key)
+        new_tat = max(shard.tat.get(key, now), now) + self._interval
+        retry_after = new_tat - self._window - now
+        if retry_after > 0:
+            return retry_after
+        shard.tat[key] = new_tat
+        return 0.0
+
+    def _sweep(self, now: float) -> None:
+        shard = self._shards[self._sweep_cursor]
+        self._sweep_cursor = (self._sweep_cursor + 1) % len(self._shards)
+        self._next_sweep = now + self._sweep_interval
+        for key in [k for k, tat in shard.tat.items() if tat <= now]:
+            del shard.tat[key]
+
+
+# GCRA in Redis so limits hold across replicas. Uses the server clock (TIME)
+# so replicas with skewed clocks agree; returns ms to wait (0 = allowed).
+_GCRA_LUA = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + t[2] / 1000
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local wait = new_tat - window - now
+if wait > 0 then return math.ceil(wait) end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return 0
+"""
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RedisRateLimiter:
+    """Shared GCRA limiter backed by a Lua script (one round-trip per request)."""
+
+    def __init__(self, redis_url: str, window_seconds: float, max_requests: int):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(
+            redis_url,
+            decode_responses=True,
+            socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+            socket_timeout=REDIS_TIMEOUT_SECONDS,
+        )
+        self._script = self._redis.register_script(_GCRA_LUA)
+        self._interval_ms = window_seconds * 1000 / max_requests
+        self._window_ms = window_seconds * 1000
+
+    async def hit(self, key: Tuple[str, str]) -> float:
+        wait_ms = await self._script(
+            keys=[f"ratelimit:{key[0]}:{key[1]}"],
+            args=[self._interval_ms, self._window_ms],
+        )
+        return int(wait_ms) / 1000
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+
+class RateLimitMiddleware:
+    """Pure ASGI per-(client IP, path) rate limiter.
+
+    memory backend: LocalRateLimiter, per process.
+    redis backend:  RedisRateLimiter, shared by every replica; if Redis errors
+                    the request is checked against the local limiter instead,
+                    and Redis is skipped for REDIS_BACKOFF_SECONDS so an
+                    outage costs one timeout, not one per request. The client
+                    is closed on lifespan shutdown.
+    """
+
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         *,
         config: RateLimitConfig,
         exempt_paths: Tuple[str, ...] = (),
     ):
-        super().__init__(app)
+        self.app = app
         self._config = config
         self._exempt_paths = exempt_paths
-        self._events: Dict[Tuple[str, str], Deque[float]] = {}
-        self._lock = asyncio.Lock()
+        self._local = LocalRateLimiter(config.window_seconds, config.max_requests)
+        self._redis: Optional[RedisRateLimiter] = None
+        self._redis_down_until = 0.0
+        if config.enabled and config.backend == "redis" and config.redis_url:
+            self._redis = RedisRateLimiter(config.redis_url, config.window_seconds, config.max_requests)
 
-    def _evict_stale_keys(self, window_start: float) -> None:
-        stale = [k for k, dq in self._events.items() if not dq or dq[-1] < window_start]
-        for k in stale:
-            del self._events[k]
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan" and self._redis is not None:
+            await self.app(scope, receive, self._closing_on_shutdown(send))
+            return
+        if scope["type"] != "http" or not self._config.enabled:
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        if not self._config.enabled:
-            return await call_next(request)
+        path = scope["path"]
+        if path.startswith(self._exempt_paths):
+            await self.app(scope, receive, send)
+            return
 
-        path = request.url.path
-        for prefix in self._exempt_paths:
-            if path.startswith(prefix):
-                return await call_next(request)
-
-        ip = _get_client_ip(request)
-        key = (ip, path)
-        now = time.monotonic()
-        window_start = now - self._config.window_seconds
-
-        async with self._lock:
-            self._evict_stale_keys(window_start)
-
-            dq = self._events.get(key)
-            if dq is None:
-                dq = deque()
-                self._events[key] = dq
-
-            while dq and dq[0] < window_start:
-                dq.popleft()
-
-            if len(dq) >= self._config.max_requests:
-                retry_after = max(1, int(dq[0] + self._config.window_seconds - now))
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Rate limit exceeded"},
-                    headers={"Retry-After": str(retry_after)},
-                )
+        key = (_scope_client_ip(scope), path)
+        retry_after = await self._hit(key)
+        if retry_after > 0:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Rate limit exceeded"},
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
 
-            dq.append(now)
+        await self.app(scope, receive, send)
 
-        return await call_next(request)
+    def _closing_on_shutdown(self, send: Send) -> Send:
+        async def wrapped(message) -> None:
+            if message["type"] == "lifespan.shutdown.complete":
+                try:
+                    await self._redis.aclose()
+                except Exception:
+                    logger.warning("Redis rate limiter close failed", exc_info=True)
+            await send(message)
 
+        return wrapped
+
+    async def _hit(self, key: Tuple[str, str]) -> float:
+        if self._redis is not None and time.monotonic() >= self._redis_down_until:
+            try:
+                retry_after = await self._redis.hit(key)
+                if self._redis_down_until:
+                    self._redis_down_until = 0.0
+                    logger.info("Redis rate limiter recovered")
+                return retry_after
+            except Exception as exc:
+                self._redis_down_until = time.monotonic() + REDIS_BACKOFF_SECONDS
+                logger.warning(
+                    f"Redis rate limiter unavailable, using local limits for {REDIS_BACKOFF_SECONDS}s: {exc}"
+                )
+        return self._local.hit(key)
@@ -0,0 +1,68 @@
+"""
+key_registry.py — Namespace registry for TTL'd Redis keys
+
+Replaces KEYS pattern scans (which block the shared Redis for every tenant)
+with sorted-set indexes maintained on write:
+
+  - member = the indexed key (or logical name)
+  - score  = unix timestamp at which the member expires
+
+Readers then get "what is live right now" with ZCOUNT / ZRANGEBYSCORE in
+O(log n), and writers prune expired members as they go, so an index never
+holds much more than its live keys.
+
+For keys written by processes that do not maintain an index yet, scan_keys()
+is an incremental SCAN fallback that never blocks the server.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any
+
+# Index of live agents:heartbeat:* hashes (member = agent key suffix)
+HEARTBEAT_INDEX = "agents:heartbeat_index"
+HEARTBEAT_PATTERN = "agents:heartbeat:*"
+HEARTBEAT_TTL_SECONDS = 30
+
+SCAN_COUNT = 1000
+
+
+def cache_index_key(namespace: str, version: int = 0) -> str:
+    """Index of MultiTierCache keys written under one namespace version."""
+    return f"cache:index:{namespace}:{version}"
+
+
+def register(pipe: Any, index: str, member: str, ttl_seconds: float, now: float | None = None) -> None:
+    """Queue an index upsert plus a prune of expired members on a pipeline.
+
+    Works with both sync and async redis-py pipelines; the caller executes.
+    """
+    now = time.time() if now is None else now
+    pipe.zadd(index, {member: now + ttl_seconds})
+    pipe.zremrangebyscore(index, "-inf", now)
+
+
+def unregister(pipe: Any, index: str, *members: str) -> None:
+    """Queue removal of members from an index on a pipeline."""
+    if members:
+        pipe.zrem(index, *members)
+
+
+def count_live(r: Any, index: str, now: float | None = None) -> Any:
+    """ZCOUNT of unexpired members (awaitable on async clients)."""
+    return r.zcount(index, time.time() if now is None else now, "+inf")
+
+
+def live_members(r: Any, index: str, now: float | None = None) -> Any:
+    """Unexpired members, soonest-expiring first (awaitable on async clients)."""
+    return r.zrangebyscore(index, time.time() if now is None else now, "+inf")
+
+
+async def scan_keys(r: Any, pattern: str, count: int = SCAN_COUNT) -> list[str]:
+    """Incremental SCAN fallback for keys that are not indexed."""
+    return [key async for key in r.scan_iter(match=pattern, count=count)]
+
+
+def register_heartbeat(pipe: Any, agent: str) -> None:
+    """Queue a heartbeat index refresh next to the heartbeat HSET/EXPIRE."""
+    register(pipe, HEARTBEAT_INDEX, agent, HEARTBEAT_TTL_SECONDS)
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-import re
-from typing import Any, Literal, Optional
+from typing import Any, AsyncIterator, Literal, Optional
 
 import httpx
 
+from app.core.redaction import PROMPT_REDACTOR
+
 
 PrivacyMode = Literal["redact", "none"]
 RouteName = Literal["hunter_alpha", "healer_alpha"]
@@ -32,19 +33,8 @@ class ModelRoute:
     privacy_mode: PrivacyMode
 
 
-_SECRET_PATTERNS: list[re.Pattern[str]] = [
-    re.compile(r"\bsk-[A-Za-z0-9]{16,}\b"),
-    re.compile(r"\bghp_[A-Za-z0-9]{16,}\b"),
-    re.compile(r"\bxox[baprs]-[A-Za-z0-9-]{10,}\b"),
-    re.compile(r"\beyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\b"),
-]
-
-
 def redact_secrets(text: str) -> str:
-    redacted = text
-    for pattern in _SECRET_PATTERNS:
-        redacted = pattern.sub("[REDACTED]", redacted)
-    return redacted
+    return PROMPT_REDACTOR.redact(text)
 
 
 def _apply_privacy_mode(value: str, mode: PrivacyMode) -> str:
@@ -100,7 +90,54 @@ async def openrouter_chat(
     max_tokens: int,
     privacy_mode: PrivacyMode,
     timeout_seconds: float = 60.0,
+    client: httpx.AsyncClient | None = None,
 ) -> str:
+    """Single chat completion; pass a pooled ``client`` to reuse connections."""
+    url, headers, payload = _openrouter_request(base_url, api_key, model, messages, max_tokens, privacy_mode)
+    if client is None:
+        async with httpx.AsyncClient(timeout=timeout_seconds) as owned:
+            resp = await owned.post(url, json=payload, headers=headers)
+    else:
+        resp = await client.post(url, json=payload, headers=headers, timeout=timeout_seconds)
+    if resp.status_code != 200:
+        body_preview = (resp.text or "")[:500]
+        raise RuntimeError(f"OpenRouter error {resp.status_code}: {body_preview}")
+    data = resp.json()
+    return data["choices"][0]["message"]["content"]
+
+
+async def openrouter_chat_stream(
+    *,
+    client: httpx.AsyncClient,
+    base_url: str,
+    api_key: str,
+    model: str,
+    messages: list[dict[str, str]],
+    max_tokens: int,
+    privacy_mode: PrivacyMode,
+    timeout_seconds: float = 60.0,
+) -> AsyncIterator[str]:
+    """Streaming variant of openrouter_chat; yields content deltas."""
+    from app.llm.streaming import iter_sse_chat_tokens
+
+    url, headers, payload = _openrouter_request(base_url, api_key, model, messages, max_tokens, privacy_mode)
+    payload["stream"] = True
+    async with client.stream("POST", url, json=payload, headers=headers, timeout=timeout_seconds) as resp:
+        if resp.status_code != 200:
+            body_preview = (await resp.aread()).decode("utf-8", "replace")[:500]
+            raise RuntimeError(f"OpenRouter error {resp.status_code}: {body_preview}")
+        async for token in iter_sse_chat_tokens(resp):
+            yield token
+
+
+def _openrouter_request(
+    base_url: str,
+    api_key: str,
+    model: str,
+    messages: list[dict[str, str]],
+    max_tokens: int,
+    privacy_mode: PrivacyMode,
+) -> tuple[str, dict[str, str], dict[str, Any]]:
     safe_messages: list[dict[str, str]] = []
     for msg in messages:
         safe_messages.append(
@@ -117,11 +154,4 @@ async def openrouter_chat(
         "max_tokens": max_tokens,
         "temperature": 0.2,
     }
-
-    async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-        resp = await client.post(f"{base_url.rstrip('/')}/chat/completions", json=payload, headers=headers)
-        if resp.status_code != 200:
-            body_preview = (resp.text or "")[:500]
-            raise RuntimeError(f"OpenRouter error {resp.status_code}: {body_preview}")
-        data = resp.json()
-        return data["choices"][0]["message"]["content"]
+    return f"{base_url.rstrip('/')}/chat/completions", headers, payload
@@ -1,13 +1,50 @@
+import asyncio
+import fnmatch
+import hashlib
 import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 import chromadb
 from chromadb.utils import embedding_functions
 from app.core.config import settings
-from typing import List, Dict, Any
-import uuid
+from typing import Iterator, List, Dict, Any, Optional
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_INGEST_PATTERNS = ("*.md", "*.txt", "*.rst", "*.py", "*.json", "*.yaml", "*.yml")
+INGEST_EMBED_BATCH = 256
+MAX_INGEST_FILE_BYTES = 2_000_000
+_SKIP_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv"}
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def _iter_ingest_files(root: str, patterns: tuple, source_prefix: str) -> Iterator[tuple]:
+    """Yield (file_path, source) lazily, in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in _SKIP_DIRS)
+        for name in sorted(filenames):
+            if any(fnmatch.fnmatch(name, p) for p in patterns):
+                file_path = os.path.join(dirpath, name)
+                rel = os.path.relpath(file_path, root).replace(os.sep, "/")
+                yield file_path, f"{source_prefix}{rel}"
+
+
+@dataclass
+class _SourcePlan:
+    """What ingesting one source has to change in the collection."""
+    source: str
+    total: int
+    to_add: List[tuple] = field(default_factory=list)      # (id, document, metadata)
+    to_update: List[tuple] = field(default_factory=list)   # (id, metadata) — same text, moved
+    to_delete: List[str] = field(default_factory=list)
+
+
 class RAGService:
     """
     Manages Vector Memory (RAG) using ChromaDB.
@@ -66,8 +103,11 @@ class RAGService:
 
     def ingest_document(self, content: str, source: str, metadata: Dict[str, Any] = None) -> int:
         """
-        Chunks and stores a document in the vector database.
-        Returns the number of chunks stored.
+        Chunks and stores a document in the vector database, incrementally.
+
+        Chunk IDs are content hashes, so re-ingesting a source only embeds
+        chunks that changed, re-labels moved ones and deletes stale ones.
+        Returns the number of chunks the source now has (0 on failure).
         """
         if not self.client:
             self._connect()
@@ -75,37 +115,144 @@ class RAGService:
                 return 0
 
         try:
-            # 1. Chunking
-            chunks = self.text_splitter.split_text(content)
-            if not chunks:
+            plan = self._plan_source(content, source, metadata)
+            if plan is None:
                 return 0
-
-            # 2. Prepare Data
-            ids = [f"{source}_{uuid.uuid4().hex[:8]}_{i}" for i in range(len(chunks))]
-            metadatas = []
-            for i in range(len(chunks)):
-                meta = metadata.copy() if metadata else {}
-                meta.update({
-                    "source": source,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks)
-                })
-                metadatas.append(meta)
-
-            # 3. Add to Chroma
-            self.collection.add(
-                documents=chunks,
-                metadatas=metadatas,
-                ids=ids
+            self._apply_plan(plan)
+            if plan.to_add:
+                self.collection.add(
+                    documents=[doc for _, doc, _ in plan.to_add],
+                    metadatas=[meta for _, _, meta in plan.to_add],
+                    ids=[chunk_id for chunk_id, _, _ in plan.to_add],
+                )
+            logger.info(
+                f"[RAG] Ingested {source}: {plan.total} chunks "
+                f"({len(plan.to_add)} embedded, {len(plan.to_update)} relabelled, {len(plan.to_delete)} deleted)"
             )
-            
-            logger.info(f"[RAG] Ingested {len(chunks)} chunks from {source}")
-            return len(chunks)
+            return plan.total
 
         except Exception as e:
             logger.error(f"[RAG] Ingestion failed for {source}: {e}")
             return 0
 
+    def ingest_directory(
+        self,
+        path: str,
+        patterns: tuple = DEFAULT_INGEST_PATTERNS,
+        batch_size: int = INGEST_EMBED_BATCH,
+        source_prefix: str = "",
+        max_file_bytes: int = MAX_INGEST_FILE_BYTES,
+    ) -> Dict[str, int]:
+        """
+        Bulk-ingest every matching file under ``path``.
+
+        Files are streamed one at a time and diffed against their manifest
+        like ingest_document; new chunks from many files are embedded
+        together in batches of ``batch_size`` (one embedding call and one
+        Chroma write per batch). Source names are ``source_prefix`` + the
+        path relative to ``path``.
+        """
+        stats = {
+            "files": 0, "skipped_files": 0, "chunks": 0,
+            "embedded": 0, "relabelled": 0, "deleted": 0, "failed": 0,
+        }
+        if not self.client:
+            self._connect()
+            if not self.client:
+                return stats
+
+        pending: List[tuple] = []
+        for file_path, source in _iter_ingest_files(path, patterns, source_prefix):
+            try:
+                if os.path.getsize(file_path) > max_file_bytes:
+                    stats["skipped_files"] += 1
+                    continue
+                with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+                    content = f.read()
+                plan = self._plan_source(content, source, {"path": file_path})
+            except Exception as e:
+                logger.warning(f"[RAG] Skipping {file_path}: {e}")
+                stats["skipped_files"] += 1
+                continue
+            if plan is None:
+                stats["skipped_files"] += 1
+                continue
+            self._apply_plan(plan)
+            stats["files"] += 1
+            stats["chunks"] += plan.total
+            stats["relabelled"] += len(plan.to_update)
+            stats["deleted"] += len(plan.to_delete)
+            pending.extend(plan.to_add)
+            while len(pending) >= batch_size:
+                self._flush_embedded(pending[:batch_size], stats)
+                del pending[:batch_size]
+        if pending:
+            self._flush_embedded(pending, stats)
+
+        logger.info(f"[RAG] Directory ingest of {path}: {stats}")
+        return stats
+
+    def _plan_source(self, content: str, source: str, metadata: Optional[Dict[str, Any]]) -> Optional["_SourcePlan"]:
+        """Diff a source's new chunks against its manifest (the chunks stored for it)."""
+        chunks = self.text_splitter.split_text(content)
+        if not chunks:
+            return None
+        source_hash = _content_hash(content)
+
+        wanted: Dict[str, tuple] = {}
+        seen: Dict[str, int] = {}
+        for i, chunk in enumerate(chunks):
+            digest = _content_hash(chunk)
+            n = seen.get(digest, 0)
+            seen[digest] = n + 1
+            chunk_id = f"{source}:{digest}" if n == 0 else f"{source}:{digest}:{n}"
+            meta = metadata.copy() if metadata else {}
+            meta.update({
+                "source": source,
+                "chunk_index": i,
+                "total_chunks": len(chunks),
+                "content_hash": digest,
+                "source_hash": source_hash,
+            })
+            wanted[chunk_id] = (chunk, meta)
+
+        existing = self.collection.get(where={"source": source}, include=["metadatas"])
+        manifest = dict(zip(existing.get("ids") or [], existing.get("metadatas") or []))
+
+        plan = _SourcePlan(source=source, total=len(chunks))
+        for chunk_id, (chunk, meta) in wanted.items():
+            if chunk_id not in manifest:
+                plan.to_add.append((chunk_id, chunk, meta))
+            elif manifest[chunk_id] != meta:
+                plan.to_update.append((chunk_id, meta))
+        plan.to_delete = [chunk_id for chunk_id in manifest if chunk_id not in wanted]
+        return plan
+
+    def _apply_plan(self, plan: "_SourcePlan") -> None:
+        """Deletes and metadata-only updates; new chunks are added by the caller."""
+        if plan.to_delete:
+            self.collection.delete(ids=plan.to_delete)
+        if plan.to_update:
+            self.collection.update(
+                ids=[chunk_id for chunk_id, _ in plan.to_update],
+                metadatas=[meta for _, meta in plan.to_update],
+            )
+
+    def _flush_embedded(self, items: List[tuple], stats: Dict[str, int]) -> None:
+        """Embed one batch of new chunks in a single call and store them."""
+        documents = [doc for _, doc, _ in items]
+        try:
+            self.collection.add(
+                ids=[chunk_id for chunk_id, _, _ in items],
+                embeddings=self._get_embedding_function()(documents),
+                documents=documents,
+                metadatas=[meta for _, _, meta in items],
+            )
+            stats["embedded"] += len(items)
+        except Exception as e:
+            logger.error(f"[RAG] Embedding batch of {len(items)} chunks failed: {e}")
+            stats["failed"] += len(items)
+
     def query(self, query_text: str, n_results: int = 5, filters: Dict = None) -> List[str]:
         """
         Semantic search for relevant context.
@@ -130,6 +277,29 @@ class RAGService:
             logger.error(f"[RAG] Query failed: {e}")
             return []
 
+    def search(
+        self,
+        query_texts: List[str],
+        query_embeddings: List[Any],
+        n_results: int = 5,
+        filters: Dict = None,
+    ) -> List[List[str]]:
+        """
+        Batch search with precomputed query embeddings (used by AsyncRAGService).
+        Raises when the store is unavailable.
+        """
+        if not self.client:
+            self._connect()
+            if not self.client:
+                raise RuntimeError(f"ChromaDB unavailable at {self.host}:{self.port}")
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=filters,
+        )
+        documents = results.get("documents") or []
+        return [list(docs) for docs in documents] + [[] for _ in range(len(query_embeddings) - len(documents))]
+
     def reset(self):
         """
         Clears all memory. Use with caution.
@@ -138,5 +308,211 @@ class RAGService:
             self.client.reset()
             self._connect()
 
+
+class LocalRAGService(RAGService):
+    """
+    RAGService on the embedded hybrid index (app/core/rag_local.py).
+
+    No external service: chunks live under RAG_LOCAL_INDEX_DIR and queries
+    fuse BM25 and vector rankings, so exact identifiers and error strings
+    are found even when embeddings miss them. Selected with RAG_BACKEND=local.
+    """
+    def __init__(self, path: Optional[str] = None):
+        super().__init__()
+        self.index_path = path or settings.RAG_LOCAL_INDEX_DIR
+
+    def _connect(self):
+        try:
+            from app.core.rag_local import LocalHybridIndex
+
+            logger.info(f"[RAG] Opening local hybrid index at {self.index_path}...")
+            self.collection = LocalHybridIndex(self.index_path, embedding_fn=self._get_embedding_function())
+            self.client = self.collection
+        except Exception as e:
+            logger.error(f"[RAG] Local index unavailable: {e}")
+            self.client = None
+
+    def search(
+        self,
+        query_texts: List[str],
+        query_embeddings: List[Any],
+        n_results: int = 5,
+        filters: Dict = None,
+    ) -> List[List[str]]:
+        if not self.client:
+            self._connect()
+            if not self.client:
+                raise RuntimeError(f"Local RAG index unavailable at {self.index_path}")
+        results = self.collection.query(
+            query_texts=query_texts,
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=filters,
+        )
+        return [list(docs) for docs in results["documents"]]
+
+    def reset(self):
+        if self.client:
+            self.collection.reset()
+
+
+def _normalize_query(text: str) -> str:
+    """Cache key (and embedded text) for a query: case- and whitespace-insensitive."""
+    return " ".join(text.split()).casefold()
+
+
+class AsyncRAGService:
+    """
+    Non-blocking facade over RAGService for use from coroutines.
+
+    - Embedding runs on a dedicated thread pool, Chroma HTTP calls on another,
+      so the event loop never waits on either.
+    - Queries that arrive within RAG_BATCH_WINDOW_MS of each other are
+      embedded in one batched call, and identical in-flight texts share a
+      single embedding.
+    - Query embeddings are kept in an LRU cache keyed by normalized text.
+
+    Unlike RAGService, failures raise instead of returning [] so callers can
+    tell "no matches" from "memory unavailable".
+    """
+    def __init__(
+        self,
+        sync: RAGService,
+        *,
+        embed_workers: int = 1,
+        io_workers: int = 4,
+        batch_window_ms: float = 5.0,
+        max_batch: int = 64,
+        cache_size: int = 1024,
+    ):
+        self._sync = sync
+        self._embed_workers = embed_workers
+        self._io_workers = io_workers
+        self._batch_window = batch_window_ms / 1000.0
+        self._max_batch = max_batch
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches: set = set()
+        self._embed_pool: Optional[ThreadPoolExecutor] = None
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self.stats = {"queries": 0, "cache_hits": 0, "coalesced": 0, "embedded": 0, "batches": 0}
+
+    async def query(self, query_text: str, n_results: int = 5, filters: Dict = None) -> List[str]:
+        """Async RAGService.query: semantic search for relevant context."""
+        return (await self.query_many([query_text], n_results=n_results, filters=filters))[0]
+
+    async def query_many(self, query_texts: List[str], n_results: int = 5, filters: Dict = None) -> List[List[str]]:
+        """Search several texts at once (one embedding batch, one store call)."""
+        if not query_texts:
+            return []
+        self.stats["queries"] += len(query_texts)
+        embeddings = await self._embed(query_texts)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._io(), self._sync.search, query_texts, embeddings, n_results, filters
+        )
+
+    async def ingest_document(self, content: str, source: str, metadata: Dict[str, Any] = None) -> int:
+        """Async RAGService.ingest_document (chunk + embed + store off the event loop)."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._io(), self._sync.ingest_document, content, source, metadata
+        )
+
+    async def ingest_directory(self, path: str, **kwargs) -> Dict[str, int]:
+        """Async RAGService.ingest_directory."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._io(), lambda: self._sync.ingest_directory(path, **kwargs)
+        )
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "cached_embeddings": len(self._cache), "pending": len(self._pending)}
+
+    def close(self) -> None:
+        for pool in (self._embed_pool, self._io_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._embed_pool = self._io_pool = None
+
+    # ── Embedding batcher ────────────────────────────────────────────────
+
+    async def _embed(self, texts: List[str]) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        waits = []
+        for key in (_normalize_query(t) for t in texts):
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                waits.append(cached)
+                continue
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = loop.create_future()
+            else:
+                self.stats["coalesced"] += 1
+            waits.append(future)
+
+        if self._pending and self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._batch_window, self._flush)
+        # shield: one caller giving up must not cancel a vector others wait on
+        return [await asyncio.shield(w) if isinstance(w, asyncio.Future) else w for w in waits]
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        items = list(pending.items())
+        for start in range(0, len(items), self._max_batch):
+            task = asyncio.ensure_future(self._run_batch(dict(items[start:start + self._max_batch])))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: Dict[str, asyncio.Future]) -> None:
+        texts = list(batch)
+        self.stats["batches"] += 1
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(self._embedder(), self._embed_sync, texts)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.stats["embedded"] += len(texts)
+        for text, vector in zip(texts, vectors):
+            self._cache[text] = vector
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            future = batch[text]
+            if not future.done():
+                future.set_result(vector)
+
+    def _embed_sync(self, texts: List[str]) -> List[Any]:
+        return list(self._sync._get_embedding_function()(texts))
+
+    def _embedder(self) -> ThreadPoolExecutor:
+        if self._embed_pool is None:
+            self._embed_pool = ThreadPoolExecutor(max_workers=self._embed_workers, thread_name_prefix="rag-embed")
+        return self._embed_pool
+
+    def _io(self) -> ThreadPoolExecutor:
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self._io_workers, thread_name_prefix="rag-io")
+        return self._io_pool
+
+
+def _build_rag_service() -> RAGService:
+    if settings.RAG_BACKEND == "local":
+        return LocalRAGService()
+    return RAGService()
+
+
 # Global Instance
-rag = RAGService()
+rag = _build_rag_service()
+async_rag = AsyncRAGService(
+    rag,
+    embed_workers=settings.RAG_EMBED_WORKERS,
+    io_workers=settings.RAG_IO_WORKERS,
+    batch_window_ms=settings.RAG_BATCH_WINDOW_MS,
+    max_batch=settings.RAG_EMBED_MAX_BATCH,
+    cache_size=settings.RAG_EMBED_CACHE_SIZE,
+)
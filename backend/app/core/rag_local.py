@@ -0,0 +1,589 @@
+"""
+rag_local.py — Embedded hybrid retrieval backend (BM25 + vectors) for RAGService
+
+LocalHybridIndex needs no external service: it keeps an inverted BM25 index
+and a float32 vector matrix side by side, and merges the two rankings with
+reciprocal-rank fusion (RRF). It implements the subset of the Chroma
+collection API that RAGService uses (add / get / update / delete / query /
+count), so incremental ingestion works unchanged on top of it.
+
+Vector search is an exact scan up to EXACT_SCAN_LIMIT rows. Beyond that an
+IVF coarse quantizer (k-means centroids, ~sqrt(n) lists) is trained lazily
+and each query scans the closest lists (up to IVF_PROBES lists' worth of rows
+on average) plus rows added since the last build, which keeps top-k over ~1M
+chunks in the low milliseconds.
+
+On-disk layout (RAG_LOCAL_INDEX_DIR):
+  log.jsonl    append-only journal of add/update/delete (documents + metadata)
+  vectors.f32  float32 [capacity, dim], memory-mapped; row i = i-th added chunk
+  meta.json    {"dim", "capacity"}
+  ivf.npz      trained centroids + list membership (large indexes only)
+
+Deletes are tombstones; compact() rewrites the files with live rows only.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+MIN_FUSION_DEPTH = 50
+# Terms in more than this share of chunks are skipped when the query has
+# rarer terms: their idf is near zero but scoring them touches most rows.
+BM25_MAX_DF_RATIO = 0.5
+
+EXACT_SCAN_LIMIT = 100_000
+IVF_PROBES = 16
+IVF_TRAIN_SAMPLE = 50_000
+IVF_ITERATIONS = 8
+IVF_REBUILD_GROWTH = 0.1   # retrain once 10% more rows than at the last build
+SCAN_CHUNK_ROWS = 65_536
+INITIAL_CAPACITY = 1024
+
+EmbeddingFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.casefold())
+
+
+class _Postings:
+    """Growable (row, term-frequency) arrays for one term."""
+
+    __slots__ = ("rows", "tf", "size")
+
+    def __init__(self) -> None:
+        self.rows = np.empty(2, dtype=np.int64)
+        self.tf = np.empty(2, dtype=np.float32)
+        self.size = 0
+
+    def append(self, row: int, tf: int) -> None:
+        if self.size == self.rows.size:
+            self.rows = np.resize(self.rows, self.size * 2)
+            self.tf = np.resize(self.tf, self.size * 2)
+        self.rows[self.size] = row
+        self.tf[self.size] = tf
+        self.size += 1
+
+
+def _top_rows(scores: np.ndarray, rows: np.ndarray, k: int) -> List[int]:
+    """Rows with the k highest scores, best first."""
+    if rows.size == 0 or k <= 0:
+        return []
+    if rows.size > k:
+        pick = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[pick], scores[pick]
+    return rows[np.argsort(-scores, kind="stable")].tolist()
+
+
+class LocalHybridIndex:
+    """BM25 + vector index persisted under ``path`` (Chroma-collection compatible)."""
+
+    def __init__(self, path: str, embedding_fn: Optional[EmbeddingFn] = None) -> None:
+        self.path = path
+        self._embedding_fn = embedding_fn
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._init_state()
+        self._load()
+
+    # ── Chroma collection API ────────────────────────────────────────────
+
+    def count(self) -> int:
+        return self._live
+
+    def add(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: Optional[List[dict]] = None,
+        embeddings: Optional[Sequence[Sequence[float]]] = None,
+    ) -> None:
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            fresh = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._row_of]
+            if len(fresh) < len(ids):
+                logger.warning(f"[RAG] Local index: {len(ids) - len(fresh)} existing IDs ignored on add")
+            if not fresh:
+                return
+            docs = [documents[i] for i in fresh]
+            if embeddings is None:
+                vectors = self._embed(docs)
+            else:
+                vectors = np.asarray(embeddings, dtype=np.float32)[fresh]
+            vectors = self._prepare_vectors(vectors, len(fresh))
+
+            start = len(self._ids)
+            if vectors is not None:
+                self._ensure_vector_capacity(start + len(fresh))
+                self._vectors[start:start + len(fresh)] = vectors
+            lines = []
+            for offset, i in enumerate(fresh):
+                row = start + offset
+                self._insert(row, ids[i], documents[i], dict(metadatas[i]))
+                lines.append({"op": "add", "row": row, "id": ids[i], "doc": documents[i], "meta": metadatas[i]})
+            self._journal(lines)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict:
+        include = include or ["metadatas", "documents"]
+        with self._lock:
+            if ids is not None:
+                rows = [self._row_of[i] for i in ids if i in self._row_of]
+            else:
+                mask = self._filter_mask(where)
+                alive = self._alive[:len(self._ids)]
+                rows = np.flatnonzero(alive if mask is None else alive & mask).tolist()
+            result: Dict[str, Any] = {"ids": [self._ids[r] for r in rows]}
+            if "metadatas" in include:
+                result["metadatas"] = [self._metas[r] for r in rows]
+            if "documents" in include:
+                result["documents"] = [self._docs[r] for r in rows]
+            return result
+
+    def update(self, ids: List[str], metadatas: List[dict]) -> None:
+        with self._lock:
+            lines = []
+            for chunk_id, meta in zip(ids, metadatas):
+                row = self._row_of.get(chunk_id)
+                if row is None:
+                    continue
+                self._set_meta(row, dict(meta))
+                lines.append({"op": "update", "id": chunk_id, "meta": meta})
+            self._journal(lines)
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            gone = [chunk_id for chunk_id in ids if chunk_id in self._row_of]
+            for chunk_id in gone:
+                self._remove(self._row_of[chunk_id])
+            if gone:
+                self._journal([{"op": "delete", "ids": gone}])
+
+    def query(
+        self,
+        query_texts: Optional[List[str]] = None,
+        query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+        n_results: int = 10,
+        where: Optional[dict] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict:
+        """Chroma-shaped results for each query (hybrid when text is available)."""
+        texts, vectors = self._query_vectors(query_texts, query_embeddings)
+        with self._lock:
+            rows = self._search(texts, vectors, n_results, where)
+            return {
+                "ids": [[self._ids[r] for r in hits] for hits in rows],
+                "documents": [[self._docs[r] for r in hits] for hits in rows],
+                "metadatas": [[self._metas[r] for r in hits] for hits in rows],
+            }
+
+    # ── Search ───────────────────────────────────────────────────────────
+
+    def search_rows(
+        self,
+        query_texts: Optional[List[str]],
+        query_embeddings: Optional[Sequence[Sequence[float]]],
+        n_results: int,
+        where: Optional[dict] = None,
+    ) -> List[List[int]]:
+        texts, vectors = self._query_vectors(query_texts, query_embeddings)
+        with self._lock:
+            return self._search(texts, vectors, n_results, where)
+
+    def _query_vectors(
+        self,
+        query_texts: Optional[List[str]],
+        query_embeddings: Optional[Sequence[Sequence[float]]],
+    ) -> Tuple[List[str], Optional[np.ndarray]]:
+        # Embedding can be slow (a model call), so it happens before the lock
+        texts = list(query_texts or [])
+        if query_embeddings is None and texts:
+            return texts, self._embed(texts)
+        if query_embeddings is not None:
+            return texts, np.asarray(query_embeddings, dtype=np.float32)
+        return texts, None
+
+    def _search(
+        self, texts: List[str], vectors: Optional[np.ndarray], n_results: int, where: Optional[dict]
+    ) -> List[List[int]]:
+        # Caller holds self._lock: add/update/delete/compact mutate the row
+        # arrays and swap the vector memmap, so rows must not move mid-search.
+        total = len(texts) if texts else (0 if vectors is None else len(vectors))
+        mask = self._filter_mask(where)
+        self._maybe_build_ivf()
+
+        results = []
+        for i in range(total):
+            text = texts[i] if texts else None
+            vector = vectors[i] if vectors is not None and self._dim and len(vectors[i]) == self._dim else None
+            results.append(self._hybrid(text, vector, n_results, mask))
+        return results
+
+    def _hybrid(self, text: Optional[str], vector: Optional[np.ndarray], k: int, mask: Optional[np.ndarray]) -> List[int]:
+        depth = max(k * 4, MIN_FUSION_DEPTH)
+        lexical = self._bm25_top(text, depth, mask) if text else []
+        semantic = self._vector_top(vector, depth, mask) if vector is not None else []
+        if not lexical or not semantic:
+            return (lexical or semantic)[:k]
+        fused: Dict[int, float] = defaultdict(float)
+        for ranking in (lexical, semantic):
+            for rank, row in enumerate(ranking):
+                fused[row] += 1.0 / (RRF_K + rank + 1)
+        return sorted(fused, key=fused.__getitem__, reverse=True)[:k]
+
+    def _bm25_top(self, text: str, k: int, mask: Optional[np.ndarray]) -> List[int]:
+        terms = set(tokenize(text))
+        n = len(self._ids)
+        if not terms or not self._live:
+            return []
+        postings = [self._postings[t] for t in terms if t in self._postings]
+        selective = [p for p in postings if p.size <= BM25_MAX_DF_RATIO * self._live]
+        scores = np.zeros(n, dtype=np.float32)
+        avgdl = self._total_len / self._live or 1.0
+        for posting in selective or postings:
+            size = posting.size
+            rows, tf = posting.rows[:size], posting.tf[:size]
+            df = size
+            idf = math.log(1.0 + (self._live - df + 0.5) / (df + 0.5))
+            dl = self._doc_len[rows]
+            scores[rows] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+        valid = self._alive[:n] & (scores > 0)
+        if mask is not None:
+            valid &= mask
+        rows = np.flatnonzero(valid)
+        return _top_rows(scores[rows], rows, k)
+
+    def _vector_top(self, vector: np.ndarray, k: int, mask: Optional[np.ndarray]) -> List[int]:
+        n = len(self._ids)
+        if not n or self._vectors is None:
+            return []
+        q = vector.astype(np.float32, copy=False)
+        norm = float(np.linalg.norm(q))
+        if norm == 0:
+            return []
+        q = q / norm
+
+        alive = self._alive[:n]
+        if mask is not None:
+            rows = np.flatnonzero(alive & mask)
+        elif n <= EXACT_SCAN_LIMIT or self._ivf is None:
+            return self._scan_all(q, k, alive)
+        else:
+            rows = self._ivf_candidates(q, n)
+            rows = rows[alive[rows]]
+        if rows.size == 0:
+            return []
+        return _top_rows(self._vectors[rows] @ q, rows, k)
+
+    def _scan_all(self, q: np.ndarray, k: int, alive: np.ndarray) -> List[int]:
+        best_rows: List[np.ndarray] = []
+        best_scores: List[np.ndarray] = []
+        for start in range(0, alive.size, SCAN_CHUNK_ROWS):
+            stop = min(alive.size, start + SCAN_CHUNK_ROWS)
+            rows = np.flatnonzero(alive[start:stop]) + start
+            if rows.size == 0:
+                continue
+            scores = np.asarray(self._vectors[start:stop]) @ q
+            scores = scores[rows - start]
+            if rows.size > k:
+                pick = np.argpartition(-scores, k - 1)[:k]
+                rows, scores = rows[pick], scores[pick]
+            best_rows.append(rows)
+            best_scores.append(scores)
+        if not best_rows:
+            return []
+        return _top_rows(np.concatenate(best_scores), np.concatenate(best_rows), k)
+
+    def _ivf_candidates(self, q: np.ndarray, n: int) -> np.ndarray:
+        centroids, rows, offsets, built_rows = self._ivf
+        # Nearest lists first, stopping at a row budget so a few oversized
+        # lists cannot blow up the tail latency.
+        budget = IVF_PROBES * rows.size / len(centroids)
+        parts, taken = [], 0
+        for c in np.argsort(-(centroids @ q))[:IVF_PROBES]:
+            if taken >= budget:
+                break
+            parts.append(rows[offsets[c]:offsets[c + 1]])
+            taken += parts[-1].size
+        if built_rows < n:
+            parts.append(np.arange(built_rows, n))
+        return np.concatenate(parts)
+
+    # ── IVF coarse quantizer ─────────────────────────────────────────────
+
+    def _maybe_build_ivf(self) -> None:
+        n = len(self._ids)
+        if self._vectors is None or n <= EXACT_SCAN_LIMIT:
+            return
+        if self._ivf is not None and n - self._ivf[3] <= IVF_REBUILD_GROWTH * self._ivf[3]:
+            return
+        with self._lock:
+            if self._ivf is None or n - self._ivf[3] > IVF_REBUILD_GROWTH * self._ivf[3]:
+                self.build_ivf()
+
+    def build_ivf(self) -> None:
+        """Train k-means centroids and assign every live row to its nearest list."""
+        with self._lock:
+            n = len(self._ids)
+            live = np.flatnonzero(self._alive[:n])
+            if live.size == 0 or self._vectors is None:
+                self._ivf = None
+                return
+            logger.info(f"[RAG] Local index: training IVF over {live.size} vectors...")
+            rng = np.random.default_rng(0)
+            nlist = int(min(4096, max(16, math.sqrt(live.size))))
+            sample = np.sort(rng.choice(live, min(IVF_TRAIN_SAMPLE, live.size), replace=False))
+            x = np.asarray(self._vectors[sample])
+            centroids = x[rng.choice(len(x), min(nlist, len(x)), replace=False)].copy()
+            for _ in range(IVF_ITERATIONS):
+                assign = self._nearest_centroid(x, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, x)
+                counts = np.bincount(assign, minlength=len(centroids))
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+                norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+                centroids = centroids / np.where(norms == 0, 1, norms)
+
+            assign = np.concatenate([
+                self._nearest_centroid(np.asarray(self._vectors[live[s:s + SCAN_CHUNK_ROWS]]), centroids)
+                for s in range(0, live.size, SCAN_CHUNK_ROWS)
+            ])
+            order = np.argsort(assign, kind="stable")
+            rows = live[order].astype(np.int64)
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+            self._ivf = (centroids, rows, offsets, n)
+            np.savez(self._file("ivf.npz"), centroids=centroids, rows=rows, offsets=offsets, built_rows=n)
+
+    @staticmethod
+    def _nearest_centroid(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        out = np.empty(len(x), dtype=np.int64)
+        for s in range(0, len(x), 8192):
+            out[s:s + 8192] = np.argmax(x[s:s + 8192] @ centroids.T, axis=1)
+        return out
+
+    # ── Maintenance ──────────────────────────────────────────────────────
+
+    def compact(self) -> None:
+        """Rewrite the journal and vector file with live rows only."""
+        with self._lock:
+            n = len(self._ids)
+            live = np.flatnonzero(self._alive[:n])
+            tmp = self.path.rstrip("/\\") + ".compact"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            with open(os.path.join(tmp, "log.jsonl"), "w", encoding="utf-8") as f:
+                for new_row, row in enumerate(live.tolist()):
+                    f.write(json.dumps({
+                        "op": "add", "row": new_row, "id": self._ids[row],
+                        "doc": self._docs[row], "meta": self._metas[row],
+                    }) + "\n")
+            if self._vectors is not None:
+                capacity = max(INITIAL_CAPACITY, live.size)
+                out = np.memmap(os.path.join(tmp, "vectors.f32"), dtype=np.float32, mode="w+",
+                                shape=(capacity, self._dim))
+                for s in range(0, live.size, SCAN_CHUNK_ROWS):
+                    chunk = live[s:s + SCAN_CHUNK_ROWS]
+                    out[s:s + chunk.size] = self._vectors[chunk]
+                out.flush()
+                del out
+                with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                    json.dump({"dim": self._dim, "capacity": capacity}, f)
+            self._close_files()
+            shutil.rmtree(self.path)
+            os.replace(tmp, self.path)
+            self._init_state()
+            self._load()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._close_files()
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.makedirs(self.path, exist_ok=True)
+            self._init_state()
+            self._load()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+
+    # ── Internals ────────────────────────────────────────────────────────
+
+    def _init_state(self) -> None:
+        self._ids: List[str] = []
+        self._docs: List[str] = []
+        self._metas: List[dict] = []
+        self._row_of: Dict[str, int] = {}
+        self._by_source: Dict[Any, set] = defaultdict(set)
+        self._postings: Dict[str, _Postings] = {}
+        self._doc_len = np.zeros(INITIAL_CAPACITY, dtype=np.float32)
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._total_len = 0.0
+        self._live = 0
+        self._dim = 0
+        self._vec_capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._ivf: Optional[tuple] = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        meta_path = self._file("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            self._dim = int(meta["dim"])
+            self._vec_capacity = int(meta["capacity"])
+            self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r+",
+                                      shape=(self._vec_capacity, self._dim))
+
+        log_path = self._file("log.jsonl")
+        if os.path.exists(log_path):
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning("[RAG] Local index: skipping torn journal line")
+                        continue
+                    op = entry["op"]
+                    if op == "add":
+                        self._insert(entry["row"], entry["id"], entry["doc"], entry["meta"])
+                    elif op == "update" and entry["id"] in self._row_of:
+                        self._set_meta(self._row_of[entry["id"]], entry["meta"])
+                    elif op == "delete":
+                        for chunk_id in entry["ids"]:
+                            if chunk_id in self._row_of:
+                                self._remove(self._row_of[chunk_id])
+
+        ivf_path = self._file("ivf.npz")
+        if os.path.exists(ivf_path) and self._vectors is not None:
+            data = np.load(ivf_path)
+            built_rows = int(data["built_rows"])
+            if built_rows <= len(self._ids):
+                self._ivf = (data["centroids"], data["rows"], data["offsets"], built_rows)
+        if self._live:
+            logger.info(f"[RAG] Local index loaded: {self._live} chunks from {self.path}")
+
+    def _close_files(self) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+
+    def _journal(self, entries: List[dict]) -> None:
+        if not entries:
+            return
+        with open(self._file("log.jsonl"), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e) + "\n" for e in entries))
+
+    def _insert(self, row: int, chunk_id: str, doc: str, meta: dict) -> None:
+        if row != len(self._ids):
+            raise ValueError(f"Local index journal out of order at row {row}")
+        if row >= self._alive.size:
+            size = self._alive.size * 2
+            self._alive = np.resize(self._alive, size)
+            self._alive[row:] = False
+            self._doc_len = np.resize(self._doc_len, size)
+        self._ids.append(chunk_id)
+        self._docs.append(doc)
+        self._metas.append(meta)
+        self._row_of[chunk_id] = row
+        self._by_source[meta.get("source")].add(row)
+        tokens = tokenize(doc)
+        for term, tf in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.append(row, tf)
+        self._doc_len[row] = len(tokens)
+        self._alive[row] = True
+        self._total_len += len(tokens)
+        self._live += 1
+
+    def _remove(self, row: int) -> None:
+        self._alive[row] = False
+        self._total_len -= float(self._doc_len[row])
+        self._live -= 1
+        self._row_of.pop(self._ids[row], None)
+        self._by_source[self._metas[row].get("source")].discard(row)
+
+    def _set_meta(self, row: int, meta: dict) -> None:
+        self._by_source[self._metas[row].get("source")].discard(row)
+        self._metas[row] = meta
+        self._by_source[meta.get("source")].add(row)
+
+    def _filter_mask(self, where: Optional[dict]) -> Optional[np.ndarray]:
+        """Equality-only metadata filter (the subset of Chroma ``where`` we use)."""
+        if not where:
+            return None
+        if any(k.startswith("$") or isinstance(v, dict) for k, v in where.items()):
+            raise ValueError("Local RAG index supports equality filters only")
+        n = len(self._ids)
+        mask = np.zeros(n, dtype=bool)
+        if set(where) == {"source"}:
+            rows = list(self._by_source.get(where["source"], ()))
+            mask[rows] = True
+            return mask
+        for row in np.flatnonzero(self._alive[:n]).tolist():
+            meta = self._metas[row]
+            if all(meta.get(k) == v for k, v in where.items()):
+                mask[row] = True
+        return mask
+
+    def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        if self._embedding_fn is None or not texts:
+            return None
+        try:
+            return np.asarray(self._embedding_fn(texts), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"[RAG] Local index embedding failed, using BM25 only: {e}")
+            return None
+
+    def _prepare_vectors(self, vectors: Optional[np.ndarray], count: int) -> Optional[np.ndarray]:
+        """Normalize to unit length; fix the index dimension on first use."""
+        if vectors is None or vectors.ndim != 2 or len(vectors) != count:
+            return np.zeros((count, self._dim), dtype=np.float32) if self._dim else None
+        if not self._dim:
+            self._dim = vectors.shape[1]
+        elif vectors.shape[1] != self._dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} != index dimension {self._dim}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _ensure_vector_capacity(self, rows: int) -> None:
+        if rows <= self._vec_capacity:
+            return
+        capacity = max(INITIAL_CAPACITY, self._vec_capacity * 2, rows)
+        vec_path = self._file("vectors.f32")
+        if self._vectors is not None:
+            self._vectors.flush()
+        with open(vec_path, "ab"):
+            pass
+        os.truncate(vec_path, capacity * self._dim * 4)
+        self._vectors = np.memmap(vec_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+        self._vec_capacity = capacity
+        with open(self._file("meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self._dim, "capacity": capacity}, f)
@@ -0,0 +1,197 @@
+"""
+redaction.py — Shared single-pass secret redaction
+
+A Redactor compiles its rules into ONE alternation of named groups, so a
+text is scanned once no matter how many rules there are (the old per-module
+loops re-scanned the whole text once per pattern). Before the regex runs, a
+literal prefilter checks for the fixed substrings the anchored rules need
+("sk-", "ghp_", ...) and the pass only includes the rules that can match;
+with none left the text is returned untouched. The alternation starts with
+a lookahead on the characters a match can begin with, which lets the regex
+engine skip every other position without trying each branch.
+
+Patterns are written for linear-time matching: possessive quantifiers so a
+failed candidate never backtracks through a long run, and run-start
+lookbehinds so a long token is scanned once instead of once per offset.
+tests/load/redaction_bench.py checks the scaling on adversarial inputs.
+
+Streaming: Redactor.stream() returns a RedactionStream that accepts text in
+arbitrary chunks (e.g. LLM tokens) and only releases text that no secret can
+still extend into, so a key split across two chunks is still redacted.
+
+Usage:
+    from app.core.redaction import MEMORY_REDACTOR
+    safe = MEMORY_REDACTOR.redact(text)
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Sequence
+
+REDACTED = "[REDACTED]"
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One secret shape.
+
+    ``literals``: substrings of which every match contains at least one
+    (compared case-insensitively when ``ignore_case``); None means the rule
+    always runs. ``first``: regex character-class body for the characters a
+    match can start with; None if unknown.
+    """
+
+    name: str
+    pattern: str
+    literals: Optional[tuple[str, ...]] = None
+    ignore_case: bool = False
+    first: Optional[str] = None
+
+
+class Redactor:
+    def __init__(self, rules: Sequence[Rule], replacement: str = REDACTED) -> None:
+        if not rules:
+            raise ValueError("Redactor needs at least one rule")
+        self.rules = tuple(rules)
+        self.replacement = replacement
+        self._compiled: dict[tuple[int, ...], re.Pattern[str]] = {}
+        self._all = self._pattern(tuple(range(len(self.rules))))
+
+    def _pattern(self, selected: tuple[int, ...]) -> re.Pattern[str]:
+        pattern = self._compiled.get(selected)
+        if pattern is None:
+            pattern = self._compiled[selected] = self._compile(self.rules[i] for i in selected)
+        return pattern
+
+    @staticmethod
+    def _compile(rules: Iterable[Rule]) -> re.Pattern[str]:
+        rules = list(rules)
+        parts = []
+        for rule in rules:
+            body = f"(?i:{rule.pattern})" if rule.ignore_case else rule.pattern
+            parts.append(f"(?P<{rule.name}>{body})")
+        alternation = "|".join(parts)
+        if all(rule.first for rule in rules):
+            alternation = f"(?=[{''.join(rule.first for rule in rules)}])(?:{alternation})"
+        return re.compile(alternation)
+
+    def _pattern_for(self, text: str) -> Optional[re.Pattern[str]]:
+        folded = None
+        selected = []
+        for i, rule in enumerate(self.rules):
+            if not rule.literals:
+                selected.append(i)
+                continue
+            haystack = text
+            if rule.ignore_case:
+                if folded is None:
+                    folded = text.casefold()
+                haystack = folded
+            if any(lit in haystack for lit in rule.literals):
+                selected.append(i)
+        return self._pattern(tuple(selected)) if selected else None
+
+    def redact(self, text: str) -> str:
+        pattern = self._pattern_for(text)
+        if pattern is None:
+            return text
+        return pattern.sub(self.replacement, text)
+
+    def findings(self, text: str) -> Iterator[str]:
+        """Names of the rules that match, in order of appearance."""
+        pattern = self._pattern_for(text)
+        if pattern is not None:
+            for match in pattern.finditer(text):
+                yield match.lastgroup
+
+    def stream(self, max_holdback: int = 4096) -> "RedactionStream":
+        return RedactionStream(self, max_holdback=max_holdback)
+
+
+_LAST_WHITESPACE = re.compile(r"\s(?=\S*\Z)")
+# Stand-in for "more text follows": long enough to complete any partial match
+_CONTINUATION = "x" * 64
+_SPAN_LOOKBACK = 256
+
+
+class RedactionStream:
+    """
+    Incremental redaction over chunked text.
+
+    feed() returns the redacted text that is safe to emit so far. The
+    unreleased tail starts after the last whitespace (no rule matches across
+    whitespace except a "key: value" pair, which is held back whole), and is
+    capped at ``max_holdback`` characters so output never stalls for long.
+    Call flush() at the end of the stream.
+    """
+
+    def __init__(self, redactor: Redactor, max_holdback: int = 4096) -> None:
+        self._redactor = redactor
+        self._max_holdback = max_holdback
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        cut = self._safe_cut()
+        ready, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._redactor.redact(ready) if ready else ""
+
+    def flush(self) -> str:
+        ready, self._buffer = self._buffer, ""
+        return self._redactor.redact(ready) if ready else ""
+
+    def _safe_cut(self) -> int:
+        buffer = self._buffer
+        if len(buffer) > self._max_holdback:
+            return len(buffer)
+        last = _LAST_WHITESPACE.search(buffer)
+        if last is None:
+            return 0
+        cut = last.end()
+        # Don't split a match that more text could extend across the cut
+        probe = buffer[:cut] + _CONTINUATION
+        for match in self._redactor._all.finditer(probe, max(0, cut - _SPAN_LOOKBACK)):
+            if match.start() >= cut:
+                break
+            if match.end() > cut:
+                return match.start()
+        return cut
+
+
+# ---------------------------------------------------------------------------
+# Rule sets
+# ---------------------------------------------------------------------------
+
+_B64 = "A-Za-z0-9+/"
+
+# Stored agent memory (app.core.agent_memory): broad — fail closed
+MEMORY_RULES = (
+    Rule(
+        "credential",
+        r"(?:api[_-]?key|bearer|token|secret|password|passwd|pwd)\s*+[:=]\s*+\S++",
+        literals=("api", "bearer", "token", "secret", "passw", "pwd"),
+        ignore_case=True,
+        first="aAbBtTsSpP",
+    ),
+    Rule("openai_key", r"sk-[A-Za-z0-9]{20,}+", literals=("sk-",), first="s"),
+    Rule("perplexity_key", r"pplx-[A-Za-z0-9]{20,}+", literals=("pplx-",), first="p"),
+    Rule("base64_blob", rf"(?<![{_B64}])[{_B64}]{{40,}}+={{0,2}}", first=_B64),
+)
+
+# Outbound prompts (app.core.model_routes): precise — don't mangle code
+PROMPT_RULES = (
+    Rule("openai_key", r"\bsk-[A-Za-z0-9]{16,}+\b", literals=("sk-",), first="s"),
+    Rule("github_token", r"\bghp_[A-Za-z0-9]{16,}+\b", literals=("ghp_",), first="g"),
+    Rule("slack_token", r"\bxox[baprs]-[A-Za-z0-9-]{10,}\b", literals=("xox",), first="x"),
+    Rule(
+        "jwt",
+        # last segment stays greedy: it may need to give back a trailing "-" to end on \b
+        r"\beyJ[A-Za-z0-9_-]{10,}+\.[A-Za-z0-9_-]{10,}+\.[A-Za-z0-9_-]{10,}\b",
+        literals=("eyJ",),
+        first="e",
+    ),
+)
+
+MEMORY_REDACTOR = Redactor(MEMORY_RULES)
+PROMPT_REDACTOR = Redactor(PROMPT_RULES)
@@ -1,4 +1,8 @@
+from typing import AsyncIterator, Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
@@ -21,3 +25,70 @@ def get_db():
         raise
     finally:
         db.close()
+
+
+# ---------------------------------------------------------------------------
+# Async engine (asyncpg) — used by the hot API routes so a request waiting on
+# Postgres doesn't hold one of Starlette's threadpool workers. Built on first
+# use: Celery workers and scripts only ever touch the sync engine above.
+# ---------------------------------------------------------------------------
+
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+
+
+def async_db_url(url: str) -> str:
+    """Swap a sync driver URL (postgresql://, postgresql+psycopg2://, sqlite://) onto its asyncio driver."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None or parsed.get_driver_name() == driver:
+        return url
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        url = settings.HYPERCODE_ASYNC_DB_URL or async_db_url(settings.HYPERCODE_DB_URL)
+        kwargs = {}
+        if make_url(url).get_backend_name() != "sqlite":
+            kwargs = dict(
+                pool_size=settings.DB_ASYNC_POOL_SIZE,
+                max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+                pool_timeout=30,
+                pool_recycle=1800,
+                pool_pre_ping=True,
+            )
+        _async_engine = create_async_engine(url, **kwargs)
+    return _async_engine
+
+
+def get_async_session_factory() -> async_sessionmaker[AsyncSession]:
+    global _async_session_factory
+    if _async_session_factory is None:
+        # expire_on_commit=False: response models read attributes after commit,
+        # which would otherwise trigger lazy IO outside the session's greenlet
+        _async_session_factory = async_sessionmaker(
+            get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with get_async_session_factory()() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_session_factory = None
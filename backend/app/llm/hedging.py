@@ -0,0 +1,454 @@
+"""
+Hedged provider racing and per-provider circuit breakers for the Brain.
+
+The LLM fallback chain used to be strictly sequential, so a hung provider
+cost its full timeout before the next one was even tried. hedged_call() walks
+the same chain, but when the running provider has not answered within its
+hedge deadline the next provider is started *in parallel*; the first valid
+answer wins and every other attempt is cancelled. A provider that fails
+outright hands over immediately, exactly like the old fallback.
+
+Hedge deadline per provider = the p95 of its recent latencies, clamped to
+[LLM_HEDGE_MIN_DELAY_SECONDS, configured deadline]. Until enough samples
+exist the configured deadline (LLM_HEDGE_DELAYS) is used. Full-response
+latency (hedged_call) and time to first token (hedged_stream) are kept in
+separate windows. An attempt cancelled because it lost the race adds a
+censored sample (it took *at least* this long); the p95 is a Kaplan-Meier
+estimate over both kinds, so hedging doesn't bias the deadline towards the
+winners.
+
+Each provider also has a circuit breaker fed by the same rolling window:
+  closed     — normal
+  open       — recent error rate (or consecutive failures) crossed the
+               threshold; the provider is skipped for LLM_BREAKER_COOLDOWN_SECONDS
+  half_open  — cool-down elapsed; one probe request decides open vs closed
+
+hedged_stream() applies the same race to streamed answers, on time to first
+token: a provider that hasn't produced a token within its hedge deadline
+gets the next one started alongside it, the first to produce a token wins
+and is streamed to the end, and the others are cancelled. If the winner
+fails mid-stream, StreamInterrupted tells the caller its text is partial.
+Each attempt runs in its own task and feeds a queue, so provider streams are
+opened, read and closed within one task.
+
+Routing decisions are exported as hypercode_llm_* Prometheus metrics.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SIZE = 100
+MIN_SAMPLES_FOR_P95 = 20
+MIN_SAMPLES_FOR_ERROR_RATE = 10
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+FULL, TTFT = "full", "ttft"  # latency windows: whole answer, time to first token
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+ROUTE_ATTEMPTS = Counter(
+    "hypercode_llm_route_attempts_total",
+    "LLM provider attempts by outcome (success, error, cancelled, skipped_open)",
+    ["provider", "outcome"],
+)
+ROUTE_WINS = Counter("hypercode_llm_route_wins_total", "Requests answered by each provider", ["provider"])
+HEDGES = Counter("hypercode_llm_hedges_total", "Providers started early because the previous one was slow", ["provider"])
+PROVIDER_LATENCY = Histogram(
+    "hypercode_llm_provider_latency_seconds",
+    "Latency of completed provider attempts",
+    ["provider"],
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+BREAKER_STATE = Gauge(
+    "hypercode_llm_circuit_state", "Circuit breaker state (0=closed, 1=half_open, 2=open)", ["provider"]
+)
+
+
+class ProviderError(Exception):
+    """A provider failed; ``response`` is the text to return if it was the last resort."""
+
+    def __init__(self, message: str, response: Optional[str] = None) -> None:
+        super().__init__(message)
+        self.response = response
+
+
+class StreamInterrupted(ProviderError):
+    """The winning stream failed after it had produced tokens; what was received is incomplete."""
+
+
+@dataclass(frozen=True)
+class Attempt:
+    provider: str
+    call: Callable[[], Awaitable[str]]
+
+
+@dataclass(frozen=True)
+class StreamAttempt:
+    provider: str
+    open: Callable[[], AsyncGenerator[str, None]]
+
+
+class ProviderHealth:
+    """Rolling latency/error window plus circuit breaker for one provider."""
+
+    def __init__(
+        self,
+        provider: str,
+        *,
+        deadline_seconds: float,
+        min_delay_seconds: float,
+        error_rate_threshold: float,
+        consecutive_failures: int,
+        cooldown_seconds: float,
+    ) -> None:
+        self.provider = provider
+        self.deadline_seconds = deadline_seconds
+        self.min_delay_seconds = min_delay_seconds
+        self.error_rate_threshold = error_rate_threshold
+        self.consecutive_failures_threshold = consecutive_failures
+        self.cooldown_seconds = cooldown_seconds
+        self._window: Deque[Tuple[bool, float]] = deque(maxlen=WINDOW_SIZE)
+        # (latency, censored) per kind; censored = cancelled before it finished
+        self._latencies: Dict[str, Deque[Tuple[float, bool]]] = {
+            FULL: deque(maxlen=WINDOW_SIZE),
+            TTFT: deque(maxlen=WINDOW_SIZE),
+        }
+        self._consecutive_failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        BREAKER_STATE.labels(provider).set(0)
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (claims the probe when half-open)."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def hedge_delay(self, kind: str = FULL) -> float:
+        samples = sorted(self._latencies[kind])
+        if len(samples) < MIN_SAMPLES_FOR_P95:
+            return self.deadline_seconds
+        # Kaplan-Meier: a censored sample only says "slower than this", so it
+        # leaves the risk set without counting as an answer at that latency
+        survival, at_risk = 1.0, len(samples)
+        for latency, censored in samples:
+            if not censored:
+                survival *= 1 - 1 / at_risk
+                if survival <= 0.05 + 1e-9:  # p95 reached (tolerance for float products)
+                    return max(self.min_delay_seconds, min(self.deadline_seconds, latency))
+            at_risk -= 1
+        return self.deadline_seconds  # too many losers to see the tail
+
+    def record_latency(self, latency: float, kind: str = FULL) -> None:
+        self._latencies[kind].append((latency, False))
+
+    def record_success(self, latency: float) -> None:
+        self._window.append((True, latency))
+        self._latencies[FULL].append((latency, False))
+        self._consecutive_failures = 0
+        self._probe_in_flight = False
+        if self._state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self, latency: float) -> None:
+        self._window.append((False, latency))
+        self._consecutive_failures += 1
+        was_probe, self._probe_in_flight = self._probe_in_flight, False
+        if was_probe or self._should_open():
+            self._opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def release(self) -> None:
+        """Attempt was abandoned unfinished — no verdict on provider health."""
+        self._probe_in_flight = False
+
+    def record_cancelled(self, elapsed: float, kind: str = FULL) -> None:
+        """Attempt lost a race after ``elapsed`` seconds: a censored latency sample, no health verdict."""
+        self._latencies[kind].append((elapsed, True))
+        self.release()
+
+    def error_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        return sum(1 for ok, _ in self._window if not ok) / len(self._window)
+
+    def _should_open(self) -> bool:
+        if self._consecutive_failures >= self.consecutive_failures_threshold:
+            return True
+        return len(self._window) >= MIN_SAMPLES_FOR_ERROR_RATE and self.error_rate() >= self.error_rate_threshold
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logger.warning(f"[BRAIN] Circuit for {self.provider}: {self._state} -> {state}")
+        self._state = state
+        BREAKER_STATE.labels(self.provider).set(_STATE_VALUES[state])
+
+
+class ProviderHealthRegistry:
+    def __init__(self) -> None:
+        self._providers: Dict[str, ProviderHealth] = {}
+
+    def get(self, provider: str) -> ProviderHealth:
+        health = self._providers.get(provider)
+        if health is None:
+            health = self._providers[provider] = ProviderHealth(
+                provider,
+                deadline_seconds=_configured_deadlines().get(provider, settings.LLM_HEDGE_DEFAULT_DELAY_SECONDS),
+                min_delay_seconds=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+                error_rate_threshold=settings.LLM_BREAKER_ERROR_RATE,
+                consecutive_failures=settings.LLM_BREAKER_CONSECUTIVE_FAILURES,
+                cooldown_seconds=settings.LLM_BREAKER_COOLDOWN_SECONDS,
+            )
+        return health
+
+    def reset(self) -> None:
+        self._providers.clear()
+
+    def get_stats(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "state": health.state,
+                "error_rate": round(health.error_rate(), 3),
+                "hedge_delay_seconds": round(health.hedge_delay(FULL), 3),
+                "ttft_hedge_delay_seconds": round(health.hedge_delay(TTFT), 3),
+            }
+            for name, health in self._providers.items()
+        }
+
+
+def _configured_deadlines() -> Dict[str, float]:
+    """Parse LLM_HEDGE_DELAYS ("ollama=15,openrouter=10")."""
+    deadlines: Dict[str, float] = {}
+    for item in settings.LLM_HEDGE_DELAYS.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            try:
+                deadlines[name.strip()] = float(value)
+            except ValueError:
+                logger.warning(f"Ignoring invalid LLM_HEDGE_DELAYS entry: {item!r}")
+    return deadlines
+
+
+provider_health = ProviderHealthRegistry()
+
+
+async def hedged_call(attempts: List[Attempt], *, hedge: bool = True) -> Tuple[str, str]:
+    """Run ``attempts`` in fallback order with hedging; return (provider, answer).
+
+    Raises the ProviderError of the last provider in the chain that failed
+    if nobody produced an answer.
+    """
+    candidates = _admitted(attempts)
+    position = {a.provider: i for i, a in enumerate(attempts)}
+    running: Dict[asyncio.Task, Tuple[Attempt, float]] = {}
+    failures: List[Tuple[int, ProviderError]] = []
+
+    def launch(hedged: bool) -> None:
+        attempt = candidates.pop(0)
+        if hedged:
+            HEDGES.labels(attempt.provider).inc()
+            logger.info(f"[BRAIN] Hedging: starting {attempt.provider} alongside slower providers")
+        task = asyncio.ensure_future(attempt.call())
+        running[task] = (attempt, time.monotonic())
+
+    try:
+        launch(hedged=False)
+        while running:
+            timeout = None
+            if hedge and candidates:
+                newest, started = max(running.values(), key=lambda item: item[1])
+                timeout = max(0.0, provider_health.get(newest.provider).hedge_delay(FULL) - (time.monotonic() - started))
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                launch(hedged=True)
+                continue
+
+            failed_now = False
+            for task in done:
+                attempt, started = running.pop(task)
+                exc = task.exception()
+                record_outcome(attempt.provider, time.monotonic() - started, ok=exc is None)
+                if exc is None:
+                    return attempt.provider, task.result()
+                error = exc if isinstance(exc, ProviderError) else ProviderError(str(exc))
+                failures.append((position[attempt.provider], error))
+                failed_now = True
+
+            # A failure hands over to the next provider straight away
+            if candidates and failed_now:
+                launch(hedged=False)
+    finally:
+        for attempt in candidates:
+            provider_health.get(attempt.provider).release()
+        for task, (attempt, started) in running.items():
+            task.cancel()
+            provider_health.get(attempt.provider).record_cancelled(time.monotonic() - started, FULL)
+            ROUTE_ATTEMPTS.labels(attempt.provider, "cancelled").inc()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    if failures:
+        raise max(failures, key=lambda item: item[0])[1]
+    raise ProviderError("no provider attempted")
+
+
+_END_OF_STREAM = object()
+
+
+async def _pump(attempt: StreamAttempt, queue: asyncio.Queue, first_token: asyncio.Future) -> None:
+    """Read one provider's stream into ``queue``; resolves ``first_token`` on the first token."""
+    try:
+        async with aclosing(attempt.open()) as stream:
+            async for token in stream:
+                queue.put_nowait(token)
+                if not first_token.done():
+                    first_token.set_result(None)
+    finally:
+        queue.put_nowait(_END_OF_STREAM)
+
+
+async def hedged_stream(attempts: List[StreamAttempt], *, hedge: bool = True) -> AsyncIterator[str]:
+    """Stream from the first of ``attempts`` to produce a token, hedging on time to first token.
+
+    Raises the ProviderError of the last provider in the chain that failed
+    if none of them produced a stream, and StreamInterrupted if the winner
+    fails after its first token (the tokens already yielded are partial).
+    """
+    candidates = _admitted(attempts)
+    position = {a.provider: i for i, a in enumerate(attempts)}
+    running: Dict[asyncio.Task, Tuple[StreamAttempt, float, asyncio.Queue, asyncio.Future]] = {}
+    failures: List[Tuple[int, ProviderError]] = []
+
+    def launch(hedged: bool) -> None:
+        attempt = candidates.pop(0)
+        if hedged:
+            HEDGES.labels(attempt.provider).inc()
+            logger.info(f"[BRAIN] Hedging: starting {attempt.provider} stream alongside slower providers")
+        queue: asyncio.Queue = asyncio.Queue()
+        first_token = asyncio.get_running_loop().create_future()
+        task = asyncio.ensure_future(_pump(attempt, queue, first_token))
+        running[task] = (attempt, time.monotonic(), queue, first_token)
+
+    async def cancel(tasks: List[asyncio.Task]) -> None:
+        for task in tasks:
+            attempt, started, _, first_token = running.pop(task)
+            task.cancel()
+            health = provider_health.get(attempt.provider)
+            if first_token.done():  # the winner, abandoned by the caller mid-stream
+                health.release()
+            else:
+                health.record_cancelled(time.monotonic() - started, TTFT)
+            ROUTE_ATTEMPTS.labels(attempt.provider, "cancelled").inc()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        winner = None
+        launch(hedged=False)
+        while running and winner is None:
+            timeout = None
+            if hedge and candidates:
+                newest, started, *_ = max(running.values(), key=lambda item: item[1])
+                timeout = max(0.0, provider_health.get(newest.provider).hedge_delay(TTFT) - (time.monotonic() - started))
+            waitables = {}
+            for task, (_, _, _, first_token) in running.items():
+                waitables[task] = waitables[first_token] = task
+            done, _ = await asyncio.wait(waitables, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                launch(hedged=True)
+                continue
+
+            failed_now = False
+            for task in {waitables[fut] for fut in done}:
+                attempt, started, _, first_token = running[task]
+                if first_token.done() or task.exception() is None:  # a token, or an empty stream
+                    winner = task
+                    provider_health.get(attempt.provider).record_latency(time.monotonic() - started, TTFT)
+                    break
+                running.pop(task)
+                exc = task.exception()
+                record_outcome(attempt.provider, time.monotonic() - started, ok=False)
+                logger.warning(f"[BRAIN] {attempt.provider} stream failed before its first token: {exc}")
+                error = exc if isinstance(exc, ProviderError) else ProviderError(str(exc))
+                failures.append((position[attempt.provider], error))
+                failed_now = True
+
+            # A failure hands over to the next provider straight away
+            if winner is None and candidates and failed_now:
+                launch(hedged=False)
+
+        if winner is None:
+            if failures:
+                raise max(failures, key=lambda item: item[0])[1]
+            raise ProviderError("no provider attempted")
+
+        await cancel([task for task in running if task is not winner])
+        attempt, started, queue, _ = running[winner]
+        # the winner stays in ``running`` so finally cancels it if the caller stops reading early
+        while (token := await queue.get()) is not _END_OF_STREAM:
+            yield token
+        await asyncio.wait([winner])
+        running.pop(winner)
+        exc = winner.exception()
+        # Full stream duration: feeds the breaker and the FULL window, not the TTFT deadline
+        record_outcome(attempt.provider, time.monotonic() - started, ok=exc is None)
+        if exc is not None:
+            logger.warning(f"[BRAIN] {attempt.provider} stream interrupted: {exc}")
+            raise StreamInterrupted(f"{attempt.provider} stream interrupted: {exc}") from exc
+    finally:
+        for attempt in candidates:
+            provider_health.get(attempt.provider).release()
+        await cancel(list(running))
+
+
+def admit(provider: str) -> bool:
+    """Breaker check for one provider; counts the skip when it is open."""
+    if provider_health.get(provider).allow():
+        return True
+    ROUTE_ATTEMPTS.labels(provider, "skipped_open").inc()
+    return False
+
+
+def record_outcome(provider: str, latency: float, ok: bool) -> None:
+    """Feed one finished attempt into the provider's breaker and the metrics."""
+    health = provider_health.get(provider)
+    PROVIDER_LATENCY.labels(provider).observe(latency)
+    if ok:
+        health.record_success(latency)
+        ROUTE_ATTEMPTS.labels(provider, "success").inc()
+        ROUTE_WINS.labels(provider).inc()
+    else:
+        health.record_failure(latency)
+        ROUTE_ATTEMPTS.labels(provider, "error").inc()
+
+
+def _admitted(attempts: List[Attempt]) -> List[Attempt]:
+    """Drop providers whose breaker is open; never drop the last resort."""
+    admitted = [attempt for attempt in attempts if admit(attempt.provider)]
+    if not admitted and attempts:
+        admitted.append(attempts[-1])
+    return admitted
@@ -0,0 +1,211 @@
+"""
+Pooled httpx clients for the LLM providers the Brain routes to.
+
+Every provider gets one long-lived ``httpx.AsyncClient`` with its own
+connection pool, so consecutive LLM calls reuse keep-alive (and TLS)
+connections instead of paying connection setup on every request. HTTP/2 is
+negotiated for providers that support it when the optional ``h2`` package is
+installed.
+
+Clients are bound to the event loop that created them. The API process has
+one loop for its lifetime and closes the registry on shutdown; each Celery
+worker process runs its tasks on one loop of its own and closes the registry
+when the process shuts down. A client found on a different (dead) loop is
+simply replaced.
+
+Pool utilisation is exposed through get_stats() and as ``hypercode_llm_pool_*``
+gauges on the Prometheus /metrics endpoint.
+
+Usage:
+    client = http_clients.get("ollama")
+    response = await client.post(...)
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+CONNECT_TIMEOUT_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class ProviderPool:
+    """Pool settings for one provider."""
+
+    timeout_seconds: float
+    http2: bool = False
+
+
+# Ollama is plain HTTP/1.1 on the internal network; the cloud APIs speak h2.
+PROVIDERS: Dict[str, ProviderPool] = {
+    "ollama": ProviderPool(timeout_seconds=120.0),
+    "perplexity": ProviderPool(timeout_seconds=60.0, http2=True),
+    "openrouter": ProviderPool(timeout_seconds=60.0, http2=True),
+}
+
+
+class HttpClientRegistry:
+    """Lazily created, per-provider pooled AsyncClients."""
+
+    def __init__(
+        self,
+        providers: Optional[Dict[str, ProviderPool]] = None,
+        *,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+    ) -> None:
+        self._providers = dict(PROVIDERS if providers is None else providers)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http2 = http2 and HTTP2_AVAILABLE
+        self._clients: Dict[str, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """Pooled client for ``provider`` on the running event loop."""
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(provider)
+        if entry is not None and entry[0] is loop and not entry[1].is_closed:
+            return entry[1]
+        if entry is not None:
+            # Created on a loop that has since finished (Celery task); its
+            # sockets went with that loop, so just start a fresh pool.
+            self._stats(provider)["replaced"] += 1
+        client = self._build(provider)
+        self._clients[provider] = (loop, client)
+        return client
+
+    async def aclose(self) -> None:
+        """Close every client owned by the running loop and forget the rest."""
+        loop = asyncio.get_running_loop()
+        clients, self._clients = self._clients, {}
+        for provider, (owner, client) in clients.items():
+            if owner is not loop:
+                continue
+            try:
+                await client.aclose()
+            except Exception:
+                logger.warning(f"Closing {provider} HTTP client failed", exc_info=True)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        result: Dict[str, Dict[str, Any]] = {}
+        for provider in self._providers:
+            entry = self._clients.get(provider)
+            pool = _pool_usage(entry[1]) if entry is not None else {}
+            result[provider] = {
+                "open": entry is not None and not entry[1].is_closed,
+                "max_connections": self._limits.max_connections,
+                "connections": pool.get("connections", 0),
+                "active": pool.get("active", 0),
+                "idle": pool.get("idle", 0),
+                "queued": pool.get("queued", 0),
+                **self._stats(provider),
+            }
+        return result
+
+    def _build(self, provider: str) -> httpx.AsyncClient:
+        pool = self._providers.get(provider)
+        if pool is None:
+            raise KeyError(f"Unknown LLM provider: {provider}")
+        stats = self._stats(provider)
+        stats["created"] += 1
+
+        async def _count_request(request: httpx.Request) -> None:
+            stats["requests"] += 1
+
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(pool.timeout_seconds, connect=CONNECT_TIMEOUT_SECONDS),
+            limits=self._limits,
+            http2=self._http2 and pool.http2,
+            event_hooks={"request": [_count_request]},
+        )
+
+    def _stats(self, provider: str) -> Dict[str, int]:
+        stats = self.stats.get(provider)
+        if stats is None:
+            stats = self.stats[provider] = {"created": 0, "replaced": 0, "requests": 0}
+        return stats
+
+
+def _pool_usage(client: httpx.AsyncClient) -> Dict[str, int]:
+    """Connection counts read from the client's httpcore pool (best effort)."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", ()) or ())
+    idle = 0
+    for conn in connections:
+        try:
+            idle += bool(conn.is_idle())
+        except Exception:
+            pass
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "queued": len(getattr(pool, "_requests", ()) or ()),
+    }
+
+
+class _PoolCollector:
+    """Prometheus collector that reads pool usage at scrape time."""
+
+    def __init__(self, registry: HttpClientRegistry) -> None:
+        self._registry = registry
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        gauges = {
+            name: GaugeMetricFamily(f"hypercode_llm_pool_{name}", help_text, labels=["provider"])
+            for name, help_text in (
+                ("connections", "Open connections in the provider pool"),
+                ("active", "Connections currently serving a request"),
+                ("idle", "Keep-alive connections waiting for reuse"),
+                ("queued", "Requests waiting for a free connection"),
+                ("max_connections", "Configured pool size"),
+            )
+        }
+        requests = CounterMetricFamily(
+            "hypercode_llm_pool_requests", "Requests sent through the provider pool", labels=["provider"]
+        )
+        for provider, stats in self._registry.get_stats().items():
+            for name, gauge in gauges.items():
+                gauge.add_metric([provider], stats[name])
+            requests.add_metric([provider], stats["requests"])
+        yield from gauges.values()
+        yield requests
+
+
+def _register_collector(registry: HttpClientRegistry) -> None:
+    try:
+        from prometheus_client import REGISTRY
+    except ImportError:
+        return
+    try:
+        REGISTRY.register(_PoolCollector(registry))
+    except ValueError:
+        # Already registered (module reloaded)
+        pass
+
+
+http_clients = HttpClientRegistry(
+    max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    http2=settings.LLM_HTTP2,
+)
+_register_collector(http_clients)
@@ -0,0 +1,171 @@
+"""
+Token streaming helpers for the Brain.
+
+Parsers turn provider wire formats into plain text deltas:
+  - Ollama /api/generate with "stream": true  — NDJSON, one {"response": ...} per line
+  - OpenAI-style /chat/completions (OpenRouter, Perplexity) — SSE "data: {...}" lines
+
+A token sink is an async callable that receives each delta as it arrives.
+stream_tokens_to() installs one for the current task (context-local), and
+Brain.think() forwards tokens to it while still returning the full text, so
+agents that call think() need no changes to be streamed.
+
+EventTokenRelay is the sink the Celery worker uses: it batches deltas into
+``llm_tokens`` events on the existing hypercode:events:channel pub/sub, which
+/ws/events already fans out to the dashboard. A "stream_abandoned" event
+means the deltas before it came from a provider that failed mid-answer;
+the replacement answer follows as new deltas. Token events are published live
+only — they are not appended to the stored event history.
+"""
+from __future__ import annotations
+
+import contextvars
+import datetime
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+TokenSink = Callable[[str], Awaitable[None]]
+
+TOKEN_EVENT_CHANNEL = "llm_tokens"
+RELAY_FLUSH_SECONDS = 0.05
+RELAY_MAX_BUFFER_CHARS = 512
+
+_token_sink: contextvars.ContextVar[Optional[TokenSink]] = contextvars.ContextVar("llm_token_sink", default=None)
+
+
+@contextmanager
+def stream_tokens_to(sink: TokenSink) -> Iterator[None]:
+    """Send every Brain token produced inside this block to ``sink``."""
+    reset = _token_sink.set(sink)
+    try:
+        yield
+    finally:
+        _token_sink.reset(reset)
+
+
+def current_token_sink() -> Optional[TokenSink]:
+    return _token_sink.get()
+
+
+async def abandon_stream(sink: TokenSink) -> None:
+    """Tell ``sink`` the tokens it received so far are void (if it cares: ``abandon()``)."""
+    abandon = getattr(sink, "abandon", None)
+    if abandon is not None:
+        await abandon()
+
+
+# ── Wire-format parsers ──────────────────────────────────────────────────────
+
+async def iter_ollama_tokens(response: httpx.Response) -> AsyncIterator[str]:
+    """Deltas from a streaming Ollama /api/generate response."""
+    async for line in response.aiter_lines():
+        if not line.strip():
+            continue
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+        token = chunk.get("response")
+        if token:
+            yield token
+        if chunk.get("done"):
+            return
+
+
+async def iter_sse_chat_tokens(response: httpx.Response) -> AsyncIterator[str]:
+    """Deltas from an OpenAI-style streaming /chat/completions response."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if not data:
+            continue
+        chunk = json.loads(data)
+        for choice in chunk.get("choices") or ():
+            token = (choice.get("delta") or {}).get("content")
+            if token:
+                yield token
+
+
+# ── Event relay ──────────────────────────────────────────────────────────────
+
+class EventTokenRelay:
+    """Token sink that publishes batched deltas as live events.
+
+    The first delta is published immediately (time-to-first-token); after
+    that, deltas are coalesced for RELAY_FLUSH_SECONDS or until the buffer
+    reaches RELAY_MAX_BUFFER_CHARS, so a fast model does not turn into one
+    pub/sub message per token. Publishing is best-effort and never fails the
+    task.
+    """
+
+    def __init__(self, redis: Any, *, task_id: Any = None, agent_id: str = "brain") -> None:
+        self._redis = redis
+        self._task_id = "" if task_id is None else str(task_id)
+        self._agent_id = agent_id
+        self._buffer: list[str] = []
+        self._buffered_chars = 0
+        self._last_flush = 0.0
+        self._seq = 0
+        self.published = 0
+
+    async def __call__(self, token: str) -> None:
+        self._buffer.append(token)
+        self._buffered_chars += len(token)
+        if (
+            self._seq == 0
+            or self._buffered_chars >= RELAY_MAX_BUFFER_CHARS
+            or time.monotonic() - self._last_flush >= RELAY_FLUSH_SECONDS
+        ):
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        delta = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+        self._seq += 1
+        await self._publish("streaming", {"seq": self._seq, "delta": delta})
+
+    async def abandon(self) -> None:
+        """The deltas sent so far were a failed attempt; listeners should discard them."""
+        self._buffer.clear()
+        self._buffered_chars = 0
+        if self._seq:
+            self._seq += 1
+            await self._publish("stream_abandoned", {"seq": self._seq})
+
+    async def aclose(self) -> None:
+        """Flush what is left and tell listeners the stream is complete."""
+        await self.flush()
+        if self._seq:
+            await self._publish("stream_end", {"seq": self._seq + 1})
+
+    async def _publish(self, status: str, payload: dict) -> None:
+        from app.ws.events_broadcaster import EVENTS_CHANNEL_KEY
+
+        event = {
+            "id": str(uuid.uuid4()),
+            "channel": TOKEN_EVENT_CHANNEL,
+            "agentId": self._agent_id,
+            "taskId": self._task_id,
+            "status": status,
+            "payload": payload,
+            "timestamp": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        try:
+            await self._redis.publish(EVENTS_CHANNEL_KEY, json.dumps(event))
+            self.published += 1
+        except Exception:
+            logger.debug("Token relay publish failed", exc_info=True)
@@ -8,6 +8,7 @@ from app.core.config import settings
 from app.core.telemetry import setup_telemetry
 from app.api.api import api_router
 from app.core.http_security import SecurityHeadersMiddleware, RateLimitMiddleware, RateLimitConfig
+from app.core.http_metrics import http_metrics
 from app.db.base_class import Base
 from app.db.session import engine
 import app.models.models as _models
@@ -52,8 +53,18 @@ async def _shutdown_event() -> None:
     global _metrics_redis
     logger.info("Shutdown initiated...")
     if _metrics_redis is not None:
+        await http_metrics.stop(_metrics_redis)
         await _metrics_redis.aclose()
-    from app.db.session import engine as _engine
+    from app.ws.pubsub_hub import hub as _pubsub_hub
+    await _pubsub_hub.close()
+    from app.llm.http_clients import http_clients as _http_clients
+    await _http_clients.aclose()
+    from app.core.agent_memory import memory_store as _memory_store
+    await _memory_store.aclose()
+    from app.core.rag import async_rag as _async_rag
+    _async_rag.close()
+    from app.db.session import dispose_async_engine, engine as _engine
+    await dispose_async_engine()
     _engine.dispose()
     logger.info("Graceful shutdown complete")
 
@@ -82,6 +93,7 @@ async def _startup_validate_security() -> None:
         )
         await _metrics_redis.ping()
         logger.info("Metrics Redis client connected")
+        http_metrics.start(_metrics_redis)
         # Start background heartbeat so dashboard shows this service as an active agent
         asyncio.create_task(_core_heartbeat_loop())
     except Exception:
@@ -90,22 +102,27 @@ async def _startup_validate_security() -> None:
 async def _core_heartbeat_loop() -> None:
     """
     Publishes hypercode-core heartbeat to Redis every 10s.
-    Key: agents:heartbeat:hypercode-core  (TTL 30s)
+    Key: agents:heartbeat:hypercode-core  (TTL 30s), indexed in agents:heartbeat_index
     Read by GET /api/v1/agents/status to populate the dashboard agent count.
     """
+    from app.core import key_registry
+
     key = "agents:heartbeat:hypercode-core"
     while True:
         if _metrics_redis is not None:
             try:
-                await _metrics_redis.hset(
-                    key,
-                    mapping={
-                        "name": "hypercode-core",
-                        "status": "online",
-                        "last_seen": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
-                    },
-                )
-                await _metrics_redis.expire(key, 30)
+                async with _metrics_redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(
+                        key,
+                        mapping={
+                            "name": "hypercode-core",
+                            "status": "online",
+                            "last_seen": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+                        },
+                    )
+                    pipe.expire(key, key_registry.HEARTBEAT_TTL_SECONDS)
+                    key_registry.register_heartbeat(pipe, "hypercode-core")
+                    await pipe.execute()
             except Exception:
                 pass
         await asyncio.sleep(10)
@@ -127,6 +144,8 @@ app.add_middleware(
         enabled=settings.RATE_LIMIT_ENABLED,
         window_seconds=settings.RATE_LIMIT_WINDOW_SECONDS,
         max_requests=settings.RATE_LIMIT_MAX_REQUESTS,
+        backend=settings.RATE_LIMIT_BACKEND,
+        redis_url=settings.HYPERCODE_REDIS_URL,
     ),
     exempt_paths=(
         "/health",
@@ -142,28 +161,13 @@ app.add_middleware(
 async def _http_metrics_middleware(request: Request, call_next):
     """
     Task 10 — HTTP metrics middleware.
-    Writes per-minute request counts, response times, and error counts to Redis.
+    Records per-minute request counts, error counts and a latency histogram
+    in memory; app.core.http_metrics flushes them to Redis once per second.
     Keys consumed by GET /api/v1/metrics to build MetricsSnapshot.
     """
     t0 = time.monotonic()
     response = await call_next(request)
-    elapsed_ms = round((time.monotonic() - t0) * 1000, 2)
-
-    if _metrics_redis is not None:
-        try:
-            minute_key = datetime.datetime.utcnow().strftime("%Y%m%d%H%M")
-            async with _metrics_redis.pipeline(transaction=False) as pipe:
-                pipe.incr(f"req_count:{minute_key}")
-                pipe.expire(f"req_count:{minute_key}", 120)
-                pipe.lpush("response_times", elapsed_ms)
-                pipe.ltrim("response_times", 0, 99)
-                if response.status_code >= 400:
-                    pipe.incr(f"error_count:{minute_key}")
-                    pipe.expire(f"error_count:{minute_key}", 120)
-                await pipe.execute()
-        except Exception:
-            pass  # Never let metrics writing break a real request
-
+    http_metrics.record(response.status_code, (time.monotonic() - t0) * 1000)
     return response
 
 
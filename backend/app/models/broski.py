@@ -5,7 +5,7 @@ import enum
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import DateTime, Enum, ForeignKey, Integer, String, Text, JSON
+from sqlalchemy import DateTime, Enum, ForeignKey, Index, Integer, String, Text, UniqueConstraint, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -57,6 +57,15 @@ class BROskiWallet(Base):
     transactions: Mapped[list[BROskiTransaction]] = relationship(back_populates="wallet", cascade="all, delete-orphan")
     earned_achievements: Mapped[list[BROskiUserAchievement]] = relationship(back_populates="wallet", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Leaderboard fallback when Redis is down: index-only scan for top-N and rank counts
+        Index(
+            "ix_broski_wallets_leaderboard",
+            coins.desc(), xp.desc(), user_id,
+            postgresql_include=["level", "level_name"],
+        ),
+    )
+
 
 class BROskiTransaction(Base):
     __tablename__ = "broski_transactions"
@@ -95,5 +104,10 @@ class BROskiUserAchievement(Base):
     achievement_slug: Mapped[str] = mapped_column(String(64), ForeignKey("broski_achievements.slug"), nullable=False)
     earned_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+    # One unlock per wallet: the achievement engine's INSERT ... ON CONFLICT relies on it
+    __table_args__ = (
+        UniqueConstraint("wallet_id", "achievement_slug", name="uq_broski_user_achievement"),
+    )
+
     wallet: Mapped[BROskiWallet] = relationship(back_populates="earned_achievements")
     achievement: Mapped[BROskiAchievement] = relationship(back_populates="earned_by")
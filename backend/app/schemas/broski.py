@@ -81,3 +81,4 @@ class LeaderboardEntry(BaseModel):
     xp: int
     level: int
     level_name: str
+    rank: Optional[int] = None
@@ -0,0 +1,201 @@
+"""
+achievements.py — Rule-driven BROski$ achievement engine
+
+Rules are pure predicates over a context snapshot (counts the caller already
+has: tasks completed today, missions started, ...), so evaluating all of
+them costs nothing until one passes. Per evaluation the engine then issues:
+
+  1. one SELECT for the users' wallets (missing ones are created),
+  2. one INSERT ... ON CONFLICT DO NOTHING RETURNING for every candidate
+     unlock; the unique (wallet_id, achievement_slug) constraint decides
+     which are new, so two concurrent evaluations can't both pay out,
+  3. one ledger UPDATE per rewarded user (broski_service.apply_ledger),
+
+and commits once. evaluate_many() chunks large batches (nightly
+recalculation) so a single transaction never locks too many wallets.
+
+The achievement catalog (names, rewards) is cached in-process. The cache
+carries a version that seed_achievements() bumps when it changes the table,
+and expires after CATALOG_TTL_SECONDS so other processes pick changes up.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Mapping, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.broski import (
+    BROskiAchievement,
+    BROskiUserAchievement,
+    BROskiWallet,
+    TransactionType,
+)
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TTL_SECONDS = 300.0
+BATCH_SIZE = 500
+
+
+@dataclass(frozen=True)
+class Rule:
+    slug: str
+    applies: Callable[[Mapping], bool]
+
+
+RULES: tuple[Rule, ...] = (
+    Rule("first_blood", lambda ctx: ctx.get("tasks_completed_total", 0) >= 1),
+    Rule("streak_3", lambda ctx: ctx.get("tasks_completed_today", 0) >= 3),
+    Rule("mission_launch", lambda ctx: ctx.get("missions_started_total", 0) >= 1),
+    Rule("hyperfocus_hero", lambda ctx: ctx.get("tasks_completed_session", 0) >= 5),
+    Rule("early_bird", lambda ctx: bool(ctx.get("completed_before_9am", False))),
+)
+
+
+@dataclass(frozen=True)
+class AchievementDef:
+    slug: str
+    name: str
+    description: str
+    xp_reward: int
+    coin_reward: int
+
+    @property
+    def message(self) -> str:
+        return f"Achievement unlocked: {self.name}! {self.description} 🏆"
+
+
+# ── Catalog cache ─────────────────────────────────────────────────────
+class _Catalog:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded: Optional[tuple[int, float, dict[str, AchievementDef]]] = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+
+    def get(self, db: Session) -> dict[str, AchievementDef]:
+        loaded = self._loaded
+        if loaded is not None:
+            version, loaded_at, defs = loaded
+            if version == self._version and time.monotonic() - loaded_at < CATALOG_TTL_SECONDS:
+                return defs
+        version = self._version
+        defs = {
+            a.slug: AchievementDef(a.slug, a.name, a.description, a.xp_reward or 0, a.coin_reward or 0)
+            for a in db.scalars(select(BROskiAchievement))
+        }
+        self._loaded = (version, time.monotonic(), defs)
+        return defs
+
+
+catalog = _Catalog()
+
+
+# ── Engine ────────────────────────────────────────────────────────────
+def _insert_ignore(db: Session):
+    """INSERT that skips rows violating a unique constraint, where the dialect supports it."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(BROskiUserAchievement)
+    return dialect_insert(BROskiUserAchievement).on_conflict_do_nothing(
+        index_elements=["wallet_id", "achievement_slug"]
+    )
+
+
+def _wallet_ids(db: Session, user_ids: Iterable[int]) -> dict[int, int]:
+    from app.services.broski_service import _ensure_wallet
+
+    user_ids = list(user_ids)
+    rows = db.execute(
+        select(BROskiWallet.user_id, BROskiWallet.id).where(BROskiWallet.user_id.in_(user_ids))
+    )
+    wallets = dict(rows.all())
+    missing = [uid for uid in user_ids if uid not in wallets]
+    if missing:
+        for uid in missing:
+            _ensure_wallet(uid, db)
+        rows = db.execute(
+            select(BROskiWallet.user_id, BROskiWallet.id).where(BROskiWallet.user_id.in_(missing))
+        )
+        wallets.update(rows.all())
+    return wallets
+
+
+def evaluate(
+    db: Session,
+    contexts: Mapping[int, Mapping],
+    commit: bool = True,
+) -> dict[int, list[str]]:
+    """
+    Evaluate every rule for each user's context and award new unlocks in
+    one transaction. Returns {user_id: [unlock messages]} for users with any.
+    """
+    defs = catalog.get(db)
+    candidates = {
+        user_id: [rule.slug for rule in RULES if rule.slug in defs and rule.applies(ctx)]
+        for user_id, ctx in contexts.items()
+    }
+    candidates = {uid: slugs for uid, slugs in candidates.items() if slugs}
+    if not candidates:
+        return {}
+
+    from app.services import broski_service
+
+    wallets = _wallet_ids(db, candidates)
+    user_by_wallet = {wallet_id: uid for uid, wallet_id in wallets.items()}
+    rows = [
+        {"wallet_id": wallets[uid], "achievement_slug": slug}
+        for uid, slugs in candidates.items()
+        for slug in slugs
+    ]
+    inserted = db.execute(
+        _insert_ignore(db).returning(BROskiUserAchievement.wallet_id, BROskiUserAchievement.achievement_slug),
+        rows,
+    ).all()
+
+    unlocked: dict[int, list[AchievementDef]] = {}
+    for wallet_id, slug in inserted:
+        unlocked.setdefault(user_by_wallet[wallet_id], []).append(defs[slug])
+
+    for user_id, achievements in unlocked.items():
+        entries = [
+            broski_service.LedgerEntry(
+                f"Achievement: {a.name}", coins=a.coin_reward, xp=a.xp_reward, type=TransactionType.bonus,
+            )
+            for a in achievements
+        ]
+        broski_service.apply_ledger(user_id, entries, db, commit=False)
+    if commit:
+        db.commit()
+
+    messages = {uid: [a.message for a in achievements] for uid, achievements in unlocked.items()}
+    for uid, msgs in messages.items():
+        for msg in msgs:
+            logger.info("🏆 %s — user %s", msg, uid)
+    return messages
+
+
+def evaluate_many(
+    db: Session,
+    contexts: Mapping[int, Mapping],
+    batch_size: int = BATCH_SIZE,
+) -> dict[int, list[str]]:
+    """evaluate() over a large user set, one transaction per ``batch_size`` users."""
+    results: dict[int, list[str]] = {}
+    user_ids = list(contexts)
+    for start in range(0, len(user_ids), batch_size):
+        chunk = {uid: contexts[uid] for uid in user_ids[start:start + batch_size]}
+        results.update(evaluate(db, chunk))
+    return results
@@ -2,17 +2,21 @@
 from __future__ import annotations
 
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import Optional, Sequence
 
+from sqlalchemy import case, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.services import achievements, leaderboard
 from app.models.broski import (
     BROskiWallet,
     BROskiTransaction,
     BROskiAchievement,
-    BROskiUserAchievement,
     TransactionType,
+    XP_LEVELS,
     xp_to_level,
 )
 
@@ -65,11 +69,13 @@ SEED_ACHIEVEMENTS = [
 
 def seed_achievements(db: Session) -> None:
     """Insert seed achievements if they don't exist yet."""
-    for data in SEED_ACHIEVEMENTS:
-        exists = db.query(BROskiAchievement).filter_by(slug=data["slug"]).first()
-        if not exists:
-            db.add(BROskiAchievement(**data))
+    existing = set(db.scalars(select(BROskiAchievement.slug)))
+    missing = [data for data in SEED_ACHIEVEMENTS if data["slug"] not in existing]
+    if missing:
+        db.add_all(BROskiAchievement(**data) for data in missing)
     db.commit()
+    if missing:
+        achievements.catalog.invalidate()
 
 
 # ── Wallet helpers ────────────────────────────────────────────────────
@@ -84,34 +90,117 @@ def _get_or_create_wallet(user_id: int, db: Session) -> BROskiWallet:
     return wallet
 
 
-def _log_transaction(
-    wallet: BROskiWallet,
-    amount: int,
-    tx_type: TransactionType,
-    reason: str,
+def _ensure_wallet(user_id: int, db: Session) -> bool:
+    """Create the wallet inside the current transaction; False if it already exists."""
+    try:
+        with db.begin_nested():
+            db.add(BROskiWallet(user_id=user_id))
+    except IntegrityError:
+        return False
+    return True
+
+
+def _level_case(xp):
+    """SQL CASE mapping an XP expression onto (level, level_name) per XP_LEVELS."""
+    ordered = sorted(XP_LEVELS, reverse=True)
+    level = case(*((xp >= threshold, lvl) for threshold, lvl, _ in ordered), else_=1)
+    name = case(*((xp >= threshold, name) for threshold, _, name in ordered), else_=XP_LEVELS[0][2])
+    return level, name
+
+
+# ── Ledger ────────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class LedgerEntry:
+    """One credit/debit. ``coins`` < 0 is a spend; ``xp`` is logged as its own row."""
+
+    reason: str
+    coins: int = 0
+    xp: int = 0
+    type: Optional[TransactionType] = None
+    meta: Optional[dict] = None
+
+
+@dataclass
+class LedgerResult:
+    wallet: BROskiWallet
+    level_up: Optional[str] = None
+
+
+def apply_ledger(
+    user_id: int,
+    entries: Sequence[LedgerEntry],
     db: Session,
-    meta: Optional[dict] = None,
-) -> BROskiTransaction:
-    tx = BROskiTransaction(
-        wallet_id=wallet.id,
-        amount=amount,
-        type=tx_type,
-        reason=reason,
-        meta=meta,
+    commit: bool = True,
+) -> LedgerResult:
+    """
+    Apply a batch of entries atomically: one UPDATE ... RETURNING moves the
+    balances (level and level name are computed in the same statement), one
+    bulk INSERT writes the transaction rows. A net debit only applies while
+    the balance covers it, so concurrent spends can't overdraw. Raises
+    ValueError when it doesn't, after rolling back unless the caller owns
+    the transaction (``commit=False``).
+    """
+    d_coins = sum(e.coins for e in entries)
+    d_xp = sum(e.xp for e in entries)
+    new_xp = BROskiWallet.xp + d_xp
+    level, level_name = _level_case(new_xp)
+    stmt = (
+        update(BROskiWallet)
+        .where(BROskiWallet.user_id == user_id)
+        .values(coins=BROskiWallet.coins + d_coins, xp=new_xp, level=level, level_name=level_name)
+        .returning(BROskiWallet)
+        .execution_options(synchronize_session=False, populate_existing=True)
     )
-    db.add(tx)
-    return tx
+    if d_coins < 0:
+        stmt = stmt.where(BROskiWallet.coins >= -d_coins)
 
+    wallet = db.scalars(stmt).one_or_none()
+    if wallet is None and _ensure_wallet(user_id, db):
+        logger.info("🆕 BROski$ wallet created for user %s", user_id)
+        wallet = db.scalars(stmt).one_or_none()
+    if wallet is None:
+        balance = db.query(BROskiWallet.coins).filter_by(user_id=user_id).scalar() or 0
+        if commit:
+            db.rollback()
+        raise ValueError(
+            f"Not enough BROski$ coins — you need {-d_coins - balance} more! 💸"
+        )
 
-def _check_level_up(wallet: BROskiWallet) -> Optional[str]:
-    new_level, new_name = xp_to_level(wallet.xp)
-    if new_level != wallet.level:
-        wallet.level = new_level
-        wallet.level_name = new_name
-        msg = f"LEVEL UP BROski! You're now a {new_name}! 🔥"
-        logger.info("🎉 %s — user %s", msg, wallet.user_id)
-        return msg
-    return None
+    rows = []
+    for e in entries:
+        if e.coins:
+            tx_type = e.type or (TransactionType.earn if e.coins > 0 else TransactionType.spend)
+            rows.append(dict(wallet_id=wallet.id, amount=e.coins, type=tx_type, reason=e.reason, meta=e.meta))
+        if e.xp:
+            rows.append(dict(wallet_id=wallet.id, amount=e.xp, type=e.type or TransactionType.earn,
+                             reason=f"XP: {e.reason}", meta=e.meta))
+    if rows:
+        db.execute(insert(BROskiTransaction), rows)
+
+    leaderboard.stage(db, user_id, wallet.coins, wallet.xp)
+
+    level_up = None
+    if xp_to_level(wallet.xp - d_xp)[0] != wallet.level:
+        level_up = f"LEVEL UP BROski! You're now a {wallet.level_name}! 🔥"
+        logger.info("🎉 %s — user %s", level_up, user_id)
+    if commit:
+        db.commit()
+    logger.info("🔥 BROski$ ledger: %+d coins, %+d xp for user %s (%d entries)",
+                d_coins, d_xp, user_id, len(entries))
+    return LedgerResult(wallet, level_up)
+
+
+def _claim_once(user_id: int, column, not_since: datetime, db: Session) -> bool:
+    """Atomically stamp ``column`` with now unless it is already >= not_since."""
+    stmt = (
+        update(BROskiWallet)
+        .where(BROskiWallet.user_id == user_id, or_(column.is_(None), column < not_since))
+        .values({column.key: datetime.now(timezone.utc)})
+        .execution_options(synchronize_session=False)
+    )
+    if db.execute(stmt).rowcount:
+        return True
+    return _ensure_wallet(user_id, db) and bool(db.execute(stmt).rowcount)
 
 
 # ── Public API ────────────────────────────────────────────────────────
@@ -126,13 +215,7 @@ def award_coins(
     db: Session,
     meta: Optional[dict] = None,
 ) -> BROskiWallet:
-    wallet = _get_or_create_wallet(user_id, db)
-    wallet.coins += amount
-    _log_transaction(wallet, amount, TransactionType.earn, reason, db, meta)
-    db.commit()
-    db.refresh(wallet)
-    logger.info("🔥 BROski$ awarded: +%d coins to user %s (%s)", amount, user_id, reason)
-    return wallet
+    return apply_ledger(user_id, [LedgerEntry(reason, coins=amount, meta=meta)], db).wallet
 
 
 def award_xp(
@@ -143,14 +226,8 @@ def award_xp(
     meta: Optional[dict] = None,
 ) -> tuple[BROskiWallet, Optional[str]]:
     """Returns (wallet, level_up_message_or_None)."""
-    wallet = _get_or_create_wallet(user_id, db)
-    wallet.xp += amount
-    _log_transaction(wallet, amount, TransactionType.earn, f"XP: {reason}", db, meta)
-    level_up_msg = _check_level_up(wallet)
-    db.commit()
-    db.refresh(wallet)
-    logger.info("⚡ BROski$ XP awarded: +%d xp to user %s (%s)", amount, user_id, reason)
-    return wallet, level_up_msg
+    result = apply_ledger(user_id, [LedgerEntry(reason, xp=amount, meta=meta)], db)
+    return result.wallet, result.level_up
 
 
 def spend_coins(
@@ -160,18 +237,16 @@ def spend_coins(
     db: Session,
     meta: Optional[dict] = None,
 ) -> BROskiWallet:
-    wallet = _get_or_create_wallet(user_id, db)
-    if wallet.coins < amount:
-        shortfall = amount - wallet.coins
-        raise ValueError(
-            f"Not enough BROski$ coins — you need {shortfall} more! 💸"
-        )
-    wallet.coins -= amount
-    _log_transaction(wallet, -amount, TransactionType.spend, reason, db, meta)
-    db.commit()
-    db.refresh(wallet)
-    logger.info("💸 BROski$ spent: -%d coins from user %s (%s)", amount, user_id, reason)
-    return wallet
+    return apply_ledger(user_id, [LedgerEntry(reason, coins=-amount, meta=meta)], db).wallet
+
+
+def award_task_completion(user_id: int, db: Session) -> LedgerResult:
+    """+10 coins / +25 XP per finished task, +15 XP for the first one each UTC day."""
+    start_of_day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    entries = [LedgerEntry("Task completed", coins=10, xp=25)]
+    if _claim_once(user_id, BROskiWallet.last_first_task_date, start_of_day, db):
+        entries.append(LedgerEntry("First task of the day bonus!", xp=15))
+    return apply_ledger(user_id, entries, db)
 
 
 def get_transactions(
@@ -193,82 +268,23 @@ def check_and_award_achievements(
     context: Optional[dict] = None,
 ) -> list[str]:
     """Evaluate achievements and award any not yet earned. Returns list of unlock messages."""
-    wallet = _get_or_create_wallet(user_id, db)
-    context = context or {}
-    unlocked: list[str] = []
-
-    earned_slugs = {
-        ua.achievement_slug for ua in wallet.earned_achievements
-    }
-
-    def _unlock(slug: str) -> None:
-        if slug in earned_slugs:
-            return
-        achievement = db.query(BROskiAchievement).filter_by(slug=slug).first()
-        if not achievement:
-            return
-        ua = BROskiUserAchievement(wallet_id=wallet.id, achievement_slug=slug)
-        db.add(ua)
-        wallet.coins += achievement.coin_reward
-        wallet.xp += achievement.xp_reward
-        _log_transaction(
-            wallet, achievement.coin_reward, TransactionType.bonus,
-            f"Achievement: {achievement.name}", db,
-        )
-        _check_level_up(wallet)
-        db.commit()
-        db.refresh(wallet)
-        earned_slugs.add(slug)
-        msg = f"Achievement unlocked: {achievement.name}! {achievement.description} 🏆"
-        unlocked.append(msg)
-        logger.info("🏆 %s — user %s", msg, user_id)
-
-    # first_blood — has completed at least 1 task
-    if context.get("tasks_completed_total", 0) >= 1:
-        _unlock("first_blood")
-
-    # streak_3 — 3+ tasks completed today
-    if context.get("tasks_completed_today", 0) >= 3:
-        _unlock("streak_3")
+    return achievements.evaluate(db, {user_id: context or {}}).get(user_id, [])
 
-    # mission_launch — has started a mission
-    if context.get("missions_started_total", 0) >= 1:
-        _unlock("mission_launch")
 
-    # hyperfocus_hero — 5+ tasks in session
-    if context.get("tasks_completed_session", 0) >= 5:
-        _unlock("hyperfocus_hero")
+def get_leaderboard(db: Session, limit: int = 10) -> list[leaderboard.Standing]:
+    return leaderboard.top(db, limit)
 
-    # early_bird — task completed before 9 AM today
-    if context.get("completed_before_9am", False):
-        _unlock("early_bird")
 
-    return unlocked
-
-
-def get_leaderboard(db: Session, limit: int = 10) -> list[BROskiWallet]:
-    return (
-        db.query(BROskiWallet)
-        .order_by(BROskiWallet.coins.desc(), BROskiWallet.xp.desc())
-        .limit(limit)
-        .all()
-    )
+def get_rank(user_id: int, db: Session) -> Optional[leaderboard.Standing]:
+    return leaderboard.rank_of(db, user_id)
 
 
 def handle_daily_login(user_id: int, db: Session) -> tuple[BROskiWallet, bool]:
     """Award 5 coins for daily login (once per 24h). Returns (wallet, awarded_bool)."""
-    wallet = _get_or_create_wallet(user_id, db)
-    now = datetime.now(timezone.utc)
-    last = wallet.last_daily_login
-    # Normalise to aware datetime regardless of DB backend (SQLite stores naive)
-    if last is not None and last.tzinfo is None:
-        last = last.replace(tzinfo=timezone.utc)
-    if last and (now - last) < timedelta(hours=24):
-        return wallet, False
-    wallet.last_daily_login = now
-    wallet.coins += 5
-    _log_transaction(wallet, 5, TransactionType.earn, "Daily login bonus", db)
-    db.commit()
-    db.refresh(wallet)
+    since = datetime.now(timezone.utc) - timedelta(hours=24)
+    if not _claim_once(user_id, BROskiWallet.last_daily_login, since, db):
+        db.commit()  # end the no-op claim's transaction so it doesn't hold the write lock
+        return _get_or_create_wallet(user_id, db), False
+    result = apply_ledger(user_id, [LedgerEntry("Daily login bonus", coins=5)], db)
     logger.info("📅 Daily login bonus +5 coins for user %s", user_id)
-    return wallet, True
+    return result.wallet, True
@@ -0,0 +1,275 @@
+"""
+leaderboard.py — BROski$ leaderboard mirrored into a Redis sorted set
+
+The ranking (coins DESC, xp DESC) is kept in one ZSET so top-N is a
+ZREVRANGE and "my rank" a ZREVRANK, both O(log n), instead of sorting the
+wallet table on every request.
+
+  - Writes: broski_service.apply_ledger stages the wallet's new totals on
+    the Session; they are ZADDed after the transaction commits (and dropped
+    on rollback), so Redis never shows a balance Postgres doesn't have.
+    Commits made on the event loop (AsyncSession.run_sync) hand the ZADD to
+    the default executor instead of blocking the loop.
+  - Reconciliation: reconcile() rebuilds the set from Postgres into a
+    scratch key, RENAMEs it over the live one and sets READY_KEY. Celery
+    beat runs it every 5 minutes (app.core.celery_app) to repair writes
+    missed while Redis was down or reordered between concurrent commits.
+  - Fallback: reads are only served from Redis while READY_KEY exists, so
+    a set rebuilt from scratch by ledger writes after a flush or restart
+    isn't mistaken for the full ranking. Otherwise (or with Redis
+    unreachable) they go to Postgres, served by the
+    ix_broski_wallets_leaderboard covering index. After a Redis error,
+    Redis is skipped for REDIS_BACKOFF_SECONDS so a dead server costs one
+    timeout, not one per request. top_async() / rank_of_async() do the
+    Redis half in the executor and the Postgres half through run_sync.
+
+Score encoding: coins * XP_SPAN + min(xp, XP_SPAN - 1), exact in a double
+while coins < 2**29.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import and_, event, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.broski import BROskiWallet, xp_to_level
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_KEY = "broski:leaderboard"
+READY_KEY = "broski:leaderboard:ready"
+XP_SPAN = 1 << 24
+REDIS_TIMEOUT_SECONDS = 0.25
+REDIS_BACKOFF_SECONDS = 30.0
+RECONCILE_BATCH = 5000
+
+_STAGED = "leaderboard_staged"
+
+_pool = None
+_pool_lock = threading.Lock()
+_down_until = 0.0
+
+
+@dataclass
+class Standing:
+    user_id: int
+    coins: int
+    xp: int
+    level: int
+    level_name: str
+    rank: Optional[int] = None
+
+
+def encode_score(coins: int, xp: int) -> float:
+    return float(coins * XP_SPAN + min(max(xp, 0), XP_SPAN - 1))
+
+
+def decode_score(score: float) -> tuple[int, int]:
+    coins, xp = divmod(int(score), XP_SPAN)
+    return coins, xp
+
+
+def _standing(user_id: int, coins: int, xp: int, rank: Optional[int] = None) -> Standing:
+    level, level_name = xp_to_level(xp)
+    return Standing(int(user_id), int(coins), int(xp), level, level_name, rank)
+
+
+# ── Redis client ──────────────────────────────────────────────────────
+def _get_redis():
+    """Pooled redis.Redis, or None while backing off after a failure."""
+    global _pool
+    if time.monotonic() < _down_until:
+        return None
+    try:
+        import redis
+        if _pool is None:
+            with _pool_lock:
+                if _pool is None:
+                    _pool = redis.ConnectionPool.from_url(
+                        settings.HYPERCODE_REDIS_URL,
+                        decode_responses=True,
+                        socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+                        socket_timeout=REDIS_TIMEOUT_SECONDS,
+                    )
+        return redis.Redis(connection_pool=_pool)
+    except Exception as exc:
+        _mark_down(exc)
+        return None
+
+
+def _mark_down(exc: Exception) -> None:
+    global _down_until
+    _down_until = time.monotonic() + REDIS_BACKOFF_SECONDS
+    logger.warning("[LEADERBOARD] Redis unavailable, using Postgres for %ss: %s", REDIS_BACKOFF_SECONDS, exc)
+
+
+# ── Write path ────────────────────────────────────────────────────────
+def stage(db: Session, user_id: int, coins: int, xp: int) -> None:
+    """Queue a wallet's new totals for the mirror; applied when ``db`` commits."""
+    db.info.setdefault(_STAGED, {})[user_id] = encode_score(coins, xp)
+
+
+def publish(scores: dict[int, float]) -> bool:
+    r = _get_redis()
+    if r is None or not scores:
+        return False
+    try:
+        r.zadd(LEADERBOARD_KEY, {str(uid): score for uid, score in scores.items()})
+        return True
+    except Exception as exc:
+        _mark_down(exc)
+        return False
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_staged(session: Session) -> None:
+    staged = session.info.pop(_STAGED, None)
+    if not staged:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        publish(staged)
+    else:
+        loop.run_in_executor(None, publish, staged)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_staged(session: Session) -> None:
+    session.info.pop(_STAGED, None)
+
+
+# ── Read path ─────────────────────────────────────────────────────────
+def top(db: Session, limit: int = 10) -> list[Standing]:
+    standings = _top_from_redis(limit)
+    return standings if standings is not None else _top_from_db(db, limit)
+
+
+def rank_of(db: Session, user_id: int) -> Optional[Standing]:
+    """1-based rank of ``user_id``, or None if they have no wallet."""
+    standing = _rank_from_redis(user_id)
+    return standing if standing is not None else _rank_from_db(db, user_id)
+
+
+async def top_async(db: AsyncSession, limit: int = 10) -> list[Standing]:
+    standings = await asyncio.get_running_loop().run_in_executor(None, _top_from_redis, limit)
+    if standings is not None:
+        return standings
+    return await db.run_sync(_top_from_db, limit)
+
+
+async def rank_of_async(db: AsyncSession, user_id: int) -> Optional[Standing]:
+    standing = await asyncio.get_running_loop().run_in_executor(None, _rank_from_redis, user_id)
+    if standing is not None:
+        return standing
+    return await db.run_sync(_rank_from_db, user_id)
+
+
+def _top_from_redis(limit: int) -> Optional[list[Standing]]:
+    """Top ``limit`` from the mirror, or None when Postgres has to answer."""
+    r = _get_redis()
+    if r is None:
+        return None
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.exists(READY_KEY)
+        pipe.zrevrange(LEADERBOARD_KEY, 0, limit - 1, withscores=True)
+        ready, rows = pipe.execute()
+    except Exception as exc:
+        _mark_down(exc)
+        return None
+    if not (ready and rows):
+        return None
+    return [_standing(uid, *decode_score(score), rank=i + 1) for i, (uid, score) in enumerate(rows)]
+
+
+def _rank_from_redis(user_id: int) -> Optional[Standing]:
+    r = _get_redis()
+    if r is None:
+        return None
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.exists(READY_KEY)
+        pipe.zrevrank(LEADERBOARD_KEY, str(user_id))
+        pipe.zscore(LEADERBOARD_KEY, str(user_id))
+        ready, rank, score = pipe.execute()
+    except Exception as exc:
+        _mark_down(exc)
+        return None
+    if not ready or rank is None:
+        return None
+    return _standing(user_id, *decode_score(score), rank=rank + 1)
+
+
+def _top_from_db(db: Session, limit: int) -> list[Standing]:
+    rows = db.execute(
+        select(BROskiWallet.user_id, BROskiWallet.coins, BROskiWallet.xp)
+        .order_by(BROskiWallet.coins.desc(), BROskiWallet.xp.desc())
+        .limit(limit)
+    )
+    return [_standing(uid, coins, xp, rank=i + 1) for i, (uid, coins, xp) in enumerate(rows)]
+
+
+def _rank_from_db(db: Session, user_id: int) -> Optional[Standing]:
+    mine = db.execute(
+        select(BROskiWallet.coins, BROskiWallet.xp).where(BROskiWallet.user_id == user_id)
+    ).one_or_none()
+    if mine is None:
+        return None
+    coins, xp = mine
+    ahead = db.scalar(
+        select(func.count()).select_from(BROskiWallet).where(
+            or_(BROskiWallet.coins > coins, and_(BROskiWallet.coins == coins, BROskiWallet.xp > xp))
+        )
+    )
+    return _standing(user_id, coins, xp, rank=ahead + 1)
+
+
+# ── Reconciliation ────────────────────────────────────────────────────
+def _batches(rows: Iterable[Any], size: int) -> Iterable[list[Any]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reconcile(db: Session, batch_size: int = RECONCILE_BATCH) -> int:
+    """Rebuild the mirror from Postgres; returns the number of wallets written (-1 if Redis is down)."""
+    r = _get_redis()
+    if r is None:
+        return -1
+    scratch = f"{LEADERBOARD_KEY}:rebuild"
+    written = 0
+    try:
+        r.delete(scratch)
+        rows = db.execute(
+            select(BROskiWallet.user_id, BROskiWallet.coins, BROskiWallet.xp)
+            .execution_options(yield_per=batch_size)
+        )
+        for batch in _batches(rows, batch_size):
+            r.zadd(scratch, {str(uid): encode_score(coins, xp) for uid, coins, xp in batch})
+            written += len(batch)
+        pipe = r.pipeline(transaction=True)
+        if written:
+            pipe.rename(scratch, LEADERBOARD_KEY)
+        else:
+            pipe.delete(LEADERBOARD_KEY)
+        pipe.set(READY_KEY, 1)
+        pipe.execute()
+    except Exception as exc:
+        _mark_down(exc)
+        return -1
+    logger.info("[LEADERBOARD] Reconciled %d wallets", written)
+    return written
@@ -1,11 +1,11 @@
 from app.core.celery_app import celery_app
 from celery import Task as CeleryTask
-from celery.signals import worker_ready
+from celery.signals import worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
 from app.agents.router import router
 from app.db.session import SessionLocal
 from app.models.models import Task, TaskStatus
 import asyncio
-from datetime import datetime, timezone
+from datetime import datetime
 import logging
 import os
 import threading
@@ -25,10 +25,12 @@ def _celery_heartbeat_thread() -> None:
     Uses the synchronous redis client — safe inside a Celery worker process.
     """
     import redis as _redis_sync
+    from app.core import key_registry
     r = _redis_sync.Redis.from_url(_REDIS_URL, decode_responses=True, socket_connect_timeout=3)
     while True:
         try:
-            r.hset(
+            pipe = r.pipeline(transaction=False)
+            pipe.hset(
                 _HEARTBEAT_KEY,
                 mapping={
                     "name": "celery-worker",
@@ -36,7 +38,9 @@ def _celery_heartbeat_thread() -> None:
                     "last_seen": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
                 },
             )
-            r.expire(_HEARTBEAT_KEY, 30)
+            pipe.expire(_HEARTBEAT_KEY, key_registry.HEARTBEAT_TTL_SECONDS)
+            key_registry.register_heartbeat(pipe, "celery-worker")
+            pipe.execute()
         except Exception as exc:
             logger.warning(f"Celery heartbeat failed (non-fatal): {exc}")
         time.sleep(10)
@@ -48,12 +52,81 @@ def _on_worker_ready(sender, **kwargs) -> None:
     t.start()
     logger.info("Celery worker heartbeat thread started — publishing to Redis every 10s")
 
+# One event loop per worker process: the pooled LLM and memory clients are
+# bound to the loop that created them, so tasks reuse them across runs and
+# they are closed once, when the process exits.
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _worker_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def _run(coro: Any) -> Any:
+    return _worker_loop().run_until_complete(coro)
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs) -> None:
+    _worker_loop()
+
+
+async def _close_pools() -> None:
+    from app.core.agent_memory import memory_store
+    from app.llm.http_clients import http_clients
+    await http_clients.aclose()
+    await memory_store.aclose()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect  # solo pool: tasks run in the main process
+def _on_worker_process_shutdown(**kwargs) -> None:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+    try:
+        _loop.run_until_complete(_close_pools())
+        _loop.run_until_complete(_loop.shutdown_asyncgens())
+    except Exception as exc:
+        logger.warning(f"[Worker] Closing client pools failed: {exc}")
+    finally:
+        _loop.close()
+        asyncio.set_event_loop(None)
+        _loop = None
+
+
 class AgentTask(CeleryTask):
     abstract = True
 
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         logger.error(f"[Worker] Task {task_id} failed: {exc}")
 
+async def _route_task(task_type: str, description: str, context: dict) -> Any:
+    """
+    Run one routed task on the worker process loop (pooled clients stay open).
+    With LLM_STREAM_TOKENS on, Brain tokens are relayed to /ws/events as they
+    arrive; the returned (and persisted) output is the same either way.
+    """
+    from app.core.config import settings
+    if not settings.LLM_STREAM_TOKENS:
+        return await router.route_task(task_type, description, context=context)
+
+    import redis.asyncio as aioredis
+    from app.llm.streaming import EventTokenRelay, stream_tokens_to
+    r = aioredis.from_url(_REDIS_URL, decode_responses=True, socket_connect_timeout=3)
+    relay = EventTokenRelay(r, task_id=context.get("task_id"), agent_id="celery-worker")
+    try:
+        with stream_tokens_to(relay):
+            return await router.route_task(task_type, description, context=context)
+    finally:
+        await relay.aclose()
+        await r.aclose()
+
+
 @celery_app.task(name="hypercode.tasks.process_agent_job")
 def process_agent_job(task_payload: dict):
     """
@@ -71,7 +144,7 @@ def process_agent_job(task_payload: dict):
         context = {"task_id": task_id, "conversation_id": f"task-{task_id}"}
         
         # Run the Router asynchronously
-        plan: Any = asyncio.run(router.route_task(task_type, description, context=context))
+        plan: Any = _run(_route_task(task_type, description, context))
         if not isinstance(plan, str) or not plan.strip():
             raise RuntimeError(f"Agent returned invalid output type={type(plan).__name__}")
         
@@ -90,15 +163,7 @@ def process_agent_job(task_payload: dict):
                 if old_status != TaskStatus.DONE:
                     from app.services import broski_service
                     user_id = task_record.assignee_id or task_record.project.owner_id
-                    broski_service.award_coins(user_id, 10, "Task completed", db)
-                    broski_service.award_xp(user_id, 25, "Task completed", db)
-                    wallet = broski_service.get_wallet(user_id, db)
-                    today = datetime.now(timezone.utc).date()
-                    last = wallet.last_first_task_date.astimezone(timezone.utc).date() if wallet.last_first_task_date else None
-                    if last is None or last < today:
-                        broski_service.award_xp(user_id, 15, "First task of the day bonus!", db)
-                        wallet.last_first_task_date = datetime.now(timezone.utc)
-                        db.commit()
+                    broski_service.award_task_completion(user_id, db)
             else:
                 logger.warning(f"[Worker] Task {task_id} not found in DB")
         except Exception as db_e:
@@ -123,3 +188,14 @@ def process_agent_job(task_payload: dict):
     except Exception as e:
         logger.error(f"[Worker] Error processing task {task_id}: {e}")
         return {"status": "failed", "error": str(e)}
+
+
+@celery_app.task(name="hypercode.tasks.reconcile_leaderboard")
+def reconcile_leaderboard() -> int:
+    """Beat task: rebuild the BROski$ leaderboard ZSET from Postgres."""
+    from app.services import leaderboard
+    db = SessionLocal()
+    try:
+        return leaderboard.reconcile(db)
+    finally:
+        db.close()
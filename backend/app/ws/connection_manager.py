@@ -0,0 +1,108 @@
+"""
+Shared WebSocket fan-out for the dashboard broadcasters.
+
+ConnectionManager gives every client a bounded send queue drained by its own
+sender task, so a broadcast is a non-blocking put per client and one slow
+socket never stalls the others. A client whose queue is full is a slow
+consumer: it is dropped and closed with 1013 (try again later) so the
+dashboard reconnects and resumes from fresh data.
+"""
+
+import asyncio
+import logging
+from typing import Dict
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = 32
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class ConnectionManager:
+    """Tracks connected WebSocket clients and fans frames out to them."""
+
+    def __init__(self, queue_size: int = SEND_QUEUE_SIZE) -> None:
+        self._queue_size = queue_size
+        self._queues: Dict[WebSocket, asyncio.Queue] = {}
+        self._senders: Dict[WebSocket, asyncio.Task] = {}
+        self.stats = {"sent": 0, "dropped_frames": 0, "dropped_clients": 0}
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    async def connect(self, ws: WebSocket) -> None:
+        await ws.accept()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        self._queues[ws] = queue
+        self._senders[ws] = asyncio.create_task(self._sender(ws, queue))
+
+    def disconnect(self, ws: WebSocket) -> None:
+        self._queues.pop(ws, None)
+        sender = self._senders.pop(ws, None)
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
+
+    def send(self, ws: WebSocket, data: str) -> bool:
+        """Queue one pre-encoded frame for a single client.
+
+        Returns False (and drops the client) if its queue is full.
+        """
+        queue = self._queues.get(ws)
+        if queue is None:
+            return False
+        try:
+            queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            self.stats["dropped_frames"] += 1
+            self._drop_slow_consumer(ws)
+            return False
+
+    async def broadcast(self, data: str) -> None:
+        """Queue one pre-encoded frame for every client without awaiting sends."""
+        for ws in list(self._queues):
+            self.send(ws, data)
+
+    def get_stats(self) -> dict:
+        depths = [q.qsize() for q in self._queues.values()]
+        return {
+            **self.stats,
+            "clients": len(self._queues),
+            "max_queue_depth": max(depths, default=0),
+            "queued_frames": sum(depths),
+        }
+
+    async def _sender(self, ws: WebSocket, queue: asyncio.Queue) -> None:
+        try:
+            while True:
+                data = await queue.get()
+                await ws.send_text(data)
+                self.stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket went away mid-send; the handler's finally also cleans up
+            self.disconnect(ws)
+
+    def _drop_slow_consumer(self, ws: WebSocket) -> None:
+        logger.warning("Dropping slow WebSocket consumer (send queue full)")
+        self.stats["dropped_clients"] += 1
+        self.disconnect(ws)
+        asyncio.create_task(_close_quietly(ws, SLOW_CONSUMER_CLOSE_CODE))
+
+
+async def _close_quietly(ws: WebSocket, code: int) -> None:
+    try:
+        await ws.close(code=code)
+    except Exception:
+        pass
+
+
+async def wait_for_disconnect(ws: WebSocket) -> None:
+    """Block until the client goes away, discarding anything it sends."""
+    while True:
+        message = await ws.receive()
+        if message["type"] == "websocket.disconnect":
+            return
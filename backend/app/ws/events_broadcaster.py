@@ -11,21 +11,23 @@ Redis storage:
 
 Event schema (stored as JSON):
   { id, channel, agentId, taskId, status, payload, timestamp }
+
+Live fanout goes through the process-wide pubsub_hub: one Redis subscription
+per process, each message decoded and framed once for all clients.
 """
 
-import asyncio
 import datetime
 import json
 import logging
 import uuid
-from typing import Optional, Set
+from typing import Optional
 
-import redis.asyncio as aioredis
 from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from app.core.config import settings
+from app.ws.connection_manager import SLOW_CONSUMER_CLOSE_CODE
+from app.ws.pubsub_hub import HubMessage, hub
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -55,30 +57,14 @@ class AgentEvent(BaseModel):
     timestamp: str
 
 
-# ── Connection manager ─────────────────────────────────────────────────────────
-
-class ConnectionManager:
-    def __init__(self) -> None:
-        self._clients: Set[WebSocket] = set()
-
-    async def connect(self, ws: WebSocket) -> None:
-        await ws.accept()
-        self._clients.add(ws)
+# ── Frame encoders (built once per message by the hub) ────────────────────────
 
-    def disconnect(self, ws: WebSocket) -> None:
-        self._clients.discard(ws)
+def _ws_event_frame(message: HubMessage) -> str:
+    return json.dumps({"channel": "ws_tasks", "data": message.data})
 
-    async def broadcast(self, data: str) -> None:
-        dead: Set[WebSocket] = set()
-        for ws in list(self._clients):
-            try:
-                await ws.send_text(data)
-            except Exception:
-                dead.add(ws)
-        self._clients -= dead
 
-
-_manager = ConnectionManager()
+def _sse_event_frame(message: HubMessage) -> str:
+    return f"data: {message.raw}\n\n"
 
 
 # ── REST: publish event (used internally by agents/healer) ────────────────────
@@ -97,15 +83,12 @@ async def publish_event(body: EventPublish) -> AgentEvent:
     )
     payload_json = event.model_dump_json()
 
-    r = await aioredis.from_url(settings.HYPERCODE_REDIS_URL, decode_responses=True)
-    try:
-        async with r.pipeline(transaction=False) as pipe:
-            pipe.rpush(EVENTS_LIST_KEY, payload_json)
-            pipe.ltrim(EVENTS_LIST_KEY, -MAX_STORED_EVENTS, -1)
-            pipe.publish(EVENTS_CHANNEL_KEY, payload_json)
-            await pipe.execute()
-    finally:
-        await r.aclose()
+    r = await hub.client()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.rpush(EVENTS_LIST_KEY, payload_json)
+        pipe.ltrim(EVENTS_LIST_KEY, -MAX_STORED_EVENTS, -1)
+        pipe.publish(EVENTS_CHANNEL_KEY, payload_json)
+        await pipe.execute()
 
     return event
 
@@ -119,28 +102,21 @@ async def sse_events(request: Request):
     Sends the last 20 stored events on connect, then streams new ones via Redis pub/sub.
     """
     async def event_generator():
-        r = await aioredis.from_url(settings.HYPERCODE_REDIS_URL, decode_responses=True)
-        pubsub = r.pubsub()
         try:
-            # Seed with history
-            history = await r.lrange(EVENTS_LIST_KEY, -20, -1)
-            for item in history:
-                yield f"data: {item}\n\n"
-
-            # Live stream
-            await pubsub.subscribe(EVENTS_CHANNEL_KEY)
-            async for message in pubsub.listen():
-                if await request.is_disconnected():
-                    break
-                if message.get("type") != "message":
-                    continue
-                yield f"data: {message['data']}\n\n"
+            # Subscribe before reading history so nothing published in
+            # between is lost
+            async with hub.subscribe(EVENTS_CHANNEL_KEY, encoder=_sse_event_frame) as sub:
+                r = await hub.client()
+                history = await r.lrange(EVENTS_LIST_KEY, -20, -1)
+                for item in history:
+                    yield f"data: {item}\n\n"
+
+                async for frame in sub:
+                    if await request.is_disconnected():
+                        break
+                    yield frame
         except Exception:
             logger.exception("SSE events stream error")
-        finally:
-            await pubsub.unsubscribe(EVENTS_CHANNEL_KEY)
-            await pubsub.close()
-            await r.aclose()
 
     return StreamingResponse(
         event_generator(),
@@ -161,33 +137,23 @@ async def ws_events(websocket: WebSocket) -> None:
     Sends last 20 stored events on connect, then live as they arrive.
     Clients connect to ws://hypercode-core:8000/api/v1/ws/events
     """
-    await _manager.connect(websocket)
-    r = await aioredis.from_url(settings.HYPERCODE_REDIS_URL, decode_responses=True)
-    pubsub = r.pubsub()
+    await websocket.accept()
     try:
-        # Seed history
-        history = await r.lrange(EVENTS_LIST_KEY, -20, -1)
-        for item in history:
-            seed_payload = json.loads(item)
-            await websocket.send_text(
-                json.dumps({"channel": "ws_tasks", "data": seed_payload})
-            )
-
-        # Live stream via pub/sub
-        await pubsub.subscribe(EVENTS_CHANNEL_KEY)
-        async for message in pubsub.listen():
-            if message.get("type") != "message":
-                continue
-            event_data = json.loads(message["data"])
-            await websocket.send_text(
-                json.dumps({"channel": "ws_tasks", "data": event_data})
-            )
+        async with hub.subscribe(EVENTS_CHANNEL_KEY, encoder=_ws_event_frame) as sub:
+            # Seed history
+            r = await hub.client()
+            history = await r.lrange(EVENTS_LIST_KEY, -20, -1)
+            for item in history:
+                await websocket.send_text(
+                    _ws_event_frame(HubMessage(EVENTS_CHANNEL_KEY, item))
+                )
+
+            # Live stream via the shared pub/sub hub
+            async for frame in sub:
+                await websocket.send_text(frame)
+            if sub.overflowed:
+                await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
     except WebSocketDisconnect:
         pass
     except Exception:
         logger.exception("ws_events connection error")
-    finally:
-        _manager.disconnect(websocket)
-        await pubsub.unsubscribe(EVENTS_CHANNEL_KEY)
-        await pubsub.close()
-        await r.aclose()
@@ -12,22 +12,22 @@ Log entry schema (JSON):
   { id, time, agent, level, msg }
 
 Agents/services push logs via RPUSH hypercode:logs + PUBLISH hypercode:logs:channel.
+Live fanout goes through the process-wide pubsub_hub (one subscription per
+process, one decode + encode per message).
 The existing dashboard.py /logs endpoint (JWT-gated) remains untouched.
 This module adds a public (no-auth) fast-path for the live dashboard.
 """
 
-import asyncio
-import datetime
 import json
 import logging
 import uuid
-from typing import List, Optional, Set
+from typing import List, Optional
 
-import redis.asyncio as aioredis
 from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 
-from app.core.config import settings
+from app.ws.connection_manager import SLOW_CONSUMER_CLOSE_CODE
+from app.ws.pubsub_hub import HubMessage, hub
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -52,30 +52,10 @@ class LogResponse(BaseModel):
     total: int
 
 
-# ── Connection manager ─────────────────────────────────────────────────────────
+# ── Frame encoder (built once per message by the hub) ─────────────────────────
 
-class ConnectionManager:
-    def __init__(self) -> None:
-        self._clients: Set[WebSocket] = set()
-
-    async def connect(self, ws: WebSocket) -> None:
-        await ws.accept()
-        self._clients.add(ws)
-
-    def disconnect(self, ws: WebSocket) -> None:
-        self._clients.discard(ws)
-
-    async def broadcast(self, data: str) -> None:
-        dead: Set[WebSocket] = set()
-        for ws in list(self._clients):
-            try:
-                await ws.send_text(data)
-            except Exception:
-                dead.add(ws)
-        self._clients -= dead
-
-
-_manager = ConnectionManager()
+def _live_log_frame(message: HubMessage) -> str:
+    return json.dumps({"channel": "logs:live", "data": message.data})
 
 
 # ── REST: GET /api/v1/logs (no auth) ──────────────────────────────────────────
@@ -91,11 +71,8 @@ async def get_logs(
     Optionally filter by level (info/warn/error/success) or agent name.
     No authentication required — suitable for the live dashboard panel.
     """
-    r = await aioredis.from_url(settings.HYPERCODE_REDIS_URL, decode_responses=True)
-    try:
-        raw_entries = await r.lrange(LOGS_LIST_KEY, -MAX_STORED_LOGS, -1)
-    finally:
-        await r.aclose()
+    r = await hub.client()
+    raw_entries = await r.lrange(LOGS_LIST_KEY, -MAX_STORED_LOGS, -1)
 
     entries: List[LogEntry] = []
     for raw in reversed(raw_entries):  # newest first
@@ -131,39 +108,27 @@ async def ws_logs(websocket: WebSocket) -> None:
     Live: sends new entries as `logs:live` channel messages.
     Clients connect to ws://hypercode-core:8000/api/v1/ws/logs
     """
-    await _manager.connect(websocket)
-    r = await aioredis.from_url(settings.HYPERCODE_REDIS_URL, decode_responses=True)
-    pubsub = r.pubsub()
+    await websocket.accept()
     try:
-        # Seed with history
-        history_raw = await r.lrange(LOGS_LIST_KEY, -20, -1)
-        for raw in history_raw:
-            try:
-                data = json.loads(raw)
+        async with hub.subscribe(LOGS_CHANNEL_KEY, encoder=_live_log_frame) as sub:
+            # Seed with history
+            r = await hub.client()
+            history_raw = await r.lrange(LOGS_LIST_KEY, -20, -1)
+            for raw in history_raw:
+                try:
+                    data = json.loads(raw)
+                except (json.JSONDecodeError, TypeError):
+                    continue
                 await websocket.send_text(
                     json.dumps({"channel": "logs:history", "data": data})
                 )
-            except Exception:
-                pass
-
-        # Live stream
-        await pubsub.subscribe(LOGS_CHANNEL_KEY)
-        async for message in pubsub.listen():
-            if message.get("type") != "message":
-                continue
-            try:
-                data = json.loads(message["data"])
-                await websocket.send_text(
-                    json.dumps({"channel": "logs:live", "data": data})
-                )
-            except Exception:
-                pass
+
+            # Live stream — undecodable entries are skipped by the hub
+            async for frame in sub:
+                await websocket.send_text(frame)
+            if sub.overflowed:
+                await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
     except WebSocketDisconnect:
         pass
     except Exception:
         logger.exception("ws_logs connection error")
-    finally:
-        _manager.disconnect(websocket)
-        await pubsub.unsubscribe(LOGS_CHANNEL_KEY)
-        await pubsub.close()
-        await r.aclose()
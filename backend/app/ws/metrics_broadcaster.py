@@ -2,37 +2,50 @@
 Task 2 — Metrics Broadcaster
 Provides:
   GET  /api/v1/metrics       — REST snapshot (MetricsSnapshot)
-  WS   /api/v1/ws/metrics    — 5-second broadcast loop per connected client
+  WS   /api/v1/ws/metrics    — 5-second broadcast to every connected client
 
-Redis keys consumed (written by Task 10 HTTP middleware):
+One producer task per process builds and serialises the snapshot once per
+tick and fans the frame out through ConnectionManager; it runs only while at
+least one client is connected.
+
+Redis keys consumed (flushed by app.core.http_metrics every second):
   req_count:{YYYYMMHHMM}     — request count per minute (TTL 120s)
   error_count:{YYYYMMHHMM}   — error count per minute   (TTL 120s)
-  response_times             — LPUSH list of last 100 elapsed_ms values
+  latency_hist:{YYYYMMHHMM}  — log-bucketed latency histogram per minute
+  latency_sum_ms:{YYYYMMHHMM} — total elapsed ms per minute
 
 Redis keys written by other agents:
   healer:heals_today         — integer reset at midnight by healer-agent
   hypercode:task_queue       — LIST used as task backlog (LLEN = queue depth)
-  agents:heartbeat:*         — HSET by each agent every 10s (Task 3), KEYS count = active agents
+  agents:heartbeat:*         — HSET by each agent every 10s (Task 3)
+  agents:heartbeat_index     — ZSET of live heartbeats (see key_registry), ZCOUNT = active agents
 """
 
 import asyncio
 import datetime
 import logging
-from typing import Set
+from typing import Optional
 
 import redis.asyncio as aioredis
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 
+from app.core import http_metrics, key_registry
 from app.core.config import settings
+from app.ws.connection_manager import ConnectionManager, wait_for_disconnect
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+BROADCAST_INTERVAL_SECONDS = 5
+
 
 class MetricsSnapshot(BaseModel):
     requestsPerMin: int
     avgResponseMs: float
+    p50ResponseMs: float = 0.0
+    p90ResponseMs: float = 0.0
+    p99ResponseMs: float = 0.0
     healsToday: int
     errorRatePct: float
     activeAgents: int
@@ -40,30 +53,9 @@ class MetricsSnapshot(BaseModel):
     collectedAt: str
 
 
-class ConnectionManager:
-    """Tracks connected WebSocket clients for broadcast."""
-
-    def __init__(self) -> None:
-        self._clients: Set[WebSocket] = set()
-
-    async def connect(self, ws: WebSocket) -> None:
-        await ws.accept()
-        self._clients.add(ws)
-
-    def disconnect(self, ws: WebSocket) -> None:
-        self._clients.discard(ws)
-
-    async def broadcast(self, data: str) -> None:
-        dead: Set[WebSocket] = set()
-        for ws in list(self._clients):
-            try:
-                await ws.send_text(data)
-            except Exception:
-                dead.add(ws)
-        self._clients -= dead
-
-
 _manager = ConnectionManager()
+_producer_task: Optional[asyncio.Task] = None
+_latest_frame: Optional[str] = None
 
 
 async def _build_snapshot(r: aioredis.Redis) -> MetricsSnapshot:
@@ -74,30 +66,42 @@ async def _build_snapshot(r: aioredis.Redis) -> MetricsSnapshot:
     async with r.pipeline(transaction=False) as pipe:
         pipe.get(f"req_count:{minute_key}")
         pipe.get(f"req_count:{prev_key}")
-        pipe.lrange("response_times", 0, 99)
         pipe.get(f"error_count:{minute_key}")
         pipe.get("healer:heals_today")
         pipe.llen("hypercode:task_queue")
-        pipe.keys("agents:heartbeat:*")
+        pipe.exists(key_registry.HEARTBEAT_INDEX)
+        key_registry.count_live(pipe, key_registry.HEARTBEAT_INDEX)
+        pipe.hgetall(f"latency_hist:{minute_key}")
+        pipe.hgetall(f"latency_hist:{prev_key}")
+        pipe.get(f"latency_sum_ms:{minute_key}")
+        pipe.get(f"latency_sum_ms:{prev_key}")
         results = await pipe.execute()
 
     req_cur = int(results[0] or 0)
     req_prev = int(results[1] or 0)
     requests_per_min = req_cur + req_prev  # rolling ~2-min window
 
-    times = [float(t) for t in (results[2] or [])]
-    avg_ms = round(sum(times) / len(times), 2) if times else 0.0
+    latency_sum = float(results[9] or 0) + float(results[10] or 0)
+    avg_ms = round(latency_sum / requests_per_min, 2) if requests_per_min else 0.0
+    p50, p90, p99 = http_metrics.percentiles(results[7:9], (0.5, 0.9, 0.99))
 
-    error_cur = int(results[3] or 0)
+    error_cur = int(results[2] or 0)
     error_pct = round((error_cur / req_cur * 100) if req_cur > 0 else 0.0, 2)
 
-    heals_today = int(results[4] or 0)
-    queue_depth = int(results[5] or 0)
-    active_agents = len(results[6] or [])
+    heals_today = int(results[3] or 0)
+    queue_depth = int(results[4] or 0)
+    if results[5]:
+        active_agents = int(results[6] or 0)
+    else:
+        # No writer maintains the index yet — non-blocking SCAN fallback
+        active_agents = len(await key_registry.scan_keys(r, key_registry.HEARTBEAT_PATTERN))
 
     return MetricsSnapshot(
         requestsPerMin=requests_per_min,
         avgResponseMs=avg_ms,
+        p50ResponseMs=p50,
+        p90ResponseMs=p90,
+        p99ResponseMs=p99,
         healsToday=heals_today,
         errorRatePct=error_pct,
         activeAgents=active_agents,
@@ -116,6 +120,34 @@ async def get_metrics() -> MetricsSnapshot:
         await r.aclose()
 
 
+async def _broadcast_loop() -> None:
+    """Build one snapshot per tick and fan it out while clients are connected."""
+    global _producer_task, _latest_frame
+    r = aioredis.from_url(settings.HYPERCODE_REDIS_URL, decode_responses=True)
+    try:
+        while len(_manager):
+            try:
+                snapshot = await _build_snapshot(r)
+                _latest_frame = snapshot.model_dump_json()
+                await _manager.broadcast(_latest_frame)
+            except Exception:
+                logger.exception("ws_metrics broadcast error")
+            await asyncio.sleep(BROADCAST_INTERVAL_SECONDS)
+        # Cleared before the await below so a client connecting meanwhile
+        # starts a fresh producer instead of attaching to this one, and is
+        # not seeded with a frame from an idle period.
+        _producer_task = None
+        _latest_frame = None
+    finally:
+        await r.aclose()
+
+
+def _ensure_producer() -> None:
+    global _producer_task
+    if _producer_task is None or _producer_task.done():
+        _producer_task = asyncio.create_task(_broadcast_loop())
+
+
 @router.websocket("/ws/metrics")
 async def ws_metrics(websocket: WebSocket) -> None:
     """
@@ -123,16 +155,15 @@ async def ws_metrics(websocket: WebSocket) -> None:
     Clients connect to ws://hypercode-core:8000/api/v1/ws/metrics
     """
     await _manager.connect(websocket)
-    r = await aioredis.from_url(settings.HYPERCODE_REDIS_URL, decode_responses=True)
     try:
-        while True:
-            snapshot = await _build_snapshot(r)
-            await websocket.send_text(snapshot.model_dump_json())
-            await asyncio.sleep(5)
+        # New tabs get the last frame right away instead of waiting a tick
+        if _latest_frame is not None:
+            _manager.send(websocket, _latest_frame)
+        _ensure_producer()
+        await wait_for_disconnect(websocket)
     except WebSocketDisconnect:
         pass
     except Exception:
         logger.exception("ws_metrics connection error")
     finally:
         _manager.disconnect(websocket)
-        await r.aclose()
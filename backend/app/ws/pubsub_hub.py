@@ -0,0 +1,249 @@
+"""
+Process-wide Redis pub/sub multiplexer for the dashboard streams.
+
+Instead of one Redis connection + one SUBSCRIBE per connected WebSocket/SSE
+client, every process holds a single PubSub connection with one subscription
+per channel, plus one shared client for history reads. Connection count on
+Redis is O(channels), not O(clients).
+
+Each message is JSON-decoded at most once and each frame encoding (e.g. the
+wrapped WS frame vs. the raw SSE line) is built at most once, then the same
+string is put on every subscriber's bounded queue. A subscriber whose queue
+overflows is ended (its iterator stops) so the handler can close the socket;
+drops are counted in get_stats().
+
+Usage:
+    async with hub.subscribe(CHANNEL, encoder=_ws_frame) as sub:
+        async for frame in sub:
+            await websocket.send_text(frame)
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 256
+RESUBSCRIBE_BACKOFF_SECONDS = 1.0
+RESUBSCRIBE_BACKOFF_MAX_SECONDS = 30.0
+_NO_FRAME = object()
+
+
+class HubMessage:
+    """One pub/sub message; ``data`` is decoded lazily and only once."""
+
+    __slots__ = ("channel", "raw", "_data")
+
+    def __init__(self, channel: str, raw: str) -> None:
+        self.channel = channel
+        self.raw = raw
+        self._data: Any = _NO_FRAME
+
+    @property
+    def data(self) -> Any:
+        if self._data is _NO_FRAME:
+            self._data = json.loads(self.raw)
+        return self._data
+
+
+Encoder = Callable[[HubMessage], str]
+
+
+def raw_frame(message: HubMessage) -> str:
+    """Default encoder — forwards the published payload unchanged."""
+    return message.raw
+
+
+class Subscription:
+    """A client's bounded view of one channel; iterate to receive frames."""
+
+    def __init__(self, channel: str, encoder: Encoder, queue_size: int) -> None:
+        self.channel = channel
+        self.encoder = encoder
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def _end(self) -> None:
+        """Stop iteration: drop anything pending and queue the end marker."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> str:
+        frame = await self.queue.get()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+
+class PubSubHub:
+    """One Redis pub/sub connection fanned out to many in-process subscribers."""
+
+    def __init__(self, redis_url: str, queue_size: int = SUBSCRIBER_QUEUE_SIZE) -> None:
+        self._redis_url = redis_url
+        self._queue_size = queue_size
+        self._redis: Optional[aioredis.Redis] = None
+        self._pubsub: Optional[Any] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._lock = asyncio.Lock()
+        self.stats = {
+            "messages": 0,
+            "frames_encoded": 0,
+            "frames_queued": 0,
+            "encode_errors": 0,
+            "dropped_subscribers": 0,
+        }
+
+    async def client(self) -> aioredis.Redis:
+        """Shared client for one-off reads (history, etc.)."""
+        if self._redis is None:
+            self._redis = aioredis.from_url(self._redis_url, decode_responses=True)
+        return self._redis
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str, encoder: Encoder = raw_frame) -> AsyncIterator[Subscription]:
+        sub = Subscription(channel, encoder, self._queue_size)
+        await self._add(sub)
+        try:
+            yield sub
+        finally:
+            await self._remove(sub)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        for subs in self._subscriptions.values():
+            for sub in subs:
+                sub._end()
+        self._subscriptions.clear()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def get_stats(self) -> dict:
+        subs = [s for group in self._subscriptions.values() for s in group]
+        return {
+            **self.stats,
+            "channels": len(self._subscriptions),
+            "subscribers": len(subs),
+            "max_queue_depth": max((s.queue.qsize() for s in subs), default=0),
+        }
+
+    # ── Subscription bookkeeping ─────────────────────────────────────────
+
+    async def _add(self, sub: Subscription) -> None:
+        async with self._lock:
+            group = self._subscriptions.get(sub.channel)
+            if group is None:
+                if self._pubsub is None:
+                    self._pubsub = (await self.client()).pubsub()
+                await self._pubsub.subscribe(sub.channel)
+                group = self._subscriptions[sub.channel] = set()
+            group.add(sub)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read_loop())
+
+    async def _remove(self, sub: Subscription) -> None:
+        async with self._lock:
+            group = self._subscriptions.get(sub.channel)
+            if group is None:
+                return
+            group.discard(sub)
+            if not group:
+                del self._subscriptions[sub.channel]
+                if self._pubsub is not None:
+                    try:
+                        await self._pubsub.unsubscribe(sub.channel)
+                    except Exception:
+                        logger.warning("pubsub hub unsubscribe failed", exc_info=True)
+
+    # ── Reader ───────────────────────────────────────────────────────────
+
+    async def _read_loop(self) -> None:
+        while self._subscriptions:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("pubsub hub read error — resubscribing")
+                await self._resubscribe_with_backoff()
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            self._dispatch(HubMessage(message["channel"], message["data"]))
+
+    async def _resubscribe_with_backoff(self) -> None:
+        """Retry _resubscribe until it succeeds; the reader must outlive a Redis outage."""
+        delay = RESUBSCRIBE_BACKOFF_SECONDS
+        while self._subscriptions:
+            await asyncio.sleep(delay)
+            try:
+                await self._resubscribe()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                delay = min(delay * 2, RESUBSCRIBE_BACKOFF_MAX_SECONDS)
+                logger.warning(f"pubsub hub resubscribe failed, retrying in {delay:.0f}s: {exc}")
+
+    async def _resubscribe(self) -> None:
+        async with self._lock:
+            if self._pubsub is not None:
+                try:
+                    await self._pubsub.aclose()
+                except Exception:
+                    pass
+            self._pubsub = (await self.client()).pubsub()
+            if self._subscriptions:
+                await self._pubsub.subscribe(*self._subscriptions)
+
+    def _dispatch(self, message: HubMessage) -> None:
+        self.stats["messages"] += 1
+        frames: Dict[Encoder, Any] = {}
+        for sub in list(self._subscriptions.get(message.channel, ())):
+            frame = frames.get(sub.encoder, _NO_FRAME)
+            if frame is _NO_FRAME:
+                try:
+                    frame = sub.encoder(message)
+                    self.stats["frames_encoded"] += 1
+                except Exception:
+                    self.stats["encode_errors"] += 1
+                    frame = None
+                frames[sub.encoder] = frame
+            if frame is None:
+                continue
+            try:
+                sub.queue.put_nowait(frame)
+                self.stats["frames_queued"] += 1
+            except asyncio.QueueFull:
+                self._drop(sub)
+
+    def _drop(self, sub: Subscription) -> None:
+        logger.warning(f"pubsub hub dropping slow subscriber on {sub.channel}")
+        self.stats["dropped_subscribers"] += 1
+        self._subscriptions.get(sub.channel, set()).discard(sub)
+        sub.overflowed = True
+        sub._end()
+
+
+hub = PubSubHub(settings.HYPERCODE_REDIS_URL)
@@ -76,154 +76,138 @@ class TestWalletService:
             result = broski_service.get_wallet(1, db)
         assert result.user_id == 1
 
-    def test_award_coins_increases_balance(self):
-        wallet = make_wallet(coins=10)
-        db = make_db(wallet=wallet)
-
-        with patch.object(broski_service, '_get_or_create_wallet', return_value=wallet), \
-             patch.object(broski_service, '_log_transaction'):
-            result = broski_service.award_coins(1, 50, "test award", db)
+    # Balance changes are applied in SQL now, so these run against the db fixture
+    def test_award_coins_increases_balance(self, db):
+        broski_service.award_coins(1, 10, "seed", db)
+        result = broski_service.award_coins(1, 50, "test award", db)
 
         assert result.coins == 60
 
-    def test_spend_coins_decreases_balance(self):
-        wallet = make_wallet(coins=100)
-        db = make_db(wallet=wallet)
-
-        with patch.object(broski_service, '_get_or_create_wallet', return_value=wallet), \
-             patch.object(broski_service, '_log_transaction'):
-            result = broski_service.spend_coins(1, 30, "test spend", db)
+    def test_spend_coins_decreases_balance(self, db):
+        broski_service.award_coins(1, 100, "seed", db)
+        result = broski_service.spend_coins(1, 30, "test spend", db)
 
         assert result.coins == 70
 
-    def test_spend_coins_raises_on_insufficient_balance(self):
-        wallet = make_wallet(coins=5)
-        db = make_db(wallet=wallet)
-
-        with patch.object(broski_service, '_get_or_create_wallet', return_value=wallet), \
-             patch.object(broski_service, '_log_transaction'):
-            with pytest.raises(ValueError, match="Not enough BROski"):
-                broski_service.spend_coins(1, 100, "overspend", db)
-
-    def test_award_xp_triggers_level_up(self):
-        wallet = make_wallet(xp=90, level=1)
-        db = make_db(wallet=wallet)
+    def test_spend_coins_raises_on_insufficient_balance(self, db):
+        broski_service.award_coins(1, 5, "seed", db)
+        with pytest.raises(ValueError, match="Not enough BROski"):
+            broski_service.spend_coins(1, 100, "overspend", db)
+        assert broski_service.get_wallet(1, db).coins == 5
 
-        with patch.object(broski_service, '_get_or_create_wallet', return_value=wallet), \
-             patch.object(broski_service, '_log_transaction'):
-            result_wallet, level_msg = broski_service.award_xp(1, 20, "test xp", db)
+    def test_award_xp_triggers_level_up(self, db):
+        broski_service.award_xp(1, 90, "seed", db)
+        result_wallet, level_msg = broski_service.award_xp(1, 20, "test xp", db)
 
         assert result_wallet.xp == 110
         assert result_wallet.level == 2
         assert level_msg is not None
         assert "LEVEL UP" in level_msg
 
-    def test_award_xp_no_level_up(self):
-        wallet = make_wallet(xp=10, level=1)
-        db = make_db(wallet=wallet)
-
-        with patch.object(broski_service, '_get_or_create_wallet', return_value=wallet), \
-             patch.object(broski_service, '_log_transaction'):
-            _, level_msg = broski_service.award_xp(1, 5, "small xp", db)
+    def test_award_xp_no_level_up(self, db):
+        broski_service.award_xp(1, 10, "seed", db)
+        _, level_msg = broski_service.award_xp(1, 5, "small xp", db)
 
         assert level_msg is None
 
+    def test_ledger_batch_is_one_update_and_one_insert(self, db):
+        from sqlalchemy import event
+
+        broski_service.get_wallet(1, db)
+        statements = []
+        listener = lambda *args: statements.append(args[2].split()[0])  # noqa: E731
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            result = broski_service.apply_ledger(1, [
+                broski_service.LedgerEntry("Task completed", coins=10, xp=25),
+                broski_service.LedgerEntry("Bonus", xp=80),
+            ], db)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        assert statements == ["UPDATE", "INSERT"]
+        assert (result.wallet.coins, result.wallet.xp, result.wallet.level) == (10, 105, 2)
+        assert result.level_up is not None
+        _, total = broski_service.get_transactions(1, db)
+        assert total == 3
+
 
 # ── Achievement tests ─────────────────────────────────────────────────────
 class TestAchievements:
-    def _make_achievement(self, slug: str, xp: int = 50, coins: int = 20) -> BROskiAchievement:
-        a = BROskiAchievement()
-        a.slug = slug
-        a.name = f"{slug} name"
-        a.description = f"{slug} desc"
-        a.xp_reward = xp
-        a.coin_reward = coins
-        return a
-
-    def test_first_blood_awarded_after_first_task(self):
-        wallet = make_wallet()
-        db = make_db(wallet=wallet)
-        achievement = self._make_achievement("first_blood")
-        db.query.return_value.filter_by.return_value.first.side_effect = [
-            wallet,  # _get_or_create_wallet
-            achievement,  # fetch achievement definition
-        ]
-
-        with patch.object(broski_service, '_log_transaction'):
-            unlocked = broski_service.check_and_award_achievements(
-                1, db, context={"tasks_completed_total": 1}
-            )
-        assert any("first_blood" in m.lower() or "first" in m.lower() for m in unlocked)
-
-    def test_no_duplicate_achievements(self):
-        from app.models.broski import BROskiUserAchievement
-        ua = BROskiUserAchievement()
-        ua.achievement_slug = "first_blood"
-        wallet = make_wallet()
-        wallet.earned_achievements = [ua]
-        db = make_db(wallet=wallet)
-
-        with patch.object(broski_service, '_get_or_create_wallet', return_value=wallet):
-            unlocked = broski_service.check_and_award_achievements(
-                1, db, context={"tasks_completed_total": 5}
-            )
+    def test_first_blood_awarded_after_first_task(self, db):
+        broski_service.seed_achievements(db)
+        unlocked = broski_service.check_and_award_achievements(
+            1, db, context={"tasks_completed_total": 1}
+        )
+        assert any("First Blood" in m for m in unlocked)
+        wallet = broski_service.get_wallet(1, db)
+        assert (wallet.coins, wallet.xp) == (20, 50)
+
+    def test_no_duplicate_achievements(self, db):
+        broski_service.seed_achievements(db)
+        broski_service.check_and_award_achievements(1, db, context={"tasks_completed_total": 1})
+        unlocked = broski_service.check_and_award_achievements(
+            1, db, context={"tasks_completed_total": 5}
+        )
         # first_blood already earned, should NOT be in unlocked again
-        assert not any("first_blood" in m.lower() for m in unlocked)
-
-    def test_early_bird_context_flag(self):
-        wallet = make_wallet()
-        db = make_db(wallet=wallet)
-        achievement = self._make_achievement("early_bird", xp=30, coins=10)
-        db.query.return_value.filter_by.return_value.first.side_effect = [
-            wallet, achievement
-        ]
-
-        with patch.object(broski_service, '_log_transaction'):
-            unlocked = broski_service.check_and_award_achievements(
-                1, db, context={"completed_before_9am": True}
-            )
-        assert any("early_bird" in m.lower() or "Early" in m for m in unlocked)
-
-    def test_seed_achievements_idempotent(self):
-        db = make_db()
-        db.query.return_value.filter_by.return_value.first.return_value = MagicMock()  # already exists
-        # Should not raise; should not add duplicates
+        assert unlocked == []
+        assert broski_service.get_wallet(1, db).coins == 20
+
+    def test_early_bird_context_flag(self, db):
+        broski_service.seed_achievements(db)
+        unlocked = broski_service.check_and_award_achievements(
+            1, db, context={"completed_before_9am": True}
+        )
+        assert any("Early Bird" in m for m in unlocked)
+
+    def test_all_unlocks_one_transaction(self, db):
+        broski_service.seed_achievements(db)
+        context = {
+            "tasks_completed_total": 5,
+            "tasks_completed_today": 3,
+            "tasks_completed_session": 5,
+            "missions_started_total": 1,
+            "completed_before_9am": True,
+        }
+        with patch.object(db, "commit", wraps=db.commit) as commit:
+            unlocked = broski_service.check_and_award_achievements(1, db, context=context)
+        assert len(unlocked) == 5
+        commit.assert_called_once()
+        assert len(broski_service.get_wallet(1, db).earned_achievements) == 5
+
+    def test_seed_achievements_idempotent(self, db):
+        broski_service.seed_achievements(db)
         broski_service.seed_achievements(db)
-        db.add.assert_not_called()
+        assert db.query(BROskiAchievement).count() == len(broski_service.SEED_ACHIEVEMENTS)
 
 
 # ── Daily login tests ─────────────────────────────────────────────────────
 class TestDailyLogin:
-    def test_first_login_awards_coins(self):
-        wallet = make_wallet(coins=0)
-        db = make_db(wallet=wallet)
+    def _set_last_login(self, db, when):
+        wallet = broski_service.get_wallet(1, db)
+        wallet.last_daily_login = when
+        db.commit()
 
-        with patch.object(broski_service, '_get_or_create_wallet', return_value=wallet), \
-             patch.object(broski_service, '_log_transaction'):
-            result_wallet, awarded = broski_service.handle_daily_login(1, db)
+    def test_first_login_awards_coins(self, db):
+        result_wallet, awarded = broski_service.handle_daily_login(1, db)
 
         assert awarded is True
         assert result_wallet.coins == 5
 
-    def test_second_login_within_24h_not_awarded(self):
-        wallet = make_wallet(coins=5)
-        wallet.last_daily_login = datetime.now(timezone.utc) - timedelta(hours=1)
-        db = make_db(wallet=wallet)
+    def test_second_login_within_24h_not_awarded(self, db):
+        broski_service.award_coins(1, 5, "seed", db)
+        self._set_last_login(db, datetime.now(timezone.utc) - timedelta(hours=1))
 
-        with patch.object(broski_service, '_get_or_create_wallet', return_value=wallet):
-            result_wallet, awarded = broski_service.handle_daily_login(1, db)
+        result_wallet, awarded = broski_service.handle_daily_login(1, db)
 
         assert awarded is False
         assert result_wallet.coins == 5  # unchanged
 
-    def test_login_after_24h_awards_again(self):
-        wallet = make_wallet(coins=5)
-        wallet.last_daily_login = datetime.now(timezone.utc) - timedelta(hours=25)
-        db = make_db(wallet=wallet)
+    def test_login_after_24h_awards_again(self, db):
+        broski_service.award_coins(1, 5, "seed", db)
+        self._set_last_login(db, datetime.now(timezone.utc) - timedelta(hours=25))
 
-        with patch.object(broski_service, '_get_or_create_wallet', return_value=wallet), \
-             patch.object(broski_service, '_log_transaction'):
-            result_wallet, awarded = broski_service.handle_daily_login(1, db)
+        result_wallet, awarded = broski_service.handle_daily_login(1, db)
 
         assert awarded is True
         assert result_wallet.coins == 10
@@ -0,0 +1,93 @@
+"""BROski$ achievement engine — cached catalog, batched unlocks."""
+import pytest
+from sqlalchemy import event
+
+from app.models.broski import BROskiAchievement
+from app.services import achievements, broski_service, leaderboard
+
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    monkeypatch.setattr(leaderboard, "_get_redis", lambda: None)
+
+
+@pytest.fixture
+def seeded(db):
+    broski_service.seed_achievements(db)
+    return db
+
+
+@pytest.fixture
+def statements(db):
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement.split()[0].upper())
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def test_no_candidates_runs_no_queries(seeded, statements):
+    achievements.catalog.get(seeded)  # warm
+    statements.clear()
+    assert achievements.evaluate(seeded, {1: {}, 2: {"tasks_completed_today": 2}}) == {}
+    assert statements == []
+
+
+def test_batch_unlocks_use_one_insert_and_one_update_per_user(seeded, statements):
+    achievements.catalog.get(seeded)
+    broski_service.get_wallet(1, seeded)
+    broski_service.get_wallet(2, seeded)
+    statements.clear()
+
+    result = achievements.evaluate(seeded, {
+        1: {"tasks_completed_total": 1, "completed_before_9am": True},
+        2: {"missions_started_total": 1},
+        3: {},
+    })
+
+    assert sorted(result) == [1, 2]
+    assert len(result[1]) == 2
+    assert statements == ["SELECT", "INSERT", "UPDATE", "INSERT", "UPDATE", "INSERT"]
+    wallet = broski_service.get_wallet(1, seeded)
+    assert (wallet.coins, wallet.xp) == (30, 80)
+
+
+def test_unlocks_are_awarded_once(seeded):
+    contexts = {uid: {"tasks_completed_total": 1} for uid in (1, 2)}
+    assert len(achievements.evaluate(seeded, contexts)) == 2
+    assert achievements.evaluate(seeded, contexts) == {}
+    assert broski_service.get_wallet(2, seeded).coins == 20
+
+
+def test_evaluate_many_chunks(seeded):
+    contexts = {uid: {"tasks_completed_total": 1} for uid in range(1, 8)}
+    result = achievements.evaluate_many(seeded, contexts, batch_size=3)
+    assert sorted(result) == list(range(1, 8))
+
+
+def test_catalog_cached_until_seed_changes_it(seeded, statements):
+    achievements.catalog.get(seeded)
+    statements.clear()
+    achievements.catalog.get(seeded)
+    assert statements == []
+
+    seeded.query(BROskiAchievement).filter_by(slug="early_bird").delete()
+    seeded.commit()
+    assert "early_bird" in achievements.catalog.get(seeded)  # still cached
+
+    broski_service.seed_achievements(seeded)  # re-inserts it and bumps the version
+    statements.clear()
+    assert "early_bird" in achievements.catalog.get(seeded)
+    assert statements == ["SELECT"]
+
+
+def test_catalog_expires(seeded, monkeypatch):
+    achievements.catalog.get(seeded)
+    seeded.query(BROskiAchievement).filter_by(slug="streak_3").delete()
+    seeded.commit()
+    monkeypatch.setattr(achievements, "CATALOG_TTL_SECONDS", 0)
+    assert "streak_3" not in achievements.catalog.get(seeded)
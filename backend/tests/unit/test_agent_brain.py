@@ -32,14 +32,14 @@ class _DummyAsyncClient:
 @pytest.mark.asyncio
 async def test_recall_context_returns_rag_results(monkeypatch):
     from app.agents.brain import Brain
-    from app.core.rag import rag
+    from app.core.rag import async_rag
 
     async_brain = Brain()
 
-    def fake_query(query_text: str, n_results: int = 5, filters=None):
+    async def fake_query(query_text: str, n_results: int = 5, filters=None):
         return ["doc-a", "doc-b"]
 
-    monkeypatch.setattr(rag, "query", fake_query)
+    monkeypatch.setattr(async_rag, "query", fake_query)
 
     result = await async_brain.recall_context(query="hello", limit=2)
     assert "--- Semantic Memory (RAG) ---" in result
@@ -50,12 +50,12 @@ async def test_recall_context_returns_rag_results(monkeypatch):
 @pytest.mark.asyncio
 async def test_recall_context_falls_back_to_storage_on_rag_failure(monkeypatch):
     from app.agents.brain import Brain
-    from app.core.rag import rag
+    from app.core.rag import async_rag
     import app.core.storage as storage_mod
 
     async_brain = Brain()
 
-    def fake_query(query_text: str, n_results: int = 5, filters=None):
+    async def fake_query(query_text: str, n_results: int = 5, filters=None):
         raise RuntimeError("rag down")
 
     class DummyStorage:
@@ -65,7 +65,7 @@ async def test_recall_context_falls_back_to_storage_on_rag_failure(monkeypatch):
         def get_file_content(self, key: str) -> str:
             return "hello world"
 
-    monkeypatch.setattr(rag, "query", fake_query)
+    monkeypatch.setattr(async_rag, "query", fake_query)
     monkeypatch.setattr(storage_mod, "get_storage", lambda: DummyStorage())
 
     result = await async_brain.recall_context(query="hello", limit=1)
@@ -98,7 +98,7 @@ async def test_think_local_llm_success_with_auto_model(monkeypatch):
             timeout=kwargs.get("timeout"),
         )
 
-    monkeypatch.setattr(brain_mod.httpx, "AsyncClient", client_factory)
+    monkeypatch.setattr(brain_mod.http_clients, "get", lambda provider: client_factory())
 
     result = await async_brain.think("Role", "Do the thing", use_memory=False)
     assert result == "ok"
@@ -128,7 +128,7 @@ async def test_think_local_llm_non_200_falls_back_to_session(monkeypatch):
             timeout=kwargs.get("timeout"),
         )
 
-    monkeypatch.setattr(brain_mod.httpx, "AsyncClient", client_factory)
+    monkeypatch.setattr(brain_mod.http_clients, "get", lambda provider: client_factory())
 
     result = await async_brain.think("Role", "Do the thing", use_memory=False)
     assert result == "Perplexity Session Auth is active. (Simulated Response)"
@@ -170,7 +170,7 @@ async def test_think_cloud_api_success(monkeypatch):
         async def post(self, url: str, json: dict, headers: dict):
             return _DummyResponse(200, {"choices": [{"message": {"content": "hi"}}]})
 
-    monkeypatch.setattr(brain_mod.httpx, "AsyncClient", lambda *a, **k: CloudClient())
+    monkeypatch.setattr(brain_mod.http_clients, "get", lambda provider: CloudClient())
 
     result = await async_brain.think("Role", "Do the thing", use_memory=False)
     assert result == "hi"
@@ -198,7 +198,7 @@ async def test_think_cloud_api_non_200_returns_error(monkeypatch):
         async def post(self, url: str, json: dict, headers: dict):
             return _DummyResponse(500, {}, "bad")
 
-    monkeypatch.setattr(brain_mod.httpx, "AsyncClient", lambda *a, **k: CloudClient())
+    monkeypatch.setattr(brain_mod.http_clients, "get", lambda provider: CloudClient())
 
     result = await async_brain.think("Role", "Do the thing", use_memory=False)
     assert "Error: API returned 500" in result
@@ -80,19 +80,21 @@ def test_write_and_consume_handoffs(monkeypatch):
 @pytest.mark.asyncio
 async def test_brain_memory_block_order(monkeypatch):
     from app.agents.brain import Brain
+    import app.core.agent_memory as am
 
-    def read_handoffs(agent_id: str, limit: int = 5, consume: bool = False):
-        return [{"from_agent_id": "researcher", "summary": "handoff"}]
+    calls = []
 
-    def get_history(conversation_id: str, last_n: int = 10):
-        return [{"agent_id": "architect", "role": "user", "content": "prior"}]
+    async def load_context(conversation_id, agent_id, **kwargs):
+        calls.append(kwargs)
+        return am.MemoryContext(
+            handoffs=[{"from_agent_id": "researcher", "summary": "handoff"}],
+            history=[{"agent_id": "architect", "role": "user", "content": "prior"}],
+        )
 
-    import app.core.agent_memory as am
-    monkeypatch.setattr(am, "read_handoffs", read_handoffs)
-    monkeypatch.setattr(am, "get_history", get_history)
+    monkeypatch.setattr(am.memory_store, "load_context", load_context)
 
     b = Brain()
-    out = b._build_memory_context(
+    out = await b._build_memory_context(
         conversation_id="task-9",
         agent_id="architect",
         memory_mode="shared",
@@ -104,3 +106,45 @@ async def test_brain_memory_block_order(monkeypatch):
     third = out.find("Conversation History")
     assert first != -1 and second != -1 and third != -1
     assert first < second < third
+    assert calls == [{"history_n": 10, "handoff_limit": 5, "include_handoffs": True}]
+
+
+@pytest.mark.asyncio
+async def test_async_store_load_context_is_one_round_trip():
+    import fakeredis.aioredis
+    from app.core import agent_memory
+
+    r = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    store = agent_memory.AsyncAgentMemory(client=r)
+    assert await store.write_handoff("architect", "researcher", "password=hunter2 found docs")
+    for i in range(3):
+        assert await store.append_turn("conv-1", "architect", "user", f"turn {i}")
+
+    pipelines = []
+    real_pipeline = r.pipeline
+
+    def counting_pipeline(*args, **kwargs):
+        pipelines.append(kwargs)
+        return real_pipeline(*args, **kwargs)
+
+    r.pipeline = counting_pipeline
+    ctx = await store.load_context("conv-1", "architect", history_n=2)
+
+    assert len(pipelines) == 1
+    assert [t["content"] for t in ctx.history] == ["turn 1", "turn 2"]
+    assert "[REDACTED]" in ctx.handoffs[0]["summary"]
+    assert (await store.load_context("conv-1", "architect", include_handoffs=False)).handoffs == []
+
+    assert len(await store.read_handoffs("architect", consume=True)) == 1
+    assert await store.read_handoffs("architect") == []
+    await r.aclose()
+
+
+@pytest.mark.asyncio
+async def test_async_store_degrades_when_redis_down():
+    from app.core import agent_memory
+
+    store = agent_memory.AsyncAgentMemory("redis://127.0.0.1:1/0")
+    assert await store.load_context("c", "a") == agent_memory.MemoryContext()
+    assert await store.append_turn("c", "a", "user", "hi") is False
+    await store.aclose()
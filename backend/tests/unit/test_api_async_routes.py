@@ -0,0 +1,116 @@
+"""Hot API routes on the AsyncSession path, against in-memory aiosqlite."""
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.db.base_class import Base
+from app.models import broski as _broski_models  # noqa: F401 — registers tables
+from app.models import models
+from app.schemas import schemas
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+async def _seed(db):
+    owner = models.User(email="owner@example.com", hashed_password="x")
+    other = models.User(email="other@example.com", hashed_password="x")
+    db.add_all([owner, other])
+    await db.flush()
+    project = models.Project(name="p", owner_id=owner.id)
+    db.add(project)
+    await db.flush()
+    db.add_all([models.Task(title=f"t{i}", project_id=project.id) for i in range(3)])
+    await db.commit()
+    return owner, other
+
+
+@pytest.mark.asyncio
+async def test_task_routes_scope_by_owner(db):
+    from app.api.v1.endpoints import tasks
+
+    owner, other = await _seed(db)
+    assert len(await tasks.read_tasks(db=db, skip=0, limit=100, current_user=owner)) == 3
+    assert await tasks.read_tasks(db=db, skip=0, limit=100, current_user=other) == []
+    with pytest.raises(HTTPException) as exc:
+        await tasks.read_task(db=db, id=1, current_user=other)
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_completing_a_task_awards_broski_through_run_sync(db):
+    from app.api.v1.endpoints import broski, tasks
+
+    owner, _ = await _seed(db)
+    task = await tasks.update_task(
+        db=db, id=1, task_in=schemas.TaskUpdate(status=models.TaskStatus.DONE), current_user=owner
+    )
+    assert task.status == models.TaskStatus.DONE
+
+    wallet = await broski.get_my_wallet(db=db, current_user=owner)
+    assert (wallet.coins, wallet.xp) == (10, 40)  # completion + first-task-of-the-day bonus
+    assert await broski.get_my_achievements(db=db, current_user=owner) == []
+
+
+@pytest.mark.asyncio
+async def test_pulse_aggregates_in_one_query(db, monkeypatch):
+    from app.api.v1.endpoints import broski
+
+    owner, other = await _seed(db)
+    monkeypatch.setattr(broski, "_count_agents_online", lambda: 4)
+    await broski.daily_login(db=db, current_user=owner)
+    await broski.daily_login(db=db, current_user=other)
+
+    pulse = await broski.get_broski_pulse(db=db)
+    assert (pulse["coins"], pulse["userCount"], pulse["agentsOnline"]) == (10, 2, 4)
+
+
+@pytest.mark.asyncio
+async def test_async_current_user_dependency(db):
+    from jose import jwt
+    from app.api import deps
+    from app.core import security
+    from app.core.config import settings
+
+    owner, _ = await _seed(db)
+    token = jwt.encode({"sub": str(owner.id)}, settings.JWT_SECRET, algorithm=security.ALGORITHM)
+    user = await deps.get_current_user_async(db=db, token=token)
+    assert await deps.get_current_active_user_async(current_user=user) is user
+
+    missing = jwt.encode({"sub": "999"}, settings.JWT_SECRET, algorithm=security.ALGORITHM)
+    with pytest.raises(HTTPException) as exc:
+        await deps.get_current_user_async(db=db, token=missing)
+    assert exc.value.status_code == 404
+    with pytest.raises(HTTPException) as exc:
+        await deps.get_current_user_async(db=db, token="garbage")
+    assert exc.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_celery_dispatch_runs_off_the_event_loop(db, monkeypatch):
+    import threading
+
+    from app.api.v1.endpoints import dashboard, tasks
+    from app.core.celery_app import celery_app
+
+    owner, _ = await _seed(db)
+    threads = []
+    monkeypatch.setattr(celery_app, "send_task", lambda *a, **kw: threads.append(threading.current_thread()))
+
+    await tasks.create_task(db=db, task_in=schemas.TaskCreate(title="t", project_id=1), current_user=owner)
+    request = dashboard.ExecuteRequest(
+        task=dashboard.DashboardTask(id="d1", type="cmd", description="check health", requires_approval=False)
+    )
+    await dashboard.execute_command(request=request, db=db, current_user=owner)
+
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
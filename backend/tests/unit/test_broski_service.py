@@ -6,6 +6,8 @@ No network or Redis required.
 from __future__ import annotations
 
 import pytest
+from sqlalchemy import update
+from sqlalchemy.orm import Session
 
 from app.models.broski import (
     BROskiWallet,
@@ -16,6 +18,13 @@ from app.models.broski import (
 from app.services import broski_service
 
 
+def _assert_not_write_locked(db):
+    """A second session can write, i.e. ``db`` didn't leave a write transaction open."""
+    with Session(bind=db.get_bind()) as other:
+        other.execute(update(BROskiWallet).values(coins=BROskiWallet.coins))
+        other.rollback()
+
+
 # ── xp_to_level helpers ───────────────────────────────────────────────────────
 
 class TestXpToLevel:
@@ -124,6 +133,7 @@ class TestSpendCoins:
     def test_cannot_overdraft(self, db):
         with pytest.raises(ValueError, match="Not enough BROski\\$"):
             broski_service.spend_coins(user_id=1, amount=100, reason="too much", db=db)
+        _assert_not_write_locked(db)
 
     def test_exact_balance_spendable(self, db):
         broski_service.award_coins(user_id=1, amount=10, reason="load", db=db)
@@ -131,6 +141,19 @@ class TestSpendCoins:
         assert wallet.coins == 0
 
 
+# ── Task completion ───────────────────────────────────────────────────────────
+
+class TestTaskCompletion:
+    def test_first_task_of_the_day_bonus_claimed_once(self, db):
+        first = broski_service.award_task_completion(user_id=1, db=db)
+        assert (first.wallet.coins, first.wallet.xp) == (10, 40)
+
+        second = broski_service.award_task_completion(user_id=1, db=db)
+        assert (second.wallet.coins, second.wallet.xp) == (20, 65)
+        _, total = broski_service.get_transactions(user_id=1, db=db)
+        assert total == 5  # coins + XP per task, plus one bonus row
+
+
 # ── Transaction history ───────────────────────────────────────────────────────
 
 class TestTransactions:
@@ -170,6 +193,7 @@ class TestDailyLogin:
         broski_service.handle_daily_login(user_id=1, db=db)
         _, awarded = broski_service.handle_daily_login(user_id=1, db=db)
         assert awarded is False
+        _assert_not_write_locked(db)
 
 
 # ── Achievements ──────────────────────────────────────────────────────────────
@@ -0,0 +1,221 @@
+import asyncio
+
+import pytest
+
+
+def _make_cache(**kwargs):
+    from app.cache.multi_tier import MultiTierCache
+
+    # No connect(): local tier only
+    return MultiTierCache(**kwargs)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_loader():
+    cache = _make_cache()
+    calls = 0
+    release = asyncio.Event()
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"id": "agent-1"}
+
+    waiters = [
+        asyncio.create_task(cache.get_or_load("agents", "agent-1", loader))
+        for _ in range(10)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == 1
+    assert all(r == {"id": "agent-1"} for r in results)
+    stats = cache.get_stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 9
+    assert stats["inflight"] == 0
+
+    assert await cache.get_or_load("agents", "agent-1", loader) == {"id": "agent-1"}
+    assert calls == 1
+    assert cache.get_stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_loader_error_reaches_all_waiters_and_is_not_cached():
+    cache = _make_cache()
+    release = asyncio.Event()
+
+    async def loader():
+        await release.wait()
+        raise RuntimeError("db down")
+
+    waiters = [
+        asyncio.create_task(cache.get_or_load("tasks", "t1", loader))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert await cache.get("tasks", "t1") is None
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_served_while_single_refresh_runs(monkeypatch):
+    from app.cache import multi_tier
+
+    now = [1000.0]
+    monkeypatch.setattr(multi_tier.time, "monotonic", lambda: now[0])
+
+    cache = _make_cache(local_ttl=10, stale_ttl=30)
+    await cache.set("agents", "a", "v1")
+
+    now[0] += 15  # past local_ttl, inside stale window
+    assert await cache.get("agents", "a") is None
+
+    calls = 0
+    release = asyncio.Event()
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "v2"
+
+    first = await cache.get_or_load("agents", "a", loader)
+    second = await cache.get_or_load("agents", "a", loader)
+    assert (first, second) == ("v1", "v1")
+
+    release.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert calls == 1
+    assert await cache.get_or_load("agents", "a", loader) == "v2"
+    stats = cache.get_stats()
+    assert stats["stale_hits"] == 2
+    assert stats["refreshes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_local_tier_honours_short_ttl(monkeypatch):
+    import fakeredis
+    from app.cache import multi_tier
+
+    now = [1000.0]
+    monkeypatch.setattr(multi_tier.time, "monotonic", lambda: now[0])
+    cache = _make_cache(local_ttl=900)
+    assert await cache.get_or_load("agents", "a", _returns("v1"), ttl=5) == "v1"
+
+    now[0] += 6  # past the entry's own ttl, well inside local_ttl
+    assert await cache.get("agents", "a") is None
+    assert await cache.get_or_load("agents", "a", _returns("v2"), ttl=5) == "v2"
+
+    # An L2 hit is only fresh locally for what is left of the Redis copy
+    cache.redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    cache_key = await cache._key("agents", "b")
+    await cache.redis_client.set(cache_key, '"from-redis"', px=3000)
+    assert await cache.get("agents", "b") == "from-redis"
+    _, fresh_until, _ = cache.local_cache[cache_key]
+    assert fresh_until == pytest.approx(now[0] + 3, abs=0.1)
+
+
+def _returns(value):
+    async def loader():
+        return value
+
+    return loader
+
+
+async def _wait_for(predicate, timeout: float = 2.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not await predicate():
+        assert loop.time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_invalidations_evict_local_tier_in_other_workers(monkeypatch):
+    import fakeredis
+    from app.cache import multi_tier
+
+    server = fakeredis.FakeServer()
+
+    async def fake_from_url(*args, **kwargs):
+        return fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+    monkeypatch.setattr(multi_tier.redis, "from_url", fake_from_url)
+
+    worker_a = _make_cache()
+    worker_b = _make_cache()
+    await worker_a.connect()
+    await worker_b.connect()
+
+    async def both_subscribed() -> bool:
+        [(_, count)] = await worker_a.redis_client.pubsub_numsub(
+            multi_tier.INVALIDATION_CHANNEL
+        )
+        return count == 2
+
+    async def evicted(cache, key) -> bool:
+        return key not in cache.local_cache
+
+    try:
+        await _wait_for(both_subscribed)
+
+        await worker_a.set("agents", "a1", {"v": 1})
+        assert await worker_b.get("agents", "a1") == {"v": 1}
+        assert "agents:a1" in worker_b.local_cache
+
+        await worker_a.delete("agents", "a1")
+        await _wait_for(lambda: evicted(worker_b, "agents:a1"))
+        assert await worker_b.get("agents", "a1") is None
+
+        await worker_b.set("system", "cfg", "old")
+        await worker_a.clear_namespace("system")
+        await _wait_for(lambda: evicted(worker_b, "system:cfg"))
+        assert worker_b._ns_versions["system"] == 1
+        assert await worker_b.get("system", "cfg") is None
+        assert worker_b.get_stats()["invalidations_received"] == 2
+    finally:
+        await worker_a.disconnect()
+        await worker_b.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_clear_namespace_purges_indexed_keys_without_keys_scan(monkeypatch):
+    import fakeredis
+    from app.cache import multi_tier
+
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def fake_from_url(*args, **kwargs):
+        return client
+
+    monkeypatch.setattr(multi_tier.redis, "from_url", fake_from_url)
+
+    async def no_keys(*args, **kwargs):
+        raise AssertionError("KEYS must not be used")
+
+    monkeypatch.setattr(client, "keys", no_keys)
+
+    cache = _make_cache()
+    await cache.connect()
+    try:
+        for i in range(3):
+            await cache.set("system", f"k{i}", i)
+        await cache.set("agents", "a", "keep")
+        assert await client.zcard("cache:index:system:0") == 3
+
+        await cache.clear_namespace("system")
+
+        assert await client.exists("system:k0", "system:k1", "system:k2") == 0
+        assert await client.exists("cache:index:system:0") == 0
+        assert await client.get("agents:a") == '"keep"'
+        assert await cache.get("system", "k0") is None
+    finally:
+        await cache.disconnect()
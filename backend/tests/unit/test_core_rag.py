@@ -1,3 +1,6 @@
+import pytest
+
+
 def test_rag_get_embedding_function_falls_back_on_exception(monkeypatch):
     import app.core.rag as rag_mod
 
@@ -30,6 +33,9 @@ def test_rag_ingest_document_chunks_and_adds(monkeypatch):
         def add(self, documents, metadatas, ids):
             self.add_calls.append({"documents": documents, "metadatas": metadatas, "ids": ids})
 
+        def get(self, where, include):
+            return {"ids": [], "metadatas": []}
+
     rag.collection = DummyCollection()
 
     monkeypatch.setattr(rag.text_splitter, "split_text", lambda content: ["a", "b"])
@@ -40,6 +46,83 @@ def test_rag_ingest_document_chunks_and_adds(monkeypatch):
     assert rag.collection.add_calls[0]["metadatas"][0]["source"] == "src"
 
 
+class _MemoryCollection:
+    """In-memory stand-in for a Chroma collection (ids, documents, metadatas)."""
+
+    def __init__(self):
+        self.rows: dict = {}
+        self.embedded: list = []
+
+    def add(self, ids, documents, metadatas, embeddings=None):
+        self.embedded.extend(documents)
+        for i, doc, meta in zip(ids, documents, metadatas):
+            assert i not in self.rows
+            self.rows[i] = (doc, meta)
+
+    def get(self, where, include):
+        ids = [i for i, (_, meta) in self.rows.items() if meta["source"] == where["source"]]
+        return {"ids": ids, "metadatas": [self.rows[i][1] for i in ids]}
+
+    def update(self, ids, metadatas):
+        for i, meta in zip(ids, metadatas):
+            self.rows[i] = (self.rows[i][0], meta)
+
+    def delete(self, ids):
+        for i in ids:
+            del self.rows[i]
+
+
+def _incremental_rag(monkeypatch):
+    import app.core.rag as rag_mod
+
+    rag = rag_mod.RAGService()
+    rag.client = object()
+    rag.collection = _MemoryCollection()
+    rag.embedding_fn = lambda docs: [[0.0] for _ in docs]
+    monkeypatch.setattr(rag.text_splitter, "split_text", lambda content: content.split("|"))
+    return rag
+
+
+def test_rag_reingest_only_embeds_changed_chunks(monkeypatch):
+    rag = _incremental_rag(monkeypatch)
+
+    assert rag.ingest_document("a|b|c", "doc") == 3
+    assert rag.collection.embedded == ["a", "b", "c"]
+
+    # Identical content: nothing embedded, nothing duplicated
+    assert rag.ingest_document("a|b|c", "doc") == 3
+    assert len(rag.collection.embedded) == 3
+    assert len(rag.collection.rows) == 3
+
+    # "b" removed, "d" inserted first, "c" repeated: only new text is embedded
+    assert rag.ingest_document("d|a|c|c", "doc") == 4
+    assert rag.collection.embedded[3:] == ["d", "c"]
+    docs = sorted((meta["chunk_index"], doc) for doc, meta in rag.collection.rows.values())
+    assert docs == [(0, "d"), (1, "a"), (2, "c"), (3, "c")]
+
+
+def test_rag_ingest_directory_batches_embeddings(monkeypatch, tmp_path):
+    rag = _incremental_rag(monkeypatch)
+    calls: list = []
+    rag.embedding_fn = lambda docs: calls.append(list(docs)) or [[0.0] for _ in docs]
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "one.md").write_text("a|b")
+    (tmp_path / "sub" / "two.txt").write_text("c|d|e")
+    (tmp_path / "skip.bin").write_text("x")
+
+    stats = rag.ingest_directory(str(tmp_path), batch_size=4, source_prefix="kb/")
+    assert stats["files"] == 2
+    assert stats["embedded"] == 5
+    assert [len(c) for c in calls] == [4, 1]
+    assert {meta["source"] for _, meta in rag.collection.rows.values()} == {"kb/one.md", "kb/sub/two.txt"}
+
+    (tmp_path / "one.md").write_text("a|z")
+    stats = rag.ingest_directory(str(tmp_path), batch_size=4, source_prefix="kb/")
+    assert stats["embedded"] == 1
+    assert stats["deleted"] == 1
+
+
 def test_rag_query_returns_documents(monkeypatch):
     import app.core.rag as rag_mod
 
@@ -77,3 +160,75 @@ def test_rag_reset_calls_client_and_reconnect(monkeypatch):
     rag.reset()
     assert calls["reset"] == 1
     assert calls["connect"] == 1
+
+
+def _async_rag(embed_calls: list, query_calls: list, **kwargs):
+    import app.core.rag as rag_mod
+
+    sync = rag_mod.RAGService()
+    sync.client = object()
+
+    def embed(texts):
+        embed_calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    class DummyCollection:
+        def query(self, query_embeddings, n_results, where=None):
+            query_calls.append(query_embeddings)
+            return {"documents": [[f"doc-{e[0]:g}"] for e in query_embeddings]}
+
+    sync.embedding_fn = embed
+    sync.collection = DummyCollection()
+    return rag_mod.AsyncRAGService(sync, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_async_rag_batches_concurrent_queries_into_one_embedding():
+    import asyncio
+
+    embed_calls: list = []
+    query_calls: list = []
+    service = _async_rag(embed_calls, query_calls, batch_window_ms=20)
+    try:
+        results = await asyncio.gather(
+            service.query("alpha"),
+            service.query("  ALPHA "),
+            service.query("beta!"),
+        )
+    finally:
+        service.close()
+
+    assert results == [["doc-5"], ["doc-5"], ["doc-5"]]
+    # one embedding call; "alpha" and "  ALPHA " normalize to the same text
+    assert embed_calls == [["alpha", "beta!"]]
+    assert service.get_stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_rag_query_many_uses_cache_and_one_search():
+    embed_calls: list = []
+    query_calls: list = []
+    service = _async_rag(embed_calls, query_calls, batch_window_ms=0)
+    try:
+        await service.query("hello")
+        results = await service.query_many(["Hello", "hi"], n_results=1)
+    finally:
+        service.close()
+
+    assert results == [["doc-5"], ["doc-2"]]
+    assert embed_calls == [["hello"], ["hi"]]
+    assert len(query_calls[-1]) == 2
+    assert service.get_stats()["cache_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_rag_raises_when_chroma_unavailable(monkeypatch):
+    embed_calls: list = []
+    service = _async_rag(embed_calls, [], batch_window_ms=0)
+    service._sync.client = None
+    monkeypatch.setattr(service._sync, "_connect", lambda: None)
+    try:
+        with pytest.raises(RuntimeError):
+            await service.query("anything")
+    finally:
+        service.close()
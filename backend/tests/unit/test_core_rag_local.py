@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+
+def _embed(texts):
+    """Deterministic bag-of-words vectors so related texts land close together."""
+    vectors = np.zeros((len(texts), 16), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for token in text.lower().split():
+            vectors[i, hash(token) % 16] += 1.0
+    return vectors
+
+
+def _index(tmp_path, **kwargs):
+    from app.core.rag_local import LocalHybridIndex
+
+    return LocalHybridIndex(str(tmp_path / "idx"), embedding_fn=_embed, **kwargs)
+
+
+def test_local_index_bm25_finds_exact_identifier(tmp_path):
+    index = _index(tmp_path)
+    index.add(
+        ids=["a", "b", "c"],
+        documents=[
+            "the agent crashed with ERR_POOL_EXHAUSTED during startup",
+            "agents coordinate through the crew orchestrator",
+            "redis keeps the task queue",
+        ],
+        metadatas=[{"source": "log"}, {"source": "docs"}, {"source": "docs"}],
+    )
+
+    result = index.query(query_texts=["ERR_POOL_EXHAUSTED"], n_results=2)
+    assert result["ids"][0][0] == "a"
+    assert index.count() == 3
+
+
+def test_local_index_update_delete_and_filters(tmp_path):
+    index = _index(tmp_path)
+    index.add(ids=["a", "b"], documents=["alpha beta", "alpha gamma"],
+              metadatas=[{"source": "s1", "chunk": 0}, {"source": "s2", "chunk": 0}])
+
+    assert index.get(where={"source": "s1"}, include=["metadatas"])["ids"] == ["a"]
+    index.update(ids=["a"], metadatas=[{"source": "s2", "chunk": 1}])
+    assert sorted(index.get(where={"source": "s2"})["ids"]) == ["a", "b"]
+
+    index.delete(ids=["b"])
+    assert index.query(query_texts=["alpha"], n_results=5)["ids"] == [["a"]]
+    assert index.count() == 1
+    with pytest.raises(ValueError):
+        index.get(where={"chunk": {"$gt": 0}})
+
+
+def test_local_index_survives_reopen_and_compaction(tmp_path):
+    index = _index(tmp_path)
+    index.add(ids=["a", "b", "c"], documents=["red apple", "green pear", "blue sky"],
+              metadatas=[{"source": "x"}] * 3)
+    index.delete(ids=["b"])
+    index.flush()
+
+    reopened = _index(tmp_path)
+    assert sorted(reopened.get()["ids"]) == ["a", "c"]
+    assert reopened.query(query_texts=["blue sky"], n_results=1)["ids"] == [["c"]]
+
+    reopened.compact()
+    assert reopened.count() == 2
+    assert reopened.query(query_texts=["red apple"], n_results=1)["ids"] == [["a"]]
+    reopened.add(ids=["d"], documents=["yellow sun"], metadatas=[{"source": "x"}])
+    assert _index(tmp_path).query(query_texts=["yellow"], n_results=1)["ids"] == [["d"]]
+
+
+def test_local_index_ivf_matches_exact_search(tmp_path, monkeypatch):
+    import app.core.rag_local as local_mod
+
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((3000, 8)).astype(np.float32)
+    index = local_mod.LocalHybridIndex(str(tmp_path / "ivf"))
+    index.add(ids=[str(i) for i in range(3000)], documents=[f"doc {i}" for i in range(3000)],
+              metadatas=[{"source": "bench"}] * 3000, embeddings=vectors)
+    query = vectors[42] + 0.01
+
+    exact = index.search_rows(None, [query], 5)
+    monkeypatch.setattr(local_mod, "EXACT_SCAN_LIMIT", 1000)
+    monkeypatch.setattr(local_mod, "IVF_PROBES", 8)
+    approx = index.search_rows(None, [query], 5)
+
+    assert index._ivf is not None
+    assert approx[0][0] == exact[0][0] == 42
+    # rows added after the IVF build are still searchable
+    index.add(ids=["new"], documents=["fresh"], metadatas=[{}], embeddings=[query * 10])
+    assert index.search_rows(None, [query], 1) == [[3000]]
+
+
+def test_local_index_queries_run_safely_during_ingestion(tmp_path):
+    import threading
+
+    index = _index(tmp_path)
+    index.add(ids=["seed"], documents=["seed document"], metadatas=[{"source": "s"}])
+    errors: list = []
+    done = threading.Event()
+
+    def ingest():
+        try:
+            for i in range(300):
+                index.add(ids=[f"d{i}"], documents=[f"document number {i} about agents"],
+                          metadatas=[{"source": "s"}])
+                if i % 50 == 49:
+                    index.delete(ids=[f"d{i - 10}"])
+                    index.update(ids=[f"d{i - 20}"], metadatas=[{"source": "t"}])
+        except Exception as e:  # pragma: no cover - surfaced below
+            errors.append(e)
+        finally:
+            done.set()
+
+    def search():
+        try:
+            while not done.is_set():
+                result = index.query(query_texts=["document agents"], n_results=5)
+                assert len(result["ids"][0]) == len(result["documents"][0])
+                index.query(query_texts=["agents"], n_results=3, where={"source": "s"})
+        except Exception as e:  # pragma: no cover - surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=ingest)] + [threading.Thread(target=search) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=60)
+
+    assert errors == []
+    assert index.count() == 301 - 6
+
+
+def test_local_rag_service_search_is_hybrid(tmp_path):
+    import app.core.rag as rag_mod
+
+    service = rag_mod.LocalRAGService(str(tmp_path / "svc"))
+    service.embedding_fn = _embed
+    assert service.ingest_document("The hyperfocus timer resets at midnight.", source="notes.md") == 1
+
+    assert service.query("hyperfocus timer") == ["The hyperfocus timer resets at midnight."]
+    assert service.search(["midnight"], _embed(["midnight"]).tolist(), n_results=3) == [
+        ["The hyperfocus timer resets at midnight."]
+    ]
+    service.reset()
+    assert service.query("hyperfocus") == []
@@ -0,0 +1,57 @@
+import pytest
+
+
+def test_memory_redactor_matches_each_rule_in_one_pass():
+    from app.core.redaction import MEMORY_REDACTOR
+
+    text = (
+        "api_key=abc123 then sk-" + "a" * 24 + " and pplx-" + "b" * 24
+        + " blob " + "QUJD" * 12 + "== done"
+    )
+    assert list(MEMORY_REDACTOR.findings(text)) == ["credential", "openai_key", "perplexity_key", "base64_blob"]
+    assert MEMORY_REDACTOR.redact(text) == (
+        "[REDACTED] then [REDACTED] and [REDACTED] blob [REDACTED] done"
+    )
+
+
+def test_prefilter_skips_regex_when_no_literal_present(monkeypatch):
+    from app.core.redaction import PROMPT_REDACTOR, Redactor, Rule
+
+    text = "plain prose with no secrets at all " * 100
+    assert PROMPT_REDACTOR._pattern_for(text) is None
+    assert PROMPT_REDACTOR.redact(text) is text
+
+    # case-insensitive literals are checked against the folded text
+    redactor = Redactor([Rule("kv", r"token\s*=\s*\S+", literals=("token",), ignore_case=True)])
+    assert redactor.redact("TOKEN = hunter2 ok") == "[REDACTED] ok"
+    with pytest.raises(ValueError):
+        Redactor([])
+
+
+def test_prompt_redactor_keeps_word_boundaries():
+    from app.core.redaction import PROMPT_REDACTOR
+
+    assert PROMPT_REDACTOR.redact("xsk-" + "a" * 20) == "xsk-" + "a" * 20
+    jwt = "eyJ" + "a" * 12 + "." + "b" * 12 + "." + "c" * 12
+    assert PROMPT_REDACTOR.redact(f"auth {jwt}-") == "auth [REDACTED]-"
+
+
+@pytest.mark.parametrize("size", [1, 3, 7])
+def test_stream_redacts_secrets_split_across_chunks(size):
+    from app.core.redaction import MEMORY_REDACTOR
+
+    text = "first line\nmy password: hunter2 and key sk-" + "z" * 30 + " tail"
+    stream = MEMORY_REDACTOR.stream()
+    out = "".join(stream.feed(text[i:i + size]) for i in range(0, len(text), size)) + stream.flush()
+
+    assert out == MEMORY_REDACTOR.redact(text)
+    assert "hunter2" not in out and "zzzz" not in out
+
+
+def test_stream_releases_text_early_and_caps_holdback():
+    from app.core.redaction import PROMPT_REDACTOR
+
+    stream = PROMPT_REDACTOR.stream(max_holdback=16)
+    assert stream.feed("hello wor") == "hello "
+    assert stream.feed("ld" + "x" * 20) == "world" + "x" * 20
+    assert stream.flush() == ""
@@ -1,3 +1,4 @@
+import pytest
 from unittest.mock import MagicMock, patch
 
 
@@ -30,3 +31,31 @@ def test_get_db_closes_on_exception():
         except RuntimeError:
             pass
         mock_session.close.assert_called_once()
+
+
+def test_async_db_url_maps_sync_drivers():
+    from app.db.session import async_db_url
+
+    assert async_db_url("postgresql://u:p@db:5432/hc") == "postgresql+asyncpg://u:p@db:5432/hc"
+    assert async_db_url("postgresql+psycopg2://u:p@db/hc") == "postgresql+asyncpg://u:p@db/hc"
+    assert async_db_url("postgresql+asyncpg://u:p@db/hc") == "postgresql+asyncpg://u:p@db/hc"
+    assert async_db_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+
+
+@pytest.mark.asyncio
+async def test_get_async_db_yields_session_and_disposes(monkeypatch):
+    from sqlalchemy import text
+    from app.db import session as db_session
+
+    monkeypatch.setattr(db_session.settings, "HYPERCODE_ASYNC_DB_URL", "sqlite+aiosqlite://")
+    await db_session.dispose_async_engine()
+    try:
+        gen = db_session.get_async_db()
+        db = await gen.__anext__()
+        assert (await db.execute(text("SELECT 1"))).scalar() == 1
+        with pytest.raises(RuntimeError):
+            await gen.athrow(RuntimeError("boom"))
+        assert db_session.get_async_engine() is db_session.get_async_engine()
+    finally:
+        await db_session.dispose_async_engine()
+    assert db_session._async_engine is None
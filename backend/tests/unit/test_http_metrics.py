@@ -0,0 +1,47 @@
+import pytest
+
+
+def test_percentiles_from_histogram_are_within_one_bucket():
+    from app.core import http_metrics
+
+    agg = http_metrics.HttpMetricsAggregator()
+    samples = [float(ms) for ms in range(1, 1001)]  # 1..1000 ms, uniform
+    for ms in samples:
+        agg.record(200, ms)
+
+    [minute_agg] = agg._pending.values()
+    hist = {str(k): str(v) for k, v in minute_agg.buckets.items()}
+    p50, p90, p99 = http_metrics.percentiles([hist], (0.5, 0.9, 0.99))
+
+    for got, exact in ((p50, 500), (p90, 900), (p99, 990)):
+        assert exact <= got <= exact * http_metrics.GROWTH
+
+
+def test_percentiles_empty_histograms():
+    from app.core import http_metrics
+
+    assert http_metrics.percentiles([{}, None], (0.5, 0.99)) == [0.0, 0.0]
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_deltas_once_and_resets(monkeypatch):
+    import fakeredis
+    from app.core import http_metrics
+
+    monkeypatch.setattr(http_metrics, "minute_key", lambda now=None: "202601011200")
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    agg = http_metrics.HttpMetricsAggregator()
+    agg.record(200, 12.0)
+    agg.record(500, 30.0)
+    agg.record(404, 8.0)
+    minute = http_metrics.minute_key()
+
+    await agg.flush(r)
+    await agg.flush(r)  # nothing pending — must not double count
+
+    assert await r.get(f"req_count:{minute}") == "3"
+    assert await r.get(f"error_count:{minute}") == "2"
+    assert float(await r.get(f"latency_sum_ms:{minute}")) == pytest.approx(50.0)
+    hist = await r.hgetall(f"latency_hist:{minute}")
+    assert sum(int(v) for v in hist.values()) == 3
+    assert 0 < await r.ttl(f"latency_hist:{minute}") <= http_metrics.KEY_TTL_SECONDS
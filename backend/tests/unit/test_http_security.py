@@ -0,0 +1,92 @@
+import pytest
+
+
+def _make_app(max_requests: int = 3, **config_kwargs):
+    from fastapi import FastAPI
+    from app.core.http_security import RateLimitConfig, RateLimitMiddleware
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    app.add_middleware(
+        RateLimitMiddleware,
+        config=RateLimitConfig(enabled=True, window_seconds=60, max_requests=max_requests, **config_kwargs),
+        exempt_paths=("/health",),
+    )
+    return app
+
+
+def test_rate_limit_allows_burst_then_returns_429():
+    from fastapi.testclient import TestClient
+
+    client = TestClient(_make_app(max_requests=3))
+    codes = [client.get("/ping").status_code for _ in range(4)]
+    assert codes == [200, 200, 200, 429]
+
+    blocked = client.get("/ping")
+    assert blocked.json() == {"detail": "Rate limit exceeded"}
+    assert int(blocked.headers["Retry-After"]) >= 1
+
+    # Limits are per (client, path) and exempt paths are never limited
+    assert client.get("/ping", headers={"X-Forwarded-For": "10.0.0.2"}).status_code == 200
+    assert all(client.get("/health").status_code == 200 for _ in range(10))
+
+
+def test_local_limiter_refills_and_evicts_idle_keys():
+    from app.core.http_security import LocalRateLimiter
+
+    limiter = LocalRateLimiter(window_seconds=60, max_requests=2, shards=1)
+    key = ("1.2.3.4", "/ping")
+    assert limiter.hit(key, now=100.0) == 0
+    assert limiter.hit(key, now=100.0) == 0
+    assert limiter.hit(key, now=100.0) == pytest.approx(30.0)
+
+    # One token back every window/max_requests seconds
+    assert limiter.hit(key, now=130.0) == 0
+    assert len(limiter) == 1
+
+    # Once the key's arrival time has passed it carries no state
+    limiter.hit(("5.6.7.8", "/other"), now=1000.0)
+    assert len(limiter) == 1
+
+
+def test_redis_backend_failure_falls_back_to_local_limits():
+    from fastapi.testclient import TestClient
+
+    app = _make_app(max_requests=2, backend="redis", redis_url="redis://127.0.0.1:1/0")
+    client = TestClient(app)
+    codes = [client.get("/ping").status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+
+
+def test_redis_outage_is_backed_off_and_client_closed_on_shutdown(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.core import http_security
+
+    calls = {"hit": 0, "closed": 0}
+
+    class DownLimiter:
+        def __init__(self, *args):
+            pass
+
+        async def hit(self, key):
+            calls["hit"] += 1
+            raise ConnectionError("redis unreachable")
+
+        async def aclose(self):
+            calls["closed"] += 1
+
+    monkeypatch.setattr(http_security, "RedisRateLimiter", DownLimiter)
+    app = _make_app(max_requests=5, backend="redis", redis_url="redis://redis:6379/0")
+    with TestClient(app) as client:
+        codes = [client.get("/ping").status_code for _ in range(3)]
+        assert codes == [200, 200, 200]
+        assert calls["hit"] == 1  # later requests skip Redis during the backoff
+    assert calls["closed"] == 1
@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_register_prunes_expired_members_and_counts_live():
+    import fakeredis
+    from app.core import key_registry
+
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    index = key_registry.HEARTBEAT_INDEX
+
+    async with r.pipeline(transaction=False) as pipe:
+        key_registry.register(pipe, index, "old", ttl_seconds=30, now=1000.0)
+        await pipe.execute()
+    async with r.pipeline(transaction=False) as pipe:
+        key_registry.register(pipe, index, "core", ttl_seconds=30, now=1040.0)
+        key_registry.register(pipe, index, "worker", ttl_seconds=30, now=1040.0)
+        await pipe.execute()
+
+    # "old" expired at 1030 and was pruned by the later writes
+    assert await r.zcard(index) == 2
+    assert await key_registry.count_live(r, index, now=1050.0) == 2
+    assert await key_registry.live_members(r, index, now=1050.0) == ["core", "worker"]
+    assert await key_registry.count_live(r, index, now=1100.0) == 0
+
+    async with r.pipeline(transaction=False) as pipe:
+        key_registry.unregister(pipe, index, "core")
+        await pipe.execute()
+    assert await key_registry.live_members(r, index, now=1050.0) == ["worker"]
+
+
+@pytest.mark.asyncio
+async def test_scan_keys_fallback_matches_pattern():
+    import fakeredis
+    from app.core import key_registry
+
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    await r.hset("agents:heartbeat:a", mapping={"status": "online"})
+    await r.hset("agents:heartbeat:b", mapping={"status": "online"})
+    await r.set("other:key", "x")
+
+    keys = await key_registry.scan_keys(r, key_registry.HEARTBEAT_PATTERN)
+    assert sorted(keys) == ["agents:heartbeat:a", "agents:heartbeat:b"]
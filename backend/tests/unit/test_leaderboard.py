@@ -0,0 +1,108 @@
+"""BROski$ leaderboard — Redis ZSET mirror with Postgres fallback."""
+import asyncio
+import threading
+
+import fakeredis
+import pytest
+from sqlalchemy.orm import Session
+
+from app.services import broski_service, leaderboard
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(leaderboard, "_get_redis", lambda: r)
+    return r
+
+
+@pytest.fixture
+def no_redis(monkeypatch):
+    monkeypatch.setattr(leaderboard, "_get_redis", lambda: None)
+
+
+def test_score_encoding_orders_by_coins_then_xp():
+    assert leaderboard.decode_score(leaderboard.encode_score(123, 4567)) == (123, 4567)
+    assert leaderboard.encode_score(2, 0) > leaderboard.encode_score(1, leaderboard.XP_SPAN * 5)
+    assert leaderboard.encode_score(1, 10) > leaderboard.encode_score(1, 9)
+
+
+def test_ledger_commits_are_mirrored_and_rollbacks_are_not(db, fake_redis):
+    leaderboard.reconcile(db)
+    broski_service.award_coins(1, 50, "a", db)
+    broski_service.award_xp(2, 300, "b", db)
+    broski_service.award_coins(2, 50, "b", db)
+
+    board = broski_service.get_leaderboard(db, limit=10)
+    assert [(s.user_id, s.coins, s.xp, s.rank) for s in board] == [(2, 50, 300, 1), (1, 50, 0, 2)]
+    assert board[0].level == 3
+
+    broski_service.apply_ledger(1, [broski_service.LedgerEntry("pending", coins=500)], db, commit=False)
+    db.rollback()
+    assert broski_service.get_rank(1, db).rank == 2
+
+
+def test_reads_fall_back_to_postgres(db, no_redis):
+    for uid, coins in [(1, 10), (2, 30), (3, 20)]:
+        broski_service.award_coins(uid, coins, "seed", db)
+
+    assert [s.user_id for s in broski_service.get_leaderboard(db, limit=2)] == [2, 3]
+    mine = broski_service.get_rank(1, db)
+    assert (mine.rank, mine.coins) == (3, 10)
+    assert broski_service.get_rank(99, db) is None
+
+
+def test_reconcile_repairs_missed_writes(db, fake_redis, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(leaderboard, "_get_redis", lambda: None)  # Redis down during the writes
+        broski_service.award_coins(1, 10, "missed", db)
+        broski_service.award_coins(2, 20, "missed", db)
+    fake_redis.zadd(leaderboard.LEADERBOARD_KEY, {"999": 1.0})  # stale member
+
+    assert leaderboard.reconcile(db, batch_size=1) == 2
+    assert fake_redis.zrevrange(leaderboard.LEADERBOARD_KEY, 0, -1) == ["2", "1"]
+    assert not fake_redis.exists(f"{leaderboard.LEADERBOARD_KEY}:rebuild")
+
+
+def test_partial_set_is_not_served_until_rebuilt(db, fake_redis, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(leaderboard, "_get_redis", lambda: None)
+        broski_service.award_coins(1, 100, "before the flush", db)
+    broski_service.award_coins(2, 5, "after the flush", db)  # a one-member set
+    assert fake_redis.zcard(leaderboard.LEADERBOARD_KEY) == 1
+
+    assert [s.user_id for s in broski_service.get_leaderboard(db)] == [1, 2]
+    assert broski_service.get_rank(2, db).rank == 2
+
+    leaderboard.reconcile(db)
+    fake_redis.zadd(leaderboard.LEADERBOARD_KEY, {"1": leaderboard.encode_score(1, 0)})  # now trusted
+    assert [s.user_id for s in broski_service.get_leaderboard(db)] == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_commits_on_the_event_loop_publish_in_the_executor(monkeypatch):
+    published = []
+    monkeypatch.setattr(leaderboard, "publish", lambda scores: published.append(threading.current_thread()))
+    session = Session()
+    session.info[leaderboard._STAGED] = {1: 1.0}
+
+    leaderboard._publish_staged(session)
+    for _ in range(100):
+        if published:
+            break
+        await asyncio.sleep(0.01)
+    assert published and published[0] is not threading.main_thread()
+
+
+def test_redis_errors_back_off(monkeypatch):
+    class Broken:
+        def zadd(self, *args, **kwargs):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(leaderboard, "_down_until", 0.0)
+    real_get_redis = leaderboard._get_redis
+    monkeypatch.setattr(leaderboard, "_get_redis", lambda: Broken())
+    assert leaderboard.publish({1: 1.0}) is False
+
+    monkeypatch.setattr(leaderboard, "_get_redis", real_get_redis)
+    assert leaderboard._get_redis() is None  # skipped until the backoff expires
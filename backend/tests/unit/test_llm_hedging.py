@@ -0,0 +1,208 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def health(monkeypatch):
+    from app.core.config import settings
+    from app.llm.hedging import provider_health
+
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAYS", "slow=0.05,fast=0.05,flaky=0.05")
+    monkeypatch.setattr(settings, "LLM_BREAKER_CONSECUTIVE_FAILURES", 3)
+    monkeypatch.setattr(settings, "LLM_BREAKER_COOLDOWN_SECONDS", 0.05)
+    provider_health.reset()
+    yield provider_health
+    provider_health.reset()
+
+
+def _sample(metric, **labels):
+    from prometheus_client import REGISTRY
+
+    return REGISTRY.get_sample_value(metric, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_slow_provider_is_hedged_and_cancelled(health):
+    from app.llm.hedging import Attempt, hedged_call
+
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "slow"
+
+    async def fast():
+        return "fast"
+
+    hedges_before = _sample("hypercode_llm_hedges_total", provider="fast")
+    provider, answer = await asyncio.wait_for(
+        hedged_call([Attempt("slow", slow), Attempt("fast", fast)]), timeout=1
+    )
+    assert (provider, answer) == ("fast", "fast")
+    assert cancelled.is_set()
+    assert _sample("hypercode_llm_hedges_total", provider="fast") == hedges_before + 1
+    assert health.get("slow").state == "closed"  # losing a race is not a failure
+
+
+@pytest.mark.asyncio
+async def test_failure_hands_over_without_waiting_and_reports_last_error(health):
+    from app.llm.hedging import Attempt, ProviderError, hedged_call
+
+    async def broken():
+        raise ProviderError("down")
+
+    async def last_resort():
+        raise ProviderError("also down", response="Error: API returned 500")
+
+    async def fast():
+        return "ok"
+
+    assert await hedged_call([Attempt("slow", broken), Attempt("fast", fast)]) == ("fast", "ok")
+
+    with pytest.raises(ProviderError) as exc_info:
+        await hedged_call([Attempt("slow", broken), Attempt("flaky", last_resort)])
+    assert exc_info.value.response == "Error: API returned 500"
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_skips_provider_then_probes(health):
+    from app.llm.hedging import Attempt, ProviderError, hedged_call
+
+    calls = {"flaky": 0}
+    healthy = False
+
+    async def flaky():
+        calls["flaky"] += 1
+        if not healthy:
+            raise ProviderError("boom")
+        return "flaky"
+
+    async def fast():
+        return "fast"
+
+    attempts = [Attempt("flaky", flaky), Attempt("fast", fast)]
+    for _ in range(3):
+        await hedged_call(attempts)
+    assert health.get("flaky").state == "open"
+
+    await hedged_call(attempts)
+    assert calls["flaky"] == 3  # skipped while open
+
+    await asyncio.sleep(0.06)
+    assert health.get("flaky").state == "half_open"
+    healthy = True
+    assert await hedged_call(attempts) == ("flaky", "flaky")
+    assert health.get("flaky").state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_stream_is_hedged_on_first_token_and_loser_cancelled(health):
+    from app.llm.hedging import StreamAttempt, hedged_stream
+
+    closed = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+            yield "slow"
+        finally:
+            closed.set()
+
+    async def fast():
+        for token in ("a", "b", "c"):
+            await asyncio.sleep(0.06)  # slower than the hedge deadline once started
+            yield token
+
+    hedges_before = _sample("hypercode_llm_hedges_total", provider="fast")
+    stream = hedged_stream([StreamAttempt("slow", slow), StreamAttempt("fast", fast)])
+    tokens = await asyncio.wait_for(_collect(stream), timeout=1)
+
+    assert tokens == ["a", "b", "c"]
+    assert closed.is_set()
+    assert _sample("hypercode_llm_hedges_total", provider="fast") == hedges_before + 1
+    assert health.get("slow").state == "closed"
+
+    # TTFT and whole-stream latency go to separate windows; the loser is censored
+    [(ttft, _)] = health.get("fast")._latencies["ttft"]
+    [(full, _)] = health.get("fast")._latencies["full"]
+    assert 0.05 < ttft < full
+    [(elapsed, censored)] = health.get("slow")._latencies["ttft"]
+    assert censored and elapsed >= 0.05
+    assert not health.get("slow")._latencies["full"]
+
+
+@pytest.mark.asyncio
+async def test_stream_failure_before_first_token_hands_over(health):
+    from app.llm.hedging import ProviderError, StreamAttempt, StreamInterrupted, hedged_stream
+
+    async def broken():
+        raise ProviderError("down")
+        yield  # pragma: no cover
+
+    async def interrupted():
+        yield "partial"
+        raise ProviderError("connection reset")
+
+    received: list[str] = []
+    stream = hedged_stream([StreamAttempt("slow", broken), StreamAttempt("flaky", interrupted)])
+    with pytest.raises(StreamInterrupted, match="connection reset"):
+        async for token in stream:
+            received.append(token)
+    assert received == ["partial"]
+    assert health.get("flaky").error_rate() == 1.0  # mid-stream failure still counts
+
+    with pytest.raises(ProviderError, match="down"):
+        await _collect(hedged_stream([StreamAttempt("slow", broken)]))
+
+
+async def _collect(stream) -> list:
+    return [token async for token in stream]
+
+
+def test_hedge_delay_tracks_p95_within_configured_cap():
+    from app.llm.hedging import MIN_SAMPLES_FOR_P95, ProviderHealth
+
+    health = ProviderHealth(
+        "p",
+        deadline_seconds=10.0,
+        min_delay_seconds=0.5,
+        error_rate_threshold=0.5,
+        consecutive_failures=5,
+        cooldown_seconds=30,
+    )
+    assert health.hedge_delay() == 10.0
+    for i in range(MIN_SAMPLES_FOR_P95):
+        health.record_success(1.0 + i * 0.1)
+    assert health.hedge_delay() == pytest.approx(2.8)
+    for _ in range(50):
+        health.record_success(60.0)
+    assert health.hedge_delay() == 10.0
+
+
+def test_hedge_delay_accounts_for_censored_losers():
+    from app.llm.hedging import MIN_SAMPLES_FOR_P95, TTFT, ProviderHealth
+
+    health = ProviderHealth(
+        "p",
+        deadline_seconds=10.0,
+        min_delay_seconds=0.5,
+        error_rate_threshold=0.5,
+        consecutive_failures=5,
+        cooldown_seconds=30,
+    )
+    for i in range(MIN_SAMPLES_FOR_P95):
+        health.record_latency(1.0 + i * 0.1, TTFT)
+    assert health.hedge_delay(TTFT) == pytest.approx(2.8)
+    assert health.hedge_delay() == 10.0  # the full-response window is separate
+
+    # As many attempts again were cancelled at 3s without answering: the
+    # provider's real p95 is somewhere past 3s, not 2.8s
+    for _ in range(MIN_SAMPLES_FOR_P95):
+        health.record_cancelled(3.0, TTFT)
+    assert health.hedge_delay(TTFT) == 10.0
+    assert health.error_rate() == 0.0
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+
+def _registry():
+    from app.llm.http_clients import HttpClientRegistry, ProviderPool
+
+    return HttpClientRegistry({"ollama": ProviderPool(timeout_seconds=7.0)}, max_connections=4)
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_one_client_per_provider():
+    registry = _registry()
+    client = registry.get("ollama")
+    assert registry.get("ollama") is client
+    assert client.timeout.read == 7.0
+
+    stats = registry.get_stats()["ollama"]
+    assert stats["open"] is True
+    assert stats["created"] == 1
+    assert stats["max_connections"] == 4
+    assert stats["connections"] == 0
+
+    with pytest.raises(KeyError):
+        registry.get("unknown")
+
+    await registry.aclose()
+    assert client.is_closed
+    assert registry.get_stats()["ollama"]["open"] is False
+
+
+def test_registry_replaces_clients_from_finished_loops():
+    registry = _registry()
+
+    async def grab():
+        return registry.get("ollama")
+
+    first = asyncio.run(grab())
+    second = asyncio.run(grab())
+    assert first is not second
+    stats = registry.get_stats()["ollama"]
+    assert stats["created"] == 2
+    assert stats["replaced"] == 1
+
+
+def test_pool_collector_exports_gauges():
+    from app.llm.http_clients import _PoolCollector
+
+    metrics = {m.name: m for m in _PoolCollector(_registry()).collect()}
+    assert metrics["hypercode_llm_pool_max_connections"].samples[0].value == 4
+    assert metrics["hypercode_llm_pool_requests"].samples[0].labels == {"provider": "ollama"}
@@ -0,0 +1,171 @@
+import json
+
+import httpx
+import pytest
+
+
+def _ollama_transport(chunks: list[str], seen: list | None = None) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if seen is not None:
+            seen.append(body)
+        if body["stream"]:
+            lines = [json.dumps({"response": c, "done": False}) for c in chunks]
+            lines.append(json.dumps({"response": "", "done": True}))
+            return httpx.Response(200, content="\n".join(lines).encode())
+        return httpx.Response(200, json={"response": "".join(chunks)})
+
+    return httpx.MockTransport(handler)
+
+
+def _ollama_brain(monkeypatch, chunks, seen=None):
+    import app.agents.brain as brain_mod
+    from app.core.config import settings
+
+    settings.OLLAMA_HOST = "http://ollama"
+    settings.DEFAULT_LLM_MODEL = "tinyllama"
+    client = httpx.AsyncClient(transport=_ollama_transport(chunks, seen))
+    monkeypatch.setattr(brain_mod.http_clients, "get", lambda provider: client)
+    return brain_mod.Brain()
+
+
+@pytest.mark.asyncio
+async def test_think_stream_yields_ollama_tokens(monkeypatch):
+    seen: list = []
+    brain = _ollama_brain(monkeypatch, ["Hel", "lo", " world"], seen)
+
+    tokens = [t async for t in brain.think_stream("Role", "Say hello")]
+    assert tokens == ["Hel", "lo", " world"]
+    assert seen[0]["stream"] is True
+
+
+@pytest.mark.asyncio
+async def test_think_with_sink_streams_but_returns_same_text(monkeypatch):
+    from app.llm.streaming import stream_tokens_to
+
+    brain = _ollama_brain(monkeypatch, ["a", "b", "c"])
+    buffered = await brain.think("Role", "Task")
+
+    received: list[str] = []
+
+    async def sink(token: str) -> None:
+        received.append(token)
+
+    with stream_tokens_to(sink):
+        streamed = await brain.think("Role", "Task")
+
+    assert streamed == buffered == "abc"
+    assert received == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_think_falls_back_to_buffered_answer_when_stream_breaks(monkeypatch):
+    import app.agents.brain as brain_mod
+    from app.core.config import settings
+    from app.llm.hedging import provider_health
+    from app.llm.streaming import stream_tokens_to
+
+    class _BreaksAfterFirstToken(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield (json.dumps({"response": "Hal", "done": False}) + "\n").encode()
+            raise httpx.ReadError("connection reset")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if json.loads(request.content)["stream"]:
+            return httpx.Response(200, stream=_BreaksAfterFirstToken())
+        return httpx.Response(200, json={"response": "Hello world"})
+
+    settings.OLLAMA_HOST = "http://ollama"
+    settings.DEFAULT_LLM_MODEL = "tinyllama"
+    settings.PERPLEXITY_SESSION_AUTH = False
+    settings.PERPLEXITY_API_KEY = None
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(brain_mod.http_clients, "get", lambda provider: client)
+    persisted: list[str] = []
+
+    async def persist(self, conversation_id, agent_id, memory_mode, role, content):
+        persisted.append(content)
+
+    monkeypatch.setattr(brain_mod.Brain, "_persist_turn", persist)
+    provider_health.reset()
+
+    class _Sink:
+        def __init__(self):
+            self.received: list[str] = []
+            self.abandoned = 0
+
+        async def __call__(self, token: str) -> None:
+            self.received.append(token)
+
+        async def abandon(self) -> None:
+            self.abandoned += 1
+
+    sink = _Sink()
+    with stream_tokens_to(sink):
+        result = await brain_mod.Brain().think("Role", "Task")
+    provider_health.reset()
+
+    assert result == "Hello world"
+    assert persisted[-1] == "Hello world"
+    assert sink.abandoned == 1
+    assert sink.received == ["Hal", "Hello world"]
+
+
+@pytest.mark.asyncio
+async def test_stream_falls_back_when_no_provider(monkeypatch):
+    from app.agents.brain import Brain, NO_PROVIDER_RESPONSE
+    from app.core.config import settings
+
+    settings.OLLAMA_HOST = ""
+    settings.PERPLEXITY_SESSION_AUTH = False
+    settings.PERPLEXITY_API_KEY = None
+
+    tokens = [t async for t in Brain().think_stream("Role", "Task")]
+    assert tokens == [NO_PROVIDER_RESPONSE]
+
+
+@pytest.mark.asyncio
+async def test_sse_chat_tokens_parses_deltas():
+    from app.llm.streaming import iter_sse_chat_tokens
+
+    body = "\n".join([
+        ": keep-alive",
+        'data: {"choices":[{"delta":{"role":"assistant"}}]}',
+        'data: {"choices":[{"delta":{"content":"Hi"}}]}',
+        "",
+        'data: {"choices":[{"delta":{"content":" there"}}]}',
+        "data: [DONE]",
+        'data: {"choices":[{"delta":{"content":"ignored"}}]}',
+    ])
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body.encode()))
+    async with httpx.AsyncClient(transport=transport) as client:
+        async with client.stream("POST", "https://llm.test/chat/completions") as response:
+            tokens = [t async for t in iter_sse_chat_tokens(response)]
+    assert tokens == ["Hi", " there"]
+
+
+@pytest.mark.asyncio
+async def test_event_token_relay_batches_and_ends_stream():
+    from app.llm.streaming import EventTokenRelay
+    from app.ws.events_broadcaster import EVENTS_CHANNEL_KEY
+
+    class _Redis:
+        def __init__(self):
+            self.messages = []
+
+        async def publish(self, channel, message):
+            self.messages.append((channel, json.loads(message)))
+
+    redis = _Redis()
+    relay = EventTokenRelay(redis, task_id=7, agent_id="worker")
+    for token in ["first", " second", " third"]:
+        await relay(token)
+    await relay.aclose()
+
+    assert {channel for channel, _ in redis.messages} == {EVENTS_CHANNEL_KEY}
+    events = [event for _, event in redis.messages]
+    # First token goes out immediately, the rest are coalesced
+    assert events[0]["payload"] == {"seq": 1, "delta": "first"}
+    assert "".join(e["payload"].get("delta", "") for e in events) == "first second third"
+    assert events[-1]["status"] == "stream_end"
+    assert all(e["channel"] == "llm_tokens" and e["taskId"] == "7" for e in events)
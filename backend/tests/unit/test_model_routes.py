@@ -43,7 +43,7 @@ def test_select_model_route_uses_hunter_for_architecture_when_enabled():
 async def test_brain_routes_to_openrouter_when_requested(monkeypatch):
     from app.agents.brain import Brain
     from app.core.config import settings
-    import app.core.model_routes as routes_mod
+    import app.agents.brain as brain_mod
 
     settings.OLLAMA_HOST = ""
     settings.PERPLEXITY_SESSION_AUTH = False
@@ -69,13 +69,13 @@ async def test_brain_routes_to_openrouter_when_requested(monkeypatch):
         async def __aexit__(self, exc_type, exc, tb):
             return False
 
-        async def post(self, url: str, json: dict, headers: dict):
+        async def post(self, url: str, json: dict, headers: dict, timeout: float):
             post_capture["url"] = url
             post_capture["json"] = json
             post_capture["headers"] = headers
             return DummyResponse(200, {"choices": [{"message": {"content": "hi"}}]})
 
-    monkeypatch.setattr(routes_mod.httpx, "AsyncClient", lambda *a, **k: CloudClient())
+    monkeypatch.setattr(brain_mod.http_clients, "get", lambda provider: CloudClient())
 
     b = Brain()
     result = await b.think(
@@ -87,3 +87,31 @@ async def test_brain_routes_to_openrouter_when_requested(monkeypatch):
     assert result == "hi"
     assert "/chat/completions" in post_capture["url"]
     assert post_capture["headers"]["Authorization"] == "Bearer k"
+
+
+@pytest.mark.asyncio
+async def test_openrouter_chat_uses_supplied_client():
+    import httpx
+    from app.core.model_routes import openrouter_chat
+
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "pong"}}]})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        for _ in range(2):
+            result = await openrouter_chat(
+                client=client,
+                base_url="https://openrouter.test/api/v1/",
+                api_key="k",
+                model="m",
+                messages=[{"role": "user", "content": "ping"}],
+                max_tokens=16,
+                privacy_mode="none",
+            )
+            assert result == "pong"
+        assert not client.is_closed
+
+    assert [str(r.url) for r in seen] == ["https://openrouter.test/api/v1/chat/completions"] * 2
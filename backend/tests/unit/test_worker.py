@@ -18,7 +18,7 @@ def _make_payload(task_id="abc-123", task_type="code", description="do stuff"):
 @patch("app.worker.os.path.exists", return_value=False)
 @patch("builtins.open", mock_open())
 @patch("app.worker.SessionLocal")
-@patch("app.worker.asyncio.run")
+@patch("app.worker._run")
 def test_process_agent_job_success(mock_run, mock_session, *_):
     """Happy path — task routed, DB updated, file written."""
     def fake_run(coro):
@@ -34,16 +34,12 @@ def test_process_agent_job_success(mock_run, mock_session, *_):
     mock_task_record.project.owner_id = 1
     mock_db.query.return_value.filter.return_value.first.return_value = mock_task_record
 
-    with patch("app.services.broski_service.award_coins") as _award_coins, \
-         patch("app.services.broski_service.award_xp") as _award_xp, \
-         patch("app.services.broski_service.get_wallet") as _get_wallet:
-        wallet = MagicMock()
-        wallet.last_first_task_date = None
-        _get_wallet.return_value = wallet
-
+    with patch("app.services.broski_service.award_task_completion") as _award:
         from app.worker import process_agent_job
         result = process_agent_job(_make_payload())
 
+    _award.assert_called_once_with(1, mock_db)  # one ledger batch per finished task
+
     assert result["status"] == "completed"
     assert "output_file" in result
     assert mock_task_record.status.name in ("DONE", "done") or mock_task_record.status is not None
@@ -52,7 +48,7 @@ def test_process_agent_job_success(mock_run, mock_session, *_):
 
 
 @patch("app.worker.SessionLocal")
-@patch("app.worker.asyncio.run")
+@patch("app.worker._run")
 @patch("app.worker.os.path.exists", return_value=True)
 @patch("builtins.open", mock_open())
 def test_process_agent_job_task_not_in_db(_mock_exists, mock_run, mock_session):
@@ -74,7 +70,7 @@ def test_process_agent_job_task_not_in_db(_mock_exists, mock_run, mock_session):
     mock_db.close.assert_called_once()
 
 
-@patch("app.worker.asyncio.run")
+@patch("app.worker._run")
 def test_process_agent_job_router_failure(mock_run):
     """Router throws — worker catches and returns failed status."""
     def fake_run(coro):
@@ -90,7 +86,7 @@ def test_process_agent_job_router_failure(mock_run):
 
 
 @patch("app.worker.SessionLocal")
-@patch("app.worker.asyncio.run")
+@patch("app.worker._run")
 @patch("app.worker.os.path.exists", return_value=True)
 @patch("builtins.open", mock_open())
 def test_process_agent_job_db_error(_mock_exists, mock_run, mock_session):
@@ -112,3 +108,30 @@ def test_process_agent_job_db_error(_mock_exists, mock_run, mock_session):
     assert result["status"] == "completed"
     mock_db.rollback.assert_called_once()
     mock_db.close.assert_called_once()
+
+
+def test_tasks_share_one_loop_and_pools_close_at_process_shutdown(monkeypatch):
+    """Pooled clients live on one loop per worker process and close with it."""
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    from app import worker
+    from app.core.agent_memory import memory_store
+    from app.llm.http_clients import http_clients
+
+    monkeypatch.setattr(http_clients, "aclose", AsyncMock())
+    monkeypatch.setattr(memory_store, "aclose", AsyncMock())
+    monkeypatch.setattr(worker, "_loop", None)
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    worker._on_worker_process_init()
+    first = worker._run(current_loop())
+    assert worker._run(current_loop()) is first
+    http_clients.aclose.assert_not_awaited()
+
+    worker._on_worker_process_shutdown()
+    http_clients.aclose.assert_awaited_once()
+    memory_store.aclose.assert_awaited_once()
+    assert first.is_closed() and worker._loop is None
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+
+class _FakeWebSocket:
+    def __init__(self, block: asyncio.Event | None = None):
+        self.sent: list[str] = []
+        self.closed_with: int | None = None
+        self._block = block
+        self._disconnect = asyncio.Event()
+
+    async def accept(self):
+        return None
+
+    async def send_text(self, data: str):
+        if self._block is not None:
+            await self._block.wait()
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+    async def receive(self):
+        await self._disconnect.wait()
+        return {"type": "websocket.disconnect"}
+
+    def hang_up(self):
+        self._disconnect.set()
+
+
+async def _drain():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_fans_out_and_drops_slow_consumer():
+    from app.ws.connection_manager import ConnectionManager, SLOW_CONSUMER_CLOSE_CODE
+
+    manager = ConnectionManager(queue_size=2)
+    fast = _FakeWebSocket()
+    slow = _FakeWebSocket(block=asyncio.Event())
+    await manager.connect(fast)
+    await manager.connect(slow)
+
+    for i in range(4):
+        await manager.broadcast(f"frame-{i}")
+        await _drain()
+
+    assert fast.sent == ["frame-0", "frame-1", "frame-2", "frame-3"]
+    assert len(manager) == 1
+    assert slow.closed_with == SLOW_CONSUMER_CLOSE_CODE
+    stats = manager.get_stats()
+    assert stats["dropped_clients"] == 1
+    assert stats["clients"] == 1
+
+    manager.disconnect(fast)
+    assert len(manager) == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_snapshot_built_once_per_tick_for_all_clients(monkeypatch):
+    from app.ws import metrics_broadcaster as mb
+
+    builds = 0
+
+    async def fake_build(r):
+        nonlocal builds
+        builds += 1
+        return mb.MetricsSnapshot(
+            requestsPerMin=builds, avgResponseMs=0.0, healsToday=0, errorRatePct=0.0,
+            activeAgents=0, redisQueueDepth=0, collectedAt="now",
+        )
+
+    class _FakeRedis:
+        async def aclose(self):
+            return None
+
+    monkeypatch.setattr(mb, "_build_snapshot", fake_build)
+    monkeypatch.setattr(mb.aioredis, "from_url", lambda *a, **k: _FakeRedis())
+    monkeypatch.setattr(mb, "BROADCAST_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(mb, "_manager", mb.ConnectionManager())
+
+    clients = [_FakeWebSocket() for _ in range(20)]
+    handlers = [asyncio.create_task(mb.ws_metrics(ws)) for ws in clients]
+    await asyncio.sleep(0.035)
+
+    ticks = builds
+    assert ticks >= 1
+    assert all(ws.sent and ws.sent[-1] == clients[0].sent[-1] for ws in clients)
+    assert all(len(ws.sent) <= ticks + 1 for ws in clients)
+
+    for ws in clients:
+        ws.hang_up()
+    await asyncio.gather(*handlers)
+    await asyncio.sleep(0.03)
+    assert mb._producer_task is None
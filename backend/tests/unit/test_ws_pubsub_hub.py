@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+
+def _make_hub(monkeypatch, queue_size: int = 8):
+    import fakeredis
+    from app.ws import pubsub_hub
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        pubsub_hub.aioredis,
+        "from_url",
+        lambda *a, **k: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+    return pubsub_hub.PubSubHub("redis://fake", queue_size=queue_size)
+
+
+async def _next(sub, timeout: float = 2.0) -> str:
+    return await asyncio.wait_for(sub.__anext__(), timeout)
+
+
+@pytest.mark.asyncio
+async def test_one_redis_subscription_and_one_encode_per_message(monkeypatch):
+    hub = _make_hub(monkeypatch)
+    encodes = 0
+
+    def wrapped(message):
+        nonlocal encodes
+        encodes += 1
+        return json.dumps({"channel": "ws_tasks", "data": message.data})
+
+    try:
+        async with hub.subscribe("events", encoder=wrapped) as a, \
+                hub.subscribe("events", encoder=wrapped) as b, \
+                hub.subscribe("events") as raw:
+            r = await hub.client()
+            [(_, count)] = await r.pubsub_numsub("events")
+            assert count == 1
+
+            await r.publish("events", json.dumps({"id": "e1"}))
+            frame_a, frame_b, frame_raw = await _next(a), await _next(b), await _next(raw)
+
+            assert frame_a is frame_b
+            assert json.loads(frame_a) == {"channel": "ws_tasks", "data": {"id": "e1"}}
+            assert frame_raw == json.dumps({"id": "e1"})
+            assert encodes == 1
+            assert hub.get_stats()["subscribers"] == 3
+
+        [(_, count)] = await r.pubsub_numsub("events")
+        assert count == 0
+        assert hub.get_stats()["channels"] == 0
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_ended_without_affecting_others(monkeypatch):
+    hub = _make_hub(monkeypatch, queue_size=2)
+    try:
+        async with hub.subscribe("logs") as slow, hub.subscribe("logs") as fast:
+            r = await hub.client()
+            received = []
+            for i in range(4):
+                await r.publish("logs", f"m{i}")
+                received.append(await _next(fast))
+
+            assert received == ["m0", "m1", "m2", "m3"]
+            with pytest.raises(StopAsyncIteration):
+                await _next(slow)
+            assert slow.overflowed
+            assert hub.get_stats()["dropped_subscribers"] == 1
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_reader_survives_failed_resubscribes(monkeypatch):
+    from app.ws import pubsub_hub
+
+    monkeypatch.setattr(pubsub_hub, "RESUBSCRIBE_BACKOFF_SECONDS", 0.01)
+    hub = _make_hub(monkeypatch)
+    real_resubscribe = hub._resubscribe
+    attempts = 0
+
+    async def flaky_resubscribe():
+        nonlocal attempts
+        attempts += 1
+        if attempts <= 2:
+            raise ConnectionError("redis still down")
+        await real_resubscribe()
+
+    monkeypatch.setattr(hub, "_resubscribe", flaky_resubscribe)
+    try:
+        async with hub.subscribe("events") as sub:
+            reader = hub._reader
+
+            async def broken(**kwargs):
+                raise ConnectionError("connection lost")
+
+            monkeypatch.setattr(hub._pubsub, "get_message", broken)
+            for _ in range(200):
+                if attempts >= 3:
+                    break
+                await asyncio.sleep(0.01)
+
+            r = await hub.client()
+            await r.publish("events", "after the outage")
+            assert await _next(sub) == "after the outage"
+            assert hub._reader is reader and not reader.done()
+    finally:
+        await hub.close()
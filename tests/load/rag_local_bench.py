@@ -0,0 +1,113 @@
+"""
+Query latency of the embedded hybrid RAG index (backend/app/core/rag_local.py).
+
+Builds a throwaway LocalHybridIndex with N synthetic chunks (Zipf-distributed
+vocabulary, clustered unit vectors) at several sizes and reports the
+median/p99 latency of top-k:
+
+  bm25     lexical ranking only
+  vector   vector ranking only (exact scan, or IVF above EXACT_SCAN_LIMIT)
+  hybrid   both rankings fused with RRF (what LocalRAGService runs)
+
+Target: hybrid p99 < 20ms at 1M chunks. Needs ~dim*4 bytes of disk per chunk.
+
+Usage:
+  python tests/load/rag_local_bench.py --sizes 100000,1000000 --dim 384 --dir /tmp/rag-bench
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app.core.rag_local import LocalHybridIndex  # noqa: E402
+
+VOCAB_SIZE = 50_000
+WORDS_PER_CHUNK = 120
+CLUSTERS = 256
+ADD_BATCH = 10_000
+
+
+def _fill(index: LocalHybridIndex, n: int, dim: int, rng: np.random.Generator) -> None:
+    centers = rng.standard_normal((CLUSTERS, dim)).astype(np.float32)
+    for start in range(0, n, ADD_BATCH):
+        size = min(ADD_BATCH, n - start)
+        words = rng.zipf(1.3, size=(size, WORDS_PER_CHUNK)) % VOCAB_SIZE
+        vectors = centers[rng.integers(0, CLUSTERS, size)] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+        index.add(
+            ids=[f"chunk-{i}" for i in range(start, start + size)],
+            documents=[" ".join(f"w{w}" for w in row) for row in words],
+            metadatas=[{"source": f"doc-{i // 20}"} for i in range(start, start + size)],
+            embeddings=vectors,
+        )
+
+
+def _time(fn, rounds: int) -> dict:
+    samples = []
+    for i in range(rounds):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+    }
+
+
+def run(directory: str, sizes: list[int], dim: int, k: int, rounds: int, out_path: str | None) -> int:
+    rng = np.random.default_rng(7)
+    results = []
+    for n in sizes:
+        path = os.path.join(directory, f"n{n}")
+        shutil.rmtree(path, ignore_errors=True)
+        index = LocalHybridIndex(path)
+        t0 = time.perf_counter()
+        _fill(index, n, dim, rng)
+        fill_s = time.perf_counter() - t0
+
+        queries = [f"w{a} w{b} w{c}" for a, b, c in rng.integers(1, 2000, (rounds, 3))]
+        vectors = rng.standard_normal((rounds, dim)).astype(np.float32)
+        index.search_rows(queries[:1], vectors[:1], k)  # warm-up (trains the IVF on large sizes)
+
+        row = {"chunks": n, "dim": dim, "k": k, "fill_s": round(fill_s, 1)}
+        row["bm25"] = _time(lambda i: index.search_rows([queries[i]], None, k), rounds)
+        row["vector"] = _time(lambda i: index.search_rows(None, [vectors[i]], k), rounds)
+        row["hybrid"] = _time(lambda i: index.search_rows([queries[i]], [vectors[i]], k), rounds)
+        results.append(row)
+        print(
+            f"{n:>8} chunks | fill {fill_s:>6.1f}s | "
+            f"BM25 p50 {row['bm25']['p50_ms']:>7.3f}ms | "
+            f"vector p50 {row['vector']['p50_ms']:>7.3f}ms | "
+            f"hybrid p50 {row['hybrid']['p50_ms']:>7.3f}ms p99 {row['hybrid']['p99_ms']:>7.3f}ms"
+        )
+        shutil.rmtree(path, ignore_errors=True)
+
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+def main() -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("--dir", default="/tmp/rag-local-bench", help="scratch directory — contents are DELETED")
+    p.add_argument("--sizes", default="10000,100000,1000000")
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--rounds", type=int, default=200)
+    p.add_argument("--out", default=None)
+    args = p.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    return run(args.dir, sizes, args.dim, args.k, args.rounds, args.out)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,133 @@
+"""
+Microbenchmark for the shared redaction engine (backend/app/core/redaction.py).
+
+Times the legacy per-pattern loops (one full scan per regex, as
+agent_memory._redact / model_routes.redact_secrets used to do) against the
+single-pass Redactor on inputs of growing size:
+
+  base64_runs     39-char base64 runs — every offset is a near-miss blob
+  jwt_no_dots     long "eyJ..." tokens that never complete a JWT
+  credential_gap  "token" followed by long whitespace and no separator
+  llm_output      realistic prose/code with a few real secrets
+
+Linear time means ns/char stays flat as the size grows; the script exits 1
+if the engine's ns/char at the largest size is more than --max-growth times
+the smallest.
+
+Usage:
+  python tests/load/redaction_bench.py --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app.core.redaction import MEMORY_REDACTOR, PROMPT_REDACTOR  # noqa: E402
+
+LEGACY_MEMORY = [
+    re.compile(r"(?i)(api[_-]?key|bearer|token|secret|password|passwd|pwd)\s*[:=]\s*\S+"),
+    re.compile(r"sk-[A-Za-z0-9]{20,}"),
+    re.compile(r"pplx-[A-Za-z0-9]{20,}"),
+    re.compile(r"[A-Za-z0-9+/]{40,}={0,2}"),
+]
+LEGACY_PROMPT = [
+    re.compile(r"\bsk-[A-Za-z0-9]{16,}\b"),
+    re.compile(r"\bghp_[A-Za-z0-9]{16,}\b"),
+    re.compile(r"\bxox[baprs]-[A-Za-z0-9-]{10,}\b"),
+    re.compile(r"\beyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\b"),
+]
+
+LLM_SNIPPET = (
+    "Here is the fix. The handler now reuses the pooled client:\n"
+    "```python\nasync def fetch(url):\n    return await client.get(url, timeout=5)\n```\n"
+    "Remember to rotate the key sk-" + "Q" * 32 + " after deploying; the token: abc123 is stale.\n"
+)
+
+
+def _inputs(size: int) -> dict:
+    def fill(unit: str) -> str:
+        return (unit * (size // len(unit) + 1))[:size]
+
+    return {
+        "base64_runs": fill("A" * 39 + "-"),
+        "jwt_no_dots": fill("eyJ" + "a" * 997 + " "),
+        "credential_gap": fill("token" + " " * 995),
+        "llm_output": fill(LLM_SNIPPET),
+    }
+
+
+def _legacy(patterns):
+    def run(text: str) -> str:
+        for pattern in patterns:
+            text = pattern.sub("[REDACTED]", text)
+        return text
+    return run
+
+
+def _time(fn, text: str, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn(text)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1e9 / len(text)  # ns per char
+
+
+def run(sizes: list[int], rounds: int, max_growth: float, out_path: str | None) -> int:
+    engines = {
+        "memory": (_legacy(LEGACY_MEMORY), MEMORY_REDACTOR.redact),
+        "prompt": (_legacy(LEGACY_PROMPT), PROMPT_REDACTOR.redact),
+    }
+    results = []
+    for size in sizes:
+        for case, text in _inputs(size).items():
+            for name, (legacy, engine) in engines.items():
+                row = {
+                    "size": size, "case": case, "ruleset": name,
+                    "legacy_ns_per_char": round(_time(legacy, text, rounds), 2),
+                    "engine_ns_per_char": round(_time(engine, text, rounds), 2),
+                }
+                results.append(row)
+                print(
+                    f"{size:>8} chars | {case:<15} {name:<6} | "
+                    f"legacy {row['legacy_ns_per_char']:>8.2f} ns/char | "
+                    f"engine {row['engine_ns_per_char']:>8.2f} ns/char"
+                )
+
+    failed = False
+    smallest, largest = min(sizes), max(sizes)
+    for row in results:
+        if row["size"] != largest or smallest == largest:
+            continue
+        base = next(r for r in results if r["size"] == smallest
+                    and r["case"] == row["case"] and r["ruleset"] == row["ruleset"])
+        growth = row["engine_ns_per_char"] / max(base["engine_ns_per_char"], 1e-3)
+        if growth > max_growth:
+            failed = True
+            print(f"NOT LINEAR: {row['case']}/{row['ruleset']} ns/char grew {growth:.1f}x")
+
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+def main() -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", default="10000,100000,1000000")
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--max-growth", type=float, default=3.0, help="allowed ns/char growth smallest -> largest")
+    p.add_argument("--out", default=None)
+    args = p.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    return run(sizes, args.rounds, args.max_growth, args.out)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""
+Compare KEYS pattern scans with the key_registry sorted-set index.
+
+Fills a throwaway Redis DB with N heartbeat keys (plus unrelated filler keys)
+at several sizes and reports the median/p99 latency of:
+
+  keys       KEYS agents:heartbeat:*          (what the dashboard used to do)
+  scan       incremental SCAN fallback         (non-blocking, still O(keyspace))
+  zcount     ZCOUNT agents:heartbeat_index     (what the dashboard does now)
+
+KEYS grows linearly with the keyspace; ZCOUNT should stay flat.
+
+Usage:
+  python tests/load/redis_keyspace_bench.py --redis-url redis://127.0.0.1:6379/15
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import redis.asyncio as redis
+
+HEARTBEAT_INDEX = "agents:heartbeat_index"
+HEARTBEAT_PATTERN = "agents:heartbeat:*"
+FILLER_PER_HEARTBEAT = 9  # unrelated keys per heartbeat key
+
+
+async def _fill(client: redis.Redis, n: int) -> None:
+    await client.flushdb()
+    expires_at = time.time() + 3600
+    batch = 5000
+    for start in range(0, n, batch):
+        async with client.pipeline(transaction=False) as pipe:
+            for i in range(start, min(start + batch, n)):
+                pipe.hset(f"agents:heartbeat:agent-{i}", mapping={"status": "online"})
+                pipe.zadd(HEARTBEAT_INDEX, {f"agent-{i}": expires_at})
+                for j in range(FILLER_PER_HEARTBEAT):
+                    pipe.set(f"filler:{i}:{j}", "x")
+            await pipe.execute()
+
+
+async def _time(fn, rounds: int) -> dict:
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+    }
+
+
+async def run(redis_url: str, sizes: list[int], rounds: int, out_path: str | None) -> int:
+    client = redis.from_url(redis_url, decode_responses=True)
+    results = []
+    try:
+        for n in sizes:
+            await _fill(client, n)
+            now = time.time()
+
+            async def keys():
+                return await client.keys(HEARTBEAT_PATTERN)
+
+            async def scan():
+                return [k async for k in client.scan_iter(match=HEARTBEAT_PATTERN, count=1000)]
+
+            async def zcount():
+                return await client.zcount(HEARTBEAT_INDEX, now, "+inf")
+
+            row = {"heartbeats": n, "total_keys": n * (FILLER_PER_HEARTBEAT + 1) + 1}
+            row["keys"] = await _time(keys, rounds)
+            row["scan"] = await _time(scan, max(1, rounds // 10))
+            row["zcount"] = await _time(zcount, rounds)
+            results.append(row)
+            print(
+                f"{n:>8} heartbeats / {row['total_keys']:>8} keys | "
+                f"KEYS p50 {row['keys']['p50_ms']:>9.3f}ms | "
+                f"SCAN p50 {row['scan']['p50_ms']:>9.3f}ms | "
+                f"ZCOUNT p50 {row['zcount']['p50_ms']:>7.3f}ms"
+            )
+        await client.flushdb()
+    finally:
+        await client.aclose()
+
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+def main() -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("--redis-url", default="redis://127.0.0.1:6379/15", help="DB is FLUSHED — use a scratch DB")
+    p.add_argument("--sizes", default="1000,10000,100000")
+    p.add_argument("--rounds", type=int, default=50)
+    p.add_argument("--out", default=None)
+    args = p.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    return asyncio.run(run(args.redis_url, sizes, args.rounds, args.out))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -70,11 +70,15 @@ class TestMetricsEndpoint:
         pipeline_results = [
             "10",   # req_count current minute
             "5",    # req_count previous minute
-            ["12.5", "20.0"],  # response_times
             "1",    # error_count
             "3",    # healer:heals_today
             "7",    # queue depth
-            ["agents:heartbeat:agent1", "agents:heartbeat:agent2"],  # keys
+            1,      # agents:heartbeat_index exists
+            2,      # live heartbeats (ZCOUNT)
+            {"10": "9", "20": "1"},  # latency_hist current minute
+            {"12": "5"},             # latency_hist previous minute
+            "150.0",  # latency_sum_ms current minute
+            "75.0",   # latency_sum_ms previous minute
         ]
         mock_from_url.return_value = _make_redis_mock(pipeline_results)
 
@@ -84,13 +88,16 @@ class TestMetricsEndpoint:
         required_fields = [
             "requestsPerMin", "avgResponseMs", "healsToday",
             "errorRatePct", "activeAgents", "redisQueueDepth", "collectedAt",
+            "p50ResponseMs", "p90ResponseMs", "p99ResponseMs",
         ]
         for field in required_fields:
             assert field in data, f"Missing field: {field}"
+        assert data["avgResponseMs"] == 15.0
+        assert data["p50ResponseMs"] <= data["p90ResponseMs"] <= data["p99ResponseMs"]
 
     @patch("app.ws.metrics_broadcaster.aioredis.from_url")
     def test_requests_per_min_sums_two_minutes(self, mock_from_url, client):
-        pipeline_results = ["10", "5", [], "0", None, "0", []]
+        pipeline_results = ["10", "5", "0", None, "0", 1, 0, {}, {}, None, None]
         mock_from_url.return_value = _make_redis_mock(pipeline_results)
 
         resp = client.get("/api/v1/metrics")
@@ -100,7 +107,7 @@ class TestMetricsEndpoint:
     @patch("app.ws.metrics_broadcaster.aioredis.from_url")
     def test_handles_empty_redis(self, mock_from_url, client):
         """All Redis keys absent — should return zeros, not crash."""
-        pipeline_results = [None, None, [], None, None, "0", []]
+        pipeline_results = [None, None, None, None, "0", 1, 0, {}, {}, None, None]
         mock_from_url.return_value = _make_redis_mock(pipeline_results)
 
         resp = client.get("/api/v1/metrics")
@@ -213,8 +220,8 @@ class TestSystemStateEndpoint:
 # ── GET /api/v1/logs ──────────────────────────────────────────────────────────
 
 class TestLogsEndpoint:
-    @patch("app.ws.logs_broadcaster.aioredis.from_url")
-    def test_returns_log_response_schema(self, mock_from_url, client):
+    @patch("app.ws.logs_broadcaster.hub.client", new_callable=AsyncMock)
+    def test_returns_log_response_schema(self, mock_client, client):
         log_entry = json.dumps({
             "id": "abc",
             "time": "12:00:00",
@@ -225,7 +232,7 @@ class TestLogsEndpoint:
         r_mock = AsyncMock()
         r_mock.lrange = AsyncMock(return_value=[log_entry])
         r_mock.aclose = AsyncMock()
-        mock_from_url.return_value = r_mock
+        mock_client.return_value = r_mock
 
         resp = client.get("/api/v1/logs")
         assert resp.status_code == 200
@@ -235,19 +242,19 @@ class TestLogsEndpoint:
         assert data["total"] == 1
         assert data["logs"][0]["agent"] == "healer"
 
-    @patch("app.ws.logs_broadcaster.aioredis.from_url")
-    def test_empty_redis_returns_empty_logs(self, mock_from_url, client):
+    @patch("app.ws.logs_broadcaster.hub.client", new_callable=AsyncMock)
+    def test_empty_redis_returns_empty_logs(self, mock_client, client):
         r_mock = AsyncMock()
         r_mock.lrange = AsyncMock(return_value=[])
         r_mock.aclose = AsyncMock()
-        mock_from_url.return_value = r_mock
+        mock_client.return_value = r_mock
 
         resp = client.get("/api/v1/logs")
         assert resp.status_code == 200
         assert resp.json()["logs"] == []
 
-    @patch("app.ws.logs_broadcaster.aioredis.from_url")
-    def test_level_filter(self, mock_from_url, client):
+    @patch("app.ws.logs_broadcaster.hub.client", new_callable=AsyncMock)
+    def test_level_filter(self, mock_client, client):
         entries = [
             json.dumps({"id": "1", "time": "", "agent": "core", "level": "error", "msg": "boom"}),
             json.dumps({"id": "2", "time": "", "agent": "core", "level": "info",  "msg": "ok"}),
@@ -255,7 +262,7 @@ class TestLogsEndpoint:
         r_mock = AsyncMock()
         r_mock.lrange = AsyncMock(return_value=entries)
         r_mock.aclose = AsyncMock()
-        mock_from_url.return_value = r_mock
+        mock_client.return_value = r_mock
 
         resp = client.get("/api/v1/logs?level=error")
         assert resp.status_code == 200
@@ -349,22 +356,26 @@ class TestHttpMetricsMiddleware:
             resp = client.get("/health")
         assert resp.status_code == 200
 
-    def test_middleware_records_to_redis(self, client):
-        """When Redis is available, pipeline.execute() is called once per request."""
-        pipe_mock = AsyncMock()
+    def test_middleware_records_without_touching_redis(self, client):
+        """Requests are aggregated in memory; Redis is only hit by the flusher."""
+        import asyncio
+        from app.core.http_metrics import HttpMetricsAggregator
+
+        aggregator = HttpMetricsAggregator()
+        pipe_mock = MagicMock()
         pipe_mock.__aenter__ = AsyncMock(return_value=pipe_mock)
         pipe_mock.__aexit__ = AsyncMock(return_value=False)
-        pipe_mock.incr = AsyncMock()
-        pipe_mock.expire = AsyncMock()
-        pipe_mock.lpush = AsyncMock()
-        pipe_mock.ltrim = AsyncMock()
-        pipe_mock.execute = AsyncMock(return_value=[1, True, 1, True])
+        pipe_mock.execute = AsyncMock(return_value=[])
 
         r_mock = MagicMock()
         r_mock.pipeline = MagicMock(return_value=pipe_mock)
 
-        with patch("app.main._metrics_redis", r_mock):
-            resp = client.get("/health")
+        with patch("app.main.http_metrics", aggregator), patch("app.main._metrics_redis", r_mock):
+            for _ in range(3):
+                assert client.get("/health").status_code == 200
 
-        assert resp.status_code == 200
+        r_mock.pipeline.assert_not_called()
+        asyncio.run(aggregator.flush(r_mock))
         pipe_mock.execute.assert_awaited_once()
+        incrby_calls = [c.args for c in pipe_mock.incrby.call_args_list]
+        assert any(key.startswith("req_count:") and n == 3 for key, n in incrby_calls)
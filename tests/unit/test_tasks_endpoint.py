@@ -1,6 +1,6 @@
 """Unit tests for the /tasks endpoint — no live DB or Celery needed."""
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 from celery.exceptions import OperationalError as CeleryOperationalError
 
 
@@ -49,9 +49,9 @@ def test_create_task_success(mock_db, mock_celery, client, auth_headers):
     assert resp.status_code in (200, 201)
 
 
-@patch("backend.app.api.v1.endpoints.memory.rag")
+@patch("backend.app.api.v1.endpoints.memory.async_rag")
 def test_memory_query_chroma_down(mock_rag, client, auth_headers):
-    mock_rag.query.side_effect = Exception("ChromaDB unavailable")
+    mock_rag.query = AsyncMock(side_effect=Exception("ChromaDB unavailable"))
     resp = client.post(
         "/api/v1/memory/query",
         json={"query": "test query", "limit": 5},